@@ -2,11 +2,17 @@
 # app_chainlit.py
 # ====================================
 
-import io
+import asyncio
+import functools
 import os
+from concurrent.futures import ThreadPoolExecutor
+
 import pandas as pd
 import chainlit as cl
 
+from config_runtime import get_secret_num
+from utils_format import df_to_excel, formatear_dataframe
+
 # ------------------------------------
 # DEBUG BÁSICO DE ENTORNO (Render)
 # ------------------------------------
@@ -25,6 +31,41 @@ except Exception as e:
     procesar_pregunta_router = None
 
 
+# ------------------------------------
+# POOL DE TRABAJO (EL EVENT LOOP NO SE BLOQUEA)
+# ------------------------------------
+# El orquestador, la base y OpenAI son sincrónicos: corren en un pool de
+# threads acotado y el loop sigue atendiendo a los demás usuarios.
+#   CHAINLIT_WORKERS          threads del pool (def. 8)
+#   CHAINLIT_MAX_POR_USUARIO  preguntas en paralelo por usuario (def. 1)
+#   CHAINLIT_FILAS_TABLA      filas de la tabla inline (def. 200; el Excel va completo)
+_POOL = ThreadPoolExecutor(max_workers=max(1, get_secret_num("CHAINLIT_WORKERS", 8)), thread_name_prefix="fertichat")
+_MAX_POR_USUARIO = max(1, get_secret_num("CHAINLIT_MAX_POR_USUARIO", 1))
+_FILAS_TABLA = max(1, get_secret_num("CHAINLIT_FILAS_TABLA", 200))
+# Un semáforo por usuario, compartido entre sus pestañas; se descarta cuando
+# se cierra la última sesión que lo usa.
+_SEMAFOROS: dict = {}
+_SESIONES: dict = {}
+
+
+def _clave_usuario() -> str:
+    usuario = cl.user_session.get("user")
+    return getattr(usuario, "identifier", None) or cl.user_session.get("id")
+
+
+def _semaforo_usuario() -> asyncio.Semaphore:
+    clave = _clave_usuario()
+    _SESIONES.setdefault(clave, set()).add(cl.user_session.get("id"))
+    if clave not in _SEMAFOROS:
+        _SEMAFOROS[clave] = asyncio.Semaphore(_MAX_POR_USUARIO)
+    return _SEMAFOROS[clave]
+
+
+async def _en_pool(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_POOL, functools.partial(fn, *args, **kwargs))
+
+
 # ------------------------------------
 # MENSAJE INICIAL (EVITA PANTALLA NEGRA)
 # ------------------------------------
@@ -35,6 +76,20 @@ async def start():
     ).send()
 
 
+@cl.on_chat_end
+async def end():
+    clave = _clave_usuario()
+    sesiones = _SESIONES.get(clave)
+    if sesiones is not None:
+        sesiones.discard(cl.user_session.get("id"))
+        if sesiones:
+            return
+        _SESIONES.pop(clave, None)
+    semaforo = _SEMAFOROS.get(clave)
+    if semaforo is not None and not semaforo.locked():
+        _SEMAFOROS.pop(clave, None)
+
+
 # ------------------------------------
 # NORMALIZADOR DE SALIDA (NO TOCA TU LÓGICA)
 # ------------------------------------
@@ -59,6 +114,36 @@ def _normalizar_salida(res):
     return str(res or ""), None
 
 
+# ------------------------------------
+# ORQUESTADOR EN EL POOL + STREAMING
+# ------------------------------------
+async def _procesar(pregunta: str, msg: cl.Message):
+    """
+    Corre el orquestador en el pool. Los tokens de OpenAI (conversación /
+    conocimiento) llegan desde el thread por una cola y se van mandando a `msg`.
+    """
+    loop = asyncio.get_running_loop()
+    cola: asyncio.Queue = asyncio.Queue()
+
+    def on_token(token: str) -> None:
+        loop.call_soon_threadsafe(cola.put_nowait, token)
+
+    async def emitir():
+        while True:
+            token = await cola.get()
+            if token is None:
+                return
+            await msg.stream_token(token)
+
+    emisor = asyncio.create_task(emitir())
+    try:
+        res = await _en_pool(procesar_pregunta_router, pregunta, on_token=on_token)
+    finally:
+        cola.put_nowait(None)
+        await emisor
+    return _normalizar_salida(res)
+
+
 # ------------------------------------
 # HANDLER PRINCIPAL
 # ------------------------------------
@@ -75,40 +160,45 @@ async def main(message: cl.Message):
         ).send()
         return
 
-    try:
-        res = procesar_pregunta_router(pregunta)
-        respuesta, df = _normalizar_salida(res)
+    # Mensaje vacío enseguida: el usuario ve que se está procesando
+    msg = cl.Message(content="")
+    await msg.send()
+
+    semaforo = _semaforo_usuario()
+    if semaforo.locked():
+        msg.content = "⏳ Termino tu consulta anterior y sigo con esta...\n\n"
+        await msg.update()
 
-        elements = []
+    async with semaforo:
+        try:
+            respuesta, df = await _procesar(pregunta, msg)
+        except Exception as e:
+            msg.content = f"❌ Error: {type(e).__name__}: {e}"
+            await msg.update()
+            return
+
+        hay_tabla = isinstance(df, pd.DataFrame) and not df.empty
+        msg.content = respuesta or "(sin texto)"
 
         # --------------------------------
-        # TABLA + EXCEL DESCARGABLE
+        # TABLA (formato LATAM): primero las primeras filas...
         # --------------------------------
-        if isinstance(df, pd.DataFrame) and not df.empty:
-            elements.append(
-                cl.Dataframe(
-                    data=df,
-                    display="inline",
-                    name="Resultado",
-                )
-            )
-
-            buf = io.BytesIO()
-            df.to_excel(buf, index=False)
-            elements.append(
-                cl.File(
-                    name="resultado.xlsx",
-                    content=buf.getvalue(),
-                    display="inline",
-                )
-            )
-
-        await cl.Message(
-            content=respuesta or "(sin texto)",
-            elements=elements,
-        ).send()
+        if hay_tabla:
+            tabla = await _en_pool(formatear_dataframe, df.head(_FILAS_TABLA))
+            msg.elements = [cl.Dataframe(data=tabla, display="inline", name="Resultado")]
+            if len(df) > _FILAS_TABLA or df.attrs.get("truncado"):
+                msg.content += f"\n\n_Mostrando {min(len(df), _FILAS_TABLA)} filas; el Excel trae el resultado completo._"
+        await msg.update()
 
-    except Exception as e:
-        await cl.Message(
-            content=f"❌ Error: {type(e).__name__}: {e}"
-        ).send()
+        # --------------------------------
+        # ... después el EXCEL DESCARGABLE (numérico, completo)
+        # --------------------------------
+        if hay_tabla:
+            try:
+                contenido = await _en_pool(df_to_excel, df)
+                await cl.Message(
+                    content="📥 Excel",
+                    elements=[cl.File(name="resultado.xlsx", content=contenido, display="inline")],
+                ).send()
+            except Exception as e:
+                await cl.Message(content=f"⚠️ No se pudo generar el Excel: {e}").send()
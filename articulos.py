@@ -14,6 +14,8 @@ from typing import Optional, Dict, Any, List, Tuple
 from datetime import datetime
 import uuid
 
+from sql_core import invalidar_cache_tablas
+
 try:
     from supabase_client import supabase
 except ImportError:
@@ -338,6 +340,7 @@ def _invalidate_caches():
     """
     _cache_proveedores.clear()
     _cache_articulos_por_tipo.clear()
+    invalidar_cache_tablas("articulos", "articulo_archivos")
 
 
 # =====================================================================
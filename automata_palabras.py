@@ -0,0 +1,67 @@
+# =========================
+# AUTOMATA_PALABRAS.PY - BÚSQUEDA DE MUCHAS PALABRAS CLAVE EN UNA PASADA
+# =========================
+"""
+Equivalente a hacer `palabra in texto` para cada palabra de una lista, pero
+recorriendo el texto una sola vez (estilo Aho-Corasick).
+
+Las palabras se arman en un trie que se compila a UN regex (motor de re, en
+C). En cada posición del texto el regex devuelve la palabra más larga que
+empieza ahí; las demás que aparecen en esa posición son prefijos de ésa, así
+que cada palabra larga trae precalculadas todas las palabras contenidas en
+ella. Resultado: exactamente el conjunto {p for p in palabras if p in texto}.
+
+Uso:
+    automata = AutomataPalabras(["factura", "facturas", "ultim", "ultima"])
+    presentes = automata.buscar("ultimas facturas de roche")
+    # frozenset({'factura', 'facturas', 'ultim', 'ultima'})
+"""
+
+import re
+from functools import lru_cache
+from typing import FrozenSet, Iterable
+
+
+def _trie(palabras: Iterable[str]) -> dict:
+    raiz: dict = {}
+    for palabra in palabras:
+        nodo = raiz
+        for c in palabra:
+            nodo = nodo.setdefault(c, {})
+        nodo[""] = True
+    return raiz
+
+
+def _regex_trie(nodo: dict) -> str:
+    """Cada nodo prueba primero seguir (más largo) y si no, termina ahí."""
+    ramas = [re.escape(c) + _regex_trie(hijo) for c, hijo in sorted(nodo.items()) if c]
+    if not ramas:
+        return ""
+    cuerpo = ramas[0] if len(ramas) == 1 else "(?:" + "|".join(ramas) + ")"
+    return f"(?:{cuerpo})?" if "" in nodo else cuerpo
+
+
+class AutomataPalabras:
+    """Conjunto de palabras clave compilado para buscarlas todas en una pasada."""
+
+    def __init__(self, palabras: Iterable[str], memo: int = 512):
+        self.palabras: FrozenSet[str] = frozenset(p for p in palabras if p)
+        self._regex = re.compile("(?=(" + _regex_trie(_trie(self.palabras)) + "))")
+        # palabra más larga encontrada -> todas las palabras contenidas en ella
+        self._contenidas = {
+            p: frozenset(q for q in self.palabras if q in p) for p in self.palabras
+        }
+        self.buscar = lru_cache(maxsize=memo)(self._buscar)
+
+    def _buscar(self, texto: str) -> FrozenSet[str]:
+        largas = set(self._regex.findall(texto or ""))
+        largas.discard("")
+        if not largas:
+            return frozenset()
+        if len(largas) == 1:
+            return self._contenidas[largas.pop()]
+        return frozenset().union(*(self._contenidas[p] for p in largas))
+
+    def buscar_simple(self, texto: str) -> FrozenSet[str]:
+        """Versión directa (una búsqueda por palabra). Referencia para validar."""
+        return frozenset(p for p in self.palabras if p in (texto or ""))
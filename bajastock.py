@@ -5,21 +5,25 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime
-import psycopg2
 from psycopg2.extras import RealDictCursor
 
+from sql_core import (
+    get_db_connection,
+    invalidar_cache_tablas,
+    stock_lote_clave_disponible,
+    _sql_filtro_texto,
+    _sql_score_texto,
+)
+
 # =========================
 # CONEXIÓN A POSTGRESQL (SUPABASE)
 # =========================
 def get_connection():
-    return psycopg2.connect(
-        host=st.secrets["DB_HOST"],
-        port=st.secrets["DB_PORT"],
-        dbname=st.secrets["DB_NAME"],
-        user=st.secrets["DB_USER"],
-        password=st.secrets["DB_PASSWORD"],
-        sslmode="require"
-    )
+    """Conexión del pool compartido (sql_core); `close()` la devuelve al pool."""
+    conn = get_db_connection()
+    if conn is None:
+        raise RuntimeError("No se pudo obtener conexión a la base de datos")
+    return conn
 
 
 # =========================
@@ -160,7 +164,8 @@ def buscar_items_stock(busqueda: str, limite_filas: int = 500):
     conn = get_connection()
     cur = conn.cursor(cursor_factory=RealDictCursor)
 
-    cur.execute("""
+    # Código exacto primero, después por similitud del artículo con la búsqueda
+    cur.execute(f"""
         SELECT
             "FAMILIA",
             "CODIGO",
@@ -168,13 +173,15 @@ def buscar_items_stock(busqueda: str, limite_filas: int = 500):
             "DEPOSITO",
             "LOTE",
             "VENCIMIENTO",
-            "STOCK"
+            "STOCK",
+            CASE WHEN TRIM("CODIGO") = %s THEN 2 ELSE {_sql_score_texto('"ARTICULO"')} END AS "SCORE"
         FROM stock
         WHERE
             TRIM("CODIGO") = %s
-            OR LOWER(TRIM("ARTICULO")) LIKE LOWER(%s)
+            OR {_sql_filtro_texto('"ARTICULO"')}
+        ORDER BY "SCORE" DESC
         LIMIT %s
-    """, (b, f"%{b}%", limite_filas))
+    """, (b, b, b, b, limite_filas))
 
     filas = cur.fetchall()
     cur.close()
@@ -195,15 +202,17 @@ def buscar_items_stock(busqueda: str, limite_filas: int = 500):
                 "CODIGO": codigo,
                 "ARTICULO": articulo,
                 "STOCK_TOTAL": 0.0,
-                "DEPOSITOS": set()
+                "DEPOSITOS": set(),
+                "SCORE": 0.0,
             }
 
         agg[key]["STOCK_TOTAL"] += stock_val
+        agg[key]["SCORE"] = max(agg[key]["SCORE"], _to_float(r.get("SCORE")))
         if deposito:
             agg[key]["DEPOSITOS"].add(deposito)
 
     items = list(agg.values())
-    items.sort(key=lambda x: x.get("STOCK_TOTAL", 0.0), reverse=True)
+    items.sort(key=lambda x: (x.get("SCORE", 0.0), x.get("STOCK_TOTAL", 0.0)), reverse=True)
     return items[:20]
 
 
@@ -263,10 +272,14 @@ def registrar_baja(
     stock_despues_lote=None,
     stock_total_articulo=None,
     stock_total_deposito=None,
-    stock_casa_central=None
+    stock_casa_central=None,
+    cur=None
 ):
-    conn = get_connection()
-    cur = conn.cursor()
+    # Con `cur` el INSERT va en la transacción del llamador (sin commit propio)
+    conn = None
+    if cur is None:
+        conn = get_connection()
+        cur = conn.cursor()
     ahora = datetime.now()
 
     cur.execute("""
@@ -288,9 +301,12 @@ def registrar_baja(
         stock_total_articulo, stock_total_deposito, stock_casa_central
     ))
 
+    if conn is None:
+        return
     conn.commit()
     cur.close()
     conn.close()
+    invalidar_cache_tablas("historial_bajas")
 
 
 def obtener_historial_bajas(limite=50):
@@ -352,6 +368,7 @@ def registrar_movimiento(
     conn.commit()
     cur.close()
     conn.close()
+    invalidar_cache_tablas("historial_movimientos")
 
 
 def obtener_historial_movimientos(limite=50):
@@ -368,6 +385,147 @@ def obtener_historial_movimientos(limite=50):
     return res
 
 
+# =========================
+# LOTES: CLAVE + OPERACIONES SOBRE stock
+# =========================
+# Un lote se identifica por (codigo, articulo, deposito, lote, vencimiento).
+# Con la migración stock_lote_clave estas expresiones están indexadas
+# (idx_stock_lote_clave) y la resta es un solo UPDATE ... RETURNING: el lock
+# de fila lo toma el UPDATE y los totales se suman en SQL.
+_WHERE_LOTE = """
+    TRIM("CODIGO") = %s
+    AND TRIM("ARTICULO") = %s
+    AND TRIM("DEPOSITO") = %s
+    AND COALESCE(TRIM("LOTE"), '') = %s
+    AND COALESCE(TRIM("VENCIMIENTO"), '') = %s
+"""
+
+
+def _restar_lote(cur, clave: tuple, cantidad: float, msg_no_encontrado: str, msg_sin_stock: str) -> tuple:
+    """Resta `cantidad` del lote `clave`. Retorna (stock_antes, stock_despues)."""
+    cantidad = float(cantidad)
+
+    if stock_lote_clave_disponible():
+        cur.execute(f"""
+            UPDATE stock
+            SET "STOCK" = fc_stock_fmt(fc_stock_cant("STOCK"::text) - %s)
+            WHERE {_WHERE_LOTE}
+              AND fc_stock_cant("STOCK"::text) >= %s - 0.000000001
+            RETURNING fc_stock_cant("STOCK"::text) AS despues
+        """, (cantidad, *clave, cantidad))
+        row = cur.fetchone()
+        if row:
+            despues = float(row.get("despues") or 0)
+            return despues + cantidad, despues
+
+        # Sin filas: o no existe el lote o no alcanza el stock
+        cur.execute(f'SELECT fc_stock_cant("STOCK"::text) AS stock FROM stock WHERE {_WHERE_LOTE}', clave)
+        row = cur.fetchone()
+        if not row:
+            raise ValueError(msg_no_encontrado)
+        raise ValueError(f"{msg_sin_stock} {float(row.get('stock') or 0)}")
+
+    cur.execute(f"""
+        SELECT "STOCK"
+        FROM stock
+        WHERE {_WHERE_LOTE}
+        FOR UPDATE
+    """, clave)
+    row = cur.fetchone()
+    if not row:
+        raise ValueError(msg_no_encontrado)
+
+    antes = _to_float(row.get("STOCK"))
+    if cantidad > antes + 1e-9:
+        raise ValueError(f"{msg_sin_stock} {antes}")
+
+    despues = antes - cantidad
+    cur.execute(f"""
+        UPDATE stock
+        SET "STOCK" = %s
+        WHERE {_WHERE_LOTE}
+    """, (_fmt_num(despues), *clave))
+    return antes, despues
+
+
+def _sumar_lote(cur, clave: tuple, cantidad: float, familia: str) -> tuple:
+    """Suma `cantidad` al lote `clave` (lo crea si no existe). Retorna (stock_antes, stock_despues)."""
+    cantidad = float(cantidad)
+
+    if stock_lote_clave_disponible():
+        cur.execute(f"""
+            UPDATE stock
+            SET "STOCK" = fc_stock_fmt(fc_stock_cant("STOCK"::text) + %s)
+            WHERE {_WHERE_LOTE}
+            RETURNING fc_stock_cant("STOCK"::text) AS despues
+        """, (cantidad, *clave))
+        row = cur.fetchone()
+        if row:
+            despues = float(row.get("despues") or 0)
+            return despues - cantidad, despues
+        antes = 0.0
+    else:
+        cur.execute(f"""
+            SELECT "STOCK"
+            FROM stock
+            WHERE {_WHERE_LOTE}
+            FOR UPDATE
+        """, clave)
+        row = cur.fetchone()
+        antes = 0.0
+        if row:
+            antes = _to_float(row.get("STOCK"))
+            despues = antes + cantidad
+            cur.execute(f"""
+                UPDATE stock
+                SET "STOCK" = %s
+                WHERE {_WHERE_LOTE}
+            """, (_fmt_num(despues), *clave))
+            return antes, despues
+
+    codigo, articulo, deposito, lote, vencimiento = clave
+    cur.execute("""
+        INSERT INTO stock ("FAMILIA","CODIGO","ARTICULO","DEPOSITO","LOTE","VENCIMIENTO","STOCK")
+        VALUES (%s,%s,%s,%s,%s,%s,%s)
+    """, (familia, codigo, articulo, deposito, lote, vencimiento, _fmt_num(cantidad)))
+    return antes, cantidad
+
+
+def _totales_articulo(cur, codigo: str, articulo: str, deposito: str) -> tuple:
+    """(total artículo, total en `deposito`, total en Casa Central) después del movimiento."""
+    if stock_lote_clave_disponible():
+        cur.execute("""
+            SELECT
+                COALESCE(SUM(fc_stock_cant("STOCK"::text)), 0) AS total_articulo,
+                COALESCE(SUM(fc_stock_cant("STOCK"::text)) FILTER (WHERE TRIM("DEPOSITO") = %s), 0) AS total_deposito,
+                COALESCE(SUM(fc_stock_cant("STOCK"::text))
+                         FILTER (WHERE LOWER(TRIM("DEPOSITO")) LIKE '%%casa central%%'), 0) AS total_casa_central
+            FROM stock
+            WHERE TRIM("CODIGO") = %s AND TRIM("ARTICULO") = %s
+        """, (deposito, codigo, articulo))
+        row = cur.fetchone() or {}
+        return (
+            float(row.get("total_articulo") or 0),
+            float(row.get("total_deposito") or 0),
+            float(row.get("total_casa_central") or 0),
+        )
+
+    cur.execute("""
+        SELECT "DEPOSITO", "STOCK"
+        FROM stock
+        WHERE TRIM("CODIGO") = %s AND TRIM("ARTICULO") = %s
+    """, (codigo, articulo))
+    filas = [
+        {"DEPOSITO": _norm_str(r.get("DEPOSITO")), "STOCK_NUM": _to_float(r.get("STOCK"))}
+        for r in cur.fetchall()
+    ]
+    return (
+        _sum_stock(filas),
+        _sum_stock(filas, filtro_deposito=deposito),
+        _sum_stock(filas, solo_casa_central=True),
+    )
+
+
 # =========================
 # BAJA: ACTUALIZAR STOCK (TABLA stock)
 # =========================
@@ -386,66 +544,30 @@ def aplicar_baja_en_lote(
     lote = _norm_str(lote)
     vencimiento = _norm_str(vencimiento)
 
+    # Se resuelve antes del checkout (queda cacheado): dentro de la transacción
+    # no se pide una segunda conexión al pool
+    stock_lote_clave_disponible()
+
     conn = get_connection()
     try:
         conn.autocommit = False
         cur = conn.cursor(cursor_factory=RealDictCursor)
 
-        cur.execute("""
-            SELECT "STOCK"
-            FROM stock
-            WHERE
-                TRIM("CODIGO") = %s
-                AND TRIM("ARTICULO") = %s
-                AND TRIM("DEPOSITO") = %s
-                AND COALESCE(TRIM("LOTE"), '') = %s
-                AND COALESCE(TRIM("VENCIMIENTO"), '') = %s
-            FOR UPDATE
-        """, (codigo, articulo, deposito, lote, vencimiento))
-
-        row = cur.fetchone()
-        if not row:
-            raise ValueError("No se encontró el lote seleccionado en la tabla stock.")
-
-        stock_antes = _to_float(row.get("STOCK"))
         if cantidad <= 0:
             raise ValueError("La cantidad debe ser mayor a 0.")
-        if cantidad > stock_antes + 1e-9:
-            raise ValueError(f"No hay stock suficiente en ese lote. Stock lote: {stock_antes}")
-
-        stock_despues = stock_antes - float(cantidad)
 
-        cur.execute("""
-            UPDATE stock
-            SET "STOCK" = %s
-            WHERE
-                TRIM("CODIGO") = %s
-                AND TRIM("ARTICULO") = %s
-                AND TRIM("DEPOSITO") = %s
-                AND COALESCE(TRIM("LOTE"), '') = %s
-                AND COALESCE(TRIM("VENCIMIENTO"), '') = %s
-        """, (_fmt_num(stock_despues), codigo, articulo, deposito, lote, vencimiento))
+        stock_antes, stock_despues = _restar_lote(
+            cur,
+            (codigo, articulo, deposito, lote, vencimiento),
+            cantidad,
+            "No se encontró el lote seleccionado en la tabla stock.",
+            "No hay stock suficiente en ese lote. Stock lote:",
+        )
 
         # Totales post-baja
-        cur.execute("""
-            SELECT "DEPOSITO", "STOCK"
-            FROM stock
-            WHERE TRIM("CODIGO") = %s AND TRIM("ARTICULO") = %s
-        """, (codigo, articulo))
-        rows_all = cur.fetchall()
-
-        filas_norm = []
-        for r in rows_all:
-            filas_norm.append({
-                "DEPOSITO": _norm_str(r.get("DEPOSITO")),
-                "STOCK_NUM": _to_float(r.get("STOCK"))
-            })
+        total_articulo, total_deposito, total_casa_central = _totales_articulo(cur, codigo, articulo, deposito)
 
-        total_articulo = sum(r["STOCK_NUM"] for r in filas_norm)
-        total_deposito = sum(r["STOCK_NUM"] for r in filas_norm if r["DEPOSITO"] == deposito)
-        total_casa_central = sum(r["STOCK_NUM"] for r in filas_norm if "casa central" in r["DEPOSITO"].lower())
-
-        # Historial baja
+        # Historial baja (mismo cursor: se confirma o se revierte junto con la baja)
         registrar_baja(
             usuario=usuario,
             codigo_interno=codigo,
@@ -458,10 +580,12 @@ def aplicar_baja_en_lote(
             stock_despues_lote=float(stock_despues),
             stock_total_articulo=float(total_articulo),
             stock_total_deposito=float(total_deposito),
-            stock_casa_central=float(total_casa_central)
+            stock_casa_central=float(total_casa_central),
+            cur=cur
         )
 
         conn.commit()
+        invalidar_cache_tablas("stock", "historial_bajas")
         return {
             "stock_antes_lote": stock_antes,
             "stock_despues_lote": stock_despues,
@@ -508,86 +632,30 @@ def aplicar_movimiento_en_lote(
     if cantidad <= 0:
         raise ValueError("La cantidad debe ser mayor a 0.")
 
+    stock_lote_clave_disponible()
+
     conn = get_connection()
     try:
         conn.autocommit = False
         cur = conn.cursor(cursor_factory=RealDictCursor)
 
-        # Lock origen
-        cur.execute("""
-            SELECT "STOCK"
-            FROM stock
-            WHERE
-                TRIM("CODIGO") = %s
-                AND TRIM("ARTICULO") = %s
-                AND TRIM("DEPOSITO") = %s
-                AND COALESCE(TRIM("LOTE"), '') = %s
-                AND COALESCE(TRIM("VENCIMIENTO"), '') = %s
-            FOR UPDATE
-        """, (codigo, articulo, deposito_origen, lote, vencimiento))
-
-        row_o = cur.fetchone()
-        if not row_o:
-            raise ValueError("No se encontró el lote en el depósito ORIGEN.")
-
-        stock_origen_antes = _to_float(row_o.get("STOCK"))
-        if cantidad > stock_origen_antes + 1e-9:
-            raise ValueError(f"No hay stock suficiente en ORIGEN. Stock: {stock_origen_antes}")
-
-        stock_origen_despues = stock_origen_antes - float(cantidad)
-
-        # Update origen
-        cur.execute("""
-            UPDATE stock
-            SET "STOCK" = %s
-            WHERE
-                TRIM("CODIGO") = %s
-                AND TRIM("ARTICULO") = %s
-                AND TRIM("DEPOSITO") = %s
-                AND COALESCE(TRIM("LOTE"), '') = %s
-                AND COALESCE(TRIM("VENCIMIENTO"), '') = %s
-        """, (_fmt_num(stock_origen_despues), codigo, articulo, deposito_origen, lote, vencimiento))
-
-        # Lock / crear destino
-        cur.execute("""
-            SELECT "STOCK"
-            FROM stock
-            WHERE
-                TRIM("CODIGO") = %s
-                AND TRIM("ARTICULO") = %s
-                AND TRIM("DEPOSITO") = %s
-                AND COALESCE(TRIM("LOTE"), '') = %s
-                AND COALESCE(TRIM("VENCIMIENTO"), '') = %s
-            FOR UPDATE
-        """, (codigo, articulo, deposito_destino, lote, vencimiento))
-
-        row_d = cur.fetchone()
-        stock_destino_antes = 0.0
-
-        if row_d:
-            stock_destino_antes = _to_float(row_d.get("STOCK"))
-            stock_destino_despues = stock_destino_antes + float(cantidad)
-
-            cur.execute("""
-                UPDATE stock
-                SET "STOCK" = %s
-                WHERE
-                    TRIM("CODIGO") = %s
-                    AND TRIM("ARTICULO") = %s
-                    AND TRIM("DEPOSITO") = %s
-                    AND COALESCE(TRIM("LOTE"), '') = %s
-                    AND COALESCE(TRIM("VENCIMIENTO"), '') = %s
-            """, (_fmt_num(stock_destino_despues), codigo, articulo, deposito_destino, lote, vencimiento))
-        else:
-            stock_destino_despues = float(cantidad)
-            cur.execute("""
-                INSERT INTO stock ("FAMILIA","CODIGO","ARTICULO","DEPOSITO","LOTE","VENCIMIENTO","STOCK")
-                VALUES (%s,%s,%s,%s,%s,%s,%s)
-            """, (
-                familia, codigo, articulo, deposito_destino, lote, vencimiento, _fmt_num(stock_destino_despues)
-            ))
+        # Restar origen / sumar (o crear) destino
+        stock_origen_antes, stock_origen_despues = _restar_lote(
+            cur,
+            (codigo, articulo, deposito_origen, lote, vencimiento),
+            cantidad,
+            "No se encontró el lote en el depósito ORIGEN.",
+            "No hay stock suficiente en ORIGEN. Stock:",
+        )
+        stock_destino_antes, stock_destino_despues = _sumar_lote(
+            cur,
+            (codigo, articulo, deposito_destino, lote, vencimiento),
+            cantidad,
+            familia,
+        )
 
         conn.commit()
+        invalidar_cache_tablas("stock", "historial_movimientos")
 
     except Exception:
         try:
@@ -0,0 +1 @@
+"""Benchmarks y verificaciones de paridad. Se corren desde la raíz: python -m bench.<script>"""
@@ -0,0 +1,142 @@
+# =========================
+# BENCH_FORMATO_LATAM.PY - PARSEO / FORMATO LATAM POR CELDA vs POR COLUMNA
+# =========================
+"""
+Compara, sobre columnas de importes de 100.000 filas, las funciones por celda
+de utils_format (Series.apply) contra las de columna:
+
+    _latam_to_float   vs  _serie_latam_to_float   (utils_graphs._df_get_numeric)
+    _fmt_num_latam    vs  _fmt_serie_latam        (formatear_dataframe)
+
+Antes de medir verifica paridad: el resultado por columna tiene que ser
+idéntico al de celda por celda, con columnas de texto ("1.234,56", "(12,5)",
+"U$S 1.234", ...), float, Decimal (psycopg2 sin Arrow) y mezclas con None /
+NaN / textos que no son números. Sale con 1 si hay alguna diferencia.
+
+Uso:
+    python -m bench.bench_formato_latam            # 100k filas
+    python -m bench.bench_formato_latam 300000     # otro tamaño
+
+No necesita Supabase ni Streamlit.
+"""
+
+import math
+import random
+import sys
+from decimal import Decimal
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from bench.medicion import mejor_ms
+from utils_format import (
+    _fmt_num_latam,
+    _fmt_serie_latam,
+    _latam_to_float,
+    _serie_latam_to_float,
+)
+
+# Textos que tienen que dar lo mismo por los dos caminos (incluye los que el
+# camino por columna deja a la función por celda)
+BORDES = [
+    "0", "1.234,56", "  124.300,00 ", "1.234.567,89", "12.500", "12.50", "1,5",
+    "(12,5)", "(1.234,56)", "-1.234,5", "-0,99", "$ 1.234,56", "$(1.234,5)",
+    "U$S 1.234,56", "U$S(12,5)", "USD 4,5", "U$$ 100", "1,234.56", "1,2,3",
+    "1.2.3", "", " ", "-", "$", "nan", "NaN", "inf", "1e5", "+5", "abc",
+    "1\t000", "1" * 400, "0,125", ".5", "5.", ",5",
+]
+
+
+def _monto_txt(rng: random.Random) -> str:
+    v = rng.uniform(-2_000_000, 2_000_000)
+    latam = f"{abs(v):,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+    forma = rng.random()
+    if forma < 0.15:
+        latam = f"({latam})"
+    elif v < 0:
+        latam = f"-{latam}"
+    pref = rng.choice(["", "", "$ ", "U$S ", "$"])
+    return f"{pref}{latam}"
+
+
+def columnas(n: int, seed: int = 7) -> Dict[str, pd.Series]:
+    rng = random.Random(seed)
+    textos = [_monto_txt(rng) for _ in range(n)]
+    floats = [round(rng.uniform(-1e6, 1e6), 2) for _ in range(n)]
+    mezcla: List[object] = []
+    for i in range(n):
+        r = rng.random()
+        if r < 0.05:
+            mezcla.append(rng.choice([None, np.nan]))
+        elif r < 0.10:
+            mezcla.append(rng.choice(BORDES))
+        elif r < 0.15:
+            mezcla.append(Decimal(str(floats[i])))
+        else:
+            mezcla.append(textos[i])
+    return {
+        "texto (str)": pd.Series(textos, dtype="str"),
+        "texto (object)": pd.Series(textos, dtype=object),
+        "float": pd.Series(floats, dtype="float64"),
+        "Decimal": pd.Series([Decimal(str(x)) for x in floats], dtype=object),
+        "mezcla": pd.Series(mezcla, dtype=object),
+        "bordes": pd.Series(BORDES + [None, np.nan, Decimal("NaN"), 7, True], dtype=object),
+    }
+
+
+def _iguales_float(a: pd.Series, b: pd.Series) -> int:
+    malas = 0
+    for x, y in zip(a.tolist(), b.tolist()):
+        if not (x == y or (math.isnan(x) and math.isnan(y))):
+            malas += 1
+    return malas
+
+
+def paridad(cols: Dict[str, pd.Series]) -> int:
+    fallas = 0
+    for nombre, s in cols.items():
+        m_num = _iguales_float(_serie_latam_to_float(s), s.apply(_latam_to_float))
+        col = _fmt_serie_latam(s).tolist()
+        ref = s.apply(_fmt_num_latam).tolist()
+        m_fmt = sum(1 for x, y in zip(col, ref) if x != y)
+        fallas += m_num + m_fmt
+        marca = "✅" if not (m_num or m_fmt) else "❌"
+        print(f"{marca} {nombre:<15} a float: {m_num} distintas | formato: {m_fmt} distintas ({len(s)} filas)")
+    return fallas
+
+
+def main() -> int:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 and sys.argv[1].isdigit() else 100_000
+    cols = columnas(n)
+
+    print("=" * 72)
+    print("PARIDAD (por columna == celda por celda)")
+    print("=" * 72)
+    fallas = paridad(cols)
+    if fallas:
+        print(f"❌ {fallas} diferencias")
+        return 1
+
+    print()
+    print("=" * 72)
+    print(f"TIEMPOS ({n} filas, mejor de 3)")
+    print("=" * 72)
+    print(f"{'columna':<16}{'a float':>22}{'formato':>26}")
+    print(f"{'':<16}{'celda':>10}{'columna':>12}{'celda':>12}{'columna':>14}")
+    for nombre, s in cols.items():
+        if nombre == "bordes":
+            continue
+        t_num_c = mejor_ms(lambda: s.apply(_latam_to_float))
+        t_num_s = mejor_ms(lambda: _serie_latam_to_float(s))
+        t_fmt_c = mejor_ms(lambda: s.apply(_fmt_num_latam))
+        t_fmt_s = mejor_ms(lambda: _fmt_serie_latam(s))
+        print(
+            f"{nombre:<16}{t_num_c:8.1f} ms{t_num_s:9.1f} ms"
+            f"{t_fmt_c:9.1f} ms{t_fmt_s:11.1f} ms"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+# =========================
+# BENCH_INTENCIONES.PY - VALIDACIÓN Y BENCHMARK DEL AUTÓMATA DE PALABRAS CLAVE
+# =========================
+"""
+detectar_intencion busca todas sus palabras clave en una pasada
+(intent_detector.palabras_presentes / automata_palabras) en vez de hacer un
+`x in texto_norm` por cada palabra de cada regla.
+
+Este script:
+    1. verifica que el autómata devuelva exactamente las mismas palabras que
+       la búsqueda directa (buscar_simple) en las preguntas de tests.py + un
+       corpus aleatorio armado con las palabras de las reglas
+    2. opcionalmente compara las intenciones completas contra una copia de un
+       intent_detector.py anterior
+    3. mide µs por pregunta
+
+Uso:
+    python -m bench.bench_intenciones
+    python -m bench.bench_intenciones 100000
+    git show <commit>:intent_detector.py > /tmp/intent_viejo.py
+    python -m bench.bench_intenciones 50000 /tmp/intent_viejo.py
+"""
+
+import importlib.util
+import random
+import sys
+from typing import List
+
+import intent_detector
+from bench.medicion import us_por_item
+from tests import TESTS
+
+_EXTRA = [
+    "roche", "vitek", "abbott", "biodiagnostico", "glucosa", "2023", "2024", "2025", "2026",
+    "2025-06", "enero", "junio", "noviembre", "última", "Última", "detalle factura", "A0012345",
+    "60907", "12345678", "de", "del", "en", "y", ",", "lote AB-12", "30 dias", "id", "fb",
+    "todas las", "cuanto", "compras del año", "mostrar compras", "total 2025", "ultimas",
+    "ultimo vitek", "vs", "en que fecha", "Comparar",
+]
+
+
+def corpus(n: int, seed: int = 25) -> List[str]:
+    vocab = sorted(intent_detector._AUTOMATA.palabras) + _EXTRA
+    rnd = random.Random(seed)
+    out = [p for p, _ in TESTS]
+    for _ in range(n):
+        out.append(" ".join(rnd.choices(vocab, k=rnd.randint(1, 7))))
+    return out
+
+
+def _cargar(path: str):
+    spec = importlib.util.spec_from_file_location("intent_detector_anterior", path)
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return modulo
+
+
+def main(n: int, anterior: str = "") -> None:
+    automata = intent_detector._AUTOMATA
+    textos = corpus(n)
+    normalizados = [intent_detector.normalizar_texto(t).replace("última", "ultima") for t in textos]
+
+    print(f"🔎 {len(automata.palabras)} palabras clave, {len(textos)} textos")
+    for t in normalizados:
+        if automata.buscar(t) != automata.buscar_simple(t):
+            print(f"❌ Autómata distinto: {t!r}")
+            return
+    print("🎯 Autómata == búsqueda directa")
+
+    if anterior:
+        modulo = _cargar(anterior)
+        distintas = [t for t in textos if modulo.detectar_intencion(t) != intent_detector.detectar_intencion(t)]
+        if distintas:
+            print(f"❌ {len(distintas)} intenciones distintas, ej.: {distintas[:3]}")
+            return
+        print(f"🎯 Intenciones idénticas a {anterior}")
+
+    muestra = normalizados[:2000]
+    preguntas = [p for p, _ in TESTS] * 100
+    print("Palabras clave por pregunta:")
+    print(f"  una búsqueda por palabra   {us_por_item(automata.buscar_simple, muestra):7.2f} µs")
+    print(f"  autómata                   {us_por_item(automata._buscar, muestra):7.2f} µs")
+    print("detectar_intencion (preguntas de tests.py):")
+    if anterior:
+        print(f"  anterior                   {us_por_item(modulo.detectar_intencion, preguntas):7.2f} µs")
+    print(f"  actual                     {us_por_item(intent_detector.detectar_intencion, preguntas):7.2f} µs")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 20_000,
+        sys.argv[2] if len(sys.argv) > 2 else "",
+    )
@@ -0,0 +1,249 @@
+# =========================
+# BENCH_RASGOS_PREGUNTA.PY - BENCHMARK EXTRACTORES POR INTÉRPRETE vs RASGOS COMPARTIDOS
+# =========================
+"""
+Compara, por pregunta, lo que costaba que cada intérprete re-escaneara el texto
+con sus propios regex (_extraer_anios, _extraer_meses_*, _extraer_moneda,
+_extraer_nro_factura, _extraer_limite, _extraer_rango_fechas, contiene_factura)
+contra rasgos_pregunta.extraer_rasgos (una pasada, memorizada por texto) +
+las mismas funciones de cada módulo, que ahora leen de los rasgos.
+
+Antes de medir verifica que los resultados sean idénticos a los regex viejos
+(copiados acá abajo) en un corpus de preguntas reales + texto aleatorio.
+
+Uso:
+    python -m bench.bench_rasgos_pregunta            # 20.000 textos aleatorios
+    python -m bench.bench_rasgos_pregunta 100000     # más casos
+
+Importa los intérpretes: necesita las mismas dependencias que la app
+(streamlit, openai); no consulta la base.
+"""
+
+import random
+import re
+import sys
+from typing import Callable, List, Tuple
+
+import ia_comparativas
+import ia_compras
+import ia_facturas
+import ia_interpretador
+import ia_interpretador_articulos
+import ia_router
+import intent_detector
+import rasgos_pregunta
+from bench.medicion import mejor_ms
+
+ANIOS_VALIDOS = {2023, 2024, 2025, 2026}
+MESES = list(ia_router.MESES.keys())
+MAX = 4, 6
+
+
+# =====================================================================
+# REGEX ANTERIORES (referencia)
+# =====================================================================
+def _unicos(xs, limite=None):
+    out, seen = [], set()
+    for x in xs:
+        if x not in seen:
+            seen.add(x)
+            out.append(x)
+    return out if limite is None else out[:limite]
+
+
+def v_anios_libres(t):
+    return _unicos([int(a) for a in re.findall(r"(2023|2024|2025|2026)", t)], MAX[0])
+
+
+def v_meses_nombre_libres(t):
+    return _unicos([m for m in MESES if m in t.lower()], MAX[1])
+
+
+def v_yyyymm_libres(t):
+    return _unicos([f"{a}-{m}" for a, m in re.findall(r"(2023|2024|2025|2026)[-/](0[1-9]|1[0-2])", t)], MAX[1])
+
+
+def v_router_anios(t):
+    return sorted({int(m.group(1)) for m in re.finditer(r"\b(20\d{2})\b", t) if int(m.group(1)) in ANIOS_VALIDOS})
+
+
+def v_router_meses(t):
+    return sorted({cod for n, cod in ia_router.MESES.items() if n in t.lower()})
+
+
+def v_router_yyyymm(t):
+    return sorted({f"{m.group(1)}-{m.group(2)}" for m in re.finditer(r"\b(20\d{2})[/-](0[1-9]|1[0-2])\b", t)})
+
+
+def v_limite(t, d=500):
+    for n in re.findall(r"\b\d+\b", t):
+        if int(n) > 0:
+            return int(n)
+    return d
+
+
+def v_moneda(t):
+    t = t.lower()
+    for cod, ps in (("USD", ["usd", "u$s", "u$$", "dólares", "dolares", "dollar", "dólar", "dolar"]),
+                    ("UYU", ["pesos", "uyu", "$", "moneda nacional"])):
+        if any(p in t for p in ps):
+            return cod
+    return None
+
+
+def v_rango(t):
+    f = re.findall(r"\b(\d{4}-\d{2}-\d{2})\b", t)
+    return (f[0], f[1]) if len(f) >= 2 else ((f[0], None) if f else (None, None))
+
+
+def v_contiene_factura(t):
+    if not t:
+        return False
+    return bool(re.search(
+        r"\b(detalle\s+)?factura(s)?\b|\bnro\.?\s*(comprobante|factura)\b|\bnro\.?\s*comprobante\b|\bcomprobante(s)?\b",
+        t.lower(), flags=re.IGNORECASE))
+
+
+def v_nro_factura(texto):
+    if not texto:
+        return None
+    t = str(texto).strip()
+    m = re.search(
+        r"\b(detalle\s+)?(factura|comprobante|nro\.?\s*comprobante|nro\.?\s*factura)\b\s*[:#-]?\s*([A-Za-z]?\d{3,})\b",
+        t, flags=re.IGNORECASE)
+    raw = m.group(3).strip() if m else (t if re.fullmatch(r"[A-Za-z]?\d{3,}", t) else None)
+    if raw is None or (raw.isdigit() and int(raw) in ANIOS_VALIDOS):
+        return None
+    return raw.upper() or None
+
+
+def v_facturas_anios(t):
+    return sorted(set(int(a) for a in re.findall(r"\b(2023|2024|2025|2026)\b", t)))
+
+
+def v_articulos_meses(t):
+    out = [m for m in MESES if m in t.lower()]
+    out.extend(re.findall(r"(2023|2024|2025|2026)[-/](0[1-9]|1[0-2])", t))
+    return sorted(map(str, set(out)))
+
+
+def v_detector_anios(t):
+    return sorted(set(int(a) for a in re.findall(r"\b(20\d{2})\b", t)))
+
+
+# (nombre, versión anterior, versión actual)
+CASOS: List[Tuple[str, Callable, Callable]] = [
+    ("interpretador.anios", v_anios_libres, ia_interpretador._extraer_anios),
+    ("interpretador.meses", v_meses_nombre_libres, ia_interpretador._extraer_meses_nombre),
+    ("interpretador.yyyymm", v_yyyymm_libres, ia_interpretador._extraer_meses_yyyymm),
+    ("interpretador.limite", v_limite, ia_interpretador._extraer_limite),
+    ("interpretador.moneda", v_moneda, ia_interpretador._extraer_moneda),
+    ("interpretador.rango", v_rango, ia_interpretador._extraer_rango_fechas),
+    ("interpretador.factura", v_contiene_factura, ia_interpretador.contiene_factura),
+    ("interpretador.nro", v_nro_factura, ia_interpretador._extraer_nro_factura),
+    ("router.anios", v_router_anios, ia_router._extraer_anios),
+    ("router.meses", v_router_meses, ia_router._extraer_meses_nombre),
+    ("router.yyyymm", v_router_yyyymm, ia_router._extraer_meses_yyyymm),
+    ("router.limite", v_limite, ia_router._extraer_limite),
+    ("router.moneda", v_moneda, ia_router._extraer_moneda),
+    ("router.rango", v_rango, ia_router._extraer_rango_fechas),
+    ("router.factura", v_contiene_factura, ia_router.contiene_factura),
+    ("router.nro", v_nro_factura, ia_router._extraer_nro_factura),
+    ("compras.anios", v_anios_libres, ia_compras._extraer_anios),
+    ("compras.meses", v_meses_nombre_libres, ia_compras._extraer_meses_nombre),
+    ("compras.yyyymm", v_yyyymm_libres, ia_compras._extraer_meses_yyyymm),
+    ("comparativas.anios", v_anios_libres, ia_comparativas._extraer_anios),
+    ("comparativas.meses", v_meses_nombre_libres, ia_comparativas._extraer_meses_nombre),
+    ("comparativas.yyyymm", v_yyyymm_libres, ia_comparativas._extraer_meses_yyyymm),
+    ("facturas.anios", v_facturas_anios, ia_facturas._extraer_anios),
+    ("articulos.anios", lambda t: _unicos([int(a) for a in re.findall(r"(2023|2024|2025|2026)", t)]),
+     ia_interpretador_articulos._extraer_anios),
+    ("articulos.meses", v_articulos_meses, lambda t: sorted(map(str, ia_interpretador_articulos._extraer_meses(t)))),
+    ("detector.anios", v_detector_anios, intent_detector.extraer_anios),
+]
+
+
+# =====================================================================
+# CORPUS
+# =====================================================================
+PREGUNTAS = [
+    "compras roche 2025", "compras roche noviembre 2025", "detalle factura 60907",
+    "comparar compras roche 2024 2025", "comparar roche noviembre 2023 vs noviembre 2024",
+    "gastos familias 2025-03", "top 10 proveedores 2025", "compras abbott junio 2025 en dólares",
+    "facturas del 2025-01-01 al 2025-03-31", "factura A00273279", "273279", "2025",
+    "ultimas 20 facturas biodiagnostico u$s", "compras setiembre 2024/09 pesos",
+    "stock vitek lote 123 vence en 30 dias", "comparar gastos familias 2023 2024 2025 2026",
+]
+_PIEZAS = [
+    "2023", "2024", "2025", "2026", "2019", "20245", "12024", "2025-01", "2024/12", "2025-13",
+    "2025-01-15", "2024-012025-02", "x2025", "2025x", "_2024", "7", "0", "60907", "A0001234",
+    "factura", "Factura", "nro comprobante", "nro. factura", "comprobantes", "detalle", "#", ":",
+    "enero", "setiembre", "Septiembre", "mayorista", "u$s", "$", "USD", "dólares", "pesos",
+    "roche", "compras", "vs", "-", "/", " ", " ", " ", ",", ".", "ñ", "á",
+]
+
+
+def corpus(n: int, seed: int = 24) -> List[str]:
+    rnd = random.Random(seed)
+    out = list(PREGUNTAS)
+    for _ in range(n):
+        partes = rnd.choices(_PIEZAS, k=rnd.randint(1, 9))
+        sep = rnd.choice(["", " ", " ", "-", "/"])
+        out.append(sep.join(partes))
+    return out
+
+
+# =====================================================================
+# MEDICIÓN
+# =====================================================================
+def verificar(textos: List[str]) -> bool:
+    ok = True
+    for nombre, viejo, nuevo in CASOS:
+        for t in textos:
+            a, b = viejo(t), nuevo(t)
+            if a != b:
+                print(f"❌ {nombre}: {t!r} -> antes {a!r} / ahora {b!r}")
+                ok = False
+                break
+    return ok
+
+
+def main(n: int) -> None:
+    textos = corpus(n)
+    print(f"🔎 Verificando {len(CASOS)} extractores en {len(textos)} textos...")
+    if not verificar(textos):
+        print("❌ Hay diferencias")
+        return
+    print("🎯 Resultados idénticos")
+
+    preguntas = PREGUNTAS * 50
+
+    def antes():
+        for t in preguntas:
+            for _, viejo, _ in CASOS:
+                viejo(t)
+
+    def ahora_sin_memo():
+        for t in preguntas:
+            rasgos_pregunta.extraer_rasgos.cache_clear()
+            for _, _, nuevo in CASOS:
+                nuevo(t)
+
+    def ahora():
+        rasgos_pregunta.extraer_rasgos.cache_clear()
+        for t in preguntas:
+            for _, _, nuevo in CASOS:
+                nuevo(t)
+
+    por_pregunta = 1000.0 / len(preguntas)
+    t_antes = mejor_ms(antes, 5) * por_pregunta
+    t_sin = mejor_ms(ahora_sin_memo, 5) * por_pregunta
+    t_ahora = mejor_ms(ahora, 5) * por_pregunta
+    print(f"{len(CASOS)} extractores por pregunta (todos los intérpretes):")
+    print(f"  regex por intérprete        {t_antes:8.1f} µs/pregunta")
+    print(f"  rasgos, primera vez         {t_sin:8.1f} µs/pregunta  (x{t_antes / t_sin:4.1f})")
+    print(f"  rasgos, ya memorizados      {t_ahora:8.1f} µs/pregunta  (x{t_antes / t_ahora:4.1f})")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20_000)
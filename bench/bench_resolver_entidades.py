@@ -0,0 +1,168 @@
+# =========================
+# BENCH_RESOLVER_ENTIDADES.PY - BENCHMARK RESOLVER vs _match_best LINEAL
+# =========================
+"""
+Compara resolver_entidades.IndiceEntidades contra los _match_best lineales que
+tenían los intérpretes, sobre un catálogo sintético (50.000 artículos por defecto).
+Verifica que devuelvan exactamente la misma lista (modo "max" con y sin exacto,
+modo "suma", con y sin `excluir`) y mide tiempos.
+
+Uso:
+    python -m bench.bench_resolver_entidades            # 50k artículos
+    python -m bench.bench_resolver_entidades 200000     # otro tamaño
+
+No necesita Supabase ni Streamlit.
+"""
+
+import random
+import sys
+import time
+from typing import Dict, List, Tuple
+
+from bench.medicion import por_llamada, resumen
+from resolver_entidades import IndiceEntidades, normalizar_clave
+
+PALABRAS = [
+    "reactivo", "control", "calibrador", "tubo", "tira", "kit", "suero", "buffer",
+    "glucosa", "urea", "creatinina", "colesterol", "trigliceridos", "hemoglobina",
+    "vitek", "cobas", "elecsys", "architect", "pipeta", "guante", "nitrilo", "aguja",
+    "jeringa", "cassette", "cartucho", "lanceta", "hisopo", "medio", "agar", "sangre",
+]
+SILABAS = ["ba", "ce", "di", "fo", "gu", "la", "me", "ni", "po", "ra", "se", "ti", "vo", "xa", "zi", "tro", "cla", "fen"]
+
+
+def _vocabulario(rnd: random.Random, n: int = 4000) -> List[str]:
+    """Palabras comunes (muy repetidas) + marcas/principios inventados (poco repetidos)."""
+    raras = set()
+    while len(raras) < n:
+        raras.add("".join(rnd.choice(SILABAS) for _ in range(rnd.randint(2, 4))))
+    return sorted(raras)
+
+
+def _tokens(texto: str) -> List[str]:
+    return [k for k in (normalizar_clave(t) for t in texto.split()) if len(k) >= 3]
+
+
+# =====================================================================
+# IMPLEMENTACIONES ANTERIORES (copiadas de los intérpretes)
+# =====================================================================
+def legacy_exacto_substring(texto: str, index: List[Tuple[str, str]], max_items: int = 1, exacto: bool = True) -> List[str]:
+    """ia_interpretador / ia_compras / ia_stock: exacto, después substring por score (ia_comparativas: sin exacto)."""
+    toks = _tokens(texto)
+    if not toks or not index:
+        return []
+    toks_set = set(toks)
+    exact = [orig for orig, norm in index if norm in toks_set] if exacto else []
+    if exact:
+        return exact[:max_items]
+    candidatos = []
+    for orig, norm in index:
+        for tk in toks:
+            if tk and tk in norm:
+                candidatos.append(((len(tk) * 1000) - len(norm), orig))
+    candidatos.sort(key=lambda x: (-x[0], x[1]))
+    out, seen = [], set()
+    for _, orig in candidatos:
+        if orig not in seen:
+            seen.add(orig)
+            out.append(orig)
+        if len(out) >= max_items:
+            break
+    return out
+
+
+def legacy_suma(texto: str, index: List[Tuple[str, str]], max_items: int = 1) -> List[str]:
+    """ia_router: suma len(token) por cada token contenido."""
+    toks = _tokens(texto)
+    if not toks or not index:
+        return []
+    scores: Dict[str, int] = {}
+    for tok in toks:
+        for orig, key_val in index:
+            if tok in key_val:
+                scores[orig] = scores.get(orig, 0) + len(tok)
+    return [k for k, _ in sorted(scores.items(), key=lambda x: x[1], reverse=True)[:max_items]]
+
+
+# =====================================================================
+# DATOS
+# =====================================================================
+def generar_catalogo(n: int, seed: int = 7) -> List[str]:
+    rnd = random.Random(seed)
+    raras = _vocabulario(rnd)
+    out = set()
+    while len(out) < n:
+        partes = rnd.sample(raras, rnd.randint(1, 2)) + rnd.sample(PALABRAS, rnd.randint(1, 2))
+        nombre = " ".join(partes).upper()
+        out.add(f"{rnd.randint(100000, 9999999)} - {nombre} X {rnd.choice([10, 25, 50, 100, 500])}")
+    return sorted(out)
+
+
+def generar_preguntas(catalogo: List[str], n: int = 300, seed: int = 11) -> List[str]:
+    rnd = random.Random(seed)
+    preguntas = []
+    for _ in range(n):
+        tipo = rnd.random()
+        if tipo < 0.15:
+            preguntas.append(f"stock {rnd.choice(PALABRAS)}")
+        elif tipo < 0.3:
+            preguntas.append(f"stock {rnd.choice(catalogo).split(' - ', 1)[1].split()[0].lower()}")
+        elif tipo < 0.6:
+            art = rnd.choice(catalogo).split(" - ", 1)[1].split(" X ")[0].lower()
+            preguntas.append(f"compras {art} 2025")
+        elif tipo < 0.8:
+            preguntas.append(f"cuanto {rnd.choice(PALABRAS)[:4]} tenemos")
+        else:
+            preguntas.append(f"{rnd.choice(catalogo).split(' - ')[0]} movimientos")
+    return preguntas
+
+
+def main(n_articulos: int = 50_000) -> None:
+    catalogo = generar_catalogo(n_articulos)
+    preguntas = generar_preguntas(catalogo)
+    pares = [(a, normalizar_clave(a)) for a in catalogo]
+
+    t0 = time.perf_counter()
+    indice = IndiceEntidades(catalogo)
+    t_build = (time.perf_counter() - t0) * 1000.0
+
+    res_a, t_a = por_llamada(lambda q: legacy_exacto_substring(q, pares, 5), preguntas)
+    res_b, t_b = por_llamada(lambda q: legacy_suma(q, pares, 5), preguntas)
+    res_n, t_n = por_llamada(lambda q: indice.buscar(_tokens(q), max_items=5), preguntas)
+    _, t_w = por_llamada(lambda q: indice.buscar(_tokens(q), max_items=5), preguntas)
+
+    # Paridad exacta con cada variante anterior
+    excluir = lambda orig: " KIT " in orig or " TUBO " in orig      # noqa: E731 (como el IVA de ia_compras)
+    pares_sin = [(o, k) for o, k in pares if not excluir(o)]
+    casos = {
+        "max (exacto)": (
+            lambda q, n: legacy_exacto_substring(q, pares, n),
+            lambda q, n: indice.buscar(_tokens(q), max_items=n)),
+        "max (sin exacto)": (
+            lambda q, n: legacy_exacto_substring(q, pares, n, exacto=False),
+            lambda q, n: indice.buscar(_tokens(q), max_items=n, exacto=False)),
+        "max + excluir": (
+            lambda q, n: legacy_exacto_substring(q, pares_sin, n),
+            lambda q, n: indice.buscar(_tokens(q), max_items=n, excluir=excluir)),
+        "suma": (
+            lambda q, n: legacy_suma(q, pares, n),
+            lambda q, n: indice.buscar(_tokens(q), max_items=n, modo="suma")),
+    }
+    paridad = []
+    for nombre, (viejo, nuevo) in casos.items():
+        for n in (1, 5, 300):
+            iguales = sum(1 for q in preguntas if viejo(q, n) == nuevo(q, n))
+            paridad.append(f"🎯 {nombre:<17} max_items={n:<3}: {iguales}/{len(preguntas)} idénticos")
+
+    print(f"📦 Catálogo: {len(catalogo)} artículos | {len(preguntas)} preguntas")
+    print(f"🏗  Construcción del índice: {t_build:.0f} ms")
+    print(resumen("legacy exacto+substring", t_a))
+    print(resumen("legacy suma (ia_router)", t_b))
+    print(resumen("IndiceEntidades (frío)", t_n))
+    print(resumen("IndiceEntidades (memo)", t_w))
+    print(f"🔁 Distintos a legacy exacto+substring (top-5): {sum(1 for a, n in zip(res_a, res_n) if a != n)}")
+    print("\n".join(paridad))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50_000)
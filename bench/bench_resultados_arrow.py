@@ -0,0 +1,218 @@
+# =========================
+# BENCH_RESULTADOS_ARROW.PY - BENCHMARK TUPLAS vs COLUMNAS ARROW
+# =========================
+"""
+Compara cómo llega un resultado de 100.000 filas desde la capa SQL:
+
+    tuplas    pd.DataFrame(cur.fetchall()) (camino de siempre, NUMERIC = Decimal)
+    columnas  sql_arrow.leer_resultado con SQL_ARROW=1 (NUMERIC = float,
+              bloques de filas -> arrays de Arrow)
+    copy      sql_arrow.copiar_select con SQL_ARROW=copy (sólo con --db)
+
+Para cada uno mide el tiempo de conversión, el pico de memoria Python
+(tracemalloc) y la memoria Arrow, y después lo que hace la UI con el
+resultado: df.copy() (cache / pantallas), memory_usage(deep=True) (cache),
+importes a float, fechas a datetime y formatear_dataframe.
+
+Uso:
+    python -m bench.bench_resultados_arrow             # 100k filas, cursor simulado
+    python -m bench.bench_resultados_arrow 300000      # otro tamaño
+    python -m bench.bench_resultados_arrow --db        # contra la base (DB_* en env/secrets)
+
+Sin --db no necesita Supabase ni Streamlit.
+"""
+
+import random
+import sys
+import tracemalloc
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Callable, List, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+import sql_arrow
+from bench.medicion import mejor_ms
+from utils_format import _serie_to_datetime, formatear_dataframe
+
+
+COLUMNAS = ["fecha", "proveedor", "articulo", "nro_comprobante", "moneda", "cantidad", "total", "stock_id"]
+
+SQL_DB = """
+    SELECT DATE '2024-01-01' + mod(g, 365)            AS fecha,
+           'Proveedor ' || mod(g, 300)                AS proveedor,
+           'Articulo ' || mod(g, 5000)                AS articulo,
+           'A-' || lpad(g::text, 8, '0')              AS nro_comprobante,
+           CASE WHEN mod(g, 3) = 0 THEN 'U$S' ELSE '$' END AS moneda,
+           (mod(g, 97) + 0.25)::numeric(12, 2)        AS cantidad,
+           CASE WHEN mod(g, 50) = 0 THEN NULL ELSE (g * 13.37)::numeric(14, 2) END AS total,
+           g                                          AS stock_id
+    FROM generate_series(1, %s) AS g
+"""
+
+
+# =====================================================================
+# CURSOR SIMULADO (lo que entrega psycopg2)
+# =====================================================================
+class _CursorSimulado:
+    def __init__(self, filas: list):
+        self._filas = filas
+        self._pos = 0
+
+    def fetchall(self) -> list:
+        out, self._pos = self._filas[self._pos:], len(self._filas)
+        return out
+
+    def fetchmany(self, n: int) -> list:
+        out = self._filas[self._pos:self._pos + n]
+        self._pos += len(out)
+        return out
+
+
+def generar_filas(n: int, numeric_float: bool, seed: int = 19) -> list:
+    """Tuplas como las de psycopg2: NUMERIC como Decimal, o float con el conversor de sql_arrow."""
+    rnd = random.Random(seed)
+    base = date(2024, 1, 1)
+    # Mismo texto que manda Postgres para numeric(14,2): float(texto) o Decimal(texto)
+    num = (lambda v: float(f"{v:.2f}")) if numeric_float else (lambda v: Decimal(f"{v:.2f}"))
+    filas = []
+    for g in range(1, n + 1):
+        total = None if g % 50 == 0 else num(rnd.uniform(-2e5, 2e6))
+        filas.append((
+            base + timedelta(days=g % 365),
+            f"Proveedor {g % 300}",
+            f"Articulo {g % 5000}",
+            f"A-{g:08d}",
+            "U$S" if g % 3 == 0 else "$",
+            num(g % 97 + 0.25),
+            total,
+            g,
+        ))
+    return filas
+
+
+# =====================================================================
+# MEDICIÓN
+# =====================================================================
+def _medir(fn: Callable, repeticiones: int = 3) -> Tuple[object, float, float, float]:
+    """(resultado, mejor ms, pico MB Python, MB Arrow que queda asignado)."""
+    mejor = mejor_ms(fn, repeticiones)
+    # Memoria en una corrida aparte (tracemalloc enlentece)
+    arrow0 = pa.total_allocated_bytes()
+    tracemalloc.start()
+    out = fn()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return out, mejor, pico / 1e6, (pa.total_allocated_bytes() - arrow0) / 1e6
+
+
+def _uso_ui(df: pd.DataFrame) -> List[Tuple[str, float]]:
+    return [
+        ("df.copy()", mejor_ms(lambda: df.copy())),
+        ("memory_usage(deep)", mejor_ms(lambda: df.memory_usage(index=True, deep=True).sum())),
+        ("importes a float", mejor_ms(lambda: pd.to_numeric(df["total"], errors="coerce"))),
+        ("fechas a datetime", mejor_ms(lambda: _serie_to_datetime(df["fecha"]))),
+        ("formatear_dataframe", mejor_ms(lambda: formatear_dataframe(df), repeticiones=1)),
+    ]
+
+
+def _reporte(nombre: str, df: pd.DataFrame, ms: float, pico: float, arrow: float) -> List[Tuple[str, float]]:
+    mb = df.memory_usage(index=True, deep=True).sum() / 1e6
+    print(
+        f"{nombre:<9} conversión {ms:8.1f} ms | pico Python {pico:7.1f} MB | "
+        f"Arrow {arrow:6.1f} MB | DataFrame {mb:6.1f} MB"
+    )
+    return _uso_ui(df)
+
+
+def _mismos_valores(a: pd.DataFrame, b: pd.DataFrame) -> bool:
+    for col in a.columns:
+        x, y = a[col], b[col]
+        if pd.api.types.is_numeric_dtype(y) and not pd.api.types.is_bool_dtype(y):
+            ok = np.array_equal(
+                pd.to_numeric(x.astype(object), errors="coerce").to_numpy(dtype="float64", na_value=np.nan),
+                y.to_numpy(dtype="float64", na_value=np.nan),
+                equal_nan=True,
+            )
+        else:
+            ok = x.astype(object).where(x.notna(), None).tolist() == y.astype(object).where(y.notna(), None).tolist()
+        if not ok:
+            print(f"❌ Columna distinta: {col}")
+            return False
+    return True
+
+
+def _tabla_ui(resultados: List[Tuple[str, List[Tuple[str, float]]]]) -> None:
+    print()
+    print(f"{'uso en la UI':<22}" + "".join(f"{n:>12}" for n, _ in resultados))
+    for i, (paso, _) in enumerate(resultados[0][1]):
+        print(f"{paso:<22}" + "".join(f"{t[i][1]:9.1f} ms" for _, t in resultados))
+
+
+# =====================================================================
+# MODOS
+# =====================================================================
+def main_simulado(n_filas: int) -> None:
+    filas_dec = generar_filas(n_filas, numeric_float=False)
+    filas_flt = generar_filas(n_filas, numeric_float=True)
+    print(f"📦 Cursor simulado: {n_filas} filas x {len(COLUMNAS)} columnas")
+
+    sql_arrow._MODO = ""
+    viejo, ms, pico, arrow = _medir(lambda: sql_arrow.leer_resultado(_CursorSimulado(filas_dec), COLUMNAS))
+    resultados = [("tuplas", _reporte("tuplas", viejo, ms, pico, arrow))]
+
+    sql_arrow._MODO = "columnas"
+    nuevo, ms, pico, arrow = _medir(lambda: sql_arrow.leer_resultado(_CursorSimulado(filas_flt), COLUMNAS))
+    resultados.append(("columnas", _reporte("columnas", nuevo, ms, pico, arrow)))
+
+    _tabla_ui(resultados)
+    print("🎯 Resultados idénticos" if _mismos_valores(viejo, nuevo) else "❌ Hay diferencias")
+
+
+def main_db(n_filas: int) -> None:
+    from sql_core import get_db_connection
+
+    conn = get_db_connection()
+    if conn is None:
+        print("❌ Sin conexión a la base")
+        return
+
+    def por_cursor() -> pd.DataFrame:
+        with conn.cursor() as cur:
+            sql_arrow.preparar_cursor(cur)
+            cur.execute(SQL_DB, (n_filas,))
+            return sql_arrow.leer_resultado(cur, [d[0] for d in cur.description])
+
+    print(f"📦 Base de datos: {n_filas} filas (generate_series)")
+    try:
+        resultados = []
+        sql_arrow._MODO = ""
+        viejo, ms, pico, arrow = _medir(por_cursor)
+        resultados.append(("tuplas", _reporte("tuplas", viejo, ms, pico, arrow)))
+
+        sql_arrow._MODO = "columnas"
+        nuevo, ms, pico, arrow = _medir(por_cursor)
+        resultados.append(("columnas", _reporte("columnas", nuevo, ms, pico, arrow)))
+        ok = _mismos_valores(viejo, nuevo)
+
+        sql_arrow._MODO = "copy"
+        nuevo, ms, pico, arrow = _medir(lambda: sql_arrow.copiar_select(conn, SQL_DB, (n_filas,)))
+        resultados.append(("copy", _reporte("copy", nuevo, ms, pico, arrow)))
+        ok &= _mismos_valores(viejo, nuevo)
+    finally:
+        conn.rollback()
+        conn.close()
+
+    _tabla_ui(resultados)
+    print("🎯 Resultados idénticos" if ok else "❌ Hay diferencias")
+
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    n = int(args[0]) if args else 100_000
+    if "--db" in sys.argv:
+        main_db(n)
+    else:
+        main_simulado(n)
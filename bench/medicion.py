@@ -0,0 +1,47 @@
+# =========================
+# MEDICION.PY - TIEMPOS COMPARTIDOS POR LOS BENCHMARKS
+# =========================
+
+import statistics
+import time
+from typing import Callable, Iterable, List, Tuple
+
+
+def mejor_ms(fn: Callable[[], object], repeticiones: int = 3) -> float:
+    """Mejor tiempo (ms) de `repeticiones` corridas de fn()."""
+    mejor = None
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        fn()
+        ms = (time.perf_counter() - t0) * 1000.0
+        mejor = ms if mejor is None else min(mejor, ms)
+    return mejor
+
+
+def us_por_item(fn: Callable[[object], object], items: List, repeticiones: int = 5) -> float:
+    """µs por llamada de fn(x) recorriendo `items` (mejor de `repeticiones` pasadas)."""
+    def pasada():
+        for x in items:
+            fn(x)
+
+    return mejor_ms(pasada, repeticiones) * 1000.0 / len(items)
+
+
+def por_llamada(fn: Callable[[object], object], items: Iterable) -> Tuple[List, List[float]]:
+    """fn(x) para cada item: (resultados, ms de cada llamada)."""
+    resultados, tiempos = [], []
+    for x in items:
+        t0 = time.perf_counter()
+        resultados.append(fn(x))
+        tiempos.append((time.perf_counter() - t0) * 1000.0)
+    return resultados, tiempos
+
+
+def resumen(nombre: str, tiempos: List[float]) -> str:
+    """Media, p50 y p95 de una lista de tiempos en ms."""
+    tiempos = sorted(tiempos)
+    p95 = tiempos[int(len(tiempos) * 0.95) - 1]
+    return (
+        f"{nombre:<28} media {statistics.mean(tiempos):9.3f} ms | "
+        f"p50 {statistics.median(tiempos):9.3f} ms | p95 {p95:9.3f} ms"
+    )
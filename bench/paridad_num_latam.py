@@ -0,0 +1,83 @@
+# =========================
+# PARIDAD_NUM_LATAM.PY - fc_num_latam vs PARSEO TEXT DE sql_core
+# =========================
+"""
+Verifica que fc_num_latam (monto_num / cantidad_num, ver sql_migraciones) y las
+expresiones TEXT de sql_core que se usan mientras la migración de columnas
+tipadas no está registrada den el mismo número para los mismos textos: los
+totales no pueden cambiar al aplicar la migración.
+
+Crea fc_num_latam dentro de una transacción que después se revierte (no deja
+nada en la base).
+
+Uso:
+    python -m bench.paridad_num_latam
+
+Necesita conexión a Postgres (Secrets/Env vars como la app).
+"""
+
+import sys
+
+import sql_core
+from sql_core import (
+    MIGRACION_COLUMNAS_TIPADAS,
+    _sql_cantidad_num_expr,
+    _sql_total_num_expr,
+    _sql_total_num_expr_general,
+    _sql_total_num_expr_usd,
+    get_db_connection,
+)
+from sql_migraciones import SQL_FUNCIONES_PARSEO
+
+MONTOS = [
+    "0", "100", "1.234,56", "  124.300,00 ", "1.234.567,89", "12.500", "12.50", "1.5",
+    "(12,5)", "(0,01)", "(1.234,56)", "-1.234,5", "-0,99", "999,9",
+]
+MONTOS_PESOS = MONTOS + ["$1.234,56", "$ 12,30", "$(1.234,5)"]
+MONTOS_USD = MONTOS + ["U$S 1.234,56", "U$S(12,5)", "U$$ 100", "U$S 0,01"]
+CANTIDADES = ["0", "3", "(3)", "-4", "1.000", "2,5", "0,125", "(1,5)", "12.50", "1.234,567"]
+
+# (nombre, expresión TEXT, columna, muestras)
+CASOS = [
+    ("_sql_total_num_expr", _sql_total_num_expr, "Monto Neto", MONTOS_PESOS),
+    ("_sql_total_num_expr_usd", _sql_total_num_expr_usd, "Monto Neto", MONTOS_USD),
+    ("_sql_total_num_expr_general", _sql_total_num_expr_general, "Monto Neto", MONTOS),
+    ("_sql_cantidad_num_expr", _sql_cantidad_num_expr, "Cantidad", CANTIDADES),
+]
+
+
+def main() -> int:
+    # Forzar el camino TEXT de los helpers (sin columnas tipadas)
+    sql_core._MIGRACIONES_APLICADAS[MIGRACION_COLUMNAS_TIPADAS] = False
+
+    conn = get_db_connection()
+    if not conn:
+        print("❌ Sin conexión a Postgres")
+        return 1
+
+    fallas = 0
+    try:
+        with conn.cursor() as cur:
+            cur.execute(SQL_FUNCIONES_PARSEO)
+            for nombre, expr_fn, col, muestras in CASOS:
+                valores = ", ".join(["(%s)"] * len(muestras))
+                cur.execute(
+                    f'SELECT "{col}", fc_num_latam("{col}"), {expr_fn()} '
+                    f'FROM (VALUES {valores}) AS t("{col}")',
+                    muestras,
+                )
+                filas = cur.fetchall()
+                malas = [f for f in filas if f[1] is None or f[1] != f[2]]
+                fallas += len(malas)
+                print(f"{'✅' if not malas else '❌'} {nombre}: {len(filas) - len(malas)}/{len(filas)} iguales")
+                for txt, tipado, texto in malas:
+                    print(f"     {txt!r}: fc_num_latam={tipado} texto={texto}")
+    finally:
+        conn.rollback()
+        conn.close()
+
+    return 1 if fallas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,294 @@
+# =========================
+# CACHE_CONSULTAS.PY - CACHE DE RESULTADOS SQL CON INVALIDACIÓN POR TABLA
+# =========================
+"""
+Cache LRU de resultados de ejecutar_consulta().
+
+Clave: SQL normalizado (espacios colapsados) + parámetros.
+Cada entrada guarda las tablas que lee la consulta y la versión de cada una
+al momento de guardarse. Una escritura sobre una tabla sube su versión y todas
+las entradas que la leen quedan viejas (no hay TTL ciego).
+
+Versiones:
+    - locales: las sube invalidar() (escrituras hechas por esta app)
+    - de la base (opcional): fc_tabla_versiones, mantenida por triggers
+      (ver sql_migraciones.aplicar_versiones_tablas). Cubre los imports
+      externos y otras instancias. Se consulta como mucho cada SQL_CACHE_POLL_SEG.
+
+Configuración (env vars o st.secrets, ver config_runtime.get_secret):
+    SQL_CACHE              0 para desactivar (def. 1)
+    SQL_CACHE_MAX_ENTRADAS cantidad máxima de resultados (def. 256)
+    SQL_CACHE_MAX_MB       memoria aproximada máxima (def. 64)
+    SQL_CACHE_POLL_SEG     cada cuánto releer fc_tabla_versiones (def. 5)
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, FrozenSet, Iterable, Optional, Tuple
+
+from config_runtime import get_secret, get_secret_num
+
+
+# =====================================================================
+# ANÁLISIS DEL SQL
+# =====================================================================
+_RE_COMENTARIOS = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_RE_ESPACIOS = re.compile(r"\s+")
+_RE_TABLAS_LECTURA = re.compile(r'\b(?:FROM|JOIN)\s+((?:"[^"]+"|[A-Za-z_][\w$]*)(?:\.(?:"[^"]+"|[A-Za-z_][\w$]*))?)', re.I)
+_RE_TABLAS_ESCRITURA = re.compile(
+    r'\b(?:INSERT\s+INTO|UPDATE|DELETE\s+FROM|TRUNCATE(?:\s+TABLE)?|MERGE\s+INTO|COPY)\s+'
+    r'(?:ONLY\s+)?((?:"[^"]+"|[A-Za-z_][\w$]*)(?:\.(?:"[^"]+"|[A-Za-z_][\w$]*))?)',
+    re.I,
+)
+# Resultados que cambian solos con el reloj: se cachean por día / por minuto
+_RE_RELOJ_DIA = re.compile(r"\b(?:current_date)\b", re.I)
+_RE_RELOJ_MINUTO = re.compile(r"\bnow\s*\(|\b(?:current_timestamp|localtimestamp|current_time)\b", re.I)
+_RE_NO_CACHEABLE = re.compile(r"\b(?:random|clock_timestamp|nextval|setval|pg_sleep|gen_random_uuid)\s*\(", re.I)
+_VERBOS_ESCRITURA = ("insert", "update", "delete", "truncate", "merge", "copy", "create", "alter", "drop")
+
+# Tablas que la base recalcula sola (triggers) cuando se escribe en otra:
+# invalidar la de origen también invalida éstas (ver sql_migraciones).
+TABLAS_DERIVADAS = {
+    "chatbot_raw": ("chatbot_rollup_mes",),
+}
+
+
+def normalizar_sql(sql: str) -> str:
+    return _RE_ESPACIOS.sub(" ", _RE_COMENTARIOS.sub(" ", sql or "")).strip()
+
+
+def _nombre_tabla(ident: str) -> str:
+    partes = [p.strip('"').lower() for p in ident.split(".")]
+    return partes[-1]
+
+
+def tablas_leidas(sql: str) -> FrozenSet[str]:
+    return frozenset(_nombre_tabla(m) for m in _RE_TABLAS_LECTURA.findall(normalizar_sql(sql)))
+
+
+def tablas_escritas(sql: str) -> FrozenSet[str]:
+    return frozenset(_nombre_tabla(m) for m in _RE_TABLAS_ESCRITURA.findall(normalizar_sql(sql)))
+
+
+def es_escritura(sql: str) -> bool:
+    """True si la sentencia modifica datos o esquema (incluye WITH ... INSERT/UPDATE)."""
+    s = normalizar_sql(sql).lower()
+    if not s:
+        return False
+    if s.split(" ", 1)[0] in _VERBOS_ESCRITURA:
+        return True
+    return s.startswith("with") and bool(tablas_escritas(s))
+
+
+# =====================================================================
+# CACHE
+# =====================================================================
+class _Entrada:
+    __slots__ = ("df", "tablas", "versiones", "bytes")
+
+    def __init__(self, df, tablas, versiones, nbytes):
+        self.df = df
+        self.tablas = tablas
+        self.versiones = versiones
+        self.bytes = nbytes
+
+
+class CacheConsultas:
+    """LRU thread-safe de DataFrames con invalidación por versión de tabla."""
+
+    def __init__(
+        self,
+        max_entradas: int = 256,
+        max_bytes: int = 64 * 1024 * 1024,
+        poll_seg: float = 5.0,
+        habilitado: bool = True,
+    ):
+        self.max_entradas = max(1, int(max_entradas))
+        self.max_bytes = max(1, int(max_bytes))
+        self.poll_seg = float(poll_seg)
+        self.habilitado = habilitado
+
+        self._lock = threading.RLock()
+        self._lru: "OrderedDict[Tuple[str, str], _Entrada]" = OrderedDict()
+        self._bytes = 0
+        self._versiones_locales: Dict[str, int] = {}
+        self._versiones_db: Dict[str, int] = {}
+        self._ultimo_poll = 0.0
+        self._lector_versiones: Optional[Callable[[], Optional[Dict[str, int]]]] = None
+
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "viejas": 0,
+            "desalojadas": 0,
+            "invalidaciones": 0,
+            "no_cacheables": 0,
+        }
+
+    # -----------------------------------------------------------------
+    # Versiones
+    # -----------------------------------------------------------------
+    def set_lector_versiones(self, fn: Callable[[], Optional[Dict[str, int]]]) -> None:
+        """fn() -> {tabla: version} desde la base, o None si no está disponible."""
+        self._lector_versiones = fn
+
+    def _refrescar_versiones_db(self) -> None:
+        if self._lector_versiones is None:
+            return
+        ahora = time.monotonic()
+        if ahora - self._ultimo_poll < self.poll_seg:
+            return
+        self._ultimo_poll = ahora
+        try:
+            versiones = self._lector_versiones()
+        except Exception as e:
+            print(f"⚠️ Cache SQL: no se pudieron leer versiones de tablas: {e}")
+            return
+        if versiones is not None:
+            with self._lock:
+                self._versiones_db = dict(versiones)
+
+    def _version(self, tabla: str) -> Tuple[int, int]:
+        return (self._versiones_locales.get(tabla, 0), self._versiones_db.get(tabla, 0))
+
+    def invalidar(self, *tablas: str) -> None:
+        """Marca las tablas como modificadas: sus resultados cacheados dejan de valer."""
+        with self._lock:
+            for t in tablas:
+                if not t:
+                    continue
+                t = _nombre_tabla(t)
+                for tabla in (t,) + TABLAS_DERIVADAS.get(t, ()):
+                    self._versiones_locales[tabla] = self._versiones_locales.get(tabla, 0) + 1
+                self._stats["invalidaciones"] += 1
+
+    # -----------------------------------------------------------------
+    # Lectura / escritura
+    # -----------------------------------------------------------------
+    @staticmethod
+    def clave(sql: str, params) -> Optional[Tuple[str, str]]:
+        """Clave del resultado, o None si la consulta no es cacheable."""
+        sql_n = normalizar_sql(sql)
+        if _RE_NO_CACHEABLE.search(sql_n):
+            return None
+        params_r = repr(tuple(params) if isinstance(params, list) else params)
+        if _RE_RELOJ_MINUTO.search(sql_n):
+            params_r += datetime.now().strftime("|%Y-%m-%d %H:%M")
+        elif _RE_RELOJ_DIA.search(sql_n):
+            params_r += datetime.now().strftime("|%Y-%m-%d")
+        return (sql_n, params_r)
+
+    def obtener(self, clave: Tuple[str, str]):
+        """DataFrame cacheado (copia) o None."""
+        if not self.habilitado:
+            return None
+        self._refrescar_versiones_db()
+        with self._lock:
+            entrada = self._lru.get(clave)
+            if entrada is None:
+                self._stats["misses"] += 1
+                return None
+            if any(self._version(t) != v for t, v in zip(entrada.tablas, entrada.versiones)):
+                self._quitar(clave)
+                self._stats["viejas"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._lru.move_to_end(clave)
+            self._stats["hits"] += 1
+            df = entrada.df
+        return df.copy()
+
+    def versiones(self, tablas: Iterable[str], refrescar: bool = False) -> Tuple[Tuple[str, ...], tuple]:
+        """
+        Foto de (tablas, versiones) tomada ANTES de ejecutar la consulta: si hay
+        una escritura mientras corre, el resultado se guarda ya viejo.
+        refrescar=True relee fc_tabla_versiones antes (respetando SQL_CACHE_POLL_SEG).
+        """
+        if refrescar:
+            self._refrescar_versiones_db()
+        tablas = tuple(sorted(tablas))
+        with self._lock:
+            return tablas, tuple(self._version(t) for t in tablas)
+
+    def guardar(self, clave: Tuple[str, str], df, foto: Tuple[Tuple[str, ...], tuple]) -> None:
+        tablas, versiones = foto
+        if not self.habilitado or df is None:
+            return
+        if not tablas:
+            with self._lock:
+                self._stats["no_cacheables"] += 1
+            return
+        try:
+            nbytes = int(df.memory_usage(index=True, deep=True).sum())
+        except Exception:
+            nbytes = 0
+        if nbytes > self.max_bytes:
+            with self._lock:
+                self._stats["no_cacheables"] += 1
+            return
+
+        with self._lock:
+            if clave in self._lru:
+                self._quitar(clave)
+            self._lru[clave] = _Entrada(df.copy(), tablas, versiones, nbytes)
+            self._bytes += nbytes
+            while self._lru and (len(self._lru) > self.max_entradas or self._bytes > self.max_bytes):
+                viejo = next(iter(self._lru))
+                self._quitar(viejo)
+                self._stats["desalojadas"] += 1
+
+    def _quitar(self, clave) -> None:
+        entrada = self._lru.pop(clave, None)
+        if entrada is not None:
+            self._bytes -= entrada.bytes
+
+    def limpiar(self) -> None:
+        with self._lock:
+            self._lru.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            data = dict(self._stats)
+            data["entradas"] = len(self._lru)
+            data["max_entradas"] = self.max_entradas
+            data["mb"] = round(self._bytes / (1024 * 1024), 2)
+            data["max_mb"] = round(self.max_bytes / (1024 * 1024), 2)
+            data["versiones_db"] = bool(self._versiones_db)
+        total = data["hits"] + data["misses"]
+        data["hit_rate"] = round(100.0 * data["hits"] / total, 1) if total else 0.0
+        data["habilitado"] = self.habilitado
+        return data
+
+
+# =====================================================================
+# CACHE GLOBAL (UNO POR PROCESO)
+# =====================================================================
+
+_CACHE: Optional[CacheConsultas] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_cache_consultas() -> CacheConsultas:
+    global _CACHE
+    if _CACHE is None:
+        with _CACHE_LOCK:
+            if _CACHE is None:
+                flag = str(get_secret("SQL_CACHE", "1") or "1").strip().lower()
+                _CACHE = CacheConsultas(
+                    max_entradas=get_secret_num("SQL_CACHE_MAX_ENTRADAS", 256),
+                    max_bytes=int(get_secret_num("SQL_CACHE_MAX_MB", 64.0, float) * 1024 * 1024),
+                    poll_seg=get_secret_num("SQL_CACHE_POLL_SEG", 5.0, float),
+                    habilitado=flag not in ("0", "false", "no"),
+                )
+    return _CACHE
+
+
+def get_cache_stats() -> dict:
+    """Métricas del cache (hits, misses, entradas, MB, etc.)."""
+    if _CACHE is None:
+        return {}
+    return _CACHE.stats()
@@ -0,0 +1,310 @@
+# =========================
+# CACHE_INTERPRETACIONES.PY - CACHE DE INTERPRETACIONES DE PREGUNTAS
+# =========================
+"""
+Cache de lo que devuelven los intérpretes (tipo + parámetros) por pregunta.
+
+Los usuarios repiten mucho las mismas preguntas ("compras roche 2025",
+"stock vitek"). La interpretación por reglas tarda milisegundos, pero cuando
+cae a OpenAI son 1-3 s; y el orquestador pasa primero por el intérprete de
+stock (que consulta familias) antes del agéntico.
+
+Dos niveles:
+    - memoria: LRU por proceso
+    - disco (opcional): SQLite compartido entre procesos / reinicios
+
+Clave: espacio (qué intérprete) + sello + pregunta.
+    pregunta  sólo minúsculas y espacios colapsados. NO se usa
+              normalizar_texto / limpiar_consulta: esas funciones juntan
+              preguntas que los intérpretes resuelven distinto (dígitos
+              repetidos, comas entre proveedores, palabras que sacan).
+    sello     huella del código de los intérpretes (un deploy invalida todo)
+              + versión del catálogo que usa el intérprete (por ejemplo
+              resolver_entidades.get_version_entidades) + fecha de hoy
+              ("este mes", "último año" y los años por defecto dependen del día).
+
+Los valores se guardan como JSON: cada hit devuelve una copia nueva y lo que
+no es JSON (DataFrames adentro del resultado) no se cachea. Tampoco se cachean
+saludos ni "no_entendido".
+
+Configuración (env vars o st.secrets, ver config_runtime.get_secret):
+    INTERP_CACHE              0 para desactivar (def. 1)
+    INTERP_CACHE_PATH         archivo SQLite (def. <tmp>/fertichat_interpretaciones.sqlite;
+                              vacío o :memory: = sólo memoria)
+    INTERP_CACHE_MAX_ENTRADAS entradas máximas en memoria y en disco (def. 2000)
+    INTERP_CACHE_TTL_HORAS    vida máxima de una entrada (def. 24)
+"""
+
+import functools
+import glob
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from typing import Callable, Dict, Optional
+
+from config_runtime import get_secret, get_secret_num
+
+
+# =====================================================================
+# CLAVE
+# =====================================================================
+_RE_ESPACIOS = re.compile(r"\s+")
+_TIPOS_NO_CACHEABLES = ("saludo", "no_entendido")
+
+# Módulos que deciden la interpretación: si cambia alguno, cambia la huella
+_PATRONES_CODIGO = (
+    "ia_*.py", "interpretador*.py", "intent_detector.py", "resolver_entidades.py", "config.py",
+    "rasgos_pregunta.py", "automata_palabras.py",
+)
+_HUELLA_CODIGO: Optional[str] = None
+
+
+def _interpretacion_cacheable(resultado) -> bool:
+    tipo = resultado.get("tipo") if isinstance(resultado, dict) else None
+    return bool(tipo) and tipo not in _TIPOS_NO_CACHEABLES
+
+
+def clave_pregunta(texto: str) -> str:
+    return _RE_ESPACIOS.sub(" ", str(texto or "")).strip().lower()
+
+
+def huella_codigo() -> str:
+    """sha1 de los fuentes de los intérpretes. Se calcula una vez por proceso."""
+    global _HUELLA_CODIGO
+    if _HUELLA_CODIGO is None:
+        base = os.path.dirname(os.path.abspath(__file__))
+        archivos = sorted({f for p in _PATRONES_CODIGO for f in glob.glob(os.path.join(base, p))})
+        h = hashlib.sha1()
+        for archivo in archivos:
+            try:
+                with open(archivo, "rb") as fh:
+                    h.update(os.path.basename(archivo).encode())
+                    h.update(fh.read())
+            except OSError:
+                continue
+        _HUELLA_CODIGO = h.hexdigest()[:12]
+    return _HUELLA_CODIGO
+
+
+# =====================================================================
+# CACHE
+# =====================================================================
+class CacheInterpretaciones:
+    """
+    LRU thread-safe de valores JSON con respaldo opcional en SQLite.
+    También lo usa cache_llm (otra tabla, otro criterio de qué se guarda).
+    """
+
+    def __init__(
+        self,
+        max_entradas: int = 2000,
+        ttl_seg: float = 24 * 3600,
+        path: str = "",
+        habilitado: bool = True,
+        tabla: str = "interpretaciones",
+        cacheable: Callable[[object], bool] = _interpretacion_cacheable,
+    ):
+        self.max_entradas = max(1, int(max_entradas))
+        self.ttl_seg = float(ttl_seg)
+        self.habilitado = habilitado
+        self.tabla = tabla
+        self._cacheable = cacheable
+
+        self._lock = threading.RLock()
+        self._lru: "OrderedDict[str, tuple]" = OrderedDict()   # clave -> (json, ts)
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._stats = {
+            "hits": 0,
+            "hits_disco": 0,
+            "misses": 0,
+            "guardadas": 0,
+            "no_cacheables": 0,
+            "desalojadas": 0,
+        }
+        if habilitado and path and path != ":memory:":
+            self._abrir_db(path)
+
+    # ---------------------------------------------------------------
+    # SQLite
+    # ---------------------------------------------------------------
+    def _abrir_db(self, path: str) -> None:
+        try:
+            conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.tabla} ("
+                " clave TEXT PRIMARY KEY, valor TEXT NOT NULL, ts REAL NOT NULL)"
+            )
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {self.tabla}_ts ON {self.tabla} (ts)")
+            conn.commit()
+            self._db = conn
+            self._podar_db()
+        except Exception as e:
+            print(f"⚠️ Cache {self.tabla} sin disco ({e})")
+            self._db = None
+
+    def _db_ejecutar(self, sql: str, params: tuple = (), leer: bool = False):
+        if self._db is None:
+            return None
+        try:
+            with self._db_lock:
+                cur = self._db.execute(sql, params)
+                if leer:
+                    return cur.fetchone()
+                self._db.commit()
+        except Exception as e:
+            print(f"⚠️ Cache {self.tabla}: error SQLite ({e}); sigo sólo en memoria")
+            self._db = None
+        return None
+
+    def _podar_db(self) -> None:
+        """Saca lo vencido y lo que sobra del máximo (lo más viejo primero)."""
+        self._db_ejecutar(f"DELETE FROM {self.tabla} WHERE ts < ?", (time.time() - self.ttl_seg,))
+        self._db_ejecutar(
+            f"DELETE FROM {self.tabla} WHERE clave IN ("
+            f" SELECT clave FROM {self.tabla} ORDER BY ts DESC LIMIT -1 OFFSET ?)",
+            (self.max_entradas,),
+        )
+
+    # ---------------------------------------------------------------
+    # API
+    # ---------------------------------------------------------------
+    def obtener(self, clave: str) -> Optional[Dict]:
+        if not self.habilitado:
+            return None
+        ahora = time.time()
+        with self._lock:
+            entrada = self._lru.get(clave)
+            if entrada is not None and ahora - entrada[1] <= self.ttl_seg:
+                self._lru.move_to_end(clave)
+                self._stats["hits"] += 1
+                return json.loads(entrada[0])
+            if entrada is not None:
+                self._lru.pop(clave, None)
+
+        fila = self._db_ejecutar(f"SELECT valor, ts FROM {self.tabla} WHERE clave = ?", (clave,), leer=True)
+        with self._lock:
+            if fila is not None and ahora - fila[1] <= self.ttl_seg:
+                self._poner(clave, fila[0], fila[1])
+                self._stats["hits"] += 1
+                self._stats["hits_disco"] += 1
+                return json.loads(fila[0])
+            self._stats["misses"] += 1
+        return None
+
+    def guardar(self, clave: str, resultado) -> None:
+        if not self.habilitado:
+            return
+        try:
+            if not self._cacheable(resultado):
+                raise TypeError(type(resultado))
+            texto = json.dumps(resultado, ensure_ascii=False)
+        except (TypeError, ValueError):
+            with self._lock:
+                self._stats["no_cacheables"] += 1
+            return
+
+        ts = time.time()
+        with self._lock:
+            self._poner(clave, texto, ts)
+            self._stats["guardadas"] += 1
+            podar = self._stats["guardadas"] % 100 == 0
+        self._db_ejecutar(
+            f"INSERT OR REPLACE INTO {self.tabla} (clave, valor, ts) VALUES (?, ?, ?)", (clave, texto, ts)
+        )
+        if podar:
+            self._podar_db()
+
+    def _poner(self, clave: str, texto: str, ts: float) -> None:
+        self._lru[clave] = (texto, ts)
+        self._lru.move_to_end(clave)
+        while len(self._lru) > self.max_entradas:
+            self._lru.popitem(last=False)
+            self._stats["desalojadas"] += 1
+
+    def limpiar(self) -> None:
+        with self._lock:
+            self._lru.clear()
+        self._db_ejecutar(f"DELETE FROM {self.tabla}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            data = dict(self._stats)
+            data["entradas"] = len(self._lru)
+            data["max_entradas"] = self.max_entradas
+        total = data["hits"] + data["misses"]
+        data["hit_rate"] = round(100.0 * data["hits"] / total, 1) if total else 0.0
+        data["persistente"] = self._db is not None
+        data["habilitado"] = self.habilitado
+        return data
+
+
+# =====================================================================
+# CACHE GLOBAL (UNO POR PROCESO)
+# =====================================================================
+
+_CACHE: Optional[CacheInterpretaciones] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_cache_interpretaciones() -> CacheInterpretaciones:
+    global _CACHE
+    if _CACHE is None:
+        with _CACHE_LOCK:
+            if _CACHE is None:
+                flag = str(get_secret("INTERP_CACHE", "1") or "1").strip().lower()
+                path = get_secret("INTERP_CACHE_PATH", None)
+                if path is None:
+                    path = os.path.join(tempfile.gettempdir(), "fertichat_interpretaciones.sqlite")
+                _CACHE = CacheInterpretaciones(
+                    max_entradas=get_secret_num("INTERP_CACHE_MAX_ENTRADAS", 2000),
+                    ttl_seg=get_secret_num("INTERP_CACHE_TTL_HORAS", 24.0, float) * 3600,
+                    path=str(path or "").strip(),
+                    habilitado=flag not in ("0", "false", "no"),
+                )
+    return _CACHE
+
+
+def get_cache_interpretaciones_stats() -> dict:
+    """Métricas del cache de interpretaciones (hits, misses, entradas, etc.)."""
+    if _CACHE is None:
+        return {}
+    return _CACHE.stats()
+
+
+def cachear_interpretacion(espacio: str, version: Optional[Callable[[], str]] = None):
+    """
+    Decorador para intérpretes f(pregunta) -> {"tipo", "parametros", ...}.
+    `version` devuelve la versión del catálogo que usa el intérprete; si falla
+    la interpretación se hace igual, sin cache.
+    """
+    def decorador(fn):
+        @functools.wraps(fn)
+        def envuelta(pregunta, *args, **kwargs):
+            cache = get_cache_interpretaciones()
+            if args or kwargs or not cache.habilitado or not clave_pregunta(pregunta):
+                return fn(pregunta, *args, **kwargs)
+            try:
+                sello = version() if version is not None else ""
+            except Exception:
+                return fn(pregunta, *args, **kwargs)
+            clave = f"{espacio}|{huella_codigo()}|{sello}|{date.today().isoformat()}|{clave_pregunta(pregunta)}"
+
+            resultado = cache.obtener(clave)
+            if resultado is not None:
+                return resultado
+            resultado = fn(pregunta)
+            cache.guardar(clave, resultado)
+            return resultado
+
+        envuelta.sin_cache = fn
+        return envuelta
+    return decorador
@@ -0,0 +1,111 @@
+# =========================
+# CACHE_LLM.PY - CACHE DE RESPUESTAS DE OPENAI (utils_openai)
+# =========================
+"""
+Cache de las respuestas de chat.completions de utils_openai
+(responder_con_openai, recomendar_como_preguntar, obtener_sugerencia_ejecutable,
+fallback_openai_sql). Cada llamada cuesta 1-3 s y tokens; las preguntas de
+conocimiento y las reformulaciones se repiten mucho.
+
+Clave: modelo + sha1 del system prompt + opciones (temperature, max_tokens)
++ texto del usuario con espacios colapsados y en minúsculas. Los prompts que
+llevan la fecha de hoy cambian de hash solos al cambiar el día.
+
+Se guarda el texto que devolvió el modelo, y sólo si el llamador lo validó
+(JSON parseable, SQL seguro, sin error). Lo que sale del cache pasa por el
+mismo parseo y las mismas validaciones que una respuesta nueva: el SQL del
+fallback se vuelve a chequear con _sql_es_seguro antes de ejecutarse.
+
+Misma implementación que cache_interpretaciones (LRU en memoria + SQLite),
+en otra tabla.
+
+Configuración (env vars o st.secrets, ver config_runtime.get_secret):
+    LLM_CACHE               0 para desactivar (def. 1)
+    LLM_CACHE_PATH          archivo SQLite (def. <tmp>/fertichat_llm.sqlite;
+                            vacío o :memory: = sólo memoria)
+    LLM_CACHE_MAX_ENTRADAS  entradas máximas en memoria y en disco (def. 1000)
+    LLM_CACHE_TTL_HORAS     vida máxima de una respuesta (def. 72)
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from typing import Callable, Optional
+
+from cache_interpretaciones import CacheInterpretaciones, clave_pregunta
+from config_runtime import get_secret, get_secret_num
+
+
+def _respuesta_cacheable(texto) -> bool:
+    return isinstance(texto, str) and bool(texto.strip())
+
+
+def clave_llm(modelo: str, system_prompt: str, usuario: str, **opciones) -> str:
+    h = hashlib.sha1((system_prompt or "").encode("utf-8", "replace")).hexdigest()[:16]
+    extra = json.dumps(opciones, sort_keys=True, default=str)
+    return f"{modelo}|{h}|{extra}|{clave_pregunta(usuario)}"
+
+
+# =====================================================================
+# CACHE GLOBAL (UNO POR PROCESO)
+# =====================================================================
+
+_CACHE: Optional[CacheInterpretaciones] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_cache_llm() -> CacheInterpretaciones:
+    global _CACHE
+    if _CACHE is None:
+        with _CACHE_LOCK:
+            if _CACHE is None:
+                flag = str(get_secret("LLM_CACHE", "1") or "1").strip().lower()
+                path = get_secret("LLM_CACHE_PATH", None)
+                if path is None:
+                    path = os.path.join(tempfile.gettempdir(), "fertichat_llm.sqlite")
+                _CACHE = CacheInterpretaciones(
+                    max_entradas=get_secret_num("LLM_CACHE_MAX_ENTRADAS", 1000),
+                    ttl_seg=get_secret_num("LLM_CACHE_TTL_HORAS", 72.0, float) * 3600,
+                    path=str(path or "").strip(),
+                    habilitado=flag not in ("0", "false", "no"),
+                    tabla="respuestas_llm",
+                    cacheable=_respuesta_cacheable,
+                )
+    return _CACHE
+
+
+def get_cache_llm_stats() -> dict:
+    """Métricas del cache de respuestas OpenAI (hits, misses, entradas, etc.)."""
+    if _CACHE is None:
+        return {}
+    return _CACHE.stats()
+
+
+def completar_cacheado(
+    llamar: Callable[[], str],
+    modelo: str,
+    system_prompt: str,
+    usuario: str,
+    validar: Optional[Callable[[str], bool]] = None,
+    **opciones,
+) -> str:
+    """
+    Devuelve la respuesta cacheada o llama a `llamar()` (que hace el request y
+    devuelve el texto). Sólo se guarda si `validar(texto)` da True. Las
+    excepciones de `llamar` no se cachean: siguen hacia el llamador.
+    """
+    cache = get_cache_llm()
+    clave = clave_llm(modelo, system_prompt, usuario, **opciones)
+    texto = cache.obtener(clave)
+    if isinstance(texto, str):
+        return texto
+    texto = llamar()
+    try:
+        valido = validar is None or bool(validar(texto))
+    except Exception:
+        valido = False
+    if valido:
+        cache.guardar(clave, texto)
+    return texto
@@ -9,6 +9,8 @@ from datetime import date, datetime
 from typing import Optional, Dict, Any, List
 
 from supabase_client import supabase
+from sql_core import get_db_connection, invalidar_cache_tablas, stock_lote_clave_disponible
+from snapshot_tablas import get_snapshot
 
 # =====================================================================
 # CONFIG
@@ -77,14 +79,19 @@ def _fetch_all_table(table_name: str, page_size: int = 1000, max_pages: int = 50
     return pd.DataFrame(rows)
 
 
-@st.cache_data(ttl=300)
-def _cache_articulos() -> pd.DataFrame:
-    return _fetch_all_table("articulos")
+# Snapshots compartidos por todas las sesiones: carga completa una vez y
+# después sólo las filas cambiadas (ver snapshot_tablas.py). Si no hay conexión
+# directa a Postgres se pagina por la API de Supabase como antes.
+def _snapshot_articulos():
+    return get_snapshot("articulos", cargador_respaldo=lambda: _fetch_all_table("articulos"))
+
+
+def _snapshot_stock():
+    return get_snapshot("stock", cargador_respaldo=lambda: _fetch_all_table("stock"))
 
 
-@st.cache_data(ttl=120)
-def _cache_stock() -> pd.DataFrame:
-    return _fetch_all_table("stock")
+def _cache_articulos() -> pd.DataFrame:
+    return _snapshot_articulos().df()
 
 
 def _articulos_preparados() -> pd.DataFrame:
@@ -129,11 +136,13 @@ def _articulos_preparados() -> pd.DataFrame:
     return out
 
 
-def _stock_preparado() -> pd.DataFrame:
+def _stock_preparado(deposito: Optional[str] = None) -> pd.DataFrame:
     """
     stock: columnas esperadas (según tu tabla): FAMILIA, CODIGO, ARTICULO, DEPOSITO, LOTE, VENCIMIENTO, STOCK
+    Con `deposito` usa el índice del snapshot en vez de filtrar la tabla entera.
     """
-    df = _cache_stock()
+    snap = _snapshot_stock()
+    df = snap.filas(DEPOSITO=deposito) if deposito is not None else snap.df()
     if df.empty:
         return df
 
@@ -164,10 +173,12 @@ def _upsert_stock_row(
     lote: str,
     vencimiento: str,
     delta_stock: float,
+    refrescar: bool = True,
 ) -> None:
     """
     Inserta o actualiza en stock sumando delta_stock (puede ser + o -).
     Detecta nombres reales de columnas en Supabase (mayúsculas/acentos) para evitar APIError.
+    refrescar=False deja la limpieza de caches al que llama (varias líneas seguidas).
     """
 
     def _norm(s: str) -> str:
@@ -304,8 +315,10 @@ def _upsert_stock_row(
                 f"Detalle: {e}"
             ) from e
 
-    # refresca cache
-    _cache_stock.clear()
+    # refresca cache (sólo trae las filas tocadas)
+    if refrescar:
+        invalidar_cache_tablas("stock")
+        _snapshot_stock().refrescar(forzar=True)
 
 
 # =====================================================================
@@ -437,6 +450,204 @@ def _crear_items_historial(comprobante_id: int, items: List[Dict[str, Any]]) ->
             }
         )
     supabase.table("comprobantes_stock_items").insert(payload).execute()
+    invalidar_cache_tablas("comprobantes_stock", "comprobantes_stock_items")
+
+
+# =====================================================================
+# POSTEO DE COMPROBANTE COMPLETO (STOCK + HISTORIAL EN UNA TRANSACCIÓN)
+# =====================================================================
+
+def _item_historial(it: Dict[str, Any]) -> tuple:
+    return (
+        it.get("familia") or None,
+        it.get("codigo") or None,
+        it.get("articulo") or None,
+        it.get("lote") or None,
+        it.get("vencimiento") or None,
+        float(it.get("cantidad") or 0),
+        float(it.get("precio")) if it.get("precio") is not None else None,
+    )
+
+
+def _agrupar_lineas_stock(lineas: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Suma los delta de líneas del mismo lote (deposito, codigo, lote, vencimiento)."""
+    por_lote: Dict[tuple, Dict[str, Any]] = {}
+    for ln in lineas:
+        clave = (
+            (ln.get("deposito") or "").strip(),
+            (ln.get("codigo") or "").strip(),
+            (ln.get("lote") or "").strip(),
+            (ln.get("vencimiento") or "").strip(),
+        )
+        if clave in por_lote:
+            por_lote[clave]["delta"] += float(ln.get("delta") or 0)
+            continue
+        por_lote[clave] = {
+            "deposito": clave[0],
+            "codigo": clave[1],
+            "lote": clave[2],
+            "vencimiento": clave[3],
+            "familia": (ln.get("familia") or "").strip(),
+            "articulo": (ln.get("articulo") or "").strip(),
+            "delta": float(ln.get("delta") or 0),
+        }
+    return list(por_lote.values())
+
+
+# Una sola sentencia para todas las líneas: UPDATE de los lotes existentes e
+# INSERT de los que no están (sólo con delta > 0, igual que _upsert_stock_row).
+_SQL_UPSERT_STOCK_LOTE = """
+    WITH d AS (
+        SELECT *
+        FROM unnest(%s::text[], %s::text[], %s::text[], %s::text[], %s::text[], %s::text[], %s::numeric[])
+             AS d(deposito, familia, codigo, articulo, lote, vencimiento, delta)
+    ),
+    upd AS (
+        UPDATE stock s
+        SET "FAMILIA" = d.familia,
+            "ARTICULO" = d.articulo,
+            "STOCK" = fc_stock_fmt(GREATEST(fc_stock_cant(s."STOCK"::text) + d.delta, 0))
+        FROM d
+        WHERE TRIM(s."CODIGO") = d.codigo
+          AND TRIM(s."DEPOSITO") = d.deposito
+          AND COALESCE(TRIM(s."LOTE"), '') = d.lote
+          AND COALESCE(TRIM(s."VENCIMIENTO"), '') = d.vencimiento
+        RETURNING d.deposito, d.codigo, d.lote, d.vencimiento
+    )
+    INSERT INTO stock ("FAMILIA","CODIGO","ARTICULO","DEPOSITO","LOTE","VENCIMIENTO","STOCK")
+    SELECT d.familia, d.codigo, d.articulo, d.deposito, d.lote, d.vencimiento, fc_stock_fmt(d.delta)
+    FROM d
+    WHERE d.delta > 0
+      AND NOT EXISTS (
+        SELECT 1 FROM upd u
+        WHERE u.deposito = d.deposito AND u.codigo = d.codigo
+          AND u.lote = d.lote AND u.vencimiento = d.vencimiento
+      )
+"""
+
+_SQL_INSERT_ITEMS = """
+    INSERT INTO comprobantes_stock_items
+        (comprobante_id, familia, codigo, articulo, lote, vencimiento, cantidad, precio)
+    SELECT %s, *
+    FROM unnest(%s::text[], %s::text[], %s::text[], %s::text[], %s::text[], %s::numeric[], %s::numeric[])
+"""
+
+
+def _postear_comprobante_sql(
+    tipo: str,
+    lineas: List[Dict[str, Any]],
+    items: List[Dict[str, Any]],
+    deposito_origen: str,
+    deposito_destino: str,
+    motivo: str,
+    notas: str,
+) -> int:
+    """Cabecera + stock + items en UNA transacción (psycopg2). Si algo falla no se aplica nada."""
+    conn = get_db_connection()
+    if conn is None:
+        raise RuntimeError("No se pudo obtener conexión a la base de datos")
+
+    lotes = _agrupar_lineas_stock(lineas)
+    filas_items = [_item_historial(it) for it in items]
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                INSERT INTO comprobantes_stock
+                    (tipo, created_at, usuario, deposito_origen, deposito_destino, motivo, notas)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+                RETURNING id
+                """,
+                (
+                    (tipo or "").upper(),
+                    datetime.utcnow().replace(microsecond=0).isoformat() + "Z",
+                    _get_usuario_actual() or None,
+                    deposito_origen or None,
+                    deposito_destino or None,
+                    motivo or None,
+                    notas or None,
+                ),
+            )
+            comp_id = int(cur.fetchone()[0])
+
+            if lotes:
+                cols = ["deposito", "familia", "codigo", "articulo", "lote", "vencimiento", "delta"]
+                cur.execute(_SQL_UPSERT_STOCK_LOTE, tuple([ln[c] for ln in lotes] for c in cols))
+
+            if filas_items:
+                cur.execute(_SQL_INSERT_ITEMS, (comp_id, *[list(col) for col in zip(*filas_items)]))
+
+        conn.commit()
+    except Exception:
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+        raise
+    finally:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    return comp_id
+
+
+def _postear_comprobante(
+    tipo: str,
+    lineas: List[Dict[str, Any]],
+    items: List[Dict[str, Any]],
+    deposito_origen: str = "",
+    deposito_destino: str = "",
+    motivo: str = "",
+    notas: str = "",
+) -> Dict[str, Any]:
+    """
+    Aplica todas las líneas de un comprobante y guarda su historial.
+
+    lineas: [{deposito, familia, codigo, articulo, lote, vencimiento, delta}]
+    items:  líneas para comprobantes_stock_items (ver _crear_items_historial)
+
+    Con la migración stock_lote_clave va todo en una transacción (un UPDATE/INSERT
+    para todas las líneas + un INSERT de items). Sin ella, línea por línea vía Supabase.
+
+    Retorna {"comp_id": int | None, "error_historial": str | None}.
+    """
+    try:
+        if stock_lote_clave_disponible():
+            comp_id = _postear_comprobante_sql(
+                tipo, lineas, items, deposito_origen, deposito_destino, motivo, notas
+            )
+            return {"comp_id": comp_id, "error_historial": None}
+
+        for ln in lineas:
+            _upsert_stock_row(
+                deposito=ln.get("deposito", ""),
+                familia=ln.get("familia", ""),
+                codigo=ln.get("codigo", ""),
+                articulo=ln.get("articulo", ""),
+                lote=ln.get("lote", ""),
+                vencimiento=ln.get("vencimiento", ""),
+                delta_stock=float(ln.get("delta") or 0),
+                refrescar=False,
+            )
+
+        try:
+            comp_id = _crear_comprobante_historial(
+                tipo=tipo,
+                deposito_origen=deposito_origen,
+                deposito_destino=deposito_destino,
+                motivo=motivo,
+                notas=notas,
+            )
+            _crear_items_historial(comp_id, items)
+            return {"comp_id": comp_id, "error_historial": None}
+        except Exception as e:
+            return {"comp_id": None, "error_historial": str(e)}
+    finally:
+        # Un solo refresco por comprobante (no por línea)
+        invalidar_cache_tablas("stock", "comprobantes_stock", "comprobantes_stock_items")
+        _snapshot_stock().refrescar(forzar=True)
 
 
 def _fetch_historial(limit: int = 200) -> pd.DataFrame:
@@ -658,6 +869,7 @@ def mostrar_comprobante_alta_stock():
             return
 
         ok = 0
+        lineas: List[Dict[str, Any]] = []
         hist_items: List[Dict[str, Any]] = []
 
         for it in items_to_process:
@@ -675,14 +887,16 @@ def mostrar_comprobante_alta_stock():
             lote = it["lote"] if it["usa_lote"] else ""
             venc = it["venc"] if it["usa_lote"] else ""
 
-            _upsert_stock_row(
-                deposito=deposito_destino,
-                familia=fam,
-                codigo=codigo,
-                articulo=desc,
-                lote=lote,
-                vencimiento=venc,
-                delta_stock=float(it["cantidad"]),
+            lineas.append(
+                {
+                    "deposito": deposito_destino,
+                    "familia": fam,
+                    "codigo": codigo,
+                    "articulo": desc,
+                    "lote": lote,
+                    "vencimiento": venc,
+                    "delta": float(it["cantidad"]),
+                }
             )
 
             hist_items.append(
@@ -700,23 +914,26 @@ def mostrar_comprobante_alta_stock():
             ok += 1
 
         # -------------------------
-        # HISTORIAL + MENSAJE FINAL
+        # STOCK + HISTORIAL (todas las líneas juntas) + MENSAJE FINAL
         # -------------------------
-        comp_id = None
-        historial_ok = False
-
         try:
-            comp_id = _crear_comprobante_historial(
+            res = _postear_comprobante(
                 tipo="ALTA",
+                lineas=lineas,
+                items=hist_items,
                 deposito_origen="",
                 deposito_destino=deposito_destino,
                 motivo="",
                 notas="Alta de stock",
             )
-            _crear_items_historial(comp_id, hist_items)
-            historial_ok = True
         except Exception as e:
-            st.warning(f"Alta aplicada a STOCK, pero no se pudo guardar historial. Detalle: {e}")
+            st.error(f"No se pudo confirmar el alta. Detalle: {e}")
+            return
+
+        comp_id = res["comp_id"]
+        historial_ok = comp_id is not None
+        if res["error_historial"]:
+            st.warning(f"Alta aplicada a STOCK, pero no se pudo guardar historial. Detalle: {res['error_historial']}")
 
         if comp_id:
             codigo_txt = _codigo_comprobante("ALTA", comp_id)
@@ -754,8 +971,7 @@ def mostrar_comprobante_baja_stock():
         key="baja_motivo",
     )
 
-    df_stock = _stock_preparado()
-    df_dep = df_stock[df_stock["DEPOSITO"] == deposito_origen].copy()
+    df_dep = _stock_preparado(deposito_origen)
 
     if df_dep.empty:
         st.info("No hay stock para ese depósito.")
@@ -863,44 +1079,34 @@ def mostrar_comprobante_baja_stock():
             return
 
         delta = -float(cant)
+        item = {
+            "familia": str(chosen.get("FAMILIA", "") or ""),
+            "codigo": str(chosen.get("CODIGO", "") or ""),
+            "articulo": str(chosen.get("ARTICULO", "") or ""),
+            "lote": str(chosen.get("LOTE", "") or ""),
+            "vencimiento": str(chosen.get("VENCIMIENTO", "") or ""),
+        }
 
-        _upsert_stock_row(
-            deposito=deposito_origen,
-            familia=str(chosen.get("FAMILIA", "") or ""),
-            codigo=str(chosen.get("CODIGO", "") or ""),
-            articulo=str(chosen.get("ARTICULO", "") or ""),
-            lote=str(chosen.get("LOTE", "") or ""),
-            vencimiento=str(chosen.get("VENCIMIENTO", "") or ""),
-            delta_stock=delta,
-        )
-
-        # Historial BAJA (no rompe si falla)
+        # Stock + historial BAJA (el historial no rompe si falla)
         try:
-            comp_id = _crear_comprobante_historial(
+            res = _postear_comprobante(
                 tipo="BAJA",
+                lineas=[{**item, "deposito": deposito_origen, "delta": delta}],
+                items=[{**item, "cantidad": float(cant), "precio": None}],
                 deposito_origen=deposito_origen,
                 deposito_destino="",
                 motivo=motivo,
                 notas="Baja de stock",
             )
-            _crear_items_historial(
-                comp_id,
-                [
-                    {
-                        "familia": str(chosen.get("FAMILIA", "") or ""),
-                        "codigo": str(chosen.get("CODIGO", "") or ""),
-                        "articulo": str(chosen.get("ARTICULO", "") or ""),
-                        "lote": str(chosen.get("LOTE", "") or ""),
-                        "vencimiento": str(chosen.get("VENCIMIENTO", "") or ""),
-                        "cantidad": float(cant),
-                        "precio": None,
-                    }
-                ],
-            )
-            st.success(f"Baja confirmada. Comprobante { _codigo_comprobante('BAJA', comp_id) }")
         except Exception as e:
+            st.error(f"No se pudo confirmar la baja. Detalle: {e}")
+            return
+
+        if res["comp_id"] is not None:
+            st.success(f"Baja confirmada. Comprobante { _codigo_comprobante('BAJA', res['comp_id']) }")
+        else:
             st.success("Baja confirmada y aplicada a stock.")
-            st.warning(f"No se pudo guardar historial de BAJA. Detalle: {e}")
+            st.warning(f"No se pudo guardar historial de BAJA. Detalle: {res['error_historial']}")
 
 
 # =====================================================================
@@ -930,8 +1136,7 @@ def mostrar_comprobante_movimiento():
         st.warning("El depósito destino debe ser distinto al origen.")
         return
 
-    df_stock = _stock_preparado()
-    df_dep = df_stock[df_stock["DEPOSITO"] == deposito_origen].copy()
+    df_dep = _stock_preparado(deposito_origen)
 
     if df_dep.empty:
         st.info("No hay stock para el depósito origen.")
@@ -1038,53 +1243,37 @@ def mostrar_comprobante_movimiento():
             st.error("No podés mover más que el stock disponible.")
             return
 
-        _upsert_stock_row(
-            deposito=deposito_origen,
-            familia=str(chosen.get("FAMILIA", "") or ""),
-            codigo=str(chosen.get("CODIGO", "") or ""),
-            articulo=str(chosen.get("ARTICULO", "") or ""),
-            lote=str(chosen.get("LOTE", "") or ""),
-            vencimiento=str(chosen.get("VENCIMIENTO", "") or ""),
-            delta_stock=-float(cant),
-        )
-
-        _upsert_stock_row(
-            deposito=deposito_destino,
-            familia=str(chosen.get("FAMILIA", "") or ""),
-            codigo=str(chosen.get("CODIGO", "") or ""),
-            articulo=str(chosen.get("ARTICULO", "") or ""),
-            lote=str(chosen.get("LOTE", "") or ""),
-            vencimiento=str(chosen.get("VENCIMIENTO", "") or ""),
-            delta_stock=float(cant),
-        )
+        item = {
+            "familia": str(chosen.get("FAMILIA", "") or ""),
+            "codigo": str(chosen.get("CODIGO", "") or ""),
+            "articulo": str(chosen.get("ARTICULO", "") or ""),
+            "lote": str(chosen.get("LOTE", "") or ""),
+            "vencimiento": str(chosen.get("VENCIMIENTO", "") or ""),
+        }
 
-        # Historial MOV (no rompe si falla)
+        # Origen (-) y destino (+) + historial MOV (el historial no rompe si falla)
         try:
-            comp_id = _crear_comprobante_historial(
+            res = _postear_comprobante(
                 tipo="MOV",
+                lineas=[
+                    {**item, "deposito": deposito_origen, "delta": -float(cant)},
+                    {**item, "deposito": deposito_destino, "delta": float(cant)},
+                ],
+                items=[{**item, "cantidad": float(cant), "precio": None}],
                 deposito_origen=deposito_origen,
                 deposito_destino=deposito_destino,
                 motivo="",
                 notas="Movimiento entre depósitos",
             )
-            _crear_items_historial(
-                comp_id,
-                [
-                    {
-                        "familia": str(chosen.get("FAMILIA", "") or ""),
-                        "codigo": str(chosen.get("CODIGO", "") or ""),
-                        "articulo": str(chosen.get("ARTICULO", "") or ""),
-                        "lote": str(chosen.get("LOTE", "") or ""),
-                        "vencimiento": str(chosen.get("VENCIMIENTO", "") or ""),
-                        "cantidad": float(cant),
-                        "precio": None,
-                    }
-                ],
-            )
-            st.success(f"Movimiento confirmado. Comprobante { _codigo_comprobante('MOV', comp_id) }")
         except Exception as e:
+            st.error(f"No se pudo confirmar el movimiento. Detalle: {e}")
+            return
+
+        if res["comp_id"] is not None:
+            st.success(f"Movimiento confirmado. Comprobante { _codigo_comprobante('MOV', res['comp_id']) }")
+        else:
             st.success("Movimiento confirmado y aplicado a stock.")
-            st.warning(f"No se pudo guardar historial de MOV. Detalle: {e}")
+            st.warning(f"No se pudo guardar historial de MOV. Detalle: {res['error_historial']}")
 
 
 # =====================================================================
@@ -12,3 +12,12 @@ def get_secret(key: str, default=None):
         return st.secrets.get(key, default)
     except Exception:
         return default
+
+
+def get_secret_num(key: str, default, cast=int):
+    # get_secret convertido con cast(); default si falta o no es numero
+    try:
+        val = get_secret(key, None)
+        return cast(val) if val not in (None, "") else default
+    except (TypeError, ValueError):
+        return default
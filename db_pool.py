@@ -0,0 +1,314 @@
+# =========================
+# DB_POOL.PY - POOL DE CONEXIONES POSTGRES (PROCESO COMPLETO)
+# =========================
+"""
+Pool de conexiones reutilizables para Postgres (Supabase).
+
+Cada conexión nueva a Supabase paga TCP + handshake TLS. El pool mantiene
+conexiones abiertas y las presta a quien las pida; `close()` sobre una
+conexión prestada la devuelve al pool en lugar de cerrarla, así el código
+existente (`conn = get_db_connection() ... conn.close()`) no cambia.
+
+Configuración (env vars o st.secrets, ver config_runtime.get_secret):
+    DB_POOL_MIN           conexiones que se abren al crear el pool (def. 1)
+    DB_POOL_MAX           máximo de conexiones simultáneas (def. 10)
+    DB_POOL_TIMEOUT       segundos de espera por una conexión libre (def. 10)
+    DB_POOL_MAX_LIFETIME  segundos antes de reciclar una conexión (def. 1800)
+    DB_POOL_MAX_IDLE      segundos ociosa antes de verificarla con SELECT 1 (def. 60)
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+from config_runtime import get_secret_num
+
+
+# =====================================================================
+# CONEXIÓN PRESTADA
+# =====================================================================
+
+class PooledConnection:
+    """
+    Envoltorio de una conexión del pool.
+    Delega todo en la conexión real; `close()` la devuelve al pool.
+    """
+
+    def __init__(self, pool: "ConnectionPool", raw, created_at: float):
+        self._pool = pool
+        self._raw = raw
+        self._created_at = created_at
+        self._returned = False
+
+    def __getattr__(self, name):
+        if name in ("_pool", "_raw", "_created_at", "_returned"):
+            raise AttributeError(name)
+        return getattr(self._raw, name)
+
+    def __setattr__(self, name, value):
+        if name.startswith("_"):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._raw, name, value)
+
+    def __enter__(self):
+        self._raw.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return self._raw.__exit__(exc_type, exc, tb)
+
+    @property
+    def raw(self):
+        return self._raw
+
+    def close(self):
+        if self._returned:
+            return
+        self._returned = True
+        self._pool._release(self)
+
+    def __del__(self):
+        # Red de seguridad: si alguien olvidó close() (p.ej. por una excepción),
+        # la conexión vuelve al pool en lugar de quedar "en uso" para siempre.
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+# =====================================================================
+# POOL
+# =====================================================================
+
+class ConnectionPool:
+    """Pool thread-safe con health check, reciclado y métricas."""
+
+    def __init__(
+        self,
+        factory: Callable,
+        min_size: int = 1,
+        max_size: int = 10,
+        timeout: float = 10.0,
+        max_lifetime: float = 1800.0,
+        max_idle: float = 60.0,
+        max_waits_log: int = 200,
+    ):
+        self._factory = factory
+        self.min_size = max(0, int(min_size))
+        self.max_size = max(1, int(max_size), self.min_size)
+        self.timeout = float(timeout)
+        self.max_lifetime = float(max_lifetime)
+        self.max_idle = float(max_idle)
+
+        self._cond = threading.Condition(threading.RLock())
+        self._idle = deque()          # (raw, created_at, last_used)
+        self._en_uso = 0
+
+        self._stats = {
+            "creadas": 0,
+            "reutilizadas": 0,
+            "recicladas": 0,
+            "descartadas": 0,
+            "checkouts": 0,
+            "timeouts": 0,
+        }
+        self._esperas_ms = deque(maxlen=max_waits_log)
+
+        for _ in range(self.min_size):
+            raw = self._nueva()
+            if raw is None:
+                break
+            self._idle.append((raw, time.monotonic(), time.monotonic()))
+
+    # -----------------------------------------------------------------
+    # Internos
+    # -----------------------------------------------------------------
+    def _nueva(self):
+        try:
+            raw = self._factory()
+        except Exception as e:
+            print(f"❌ Pool DB: error creando conexión: {e}")
+            return None
+        if raw is not None:
+            with self._cond:
+                self._stats["creadas"] += 1
+        return raw
+
+    @staticmethod
+    def _cerrar(raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    @staticmethod
+    def _esta_viva(raw) -> bool:
+        """Health check: conexión abierta y responde a SELECT 1."""
+        try:
+            if getattr(raw, "closed", 0):
+                return False
+            with raw.cursor() as cur:
+                cur.execute("SELECT 1")
+                cur.fetchone()
+            raw.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _resetear(self, raw) -> bool:
+        """Deja la conexión lista para el próximo usuario (sin transacción abierta)."""
+        try:
+            if getattr(raw, "closed", 0):
+                return False
+            raw.rollback()
+            if getattr(raw, "autocommit", False):
+                raw.autocommit = False
+            return True
+        except Exception:
+            return False
+
+    # -----------------------------------------------------------------
+    # API
+    # -----------------------------------------------------------------
+    def getconn(self) -> Optional[PooledConnection]:
+        """Presta una conexión. Devuelve None si no se pudo conectar."""
+        t0 = time.monotonic()
+        deadline = t0 + self.timeout
+
+        while True:
+            candidata = None
+            crear = False
+            with self._cond:
+                while not self._idle and self._en_uso >= self.max_size:
+                    restante = deadline - time.monotonic()
+                    if restante <= 0:
+                        self._stats["timeouts"] += 1
+                        print(f"❌ Pool DB: timeout esperando conexión ({self.timeout:.1f}s)")
+                        return None
+                    self._cond.wait(restante)
+
+                if self._idle:
+                    candidata = self._idle.pop()
+                else:
+                    crear = True
+                self._en_uso += 1
+
+            ahora = time.monotonic()
+            if candidata is not None:
+                raw, created_at, last_used = candidata
+                vencida = self.max_lifetime > 0 and (ahora - created_at) > self.max_lifetime
+                ociosa = (ahora - last_used) > self.max_idle
+                if vencida or (ociosa and not self._esta_viva(raw)) or getattr(raw, "closed", 0):
+                    self._cerrar(raw)
+                    with self._cond:
+                        self._en_uso -= 1
+                        self._stats["recicladas" if vencida else "descartadas"] += 1
+                        self._cond.notify()
+                    continue
+                self._registrar_checkout(t0, reutilizada=True)
+                return PooledConnection(self, raw, created_at)
+
+            if crear:
+                raw = self._nueva()
+                if raw is None:
+                    with self._cond:
+                        self._en_uso -= 1
+                        self._cond.notify()
+                    return None
+                self._registrar_checkout(t0, reutilizada=False)
+                return PooledConnection(self, raw, time.monotonic())
+
+    def _registrar_checkout(self, t0: float, reutilizada: bool):
+        espera_ms = (time.monotonic() - t0) * 1000.0
+        with self._cond:
+            self._stats["checkouts"] += 1
+            if reutilizada:
+                self._stats["reutilizadas"] += 1
+            self._esperas_ms.append(espera_ms)
+
+    def _release(self, conn: PooledConnection):
+        raw = conn._raw
+        ok = self._resetear(raw)
+        with self._cond:
+            self._en_uso -= 1
+            if ok:
+                self._idle.append((raw, conn._created_at, time.monotonic()))
+            else:
+                self._stats["descartadas"] += 1
+            self._cond.notify()
+        if not ok:
+            self._cerrar(raw)
+
+    @contextmanager
+    def connection(self):
+        """Checkout por sesión: `with pool.connection() as conn: ...`"""
+        conn = self.getconn()
+        try:
+            yield conn
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def closeall(self):
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+        for raw, _, _ in idle:
+            self._cerrar(raw)
+
+    def stats(self) -> dict:
+        with self._cond:
+            esperas = list(self._esperas_ms)
+            data = dict(self._stats)
+            data["en_uso"] = self._en_uso
+            data["libres"] = len(self._idle)
+        data["min_size"] = self.min_size
+        data["max_size"] = self.max_size
+        data["espera_ultima_ms"] = round(esperas[-1], 2) if esperas else 0.0
+        data["espera_promedio_ms"] = round(sum(esperas) / len(esperas), 2) if esperas else 0.0
+        data["espera_max_ms"] = round(max(esperas), 2) if esperas else 0.0
+        data["esperas_ms"] = [round(x, 2) for x in esperas]
+        return data
+
+
+# =====================================================================
+# POOL GLOBAL (UNO POR PROCESO)
+# =====================================================================
+
+_POOL: Optional[ConnectionPool] = None
+_POOL_LOCK = threading.Lock()
+
+
+def get_pool(factory: Callable) -> ConnectionPool:
+    """Devuelve el pool del proceso, creándolo la primera vez."""
+    global _POOL
+    if _POOL is None:
+        with _POOL_LOCK:
+            if _POOL is None:
+                _POOL = ConnectionPool(
+                    factory,
+                    min_size=get_secret_num("DB_POOL_MIN", 1),
+                    max_size=get_secret_num("DB_POOL_MAX", 10),
+                    timeout=get_secret_num("DB_POOL_TIMEOUT", 10.0, float),
+                    max_lifetime=get_secret_num("DB_POOL_MAX_LIFETIME", 1800.0, float),
+                    max_idle=get_secret_num("DB_POOL_MAX_IDLE", 60.0, float),
+                )
+    return _POOL
+
+
+def get_pool_stats() -> dict:
+    """Métricas del pool (reutilizadas, creadas, esperas en ms, etc.)."""
+    if _POOL is None:
+        return {}
+    return _POOL.stats()
+
+
+def cerrar_pool() -> None:
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is not None:
+            _POOL.closeall()
+            _POOL = None
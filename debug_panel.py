@@ -171,6 +171,10 @@ class DebugPanel:
         else:
             st.success("✅ Flujo validado correctamente - no se detectaron errores comunes.")
         
+        self._render_metricas_db()
+        self._render_metricas_cache()
+        self._render_metricas_interpretaciones()
+
         # Mostrar flow
         if st.session_state.get(self.session_key):
             st.markdown("---")
@@ -199,6 +203,86 @@ class DebugPanel:
             - ⚠️ Validaciones automáticas para detectar inconsistencias
             """)
     
+    def _render_metricas_db(self):
+        """Muestra métricas del pool de conexiones DB (si ya se creó)."""
+        try:
+            from db_pool import get_pool_stats
+            stats = get_pool_stats()
+        except Exception:
+            stats = {}
+        if not stats:
+            return
+
+        with st.expander("🔌 Conexiones DB (pool)", expanded=False):
+            c1, c2, c3, c4 = st.columns(4)
+            c1.metric("Reutilizadas", stats.get("reutilizadas", 0))
+            c2.metric("Creadas", stats.get("creadas", 0))
+            c3.metric("En uso / libres", f"{stats.get('en_uso', 0)} / {stats.get('libres', 0)}")
+            c4.metric("Espera prom. (ms)", stats.get("espera_promedio_ms", 0.0))
+            st.caption(
+                f"Última espera: {stats.get('espera_ultima_ms', 0.0)} ms · "
+                f"máx: {stats.get('espera_max_ms', 0.0)} ms · "
+                f"recicladas: {stats.get('recicladas', 0)} · "
+                f"descartadas: {stats.get('descartadas', 0)} · "
+                f"timeouts: {stats.get('timeouts', 0)}"
+            )
+            if stats.get("esperas_ms"):
+                st.line_chart(pd.DataFrame({"espera_ms": stats["esperas_ms"]}))
+
+    def _render_metricas_cache(self):
+        """Muestra hit/miss del cache de consultas SQL (si ya se creó)."""
+        try:
+            from cache_consultas import get_cache_stats
+            stats = get_cache_stats()
+        except Exception:
+            stats = {}
+        if not stats:
+            return
+
+        with st.expander("⚡ Cache de consultas SQL", expanded=False):
+            c1, c2, c3, c4 = st.columns(4)
+            c1.metric("Hits", stats.get("hits", 0))
+            c2.metric("Misses", stats.get("misses", 0))
+            c3.metric("Hit rate", f"{stats.get('hit_rate', 0.0)}%")
+            c4.metric("Entradas", f"{stats.get('entradas', 0)} / {stats.get('max_entradas', 0)}")
+            st.caption(
+                f"Memoria: {stats.get('mb', 0.0)} / {stats.get('max_mb', 0.0)} MB · "
+                f"invalidadas por escritura: {stats.get('viejas', 0)} · "
+                f"desalojadas (LRU): {stats.get('desalojadas', 0)} · "
+                f"tablas invalidadas: {stats.get('invalidaciones', 0)} · "
+                f"versiones DB: {'sí' if stats.get('versiones_db') else 'no'}"
+                + ("" if stats.get("habilitado", True) else " · ⛔ desactivado (SQL_CACHE=0)")
+            )
+
+    def _render_metricas_interpretaciones(self):
+        """Muestra hit/miss de los caches de interpretaciones y de respuestas OpenAI (si ya se crearon)."""
+        caches = (
+            ("🧠 Cache de interpretaciones", "cache_interpretaciones", "get_cache_interpretaciones_stats", "INTERP_CACHE"),
+            ("🤖 Cache de respuestas OpenAI", "cache_llm", "get_cache_llm_stats", "LLM_CACHE"),
+        )
+        for titulo, modulo, funcion, flag in caches:
+            try:
+                stats = getattr(__import__(modulo), funcion)()
+            except Exception:
+                stats = {}
+            if not stats:
+                continue
+
+            with st.expander(titulo, expanded=False):
+                c1, c2, c3, c4 = st.columns(4)
+                c1.metric("Hits", stats.get("hits", 0))
+                c2.metric("Misses", stats.get("misses", 0))
+                c3.metric("Hit rate", f"{stats.get('hit_rate', 0.0)}%")
+                c4.metric("Entradas", f"{stats.get('entradas', 0)} / {stats.get('max_entradas', 0)}")
+                st.caption(
+                    f"hits desde disco: {stats.get('hits_disco', 0)} · "
+                    f"guardadas: {stats.get('guardadas', 0)} · "
+                    f"no cacheables: {stats.get('no_cacheables', 0)} · "
+                    f"desalojadas (LRU): {stats.get('desalojadas', 0)} · "
+                    f"SQLite: {'sí' if stats.get('persistente') else 'no'}"
+                    + ("" if stats.get("habilitado", True) else f" · ⛔ desactivado ({flag}=0)")
+                )
+
     def _get_style(self, step: str):
         """Determina color e icono según el tipo de paso"""
         step_lower = step.lower()
@@ -8,7 +8,7 @@ import pandas as pd
 from typing import Optional
 
 # Importar conexión a DB
-from sql_core import get_db_connection, ejecutar_consulta
+from sql_core import get_db_connection, ejecutar_consulta, invalidar_cache_tablas
 
 
 # =====================================================================
@@ -54,6 +54,7 @@ def _crear_deposito(nombre: str, codigo: str, descripcion: str, activo: bool) ->
         with conn.cursor() as cur:
             cur.execute(sql, (nombre, codigo, descripcion, activo))
         conn.commit()
+        invalidar_cache_tablas("depositos")
     finally:
         try:
             conn.close()
@@ -75,6 +76,7 @@ def _actualizar_deposito(dep_id, nombre: str, codigo: str, descripcion: str, act
         with conn.cursor() as cur:
             cur.execute(sql, (nombre, codigo, descripcion, activo, dep_id))
         conn.commit()
+        invalidar_cache_tablas("depositos")
     finally:
         try:
             conn.close()
@@ -89,6 +91,7 @@ def _eliminar_deposito(dep_id) -> None:
         with conn.cursor() as cur:
             cur.execute(sql, (dep_id,))
         conn.commit()
+        invalidar_cache_tablas("depositos")
     finally:
         try:
             conn.close()
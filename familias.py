@@ -9,7 +9,7 @@ from datetime import datetime
 
 # Importar conexión a DB (Supabase / Postgres)
 # (No cambiar: se asume que ya existe en tu proyecto)
-from sql_core import get_db_connection
+from sql_core import get_db_connection, invalidar_cache_tablas, tablas_escritas
 
 
 # =====================================================================
@@ -76,6 +76,7 @@ def _exec(sql: str, params: tuple = ()) -> bool:
         with conn.cursor() as cur:
             cur.execute(sql, params)
         conn.commit()
+        invalidar_cache_tablas(*tablas_escritas(sql))
         return True
     except Exception as e:
         try:
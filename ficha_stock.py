@@ -4,11 +4,15 @@
 # =====================================================================
 
 import streamlit as st
+import numpy as np
 import pandas as pd
 from datetime import datetime, date
 from typing import List, Dict, Any, Optional
 
 from supabase_client import supabase
+from sql_core import ejecutar_consulta, kardex_checkpoints_disponible, _sql_kardex_ctes
+from sql_stock import get_stock_a_fecha
+from utils_format import df_to_csv_bytes
 
 
 # =====================================================================
@@ -66,6 +70,16 @@ def _fetch_articulos(q: str, limit: int = 50) -> List[Dict[str, Any]]:
             return []
 
 
+_COLS_MOVIMIENTOS = (
+    "id", "articulo_id", "fecha_hora", "tipo_mov",
+    "deposito_id", "deposito_origen_id", "deposito_destino_id",
+    "qty_base", "unidad_mov", "factor_conversion",
+    "lote", "vencimiento",
+    "ref_tipo", "ref_nro", "proveedor", "proveedor_id", "usuario", "observacion",
+    "precio_unit_aplicado", "moneda",
+)
+
+
 def _fetch_movimientos(
     articulo_id: Any,
     fecha_desde: Optional[date],
@@ -81,14 +95,7 @@ def _fetch_movimientos(
     - precio_unit_aplicado, moneda
     """
     try:
-        sel = (
-            "id,articulo_id,fecha_hora,tipo_mov,"
-            "deposito_id,deposito_origen_id,deposito_destino_id,"
-            "qty_base,unidad_mov,factor_conversion,"
-            "lote,vencimiento,"
-            "ref_tipo,ref_nro,proveedor,proveedor_id,usuario,observacion,"
-            "precio_unit_aplicado,moneda"
-        )
+        sel = ",".join(_COLS_MOVIMIENTOS)
 
         q = supabase.table("movimientos_stock").select(sel).eq("articulo_id", articulo_id)
 
@@ -104,7 +111,86 @@ def _fetch_movimientos(
         return []
 
 
-def _calcular_kardex_promedio_movil(df: pd.DataFrame) -> pd.DataFrame:
+def _serie_float(s: pd.Series) -> pd.Series:
+    """Versión vectorizada de _safe_float (None / "" / texto inválido -> 0.0)."""
+    return pd.to_numeric(s, errors="coerce").fillna(0.0).astype(float)
+
+
+def _serie_datetime(s: pd.Series) -> pd.Series:
+    """
+    Versión vectorizada de _to_datetime_safe (inválidos -> NaT).
+
+    Con format="ISO8601": si no, pandas infiere UN formato de la primera fila
+    y las fechas con/sin fracción de segundo que no coinciden quedan NaT.
+    """
+    for extra in ({}, {"utc": True}):      # offsets mezclados -> todo a UTC
+        try:
+            return pd.to_datetime(s, errors="coerce", format="ISO8601", **extra)
+        except Exception:
+            pass
+    return s.apply(_to_datetime_safe)
+
+
+# Separación (en escala log) entre tramos de saldo positivo: con 2000 el aporte
+# de un tramo anterior queda por debajo de exp(-1900), o sea 0.0 en float64.
+_KARDEX_SEP_TRAMOS = 2000.0
+
+
+def _kardex_arrays(qty: np.ndarray, precio: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Promedio móvil ponderado sin recorrer fila por fila.
+
+    Mientras el saldo es positivo una salida valúa a costo promedio y no lo
+    cambia: sólo achica el valor en la proporción saldo_nuevo / saldo_previo.
+    Entonces, dentro de un tramo de saldo > 0,
+
+        saldo_valor[n] = sum_{entradas k <= n} qty[k] * precio[k] * R(k, n)
+
+    con R(k, n) = producto de las proporciones retenidas por las salidas entre
+    k y n = exp(L[n] - L[k]), L = cumsum(log(saldo / saldo_previo)) en salidas.
+    La suma se acumula con np.logaddexp.accumulate (estable aunque R sea
+    ínfimo); cada tramo se corre _KARDEX_SEP_TRAMOS en la escala log para que
+    los anteriores (saldo <= 0 resetea costo y valor) no aporten.
+    """
+    n = len(qty)
+    saldo_qty = np.cumsum(qty)
+    saldo_prev = np.concatenate(([0.0], saldo_qty[:-1]))
+
+    positivo = saldo_qty > 0
+    positivo_prev = np.concatenate(([False], positivo[:-1]))
+    entrada = qty > 0
+    salida = qty < 0
+
+    tramo = np.cumsum(positivo & ~positivo_prev).astype(float) * _KARDEX_SEP_TRAMOS
+
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore", under="ignore"):
+        retenido = np.where(salida & positivo, np.log(saldo_qty / saldo_prev), 0.0)
+        L = np.cumsum(retenido)
+
+        aporte = np.where(entrada & positivo, qty * precio, 0.0)
+
+        def _acumular(montos: np.ndarray) -> np.ndarray:
+            w = np.where(montos > 0, np.log(montos), -np.inf) - L + tramo
+            acc = np.logaddexp.accumulate(w) if n else w
+            return np.where(positivo, np.exp(acc + L - tramo), 0.0)
+
+        # Precios negativos (notas de crédito mal cargadas) se acumulan aparte
+        saldo_valor = _acumular(aporte) - _acumular(-aporte)
+        costo_prom = np.where(positivo, saldo_valor / np.where(positivo, saldo_qty, 1.0), 0.0)
+
+    costo_previo = np.concatenate(([0.0], costo_prom[:-1]))
+    valor_mov = np.where(entrada, qty * precio, np.where(salida, qty * costo_previo, 0.0))
+
+    return {
+        "costo_unit_aplicado": np.where(salida, costo_previo, 0.0),
+        "valor_mov": valor_mov,
+        "saldo_qty": saldo_qty,
+        "saldo_valor": saldo_valor,
+        "costo_promedio": costo_prom,
+    }
+
+
+def _calcular_kardex_promedio_movil(df: pd.DataFrame, inicial: Optional[Dict[str, float]] = None) -> pd.DataFrame:
     """
     Calcula:
     - qty_in / qty_out
@@ -112,6 +198,8 @@ def _calcular_kardex_promedio_movil(df: pd.DataFrame) -> pd.DataFrame:
     - costo_unit_aplicado en BAJAS (usa costo_promedio previo)
     - valor_mov (positivo entradas / negativo salidas)
     - saldo_qty / saldo_valor
+    Con saldo <= 0 el costo promedio y el valor vuelven a 0 (ver _kardex_arrays).
+    `inicial` = estado previo al primer movimiento (ver _saldo_kardex).
     """
     if df.empty:
         return df
@@ -120,72 +208,350 @@ def _calcular_kardex_promedio_movil(df: pd.DataFrame) -> pd.DataFrame:
 
     # Normaliza fecha
     if "fecha_hora" in df.columns:
-        df["fecha_hora_dt"] = df["fecha_hora"].apply(_to_datetime_safe)
+        df["fecha_hora_dt"] = _serie_datetime(df["fecha_hora"])
     else:
         df["fecha_hora_dt"] = None
 
     # qty_base
     if "qty_base" not in df.columns:
         df["qty_base"] = 0
-    df["qty_base"] = df["qty_base"].apply(_safe_float)
+    df["qty_base"] = _serie_float(df["qty_base"])
 
     # Entradas / salidas
-    df["qty_in"] = df["qty_base"].apply(lambda x: x if x > 0 else 0)
-    df["qty_out"] = df["qty_base"].apply(lambda x: abs(x) if x < 0 else 0)
+    df["qty_in"] = df["qty_base"].clip(lower=0)
+    df["qty_out"] = (-df["qty_base"]).clip(lower=0)
 
     # Precio entrada
     if "precio_unit_aplicado" not in df.columns:
         df["precio_unit_aplicado"] = 0
-    df["precio_unit_aplicado"] = df["precio_unit_aplicado"].apply(_safe_float)
-
-    saldo_qty = 0.0
-    saldo_valor = 0.0
-    costo_prom = 0.0
-
-    costo_unit_baja: List[float] = []
-    valor_mov: List[float] = []
-    saldo_qty_list: List[float] = []
-    saldo_valor_list: List[float] = []
-    costo_prom_list: List[float] = []
-
-    for _, r in df.iterrows():
-        qty = _safe_float(r.get("qty_base", 0))
-        precio_in = _safe_float(r.get("precio_unit_aplicado", 0))
-        costo_previo = costo_prom
-
-        if qty > 0:
-            v = qty * precio_in
-            saldo_qty += qty
-            saldo_valor += v
-        elif qty < 0:
-            q_out = abs(qty)
-            v = -1 * q_out * costo_previo
-            saldo_qty -= q_out
-            saldo_valor += v
-        else:
-            v = 0.0
+    df["precio_unit_aplicado"] = _serie_float(df["precio_unit_aplicado"])
 
-        if saldo_qty > 0:
-            costo_prom = saldo_valor / saldo_qty
-        else:
-            costo_prom = 0.0
-            saldo_valor = 0.0
+    qty = df["qty_base"].to_numpy(dtype=float)
+    precio = df["precio_unit_aplicado"].to_numpy(dtype=float)
 
-        costo_unit_baja.append(costo_previo if qty < 0 else 0.0)
-        valor_mov.append(v)
-        saldo_qty_list.append(saldo_qty)
-        saldo_valor_list.append(saldo_valor)
-        costo_prom_list.append(costo_prom)
-
-    df["costo_unit_aplicado"] = costo_unit_baja
-    df["valor_mov"] = valor_mov
-    df["saldo_qty"] = saldo_qty_list
-    df["saldo_valor"] = saldo_valor_list
-    df["costo_promedio"] = costo_prom_list
+    q0 = float((inicial or {}).get("saldo_qty", 0.0) or 0.0)
+    if q0:
+        # El saldo inicial entra como un movimiento más (a costo promedio si es positivo)
+        c0 = float(inicial.get("costo_promedio", 0.0) or 0.0) if q0 > 0 else 0.0
+        cols = _kardex_arrays(np.concatenate(([q0], qty)), np.concatenate(([c0], precio)))
+        cols = {col: valores[1:] for col, valores in cols.items()}
+    else:
+        cols = _kardex_arrays(qty, precio)
+    for col, valores in cols.items():
+        df[col] = valores
 
     return df
 
 
+# =====================================================================
+# Kardex en la base: saldo inicial + páginas
+# =====================================================================
+
+_KARDEX_FILAS_PAGINA = 500
+
+# Movimientos del artículo que cumplen {hasta}, para sql_core._sql_kardex_ctes
+_SQL_KARDEX_MOVS = """
+    SELECT
+        articulo_id,
+        1 AS orden,
+        fecha_hora,
+        id,
+        COALESCE(qty_base::float8, 0) AS qty,
+        COALESCE(precio_unit_aplicado::float8, 0) AS precio
+    FROM movimientos_stock
+    WHERE articulo_id = %(articulo_id)s
+      AND {hasta}
+"""
+
+# Con checkpoints: último corte <= {limite} como saldo inicial + movimientos desde el corte
+_SQL_KARDEX_CHECKPOINT = """
+    cp AS (
+        SELECT corte, saldo_qty, saldo_valor, movimientos
+        FROM fc_kardex_checkpoints
+        WHERE articulo_id = %(articulo_id)s
+          AND {limite}
+        ORDER BY corte DESC
+        LIMIT 1
+    ),
+"""
+
+_SQL_KARDEX_CHECKPOINT_FUENTE = """
+    SELECT
+        %(articulo_id)s AS articulo_id, 0 AS orden, NULL::timestamptz AS fecha_hora, NULL AS id,
+        saldo_qty AS qty,
+        CASE WHEN saldo_qty > 0 THEN saldo_valor / saldo_qty ELSE 0 END AS precio
+    FROM cp
+    UNION ALL
+    {movs}
+      AND (NOT EXISTS (SELECT 1 FROM cp) OR fecha_hora >= (SELECT corte FROM cp))
+"""
+
+_SQL_KARDEX_PAGINA = """
+    SELECT {cols}
+    FROM movimientos_stock
+    WHERE articulo_id = %(articulo_id)s
+      AND {rango}
+    ORDER BY fecha_hora, id
+    LIMIT %(limite)s OFFSET %(offset)s
+"""
+
+
+def _ts_desde(fecha: Optional[date]) -> Optional[datetime]:
+    return datetime.combine(fecha, datetime.min.time()) if fecha else None
+
+
+def _ts_hasta(fecha: Optional[date]) -> Optional[datetime]:
+    return datetime.combine(fecha, datetime.max.time()) if fecha else None
+
+
+def _corte_serie(serie: pd.Series, ts: datetime) -> pd.Timestamp:
+    """`ts` comparable con `serie`: si las fechas traen zona (timestamptz), en esa zona."""
+    corte = pd.Timestamp(ts)
+    tz = serie.dt.tz if pd.api.types.is_datetime64_any_dtype(serie) else None
+    return corte.tz_localize(tz) if tz is not None and corte.tzinfo is None else corte
+
+
+def _valor_py(v):
+    """numpy / pandas -> tipo Python (psycopg2 no adapta numpy.int64)."""
+    if isinstance(v, pd.Timestamp):
+        return v.to_pydatetime()
+    return v.item() if hasattr(v, "item") else v
+
+
+def _estado_kardex(saldo_qty: float = 0.0, saldo_valor: float = 0.0, movimientos: int = 0) -> Dict[str, float]:
+    saldo_qty = float(saldo_qty or 0.0)
+    saldo_valor = float(saldo_valor or 0.0) if saldo_qty > 0 else 0.0
+    return {
+        "saldo_qty": saldo_qty,
+        "saldo_valor": saldo_valor,
+        "costo_promedio": saldo_valor / saldo_qty if saldo_qty > 0 else 0.0,
+        "movimientos": int(movimientos or 0),
+    }
+
+
+def _saldo_kardex(
+    articulo_id: Any,
+    hasta: str,
+    params: Dict[str, Any],
+    limite_checkpoint: str = "TRUE",
+) -> Optional[Dict[str, float]]:
+    """
+    Saldo / valor / costo promedio acumulados de todos los movimientos que
+    cumplen `hasta` (condición SQL sobre fecha_hora / id). Con checkpoints
+    parte del último corte que cumple `limite_checkpoint` (condición sobre
+    corte que no deje afuera movimientos de `hasta`). None si no hay conexión
+    directa a la base.
+    """
+    movs = _SQL_KARDEX_MOVS.format(hasta=hasta)
+    if kardex_checkpoints_disponible():
+        ctes = _SQL_KARDEX_CHECKPOINT.format(limite=limite_checkpoint)
+        ctes += _sql_kardex_ctes(_SQL_KARDEX_CHECKPOINT_FUENTE.format(movs=movs))
+        movs_previos = "COALESCE((SELECT movimientos FROM cp), 0)"
+    else:
+        ctes = _sql_kardex_ctes(movs)
+        movs_previos = "0"
+
+    sql = f"""
+        WITH {ctes}
+        SELECT
+            COALESCE(e.saldo_qty, 0) AS saldo_qty,
+            COALESCE(e.saldo_valor, 0) AS saldo_valor,
+            COALESCE(e.movimientos, 0) + {movs_previos} AS movimientos
+        FROM (SELECT 1) uno
+        LEFT JOIN kestado e ON TRUE
+    """
+    df = ejecutar_consulta(sql, {"articulo_id": articulo_id, **params}, usar_cache=False)
+    if df is None or df.empty:
+        return None
+    r = df.iloc[0]
+    return _estado_kardex(r["saldo_qty"], r["saldo_valor"], r["movimientos"])
+
+
+def _sql_rango(fecha_desde: Optional[date], fecha_hasta: Optional[date]) -> tuple:
+    conds, params = [], {}
+    if fecha_desde:
+        conds.append("fecha_hora >= %(desde)s")
+        params["desde"] = _ts_desde(fecha_desde)
+    if fecha_hasta:
+        conds.append("fecha_hora <= %(hasta)s")
+        params["hasta"] = _ts_hasta(fecha_hasta)
+    return (" AND ".join(conds) or "TRUE"), params
+
+
+def _kardex_resumen(articulo_id: Any, fecha_desde: Optional[date], fecha_hasta: Optional[date]) -> Dict[str, Any]:
+    """
+    Estado al inicio y al final del rango + cantidad de movimientos en el rango.
+    El saldo inicial incluye TODO el historial anterior a fecha_desde.
+
+    Sin conexión directa a Postgres se trae el historial por Supabase hasta
+    fecha_hasta, se calcula completo y se recorta (queda en "df").
+    """
+    if fecha_hasta:
+        final = _saldo_kardex(
+            articulo_id, "fecha_hora <= %(hasta)s", {"hasta": _ts_hasta(fecha_hasta)}, "corte <= %(hasta)s"
+        )
+    else:
+        final = _saldo_kardex(articulo_id, "TRUE", {})
+    if final is not None:
+        inicial = _estado_kardex()
+        if fecha_desde:
+            inicial = _saldo_kardex(
+                articulo_id, "fecha_hora < %(desde)s", {"desde": _ts_desde(fecha_desde)}, "corte <= %(desde)s"
+            ) or inicial
+        return {
+            "inicial": inicial,
+            "final": final,
+            "movimientos": final["movimientos"] - inicial["movimientos"],
+            "df": None,
+        }
+
+    movs = _fetch_movimientos(articulo_id, None, fecha_hasta)
+    df = pd.DataFrame(movs)
+    if df.empty:
+        return {"inicial": _estado_kardex(), "final": _estado_kardex(), "movimientos": 0, "df": df}
+
+    if "fecha_hora" in df.columns:
+        df["fecha_hora_dt"] = _serie_datetime(df["fecha_hora"])
+        df = df.sort_values(by=["fecha_hora_dt", "id"], ascending=[True, True], na_position="last")
+
+    df_k = _calcular_kardex_promedio_movil(df).reset_index(drop=True)
+
+    inicial = _estado_kardex()
+    if fecha_desde and "fecha_hora_dt" in df_k.columns:
+        previos = df_k["fecha_hora_dt"] < _corte_serie(df_k["fecha_hora_dt"], _ts_desde(fecha_desde))
+        if previos.any():
+            ult = df_k[previos].iloc[-1]
+            inicial = _estado_kardex(ult["saldo_qty"], ult["saldo_valor"], int(previos.sum()))
+        df_k = df_k[~previos].reset_index(drop=True)
+
+    ult = df_k.iloc[-1] if not df_k.empty else None
+    final = (
+        _estado_kardex(ult["saldo_qty"], ult["saldo_valor"], inicial["movimientos"] + len(df_k))
+        if ult is not None else inicial
+    )
+    return {"inicial": inicial, "final": final, "movimientos": len(df_k), "df": df_k}
+
+
+def _kardex_pagina(
+    articulo_id: Any,
+    fecha_desde: Optional[date],
+    fecha_hasta: Optional[date],
+    resumen: Dict[str, Any],
+    pagina: int,
+    filas_pagina: int = _KARDEX_FILAS_PAGINA,
+) -> pd.DataFrame:
+    """Página `pagina` (desde 0) del kardex del rango, con saldos arrastrados desde antes."""
+    if resumen.get("df") is not None:
+        return resumen["df"].iloc[pagina * filas_pagina:(pagina + 1) * filas_pagina]
+
+    rango, params = _sql_rango(fecha_desde, fecha_hasta)
+    sql = _SQL_KARDEX_PAGINA.format(cols=", ".join(_COLS_MOVIMIENTOS), rango=rango)
+    df = ejecutar_consulta(
+        sql,
+        {"articulo_id": articulo_id, "limite": filas_pagina, "offset": pagina * filas_pagina, **params},
+        usar_cache=False,
+    )
+    if df.empty:
+        return df
+
+    if pagina == 0:
+        inicial = resumen["inicial"]
+    else:
+        primera = df.iloc[0]
+        inicial = _saldo_kardex(
+            articulo_id,
+            "(fecha_hora, id) < (%(cursor_fecha)s, %(cursor_id)s)",
+            {"cursor_fecha": _valor_py(primera["fecha_hora"]), "cursor_id": _valor_py(primera["id"])},
+            "corte <= %(cursor_fecha)s",
+        ) or resumen["inicial"]
+
+    return _calcular_kardex_promedio_movil(df, inicial=inicial)
+
+
+def iterar_kardex(
+    articulo_id: Any,
+    fecha_desde: Optional[date],
+    fecha_hasta: Optional[date],
+    resumen: Optional[Dict[str, Any]] = None,
+    filas_pagina: int = _KARDEX_FILAS_PAGINA,
+):
+    """Kardex completo del rango de a una página, arrastrando el saldo (export)."""
+    resumen = resumen or _kardex_resumen(articulo_id, fecha_desde, fecha_hasta)
+    if resumen.get("df") is not None:
+        yield resumen["df"]
+        return
+
+    rango, params = _sql_rango(fecha_desde, fecha_hasta)
+    estado = resumen["inicial"]
+    cursor = None
+    while True:
+        rango_pag = rango
+        params_pag = {"articulo_id": articulo_id, "limite": filas_pagina, "offset": 0, **params}
+        if cursor is not None:
+            rango_pag += " AND (fecha_hora, id) > (%(cursor_fecha)s, %(cursor_id)s)"
+            params_pag.update(cursor_fecha=cursor[0], cursor_id=cursor[1])
+
+        df = ejecutar_consulta(
+            _SQL_KARDEX_PAGINA.format(cols=", ".join(_COLS_MOVIMIENTOS), rango=rango_pag),
+            params_pag,
+            usar_cache=False,
+        )
+        if df.empty:
+            return
+
+        df_k = _calcular_kardex_promedio_movil(df, inicial=estado)
+        yield df_k
+
+        ult = df_k.iloc[-1]
+        estado = _estado_kardex(ult["saldo_qty"], ult["saldo_valor"])
+        cursor = (_valor_py(ult["fecha_hora"]), _valor_py(ult["id"]))
+        if len(df) < filas_pagina:
+            return
+
+
+def _kardex_vista(df_k: pd.DataFrame, mostrar_avanzado: bool = False) -> pd.DataFrame:
+    """Columnas renombradas / elegidas para mostrar o exportar el kardex."""
+    rename_map = {
+        "fecha_hora": "Fecha",
+        "tipo_mov": "Tipo",
+        "lote": "Lote",
+        "vencimiento": "Vencimiento",
+        "qty_in": "Entrada",
+        "qty_out": "Salida",
+        "qty_base": "Cantidad (base)",
+        "precio_unit_aplicado": "Precio entrada",
+        "costo_unit_aplicado": "Costo baja",
+        "valor_mov": "Valor mov.",
+        "saldo_qty": "Saldo qty",
+        "saldo_valor": "Saldo $",
+        "ref_tipo": "Ref tipo",
+        "ref_nro": "Ref nro",
+        "proveedor": "Proveedor",
+        "usuario": "Usuario",
+        "observacion": "Obs",
+        "deposito_id": "Depósito",
+        "deposito_origen_id": "Origen",
+        "deposito_destino_id": "Destino",
+    }
+    df_view = df_k.rename(columns={k: v for k, v in rename_map.items() if k in df_k.columns})
+
+    cols_simple = [
+        "Fecha", "Tipo", "Lote", "Vencimiento",
+        "Entrada", "Salida", "Saldo qty",
+        "Costo baja", "Precio entrada", "Valor mov.", "Saldo $",
+        "Ref tipo", "Ref nro", "Proveedor", "Usuario", "Obs"
+    ]
+    cols_simple = [c for c in cols_simple if c in df_view.columns]
+
+    cols_adv = cols_simple.copy()
+    for extra in ["Depósito", "Origen", "Destino", "Cantidad (base)"]:
+        if extra in df_view.columns and extra not in cols_adv:
+            cols_adv.insert(4, extra)
+
+    # Las filas ya vienen ordenadas por fecha_hora, id
+    return df_view[cols_adv if mostrar_avanzado else cols_simple]
+
+
 # =====================================================================
 # UI principal (MEJORADA)
 # =====================================================================
@@ -290,100 +656,87 @@ def mostrar_ficha_stock():
     )
 
     # -------------------------
-    # Datos: movimientos
+    # Datos: kardex (saldo inicial + página)
     # -------------------------
-    movs = _fetch_movimientos(articulo_id, fecha_desde, fecha_hasta)
+    resumen = _kardex_resumen(articulo_id, fecha_desde, fecha_hasta)
 
-    if not movs:
+    if resumen["movimientos"] == 0:
         st.warning("No hay movimientos para este artículo en el rango seleccionado.")
         return
 
-    df = pd.DataFrame(movs)
-
-    if "fecha_hora" in df.columns:
-        df["fecha_hora_dt"] = df["fecha_hora"].apply(_to_datetime_safe)
-        df = df.sort_values(by=["fecha_hora_dt", "id"], ascending=[True, True], na_position="last")
-
-    df_k = _calcular_kardex_promedio_movil(df)
+    inicial = resumen["inicial"]
+    final = resumen["final"]
 
     # -------------------------
     # Resumen
     # -------------------------
-    stock_final = float(df_k["saldo_qty"].iloc[-1]) if not df_k.empty else 0.0
-    valor_final = float(df_k["saldo_valor"].iloc[-1]) if not df_k.empty else 0.0
-    costo_final = float(df_k["costo_promedio"].iloc[-1]) if not df_k.empty else 0.0
-
     with st.container(border=True):
         a, b, c, d = st.columns([1, 1, 1, 1])
-        a.metric("Stock actual", f"{_fmt_num(stock_final, 2)}")
-        b.metric("Valor stock", f"$ {_fmt_num(valor_final, 2)}")
-        c.metric("Costo promedio", f"$ {_fmt_num(costo_final, 4)}")
-        d.metric("Movimientos", f"{len(df_k)}")
+        a.metric("Stock actual", f"{_fmt_num(final['saldo_qty'], 2)}")
+        b.metric("Valor stock", f"$ {_fmt_num(final['saldo_valor'], 2)}")
+        c.metric("Costo promedio", f"$ {_fmt_num(final['costo_promedio'], 4)}")
+        d.metric("Movimientos", f"{resumen['movimientos']}")
+
+        if fecha_desde and inicial["movimientos"]:
+            st.caption(
+                f"Saldo inicial al {fecha_desde.strftime('%d/%m/%Y')}: "
+                f"**{_fmt_num(inicial['saldo_qty'], 2)}** • "
+                f"$ {_fmt_num(inicial['saldo_valor'], 2)} • "
+                f"costo $ {_fmt_num(inicial['costo_promedio'], 4)}"
+            )
 
     # -------------------------
-    # Tabla “humana”
+    # Stock por depósito y lote (al "Hasta", o a hoy)
     # -------------------------
-    df_view = df_k.copy()
-
-    rename_map = {
-        "fecha_hora": "Fecha",
-        "tipo_mov": "Tipo",
-        "lote": "Lote",
-        "vencimiento": "Vencimiento",
-        "qty_in": "Entrada",
-        "qty_out": "Salida",
-        "qty_base": "Cantidad (base)",
-        "precio_unit_aplicado": "Precio entrada",
-        "costo_unit_aplicado": "Costo baja",
-        "valor_mov": "Valor mov.",
-        "saldo_qty": "Saldo qty",
-        "saldo_valor": "Saldo $",
-        "ref_tipo": "Ref tipo",
-        "ref_nro": "Ref nro",
-        "proveedor": "Proveedor",
-        "usuario": "Usuario",
-        "observacion": "Obs",
-        "deposito_id": "Depósito",
-        "deposito_origen_id": "Origen",
-        "deposito_destino_id": "Destino",
-    }
-    df_view = df_view.rename(columns={k: v for k, v in rename_map.items() if k in df_view.columns})
-
-    cols_simple = [
-        "Fecha", "Tipo", "Lote", "Vencimiento",
-        "Entrada", "Salida", "Saldo qty",
-        "Costo baja", "Precio entrada", "Valor mov.", "Saldo $",
-        "Ref tipo", "Ref nro", "Proveedor", "Usuario", "Obs"
-    ]
-    cols_simple = [c for c in cols_simple if c in df_view.columns]
-
-    cols_adv = cols_simple.copy()
-    for extra in ["Depósito", "Origen", "Destino", "Cantidad (base)"]:
-        if extra in df_view.columns and extra not in cols_adv:
-            cols_adv.insert(4, extra)
+    with st.expander("📦 Stock por depósito y lote", expanded=False):
+        al = fecha_hasta or date.today()
+        df_dep = get_stock_a_fecha(al, articulo_id)
+        if df_dep.empty:
+            st.caption(f"Sin stock al {al.strftime('%d/%m/%Y')}.")
+        else:
+            st.caption(f"Al {al.strftime('%d/%m/%Y')}")
+            st.dataframe(
+                pd.DataFrame({
+                    "Depósito": df_dep["deposito_id"],
+                    "Lote": df_dep["lote"],
+                    "Stock": df_dep["stock"].map(lambda x: _fmt_num(x, 2)),
+                }),
+                use_container_width=True,
+                hide_index=True
+            )
 
-    cols_show = cols_adv if mostrar_avanzado else cols_simple
+    paginas = max(1, -(-resumen["movimientos"] // _KARDEX_FILAS_PAGINA))
+    pagina = 1
+    if paginas > 1:
+        pagina = int(st.number_input(
+            f"Página (de {paginas}, {_KARDEX_FILAS_PAGINA} movimientos c/u)",
+            min_value=1, max_value=paginas, value=1, step=1,
+        ))
 
-    # Orden por fecha usando dt (si existe)
-    if "fecha_hora_dt" in df_k.columns:
-        df_view["_orden"] = df_k["fecha_hora_dt"]
-        df_view = df_view.sort_values(by=["_orden"], ascending=True, na_position="last").drop(columns=["_orden"])
+    df_k = _kardex_pagina(articulo_id, fecha_desde, fecha_hasta, resumen, pagina - 1)
 
+    # -------------------------
+    # Tabla “humana”
+    # -------------------------
     st.dataframe(
-        df_view[cols_show],
+        _kardex_vista(df_k, mostrar_avanzado),
         use_container_width=True,
         hide_index=True
     )
 
     # -------------------------
-    # Descarga
+    # Descarga (rango completo, de a una página)
     # -------------------------
     with st.expander("⬇️ Descargar", expanded=False):
-        csv = df_view[cols_show].to_csv(index=False).encode("utf-8")
-        st.download_button(
-            "Descargar ficha (CSV)",
-            data=csv,
-            file_name=f"ficha_stock_articulo_{articulo_id}.csv",
-            mime="text/csv",
-            use_container_width=True
-        )
+        if paginas == 1 or st.button("Preparar CSV del rango completo", use_container_width=True):
+            csv = df_to_csv_bytes(
+                _kardex_vista(chunk, mostrar_avanzado)
+                for chunk in iterar_kardex(articulo_id, fecha_desde, fecha_hasta, resumen)
+            )
+            st.download_button(
+                "Descargar ficha (CSV)",
+                data=csv,
+                file_name=f"ficha_stock_articulo_{articulo_id}.csv",
+                mime="text/csv",
+                use_container_width=True
+            )
@@ -7,7 +7,8 @@ import re
 import unicodedata
 from typing import Dict, List, Tuple, Optional
 
-import streamlit as st
+from resolver_entidades import get_indices_entidades, get_listas_entidades, match_tokens
+from rasgos_pregunta import extraer_rasgos, unicos
 
 MESES = {
     "enero": "01",
@@ -116,75 +117,15 @@ def _tiene_alguna_palabra(texto_lower: str, palabras: List[str]) -> bool:
 # =====================================================================
 # CARGA LISTAS DESDE SUPABASE (cache)
 # =====================================================================
-@st.cache_data(ttl=60 * 60)
 def _cargar_listas_supabase() -> Dict[str, List[str]]:
-    proveedores = []
-    articulos = []
-
-    try:
-        from supabase_client import supabase
-        if supabase is None:
-            return {"proveedores": [], "articulos": []}
-
-        for col in ["nombre", "Nombre", "NOMBRE"]:
-            try:
-                res = supabase.table("proveedores").select(col).execute()
-                data = res.data or []
-                proveedores = [str(r.get(col)).strip() for r in data if r.get(col)]
-                if proveedores:
-                    break
-            except Exception:
-                continue
-
-        for col in ["Descripción", "DESCRIPCIÓN", "descripcion", "Descripcion"]:
-            try:
-                res = supabase.table("articulos").select(col).execute()
-                data = res.data or []
-                articulos = [str(r.get(col)).strip() for r in data if r.get(col)]
-                if articulos:
-                    break
-            except Exception:
-                continue
-
-    except Exception:
-        return {"proveedores": [], "articulos": []}
-
-    proveedores = sorted(list(set([p for p in proveedores if p])))
-    articulos = sorted(list(set([a for a in articulos if a])))
-    return {"proveedores": proveedores, "articulos": articulos}
+    return get_listas_entidades()
 
 def _get_indices() -> Tuple[List[Tuple[str, str]], List[Tuple[str, str]]]:
-    listas = _cargar_listas_supabase()
-    prov = [(p, _key(p)) for p in (listas.get("proveedores") or []) if p]
-    art = [(a, _key(a)) for a in (listas.get("articulos") or []) if a]
-    return prov, art
+    return get_indices_entidades()
 
 def _match_best(texto: str, index: List[Tuple[str, str]], max_items: int = 1) -> List[str]:
-    toks = _tokens(texto)
-    if not toks or not index:
-        return []
-
-    # 1) substring + score (robusto)
-    candidatos = []
-    for orig, norm in index:
-        for tk in toks:
-            if tk and tk in norm:
-                score = (len(tk) * 1000) - len(norm)
-                candidatos.append((score, orig))
-
-    if not candidatos:
-        return []
-
-    candidatos.sort(key=lambda x: (-x[0], x[1]))
-    out = []
-    seen = set()
-    for _, orig in candidatos:
-        if orig not in seen:
-            seen.add(orig)
-            out.append(orig)
-        if len(out) >= max_items:
-            break
-    return out
+    return match_tokens(index, _tokens(texto), max_items=max_items, exacto=False)
+
 
 # =====================================================================
 # RESOLVER ALIASES DE PROVEEDOR
@@ -250,40 +191,16 @@ def _resolver_proveedor_alias_por_hit(hit: str, idx_prov: List[Tuple[str, str]])
 # PARSEO TIEMPO
 # =====================================================================
 def _extraer_anios(texto: str) -> List[int]:
-    anios = re.findall(r"(2023|2024|2025|2026)", texto or "")
-    out = []
-    seen = set()
-    for a in anios:
-        try:
-            val = int(a)
-            if val not in seen:
-                seen.add(val)
-                out.append(val)
-        except Exception:
-            pass
-    return out[:MAX_ANIOS]
+    """Años 2023-2026 en orden de aparición, sin repetidos (hasta MAX_ANIOS)."""
+    return unicos(extraer_rasgos(texto).anios_libres, MAX_ANIOS)
 
 def _extraer_meses_nombre(texto: str) -> List[str]:
-    tl = (texto or "").lower()
-    ms = [m for m in MESES.keys() if m in tl]
-    seen = set()
-    out = []
-    for m in ms:
-        if m not in seen:
-            seen.add(m)
-            out.append(m)
-    return out[:MAX_MESES]
+    """Nombres de mes mencionados, en el orden de MESES (hasta MAX_MESES)."""
+    return unicos([m for m in extraer_rasgos(texto).meses_nombre if m in MESES], MAX_MESES)
 
 def _extraer_meses_yyyymm(texto: str) -> List[str]:
-    ms = re.findall(r"(2023|2024|2025|2026)[-/](0[1-9]|1[0-2])", texto or "")
-    out = [f"{a}-{m}" for a, m in ms]
-    seen = set()
-    out2 = []
-    for x in out:
-        if x not in seen:
-            seen.add(x)
-            out2.append(x)
-    return out2[:MAX_MESES]
+    """Meses YYYY-MM (o YYYY/MM) en orden de aparición, sin repetidos (hasta MAX_MESES)."""
+    return unicos(extraer_rasgos(texto).yyyymm_libres, MAX_MESES)
 
 def _to_yyyymm(anio: int, mes_nombre: str) -> str:
     return f"{anio}-{MESES.get(mes_nombre, '01')}"
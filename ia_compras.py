@@ -276,10 +276,11 @@ if m:
 import os
 import re
 import unicodedata
-from typing import Dict, List, Tuple, Optional
+from typing import Callable, Dict, List, Tuple, Optional
 from datetime import datetime
 
-import streamlit as st
+from resolver_entidades import get_indices_entidades, get_listas_entidades, match_tokens
+from rasgos_pregunta import extraer_rasgos, unicos
 
 # =========================================================================================
 # CONFIGURACIÓN
@@ -367,63 +368,19 @@ def _tokens(texto: str) -> List[str]:
 # CARGA LISTAS DESDE SUPABASE (cache)
 # =========================================================================================
 
-@st.cache_data(ttl=60 * 60)
 def _cargar_listas_supabase() -> Dict[str, List[str]]:
     """
-    Carga listas de proveedores y artículos desde Supabase.
+    Listas de proveedores y artículos (catálogo compartido, ver resolver_entidades).
     
     Retorna:
         {"proveedores": [...], "articulos": [...]}
-    
-    Tablas consultadas:
-        - proveedores: columna "nombre"
-        - articulos: columna "Descripción"
     """
-    proveedores: List[str] = []
-    articulos: List[str] = []
-
-    try:
-        from supabase_client import supabase  # type: ignore
-        if supabase is None:
-            return {"proveedores": [], "articulos": []}
-
-        # ======= PROVEEDORES =======
-        # Intentar diferentes variantes de nombre de columna
-        for col in ["nombre", "Nombre", "NOMBRE"]:
-            try:
-                res = supabase.table("proveedores").select(col).execute()
-                data = res.data or []
-                proveedores = [str(r.get(col)).strip() for r in data if r.get(col)]
-                if proveedores:
-                    break
-            except Exception:
-                continue
-
-        # ======= ARTÍCULOS =======
-        # Intentar diferentes variantes de nombre de columna
-        for col in ["Descripción", "Descripcion", "descripcion", "DESCRIPCION", "DESCRIPCIÓN"]:
-            try:
-                res = supabase.table("articulos").select(col).execute()
-                data = res.data or []
-                articulos = [str(r.get(col)).strip() for r in data if r.get(col)]
-                if articulos:
-                    break
-            except Exception:
-                continue
-
-    except Exception:
-        return {"proveedores": [], "articulos": []}
-
-    # Limpiar duplicados y ordenar
-    proveedores = sorted(list(set([p for p in proveedores if p])))
-    articulos = sorted(list(set([a for a in articulos if a])))
-
-    return {"proveedores": proveedores, "articulos": articulos}
+    return get_listas_entidades()
 
 
 def _get_indices() -> Tuple[List[Tuple[str, str]], List[Tuple[str, str]]]:
     """
-    Obtiene índices de proveedores y artículos.
+    Obtiene índices de proveedores y artículos (construidos una vez por proceso).
     
     Retorna:
         ([(nombre_original, nombre_normalizado), ...],
@@ -433,24 +390,28 @@ def _get_indices() -> Tuple[List[Tuple[str, str]], List[Tuple[str, str]]]:
         ([("ROCHE URUGUAY S.A.", "rocheuruguaysa"), ...],
          [("OBIS - PYR X 60 DET", "obispyrx60det"), ...])
     """
-    listas = _cargar_listas_supabase()
-    prov = [(p, _key(p)) for p in listas.get("proveedores", []) if p]
-    art = [(a, _key(a)) for a in listas.get("articulos", []) if a]
-    return prov, art
+    return get_indices_entidades()
+
 
 
-def _match_best(texto: str, index: List[Tuple[str, str]], max_items: int = 1) -> List[str]:
+def _match_best(
+    texto: str,
+    index: List[Tuple[str, str]],
+    max_items: int = 1,
+    excluir: Optional[Callable[[str], bool]] = None,
+) -> List[str]:
     """
     Encuentra los mejores matches de un texto contra un índice.
     
-    Prioridad:
+    Prioridad (ver resolver_entidades):
         1. Match exacto (token normalizado == nombre normalizado)
         2. Substring (token está contenido en nombre, ordenado por score)
     
     Args:
         texto: Texto de consulta del usuario
-        index: Lista de (nombre_original, nombre_normalizado)
+        index: Índice de entidades (o lista de (nombre_original, nombre_normalizado))
         max_items: Máximo número de resultados
+        excluir: Función que descarta nombres originales
     
     Retorna:
         Lista de nombres originales que hacen match
@@ -459,44 +420,7 @@ def _match_best(texto: str, index: List[Tuple[str, str]], max_items: int = 1) ->
         _match_best("roche", index_proveedores, 1) → ["ROCHE URUGUAY S.A."]
     """
     toks = _tokens(texto)
-    if not toks or not index:
-        return []
-
-    # ======= PRIORIDAD 1: MATCH EXACTO =======
-    toks_set = set(toks)
-    exact_matches: List[str] = []
-    for orig, norm in index:
-        if norm in toks_set:
-            exact_matches.append(orig)
-    if exact_matches:
-        return exact_matches[:max_items]
-
-    # ======= PRIORIDAD 2: SUBSTRING + SCORE =======
-    candidatos: List[Tuple[int, str]] = []
-    for orig, norm in index:
-        for tk in toks:
-            if tk and tk in norm:
-                # Score: prioriza matches largos en nombres cortos
-                score = (len(tk) * 1000) - len(norm)
-                candidatos.append((score, orig))
-
-    if not candidatos:
-        return []
-
-    # Ordenar por score descendente, luego alfabéticamente
-    candidatos.sort(key=lambda x: (-x[0], x[1]))
-    
-    # Retornar top N sin duplicados
-    out: List[str] = []
-    seen = set()
-    for _, orig in candidatos:
-        if orig not in seen:
-            seen.add(orig)
-            out.append(orig)
-        if len(out) >= max_items:
-            break
-
-    return out
+    return match_tokens(index, toks, max_items=max_items, excluir=excluir)
 
 
 # =========================================================================================
@@ -505,29 +429,13 @@ def _match_best(texto: str, index: List[Tuple[str, str]], max_items: int = 1) ->
 
 def _extraer_anios(texto: str) -> List[int]:
     """
-    Extrae años válidos del texto (2023-2026).
+    Extrae años válidos del texto (2023-2026), en orden y sin repetidos.
     
     Ejemplo:
         _extraer_anios("compras roche 2025") → [2025]
         _extraer_anios("2024 vs 2025") → [2024, 2025]
     """
-    anios = re.findall(r"(2023|2024|2025|2026)", texto or "")
-    out: List[int] = []
-    for a in anios:
-        try:
-            out.append(int(a))
-        except Exception:
-            pass
-    
-    # Remover duplicados preservando orden
-    seen = set()
-    out2: List[int] = []
-    for x in out:
-        if x not in seen:
-            seen.add(x)
-            out2.append(x)
-    
-    return out2[:MAX_ANIOS]
+    return unicos(extraer_rasgos(texto).anios_libres, MAX_ANIOS)
 
 
 def _extraer_meses_nombre(texto: str) -> List[str]:
@@ -538,18 +446,7 @@ def _extraer_meses_nombre(texto: str) -> List[str]:
         _extraer_meses_nombre("compras noviembre") → ["noviembre"]
         _extraer_meses_nombre("enero y febrero") → ["enero", "febrero"]
     """
-    tl = (texto or "").lower()
-    ms = [m for m in MESES.keys() if m in tl]
-    
-    # Remover duplicados preservando orden
-    seen = set()
-    out: List[str] = []
-    for m in ms:
-        if m not in seen:
-            seen.add(m)
-            out.append(m)
-    
-    return out[:MAX_MESES]
+    return unicos([m for m in extraer_rasgos(texto).meses_nombre if m in MESES], MAX_MESES)
 
 
 def _extraer_meses_yyyymm(texto: str) -> List[str]:
@@ -560,18 +457,7 @@ def _extraer_meses_yyyymm(texto: str) -> List[str]:
         _extraer_meses_yyyymm("2025-11") → ["2025-11"]
         _extraer_meses_yyyymm("2024/03") → ["2024-03"]
     """
-    ms = re.findall(r"(2023|2024|2025|2026)[-/](0[1-9]|1[0-2])", texto or "")
-    out = [f"{a}-{m}" for a, m in ms]
-    
-    # Remover duplicados preservando orden
-    seen = set()
-    out2: List[str] = []
-    for x in out:
-        if x not in seen:
-            seen.add(x)
-            out2.append(x)
-    
-    return out2[:MAX_MESES]
+    return unicos(extraer_rasgos(texto).yyyymm_libres, MAX_MESES)
 
 
 def _to_yyyymm(anio: int, mes_nombre: str) -> str:
@@ -706,10 +592,8 @@ def interpretar_compras(pregunta: str, anios: List[int] = None) -> Dict:
         "2183118 - IVA COMPRAS DEL ESTADO (DTOS 528/03 Y 319/06)",
         "IVA COMPRAS DEL ESTADO",
     ]
-    idx_art_filtrado = [
-        (orig, norm) for orig, norm in idx_art 
-        if not any(excl.lower() in orig.lower() for excl in ARTICULOS_EXCLUIDOS)
-    ]
+    def _articulo_excluido(orig: str) -> bool:
+        return any(excl.lower() in orig.lower() for excl in ARTICULOS_EXCLUIDOS)
     
     # ✅ Usar años pasados como parámetro si existen, sino extraer
     if anios is None:
@@ -719,7 +603,7 @@ def interpretar_compras(pregunta: str, anios: List[int] = None) -> Dict:
     if len(anios) >= 1 and "compra" in texto_lower:
         arts = []  # Por defecto vacío para compras
     else:
-        arts = _match_best(texto_lower, idx_art_filtrado, max_items=MAX_ARTICULOS)
+        arts = _match_best(texto_lower, idx_art, max_items=MAX_ARTICULOS, excluir=_articulo_excluido)
     
     # ======= EXTRAER TIEMPO =======
     meses_nombre = _extraer_meses_nombre(texto_lower)
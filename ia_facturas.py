@@ -6,6 +6,8 @@ import re
 from typing import Dict, List, Optional
 from datetime import datetime
 
+from rasgos_pregunta import ANIOS_VALIDOS, extraer_rasgos
+
 
 
 # ==================================================
@@ -22,12 +24,12 @@ MESES = {
 
 def _extraer_anios(texto: str) -> List[int]:
     """Extrae años del texto (2023-2026)"""
-    return sorted(list(set([int(a) for a in re.findall(r"\b(2023|2024|2025|2026)\b", texto)])))
+    return sorted({a for a in extraer_rasgos(texto).anios_palabra if a in ANIOS_VALIDOS})
 
 
 def _extraer_meses_nombre(texto: str) -> List[str]:
     """Extrae nombres de meses del texto"""
-    return [m for m in MESES.keys() if m in texto.lower()]
+    return [m for m in extraer_rasgos(texto).meses_nombre if m in MESES]
 
 
 def _extraer_proveedor(texto: str) -> Optional[str]:
@@ -8,6 +8,9 @@ import streamlit as st
 from openai import OpenAI
 from config import OPENAI_MODEL
 from sql_core import ejecutar_consulta
+from resolver_entidades import get_indices_entidades, get_listas_entidades, get_version_entidades, match_tokens
+from cache_interpretaciones import cachear_interpretacion
+from rasgos_pregunta import extraer_rasgos, limite_de, rango_fechas_de, unicos
 import re
 
 
@@ -598,180 +601,55 @@ def contiene_gastos_o_documentos(texto: str) -> bool:
 def contiene_factura(texto: str) -> bool:
     if not texto:
         return False
-    t = texto.lower()
-    return bool(
-        re.search(
-            r"\b(detalle\s+)?factura(s)?\b"
-            r"|\bnro\.?\s*(comprobante|factura)\b"
-            r"|\bnro\.?\s*comprobante\b"
-            r"|\bcomprobante(s)?\b",
-            t,
-            flags=re.IGNORECASE
-        )
-    )
+    return extraer_rasgos(texto).menciona_factura
 
 def _normalizar_nro_factura(nro: str) -> str:
     return (nro or "").strip().upper()
 
 def _extraer_nro_factura(texto: str) -> Optional[str]:
+    """
+    Número de factura: "detalle factura 60907", "factura A0001234" o el texto
+    que es sólo el número. Un año (2023-2026) no es nro de factura.
+    """
     if not texto:
         return None
-
-    t = str(texto).strip()
-
-    m = re.search(
-        r"\b(detalle\s+)?(factura|comprobante|nro\.?\s*comprobante|nro\.?\s*factura)\b\s*[:#-]?\s*([A-Za-z]?\d{3,})\b",
-        t,
-        flags=re.IGNORECASE
-    )
-    if m:
-        raw = str(m.group(3)).strip()
-
-        if raw.isdigit():
-            try:
-                n = int(raw)
-                if n in ANIOS_VALIDOS:
-                    return None
-            except Exception:
-                pass
-
-        nro = _normalizar_nro_factura(raw)
-        return nro or None
-
-    if re.fullmatch(r"[A-Za-z]?\d{3,}", t):
-        if t.isdigit():
-            try:
-                n = int(t)
-                if n in ANIOS_VALIDOS:
-                    return None
-            except Exception:
-                pass
-
-        nro = _normalizar_nro_factura(t)
-        return nro or None
-
-    return None
+    return extraer_rasgos(str(texto)).nro_factura
 
 # =====================================================================
 # Extraer limite
 # =====================================================================
 def _extraer_limite(texto: str, predeterminado: int = 500) -> int:
-    import re
-    numeros = re.findall(r"\b\d+\b", texto)
-    for numero in numeros:
-        n = int(numero)
-        if n > 0:
-            return n
-    return predeterminado
+    return limite_de(extraer_rasgos(texto), predeterminado)
 
 # =====================================================================
 # Extraer Monedas
 # =====================================================================
 def _extraer_moneda(texto: str) -> Optional[str]:
-    texto = texto.lower()
-    patrones_moneda = {
-        "USD": ["usd", "u$s", "u$$", "dólares", "dolares", "dollar", "dólar", "dolar"],
-        "UYU": ["pesos", "uyu", "$", "moneda nacional"],
-    }
-    for moneda, palabras_clave in patrones_moneda.items():
-        for palabra in palabras_clave:
-            if palabra in texto:
-                return moneda
-    return None
+    return extraer_rasgos(texto).moneda
 
 # =====================================================================
 # Extraer rango fechas
 # =====================================================================
 def _extraer_rango_fechas(texto: str) -> Tuple[Optional[str], Optional[str]]:
-    patron_fecha = r"\b(\d{4}-\d{2}-\d{2})\b"
-    fechas = re.findall(patron_fecha, texto)
-    if len(fechas) >= 2:
-        return fechas[0], fechas[1]
-    elif len(fechas) == 1:
-        return fechas[0], None
-    return None, None
+    return rango_fechas_de(extraer_rasgos(texto))
 
 # =====================================================================
 # CARGA LISTAS DESDE SUPABASE
 # =====================================================================
-@st.cache_data(ttl=60 * 60)
 def _cargar_listas_supabase() -> Dict[str, List[str]]:
-    proveedores: List[str] = []
-    articulos: List[str] = []
-
-    try:
-        from supabase_client import supabase
-        if supabase is None:
-            return {"proveedores": [], "articulos": []}
-
-        for col in ["nombre", "Nombre", "NOMBRE"]:
-            try:
-                res = supabase.table("proveedores").select(col).execute()
-                data = res.data or []
-                proveedores = [str(r.get(col)).strip() for r in data if r.get(col)]
-                if proveedores:
-                    break
-            except Exception:
-                continue
-
-        for col in ["Descripción", "Descripcion", "descripcion", "DESCRIPCION", "DESCRIPCIÓN"]:
-            try:
-                res = supabase.table("articulos").select(col).execute()
-                data = res.data or []
-                articulos = [str(r.get(col)).strip() for r in data if r.get(col)]
-                if articulos:
-                    break
-            except Exception:
-                continue
-
-    except Exception:
-        return {"proveedores": [], "articulos": []}
-
-    proveedores = sorted(list(set([p for p in proveedores if p])))
-    articulos = sorted(list(set([a for a in articulos if a])))
-
-    return {"proveedores": proveedores, "articulos": articulos}
+    """Catálogo compartido (ver resolver_entidades)."""
+    return get_listas_entidades()
 
 def _get_indices() -> Tuple[List[Tuple[str, str]], List[Tuple[str, str]]]:
-    listas = _cargar_listas_supabase()
-    prov = [(p, _key(p)) for p in (listas.get("proveedores") or []) if p]
-    art = [(a, _key(a)) for a in (listas.get("articulos") or []) if a]
-    return prov, art
+    """(proveedores, artículos) indexados una vez por proceso (ver resolver_entidades)."""
+    return get_indices_entidades()
 
 def _match_best(texto: str, index: List[Tuple[str, str]], max_items: int = 1) -> List[str]:
     toks = _tokens(texto)
     # Filter out common words that shouldn't match articles/providers
     ignore_words = {"compras", "compra", "factura", "facturas", "total", "totales", "comparar", "compara", "2023", "2024", "2025", "2026", "usd", "u$s", "pesos", "uyu"}
     toks = [t for t in toks if t not in ignore_words]
-    if not toks or not index:
-        return []
-
-    toks_set = set(toks)
-    exact_matches = [orig for orig, norm in index if norm in toks_set]
-    if exact_matches:
-        return exact_matches[:max_items]
-
-    candidatos: List[Tuple[int, str]] = []
-    for orig, norm in index:
-        for tk in toks:
-            if tk and tk in norm:
-                score = (len(tk) * 1000) - len(norm)
-                candidatos.append((score, orig))
-
-    if not candidatos:
-        return []
-
-    candidatos.sort(key=lambda x: (-x[0], x[1]))
-    out: List[str] = []
-    seen = set()
-    for _, orig in candidatos:
-        if orig not in seen:
-            seen.add(orig)
-            out.append(orig)
-        if len(out) >= max_items:
-            break
-
-    return out
+    return match_tokens(index, toks, max_items=max_items)
 
 # =====================================================================
 # PARSEO DE PARÁMETROS: Mes a Meses
@@ -786,42 +664,16 @@ def normalizar_parametros(params: dict) -> dict:
 # PARSEO DE RANGO DE FECHAS + MONEDA + LÍMITE
 # =====================================================================
 def _extraer_anios(texto: str) -> List[int]:
-    anios = re.findall(r"(2023|2024|2025|2026)", texto)
-    out: List[int] = []
-    for a in anios:
-        try:
-            out.append(int(a))
-        except Exception:
-            pass
-
-    seen = set()
-    out2: List[int] = []
-    for x in out:
-        if x not in seen:
-            seen.add(x)
-            out2.append(x)
-    return out2[:MAX_ANIOS]
+    """Años 2023-2026 en orden de aparición, sin repetidos (hasta MAX_ANIOS)."""
+    return unicos(extraer_rasgos(texto).anios_libres, MAX_ANIOS)
 
 def _extraer_meses_nombre(texto: str) -> List[str]:
-    ms = [m for m in MESES.keys() if m in texto.lower()]
-    seen = set()
-    out: List[str] = []
-    for m in ms:
-        if m not in seen:
-            seen.add(m)
-            out.append(m)
-    return out[:MAX_MESES]
+    """Nombres de mes mencionados, en el orden de MESES (hasta MAX_MESES)."""
+    return unicos([m for m in extraer_rasgos(texto).meses_nombre if m in MESES], MAX_MESES)
 
 def _extraer_meses_yyyymm(texto: str) -> List[str]:
-    ms = re.findall(r"(2023|2024|2025|2026)[-/](0[1-9]|1[0-2])", texto)
-    out = [f"{a}-{m}" for a, m in ms]
-    seen = set()
-    out2: List[str] = []
-    for x in out:
-        if x not in seen:
-            seen.add(x)
-            out2.append(x)
-    return out2[:MAX_MESES]
+    """Meses YYYY-MM (o YYYY/MM) en orden de aparición, sin repetidos (hasta MAX_MESES)."""
+    return unicos(extraer_rasgos(texto).yyyymm_libres, MAX_MESES)
 
 def _to_yyyymm(anio: int, mes_nombre: str) -> str:
     return f"{anio}-{MESES[mes_nombre]}"
@@ -995,6 +847,7 @@ def es_tipo_valido(tipo: str) -> bool:
 # INTERPRETADOR PRINCIPAL (AGENTIC AI = DECIDE, NO EJECUTA)
 # =====================================================================
 
+@cachear_interpretacion("ia_interpretador", version=get_version_entidades)
 def interpretar_pregunta(pregunta: str) -> Dict[str, Any]:
     """
     Interpretador canónico (Agentic AI):
@@ -1788,6 +1641,8 @@ import streamlit as st
 from openai import OpenAI
 from config import OPENAI_MODEL
 from sql_core import ejecutar_consulta
+from cache_interpretaciones import cachear_interpretacion
+from rasgos_pregunta import extraer_rasgos, limite_de, rango_fechas_de, unicos
 
 # =========================
 # IA_INTERPRETADOR.PY - CANÓNICO (DETECCIÓN BD + COMPARATIVAS)
@@ -2061,180 +1916,55 @@ def contiene_gastos_o_documentos(texto: str) -> bool:
 def contiene_factura(texto: str) -> bool:
     if not texto:
         return False
-    t = texto.lower()
-    return bool(
-        re.search(
-            r"\b(detalle\s+)?factura(s)?\b"
-            r"|\bnro\.?\s*(comprobante|factura)\b"
-            r"|\bnro\.?\s*comprobante\b"
-            r"|\bcomprobante(s)?\b",
-            t,
-            flags=re.IGNORECASE
-        )
-    )
+    return extraer_rasgos(texto).menciona_factura
 
 def _normalizar_nro_factura(nro: str) -> str:
     return (nro or "").strip().upper()
 
 def _extraer_nro_factura(texto: str) -> Optional[str]:
+    """
+    Número de factura: "detalle factura 60907", "factura A0001234" o el texto
+    que es sólo el número. Un año (2023-2026) no es nro de factura.
+    """
     if not texto:
         return None
-
-    t = str(texto).strip()
-
-    m = re.search(
-        r"\b(detalle\s+)?(factura|comprobante|nro\.?\s*comprobante|nro\.?\s*factura)\b\s*[:#-]?\s*([A-Za-z]?\d{3,})\b",
-        t,
-        flags=re.IGNORECASE
-    )
-    if m:
-        raw = str(m.group(3)).strip()
-
-        if raw.isdigit():
-            try:
-                n = int(raw)
-                if n in ANIOS_VALIDOS:
-                    return None
-            except Exception:
-                pass
-
-        nro = _normalizar_nro_factura(raw)
-        return nro or None
-
-    if re.fullmatch(r"[A-Za-z]?\d{3,}", t):
-        if t.isdigit():
-            try:
-                n = int(t)
-                if n in ANIOS_VALIDOS:
-                    return None
-            except Exception:
-                pass
-
-        nro = _normalizar_nro_factura(t)
-        return nro or None
-
-    return None
+    return extraer_rasgos(str(texto)).nro_factura
 
 # =====================================================================
 # Extraer limite
 # =====================================================================
 def _extraer_limite(texto: str, predeterminado: int = 500) -> int:
-    import re
-    numeros = re.findall(r"\b\d+\b", texto)
-    for numero in numeros:
-        n = int(numero)
-        if n > 0:
-            return n
-    return predeterminado
+    return limite_de(extraer_rasgos(texto), predeterminado)
 
 # =====================================================================
 # Extraer Monedas
 # =====================================================================
 def _extraer_moneda(texto: str) -> Optional[str]:
-    texto = texto.lower()
-    patrones_moneda = {
-        "USD": ["usd", "u$s", "u$$", "dólares", "dolares", "dollar", "dólar", "dolar"],
-        "UYU": ["pesos", "uyu", "$", "moneda nacional"],
-    }
-    for moneda, palabras_clave in patrones_moneda.items():
-        for palabra in palabras_clave:
-            if palabra in texto:
-                return moneda
-    return None
+    return extraer_rasgos(texto).moneda
 
 # =====================================================================
 # Extraer rango fechas
 # =====================================================================
 def _extraer_rango_fechas(texto: str) -> Tuple[Optional[str], Optional[str]]:
-    patron_fecha = r"\b(\d{4}-\d{2}-\d{2})\b"
-    fechas = re.findall(patron_fecha, texto)
-    if len(fechas) >= 2:
-        return fechas[0], fechas[1]
-    elif len(fechas) == 1:
-        return fechas[0], None
-    return None, None
+    return rango_fechas_de(extraer_rasgos(texto))
 
 # =====================================================================
 # CARGA LISTAS DESDE SUPABASE
 # =====================================================================
-@st.cache_data(ttl=60 * 60)
 def _cargar_listas_supabase() -> Dict[str, List[str]]:
-    proveedores: List[str] = []
-    articulos: List[str] = []
-
-    try:
-        from supabase_client import supabase
-        if supabase is None:
-            return {"proveedores": [], "articulos": []}
-
-        for col in ["nombre", "Nombre", "NOMBRE"]:
-            try:
-                res = supabase.table("proveedores").select(col).execute()
-                data = res.data or []
-                proveedores = [str(r.get(col)).strip() for r in data if r.get(col)]
-                if proveedores:
-                    break
-            except Exception:
-                continue
-
-        for col in ["Descripción", "Descripcion", "descripcion", "DESCRIPCION", "DESCRIPCIÓN"]:
-            try:
-                res = supabase.table("articulos").select(col).execute()
-                data = res.data or []
-                articulos = [str(r.get(col)).strip() for r in data if r.get(col)]
-                if articulos:
-                    break
-            except Exception:
-                continue
-
-    except Exception:
-        return {"proveedores": [], "articulos": []}
-
-    proveedores = sorted(list(set([p for p in proveedores if p])))
-    articulos = sorted(list(set([a for a in articulos if a])))
-
-    return {"proveedores": proveedores, "articulos": articulos}
+    """Catálogo compartido (ver resolver_entidades)."""
+    return get_listas_entidades()
 
 def _get_indices() -> Tuple[List[Tuple[str, str]], List[Tuple[str, str]]]:
-    listas = _cargar_listas_supabase()
-    prov = [(p, _key(p)) for p in (listas.get("proveedores") or []) if p]
-    art = [(a, _key(a)) for a in (listas.get("articulos") or []) if a]
-    return prov, art
+    """(proveedores, artículos) indexados una vez por proceso (ver resolver_entidades)."""
+    return get_indices_entidades()
 
 def _match_best(texto: str, index: List[Tuple[str, str]], max_items: int = 1) -> List[str]:
     toks = _tokens(texto)
     # Filter out common words that shouldn't match articles/providers
     ignore_words = {"compras", "compra", "factura", "facturas", "total", "totales", "comparar", "compara", "2023", "2024", "2025", "2026", "usd", "u$s", "pesos", "uyu"}
     toks = [t for t in toks if t not in ignore_words]
-    if not toks or not index:
-        return []
-
-    toks_set = set(toks)
-    exact_matches = [orig for orig, norm in index if norm in toks_set]
-    if exact_matches:
-        return exact_matches[:max_items]
-
-    candidatos: List[Tuple[int, str]] = []
-    for orig, norm in index:
-        for tk in toks:
-            if tk and tk in norm:
-                score = (len(tk) * 1000) - len(norm)
-                candidatos.append((score, orig))
-
-    if not candidatos:
-        return []
-
-    candidatos.sort(key=lambda x: (-x[0], x[1]))
-    out: List[str] = []
-    seen = set()
-    for _, orig in candidatos:
-        if orig not in seen:
-            seen.add(orig)
-            out.append(orig)
-        if len(out) >= max_items:
-            break
-
-    return out
+    return match_tokens(index, toks, max_items=max_items)
 
 # =====================================================================
 # PARSEO DE PARÁMETROS: Mes a Meses
@@ -2249,42 +1979,16 @@ def normalizar_parametros(params: dict) -> dict:
 # PARSEO DE RANGO DE FECHAS + MONEDA + LÍMITE
 # =====================================================================
 def _extraer_anios(texto: str) -> List[int]:
-    anios = re.findall(r"(2023|2024|2025|2026)", texto)
-    out: List[int] = []
-    for a in anios:
-        try:
-            out.append(int(a))
-        except Exception:
-            pass
-
-    seen = set()
-    out2: List[int] = []
-    for x in out:
-        if x not in seen:
-            seen.add(x)
-            out2.append(x)
-    return out2[:MAX_ANIOS]
+    """Años 2023-2026 en orden de aparición, sin repetidos (hasta MAX_ANIOS)."""
+    return unicos(extraer_rasgos(texto).anios_libres, MAX_ANIOS)
 
 def _extraer_meses_nombre(texto: str) -> List[str]:
-    ms = [m for m in MESES.keys() if m in texto.lower()]
-    seen = set()
-    out: List[str] = []
-    for m in ms:
-        if m not in seen:
-            seen.add(m)
-            out.append(m)
-    return out[:MAX_MESES]
+    """Nombres de mes mencionados, en el orden de MESES (hasta MAX_MESES)."""
+    return unicos([m for m in extraer_rasgos(texto).meses_nombre if m in MESES], MAX_MESES)
 
 def _extraer_meses_yyyymm(texto: str) -> List[str]:
-    ms = re.findall(r"(2023|2024|2025|2026)[-/](0[1-9]|1[0-2])", texto)
-    out = [f"{a}-{m}" for a, m in ms]
-    seen = set()
-    out2: List[str] = []
-    for x in out:
-        if x not in seen:
-            seen.add(x)
-            out2.append(x)
-    return out2[:MAX_MESES]
+    """Meses YYYY-MM (o YYYY/MM) en orden de aparición, sin repetidos (hasta MAX_MESES)."""
+    return unicos(extraer_rasgos(texto).yyyymm_libres, MAX_MESES)
 
 def _to_yyyymm(anio: int, mes_nombre: str) -> str:
     return f"{anio}-{MESES[mes_nombre]}"
@@ -2458,6 +2162,7 @@ def es_tipo_valido(tipo: str) -> bool:
 # INTERPRETADOR PRINCIPAL (AGENTIC AI = DECIDE, NO EJECUTA)
 # =====================================================================
 
+@cachear_interpretacion("ia_interpretador", version=get_version_entidades)
 def interpretar_pregunta(pregunta: str) -> Dict[str, Any]:
     """
     Interpretador canónico (Agentic AI):
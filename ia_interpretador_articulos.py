@@ -1,6 +1,8 @@
 import re
 from typing import Dict, List, Any
 
+from rasgos_pregunta import extraer_rasgos, unicos
+
 # =====================================================================
 # ARTÍCULOS EXCLUIDOS (para filtrar términos no deseados del catálogo)
 # =====================================================================
@@ -52,29 +54,12 @@ FAMILIAS_VALIDAS = {
 # FUNCIONES AUXILIARES
 # =====================================================================
 def _extraer_anios(texto: str) -> List[int]:
-    anios = re.findall(r"(2023|2024|2025|2026)", texto)
-    out = []
-    for a in anios:
-        try:
-            out.append(int(a))
-        except Exception:
-            pass
-    seen = set()
-    out2 = []
-    for x in out:
-        if x not in seen:
-            seen.add(x)
-            out2.append(x)
-    return out2
+    return unicos(extraer_rasgos(texto).anios_libres)
 
 def _extraer_meses(texto: str) -> List[str]:
-    meses_nombres = ["enero", "febrero", "marzo", "abril", "mayo", "junio", "julio", "agosto", "septiembre", "setiembre", "octubre", "noviembre", "diciembre"]
-    meses_yyyymm = re.findall(r"(2023|2024|2025|2026)[-/](0[1-9]|1[0-2])", texto)
-    out = []
-    for m in meses_nombres:
-        if m in texto.lower():
-            out.append(m)
-    out.extend(meses_yyyymm)
+    rasgos = extraer_rasgos(texto)
+    out = list(rasgos.meses_nombre)
+    out.extend(tuple(x.split("-")) for x in rasgos.yyyymm_libres)
     return list(set(out))
 
 def normalizar_meses(meses: List[str], anios: List[int]) -> List[str]:
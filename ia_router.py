@@ -16,6 +16,9 @@ import streamlit as st
 from openai import OpenAI
 from config import OPENAI_MODEL
 from sql_core import ejecutar_consulta
+from resolver_entidades import get_indices_entidades, get_listas_entidades, get_version_entidades, match_tokens
+from cache_interpretaciones import cachear_interpretacion
+from rasgos_pregunta import extraer_rasgos, limite_de, rango_fechas_de
 
 # =====================================================================
 # CONFIGURACIÓN OPENAI (opcional)
@@ -255,202 +258,70 @@ def contiene_gastos_o_documentos(texto: str) -> bool:
 def contiene_factura(texto: str) -> bool:
     if not texto:
         return False
-    t = texto.lower()
-    return bool(
-        re.search(
-            r"\b(detalle\s+)?factura(s)?\b"
-            r"|\bnro\.?\s*(comprobante|factura)\b"
-            r"|\bnro\.?\s*comprobante\b"
-            r"|\bcomprobante(s)?\b",
-            t,
-            flags=re.IGNORECASE
-        )
-    )
+    return extraer_rasgos(texto).menciona_factura
 
 def _normalizar_nro_factura(nro: str) -> str:
     return (nro or "").strip().upper()
 
 def _extraer_nro_factura(texto: str) -> Optional[str]:
     """
-    Extrae número de factura del texto.
-    CRÍTICO: debe detectar números después de "detalle factura", "factura", etc.
+    Número de factura: "detalle factura 60907", "factura A0001234" o el texto
+    que es sólo el número. Un año (2023-2026) no es nro de factura.
     """
     if not texto:
         return None
-
-    t = str(texto).strip()
-
-    # Patrón 1: "detalle factura 60907", "factura 60907", etc.
-    m = re.search(
-        r"\b(detalle\s+)?(factura|comprobante|nro\.?\s*comprobante|nro\.?\s*factura)\b\s*[:#-]?\s*([A-Za-z]?\d{3,})\b",
-        t,
-        flags=re.IGNORECASE
-    )
-    if m:
-        raw = str(m.group(3)).strip()
-
-        # ❌ NO confundir años con números de factura
-        if raw.isdigit():
-            try:
-                n = int(raw)
-                if n in ANIOS_VALIDOS:
-                    return None
-            except Exception:
-                pass
-
-        nro = _normalizar_nro_factura(raw)
-        return nro or None
-
-    # Patrón 2: Si el texto es SOLO un número (fallback)
-    # Ejemplo: "60907" → debe ser factura, no año
-    if re.fullmatch(r"[A-Za-z]?\d{3,}", t):
-        if t.isdigit():
-            try:
-                n = int(t)
-                # ❌ NO confundir años (2023, 2024, etc)
-                if n in ANIOS_VALIDOS:
-                    return None
-            except Exception:
-                pass
-
-        nro = _normalizar_nro_factura(t)
-        return nro or None
-
-    return None
+    return extraer_rasgos(str(texto)).nro_factura
 
 # =====================================================================
 # Extraer limite
 # =====================================================================
 def _extraer_limite(texto: str, predeterminado: int = 500) -> int:
-    import re
-    numeros = re.findall(r"\b\d+\b", texto)
-    for numero in numeros:
-        n = int(numero)
-        if n > 0:
-            return n
-    return predeterminado
+    return limite_de(extraer_rasgos(texto), predeterminado)
 
 # =====================================================================
 # Extraer Monedas
 # =====================================================================
 def _extraer_moneda(texto: str) -> Optional[str]:
-    texto = texto.lower()
-    patrones_moneda = {
-        "USD": ["usd", "u$s", "u$$", "dólares", "dolares", "dollar", "dólar", "dolar"],
-        "UYU": ["pesos", "uyu", "$", "moneda nacional"],
-    }
-    for moneda, palabras_clave in patrones_moneda.items():
-        for palabra in palabras_clave:
-            if palabra in texto:
-                return moneda
-    return None
+    return extraer_rasgos(texto).moneda
 
 # =====================================================================
 # Extraer rango fechas
 # =====================================================================
 def _extraer_rango_fechas(texto: str) -> Tuple[Optional[str], Optional[str]]:
-    patron_fecha = r"\b(\d{4}-\d{2}-\d{2})\b"
-    fechas = re.findall(patron_fecha, texto)
-    if len(fechas) >= 2:
-        return fechas[0], fechas[1]
-    elif len(fechas) == 1:
-        return fechas[0], None
-    return None, None
+    return rango_fechas_de(extraer_rasgos(texto))
 
 # =====================================================================
 # CARGA LISTAS DESDE SUPABASE
 # =====================================================================
-@st.cache_data(ttl=60 * 60)
 def _cargar_listas_supabase() -> Dict[str, List[str]]:
-    proveedores: List[str] = []
-    articulos: List[str] = []
-
-    try:
-        from supabase_client import supabase
-        if supabase is None:
-            return {"proveedores": [], "articulos": []}
-
-        for col in ["nombre", "Nombre", "NOMBRE"]:
-            try:
-                res = supabase.table("proveedores").select(col).execute()
-                data = res.data or []
-                proveedores = [str(r.get(col)).strip() for r in data if r.get(col)]
-                if proveedores:
-                    break
-            except Exception:
-                continue
-
-        for col in ["Descripción", "Descripcion", "descripcion", "DESCRIPCION", "DESCRIPCIÓN"]:
-            try:
-                res = supabase.table("articulos").select(col).execute()
-                data = res.data or []
-                articulos = [str(r.get(col)).strip() for r in data if r.get(col)]
-                if articulos:
-                    break
-            except Exception:
-                continue
-
-    except Exception:
-        return {"proveedores": [], "articulos": []}
-
-    proveedores = sorted(list(set([p for p in proveedores if p])))
-    articulos = sorted(list(set([a for a in articulos if a])))
-
-    return {"proveedores": proveedores, "articulos": articulos}
+    """Catálogo compartido (ver resolver_entidades)."""
+    return get_listas_entidades()
 
 def _get_indices() -> Tuple[List[Tuple[str, str]], List[Tuple[str, str]]]:
-    listas = _cargar_listas_supabase()
-    prov = [(p, _key(p)) for p in (listas.get("proveedores") or []) if p]
-    art = [(a, _key(a)) for a in (listas.get("articulos") or []) if a]
-    return prov, art
+    """(proveedores, artículos) indexados una vez por proceso (ver resolver_entidades)."""
+    return get_indices_entidades()
 
 def _match_best(texto: str, index: List[Tuple[str, str]], max_items: int = 1) -> List[str]:
     toks = _tokens(texto)
     # Filter out common words that shouldn't match articles/providers
     ignore_words = {"compras", "compra", "factura", "facturas", "total", "totales", "comparar", "compara", "2023", "2024", "2025", "2026", "usd", "u$s", "pesos", "uyu"}
     toks = [t for t in toks if t not in ignore_words]
-    if not toks or not index:
-        return []
-
-    scores: Dict[str, int] = {}
-    for tok in toks:
-        for orig, key_val in index:
-            if tok in key_val:
-                scores[orig] = scores.get(orig, 0) + len(tok)
-
-    if not scores:
-        return []
-
-    sorted_items = sorted(scores.items(), key=lambda x: x[1], reverse=True)
-    return [it[0] for it in sorted_items[:max_items]]
+    return match_tokens(index, toks, max_items=max_items, modo="suma")
 
 # =====================================================================
 # EXTRACCIONES TEMPORALES
 # =====================================================================
 def _extraer_anios(texto: str) -> List[int]:
     """Extrae años válidos (2023-2026)"""
-    anios = []
-    for m in re.finditer(r"\b(20\d{2})\b", texto):
-        a = int(m.group(1))
-        if a in ANIOS_VALIDOS:
-            anios.append(a)
-    return sorted(list(set(anios)))
+    return sorted({a for a in extraer_rasgos(texto).anios_palabra if a in ANIOS_VALIDOS})
 
 def _extraer_meses_nombre(texto: str) -> List[str]:
     """Extrae meses mencionados por nombre (enero, febrero, etc)"""
-    t = texto.lower()
-    out: List[str] = []
-    for nombre, cod in MESES.items():
-        if nombre in t:
-            out.append(cod)
-    return sorted(list(set(out)))
+    return sorted({MESES[m] for m in extraer_rasgos(texto).meses_nombre if m in MESES})
 
 def _extraer_meses_yyyymm(texto: str) -> List[str]:
     """Extrae meses en formato YYYY-MM"""
-    out: List[str] = []
-    for m in re.finditer(r"\b(20\d{2})[/-](0[1-9]|1[0-2])\b", texto):
-        out.append(f"{m.group(1)}-{m.group(2)}")
-    return sorted(list(set(out)))
+    return sorted(set(extraer_rasgos(texto).yyyymm_palabra))
 
 def _to_yyyymm(anio: int, mes_cod: str) -> str:
     """Convierte año + código mes → YYYY-MM"""
@@ -548,6 +419,7 @@ def get_detalle_factura_por_numero(nro_factura: str):
 # INTERPRETADOR PRINCIPAL (AGENTIC AI = DECIDE, NO EJECUTA)
 # =====================================================================
 
+@cachear_interpretacion("ia_router", version=get_version_entidades)
 def interpretar_pregunta(pregunta: str) -> Dict[str, Any]:
     """
     Interpretador canónico (Agentic AI):
@@ -7,7 +7,7 @@ import re
 import unicodedata
 from typing import Dict, List, Tuple
 
-import streamlit as st
+from resolver_entidades import get_indices_entidades, get_listas_entidades, match_tokens
 
 MAX_ARTICULOS = 5
 
@@ -39,66 +39,15 @@ def _tokens(texto: str) -> List[str]:
 # =====================================================================
 # CARGA LISTAS DESDE SUPABASE (cache)
 # =====================================================================
-@st.cache_data(ttl=60 * 60)
 def _cargar_listas_supabase() -> Dict[str, List[str]]:
-    articulos: List[str] = []
-
-    try:
-        from supabase_client import supabase  # type: ignore
-        if supabase is None:
-            return {"articulos": []}
-
-        for col in ["Descripción", "Descripcion", "descripcion", "DESCRIPCION", "DESCRIPCIÓN"]:
-            try:
-                res = supabase.table("articulos").select(col).execute()
-                data = res.data or []
-                articulos = [str(r.get(col)).strip() for r in data if r.get(col)]
-                if articulos:
-                    break
-            except Exception:
-                continue
-
-    except Exception:
-        return {"articulos": []}
-
-    articulos = sorted(list(set([a for a in articulos if a])))
-    return {"articulos": articulos}
+    return get_listas_entidades()
 
 def _get_art_index() -> List[Tuple[str, str]]:
-    listas = _cargar_listas_supabase()
-    return [(a, _key(a)) for a in (listas.get("articulos") or []) if a]
+    return get_indices_entidades()[1]
 
 def _match_best(texto: str, index: List[Tuple[str, str]], max_items: int = 1) -> List[str]:
-    toks = _tokens(texto)
-    if not toks or not index:
-        return []
-
-    toks_set = set(toks)
-    for orig, norm in index:
-        if norm in toks_set:
-            return [orig]
+    return match_tokens(index, _tokens(texto), max_items=max_items)
 
-    candidatos: List[Tuple[int, str]] = []
-    for orig, norm in index:
-        for tk in toks:
-            if tk and tk in norm:
-                score = (len(tk) * 1000) - len(norm)
-                candidatos.append((score, orig))
-
-    if not candidatos:
-        return []
-
-    candidatos.sort(key=lambda x: (-x[0], x[1]))
-    out: List[str] = []
-    seen = set()
-    for _, orig in candidatos:
-        if orig not in seen:
-            seen.add(orig)
-            out.append(orig)
-        if len(out) >= max_items:
-            break
-
-    return out
 
 # =====================================================================
 # INTÉRPRETE STOCK
@@ -13,7 +13,7 @@ import os
 import re
 
 from supabase import create_client
-from sql_core import ejecutar_consulta  # ✅ IMPORTADO PARA CARGAR PROVEEDORES/ARTÍCULOS
+from sql_core import ejecutar_consulta, invalidar_cache_tablas  # ✅ IMPORTADO PARA CARGAR PROVEEDORES/ARTÍCULOS
 
 # =====================================================================
 # CONFIGURACIÓN SUPABASE
@@ -347,7 +347,6 @@ def _fmt_money(v: float, moneda: str) -> str:
 # CACHE SUPABASE (USANDO sql_core)
 # =====================================================================
 
-@st.cache_data(ttl=600)
 def _cache_proveedores() -> list:  # ✅ USANDO sql_core como en ui_compras
     try:
         sql = '''
@@ -365,7 +364,6 @@ def _cache_proveedores() -> list:  # ✅ USANDO sql_core como en ui_compras
         st.error(f"Error cargando proveedores: {e}")
         return []
 
-@st.cache_data(ttl=600)
 def _cache_articulos() -> list:  # ✅ USANDO sql_core como en ui_compras
     try:
         sql = 'SELECT DISTINCT TRIM("Articulo") AS art FROM chatbot_raw WHERE TRIM("Articulo") != \'\' ORDER BY art'
@@ -501,16 +499,20 @@ def _impactar_stock(articulo: str, cantidad: int) -> None:
         supabase.table(TABLA_STOCK).update({"cantidad": nueva_cant}).eq("id", stock_id).execute()
     else:
         supabase.table(TABLA_STOCK).insert({"articulo": articulo, "cantidad": int(cantidad)}).execute()
+    invalidar_cache_tablas(TABLA_STOCK)
 
 # =====================================================================
 # INSERTS
 # =====================================================================
 
 def _insert_cabecera(tabla_cab: str, cabecera: dict) -> dict:
-    return supabase.table(tabla_cab).insert(cabecera).execute()
+    res = supabase.table(tabla_cab).insert(cabecera).execute()
+    invalidar_cache_tablas(tabla_cab)
+    return res
 
 def _insert_detalle(tabla_det: str, detalle: dict) -> None:
     supabase.table(tabla_det).insert(detalle).execute()
+    invalidar_cache_tablas(tabla_det)
 
 # =====================================================================
 # FUNCIÓN PRINCIPAL - REDISEÑADA v2 (FIXED)
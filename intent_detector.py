@@ -6,9 +6,12 @@
 
 import re
 import unicodedata
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, FrozenSet, List, Tuple, Optional
 from datetime import datetime, timedelta
 
+from automata_palabras import AutomataPalabras
+from rasgos_pregunta import PALABRAS_COMPARACION, extraer_rasgos
+
 
 # =====================================================================
 # NORMALIZACIÓN TEXTO
@@ -67,7 +70,7 @@ PALABRAS_EXCLUIR_PROVEEDOR = [
     'cuando', 'vino', 'llego', 'entro', 'fue', 'paso', 'ultima', 'ultimo', 'vez',
 ]
 
-PALABRAS_COMPARACION = ['comparar', 'comparame', 'compara', 'comparacion', 'comparaciones', 'vs', 'versus']
+# PALABRAS_COMPARACION: ver rasgos_pregunta (también arma el flag menciona_comparacion)
 
 PALABRAS_STOCK = [
     'stock', 'lote', 'lotes', 'vencimiento', 'vencer', 'vencido', 'vencidos',
@@ -77,6 +80,75 @@ PALABRAS_STOCK = [
 ]
 
 
+# =====================================================================
+# PALABRAS CLAVE DE LAS REGLAS (UN SOLO AUTÓMATA)
+# =====================================================================
+# Todas las palabras/frases que disparan reglas en detectar_intencion y
+# _detectar_intencion_stock. Se buscan TODAS juntas en una pasada sobre el
+# texto normalizado (ver automata_palabras); cada regla mira su grupo en ese
+# conjunto en vez de volver a recorrer el texto. El orden de prioridad de las
+# reglas no cambia.
+
+GRUPOS_PALABRAS = {
+    'ultimo': ['ultimo', 'ultima', 'ultim'],
+    'ultima_compra': [
+        'ultima vez que vino', 'ultima vez que llego', 'ultima vez que compramos',
+        'cuando fue la ultima', 'cuando fue el ultimo',
+        'ultima compra de', 'ultimo pedido de', 'ultima factura de'
+    ],
+    'cuando_vino_frase': [
+        'cuando vino', 'cuando llego', 'cuando entro', 'cuando compramos',
+        'en que fecha vino', 'en que fecha llego', 'en que fecha se compro',
+        'en que fecha compramos', 'que fecha vino', 'que fecha llego'
+    ],
+    'cuando_vino': ['cuando vino', 'cuando llego', 'cuando entro', 'ultima vez que vino', 'ultima vez que llego'],
+    'comparacion': PALABRAS_COMPARACION,
+    'stock': PALABRAS_STOCK,
+    'stock_por_vencer': ['por vencer', 'proximo a vencer', 'proximos a vencer', 'vence pronto', 'vencen pronto'],
+    'stock_vencidos': ['vencido', 'vencidos', 'ya vencio', 'ya vencieron'],
+    'stock_bajo': ['stock bajo', 'poco stock', 'bajo stock', 'quedan pocos', 'se acaba', 'reponer', 'agotando'],
+    'stock_familia': ['familia', 'familias', 'seccion', 'secciones', 'por familia', 'por seccion'],
+    'stock_deposito': ['deposito', 'depositos', 'por deposito', 'ubicacion', 'almacen'],
+    'stock_articulo': ['stock', 'cuanto hay', 'cuantos hay', 'tenemos', 'disponible', 'hay'],
+    'stock_total': ['stock total', 'todo el stock', 'resumen stock', 'stock general', 'inventario total'],
+    'top': ['top', 'ranking', 'mayores', 'principales', 'mayor gasto', 'mas compramos', 'mas gastamos'],
+    'proveedor': ['proveedor', 'proveedores'],
+    'dolares': ['dolares', 'dolar', 'usd', 'u$s'],
+    'pesos': ['pesos', '$'],
+    'listar_que': ['proveedores', 'familias', 'articulos', 'proveedor', 'familia', 'articulo'],
+    'ver_factura': ['detalle', 'ver', 'mostrar', 'numero', 'nro'],
+    'completa': ['completa', 'toda', 'todas', 'entera'],
+    'facturas': ['facturas', 'en que factura', 'listar facturas'],
+    'gastos': ['gastos', 'gasto', 'gastado', 'gastamos', 'importes', 'importe', 'cuanto gasto', 'cuanto fue'],
+    'gastos_comparacion': ['gastos', 'gasto', 'gastado', 'importe', 'importes'],
+    'familia': ['familia', 'familias', 'seccion', 'secciones'],
+    'compras': ['compras', 'compra'],
+    'por_mes': ['por mes', 'del mes'],
+    'ver_listado': ['listar', 'detalle', 'ver', 'mostrar', 'excel'],
+    'total_proveedor': ['proveedor', 'proveedores', 'por proveedor'],
+    'total_cuanto': ['total', 'ranking', 'mayor', 'gasto', 'gastado', 'se gasto', 'cuanto'],
+    'detalle': ['detalle', 'que vino', 'listado'],
+    # Palabras que las reglas miran de a una
+    'sueltas': [
+        'factura', 'factura completa', 'ultima', 'completa', 'toda', 'listar',
+        'compra', 'compras', 'compramos', 'compre', 'proveedor', 'articulo',
+        'familia', 'seccion'
+    ],
+}
+
+_GRUPOS = {nombre: frozenset(palabras) for nombre, palabras in GRUPOS_PALABRAS.items()}
+_AUTOMATA = AutomataPalabras(p for palabras in GRUPOS_PALABRAS.values() for p in palabras)
+
+
+def palabras_presentes(texto_norm: str) -> FrozenSet[str]:
+    """Palabras clave de las reglas que aparecen (como substring) en el texto normalizado."""
+    return _AUTOMATA.buscar(texto_norm)
+
+
+def _hay(presentes: FrozenSet[str], grupo: str) -> bool:
+    return not presentes.isdisjoint(_GRUPOS[grupo])
+
+
 # =====================================================================
 # HELPERS DE EXTRACCIÓN
 # =====================================================================
@@ -143,8 +215,7 @@ def _extraer_patron_libre(texto: str, excluir_palabras: List[str] = None) -> str
 
 def extraer_anios(texto: str) -> List[int]:
     """Extrae años del texto"""
-    anios = re.findall(r'\b(20\d{2})\b', texto)
-    return sorted(set(int(a) for a in anios))
+    return sorted(set(extraer_rasgos(texto).anios_palabra))
 
 
 def _extraer_mes_key(texto: str) -> Optional[str]:
@@ -169,9 +240,9 @@ def _extraer_mes_key(texto: str) -> Optional[str]:
     anio = None
     mes = None
 
-    match_anio = re.search(r'\b(20\d{2})\b', texto_norm)
-    if match_anio:
-        anio = int(match_anio.group(1))
+    anios_texto = extraer_rasgos(texto_norm).anios_palabra
+    if anios_texto:
+        anio = anios_texto[0]
 
     for mes_nombre, mes_num in meses_map.items():
         if mes_nombre in texto_norm:
@@ -211,9 +282,9 @@ def extraer_meses_para_comparacion(texto: str) -> List[Tuple[int, int, str]]:
 
     # Extraer el año global del texto (si existe)
     anio_global = None
-    match_anio = re.search(r'\b(20\d{2})\b', texto_norm)
-    if match_anio:
-        anio_global = int(match_anio.group(1))
+    anios_texto = extraer_rasgos(texto_norm).anios_palabra
+    if anios_texto:
+        anio_global = anios_texto[0]
 
     resultados = []
     meses_encontrados = set()
@@ -281,7 +352,7 @@ def _extraer_lista_familias(texto: str) -> List[str]:
 
 def _es_comparacion(texto_norm: str) -> bool:
     """Detecta si el texto pide una comparación"""
-    return any(p in texto_norm for p in PALABRAS_COMPARACION)
+    return _hay(palabras_presentes(texto_norm), 'comparacion')
 
 
 def _extraer_proveedor_limpio(texto: str) -> str:
@@ -396,19 +467,17 @@ def _generar_periodos_mes_keys(anios: List[int], meses_nums: List[int], anio_def
 
 def _es_consulta_stock(texto_norm: str) -> bool:
     """Detecta si el texto es una consulta de stock"""
-    for palabra in PALABRAS_STOCK:
-        if palabra in texto_norm:
-            return True
-    return False
+    return _hay(palabras_presentes(texto_norm), 'stock')
 
 
 def _detectar_intencion_stock(texto: str) -> Dict:
     """Detecta la intención específica para consultas de stock"""
     texto_lower = normalizar_texto(texto)
+    kw = palabras_presentes(texto_lower)
     familias_conocidas = ['id', 'fb', 'g', 'hm', 'ur', 'bc', 'ch', 'mi', 'se', 'co']
 
     # LOTES POR VENCER
-    if any(k in texto_lower for k in ['por vencer', 'proximo a vencer', 'proximos a vencer', 'vence pronto', 'vencen pronto']):
+    if _hay(kw, 'stock_por_vencer'):
         dias = 90
         match_dias = re.search(r'(\d+)\s*dias?', texto_lower)
         if match_dias:
@@ -420,7 +489,7 @@ def _detectar_intencion_stock(texto: str) -> Dict:
         }
 
     # LOTES VENCIDOS
-    if any(k in texto_lower for k in ['vencido', 'vencidos', 'ya vencio', 'ya vencieron']):
+    if _hay(kw, 'stock_vencidos'):
         return {
             'tipo': 'stock_lotes_vencidos',
             'parametros': {},
@@ -428,7 +497,7 @@ def _detectar_intencion_stock(texto: str) -> Dict:
         }
 
     # STOCK BAJO
-    if any(k in texto_lower for k in ['stock bajo', 'poco stock', 'bajo stock', 'quedan pocos', 'se acaba', 'reponer', 'agotando']):
+    if _hay(kw, 'stock_bajo'):
         return {
             'tipo': 'stock_bajo',
             'parametros': {},
@@ -446,7 +515,7 @@ def _detectar_intencion_stock(texto: str) -> Dict:
         }
 
     # STOCK POR FAMILIA / SECCIÓN
-    if any(k in texto_lower for k in ['familia', 'familias', 'seccion', 'secciones', 'por familia', 'por seccion']):
+    if _hay(kw, 'stock_familia'):
         for fam in familias_conocidas:
             if fam in texto_lower.split():
                 return {
@@ -461,7 +530,7 @@ def _detectar_intencion_stock(texto: str) -> Dict:
         }
 
     # STOCK POR DEPÓSITO
-    if any(k in texto_lower for k in ['deposito', 'depositos', 'por deposito', 'ubicacion', 'almacen']):
+    if _hay(kw, 'stock_deposito'):
         return {
             'tipo': 'stock_por_deposito',
             'parametros': {},
@@ -469,7 +538,7 @@ def _detectar_intencion_stock(texto: str) -> Dict:
         }
 
     # STOCK DE ARTÍCULO ESPECÍFICO
-    if any(k in texto_lower for k in ['stock', 'cuanto hay', 'cuantos hay', 'tenemos', 'disponible', 'hay']):
+    if _hay(kw, 'stock_articulo'):
         palabras_excluir = ['stock', 'cuanto', 'cuantos', 'hay', 'de', 'del', 'tenemos', 'disponible',
                            'el', 'la', 'los', 'las', 'que', 'en', 'total', 'resumen']
         tokens = texto_lower.split()
@@ -484,7 +553,7 @@ def _detectar_intencion_stock(texto: str) -> Dict:
             }
 
     # STOCK TOTAL
-    if any(k in texto_lower for k in ['stock total', 'todo el stock', 'resumen stock', 'stock general', 'inventario total']):
+    if _hay(kw, 'stock_total'):
         return {
             'tipo': 'stock_total',
             'parametros': {},
@@ -518,6 +587,8 @@ def detectar_intencion(texto: str) -> Dict:
     """
 
     texto_norm = normalizar_texto(texto).replace("última", "ultima")
+    kw = palabras_presentes(texto_norm)       # todas las palabras clave, una pasada
+    es_comparacion = _hay(kw, 'comparacion')
     intencion = {'tipo': 'consulta_general', 'parametros': {}, 'debug': ''}
 
     # =====================================================================
@@ -530,24 +601,12 @@ def detectar_intencion(texto: str) -> Dict:
     # =====================================================================
     
     # Detectar si tiene "ultimo/ultima"
-    tiene_ultimo = any(x in texto_norm for x in ['ultimo', 'ultima', 'ultim'])
-    
-    # Patrones que indican pregunta de última compra/factura (CON ultimo)
-    patrones_ultima_compra = [
-        'ultima vez que vino', 'ultima vez que llego', 'ultima vez que compramos',
-        'cuando fue la ultima', 'cuando fue el ultimo',
-        'ultima compra de', 'ultimo pedido de', 'ultima factura de'
-    ]
-    
-    # Patrones que indican "cuando vino" (puede ser con o sin ultimo)
-    patrones_cuando_vino = [
-        'cuando vino', 'cuando llego', 'cuando entro', 'cuando compramos',
-        'en que fecha vino', 'en que fecha llego', 'en que fecha se compro',
-        'en que fecha compramos', 'que fecha vino', 'que fecha llego'
-    ]
+    tiene_ultimo = _hay(kw, 'ultimo')
     
-    tiene_patron_ultima = any(p in texto_norm for p in patrones_ultima_compra)
-    tiene_patron_cuando_vino = any(p in texto_norm for p in patrones_cuando_vino)
+    # Patrones de pregunta de última compra/factura (CON ultimo): grupo 'ultima_compra'
+    # Patrones de "cuando vino" (con o sin ultimo): grupo 'cuando_vino_frase'
+    tiene_patron_ultima = _hay(kw, 'ultima_compra')
+    tiene_patron_cuando_vino = _hay(kw, 'cuando_vino_frase')
     
     # Detectar "ultimo/ultima [articulo]" directo (ej: "ultimo vitek", "ultima glucosa")
     match_ultimo_art = re.search(r'\b(ultima?o?)\s+([a-z0-9]{2,})', texto_norm)
@@ -605,24 +664,23 @@ def detectar_intencion(texto: str) -> Dict:
     # =====================================================================
     # PRIORIDAD 0: CONSULTAS DE STOCK
     # =====================================================================
-    if _es_consulta_stock(texto_norm):
+    if _hay(kw, 'stock'):
         return _detectar_intencion_stock(texto)
 
     # =====================================================================
     # PRIORIDAD 0.5: TOP PROVEEDORES
     # =====================================================================
-    palabras_top = ['top', 'ranking', 'mayores', 'principales', 'mayor gasto', 'mas compramos', 'mas gastamos']
-    tiene_top = any(p in texto_norm for p in palabras_top)
-    tiene_proveedores = 'proveedor' in texto_norm or 'proveedores' in texto_norm
+    tiene_top = _hay(kw, 'top')
+    tiene_proveedores = _hay(kw, 'proveedor')
 
     if tiene_top and tiene_proveedores:
         anios = extraer_anios(texto)
         mes_key = _extraer_mes_key(texto)
 
         moneda = None
-        if any(m in texto_norm for m in ['dolares', 'dolar', 'usd', 'u$s']):
+        if _hay(kw, 'dolares'):
             moneda = 'U$S'
-        elif any(m in texto_norm for m in ['pesos', '$']):
+        elif _hay(kw, 'pesos'):
             moneda = '$'
 
         params = {}
@@ -642,7 +700,7 @@ def detectar_intencion(texto: str) -> Dict:
     # =====================================================================
     # PRIORIDAD 1: LISTAR VALORES
     # =====================================================================
-    if 'listar' in texto_norm and any(x in texto_norm for x in ['proveedores', 'familias', 'articulos', 'proveedor', 'familia', 'articulo']):
+    if 'listar' in kw and _hay(kw, 'listar_que'):
         intencion['tipo'] = 'listar_valores'
         intencion['debug'] = 'Match: listar valores'
         return intencion
@@ -658,7 +716,7 @@ def detectar_intencion(texto: str) -> Dict:
 
     nro = nro_match.group(1).replace(' ', '').upper() if nro_match else ""
 
-    if nro and ('factura' in texto_norm) and any(x in texto_norm for x in ['detalle', 'ver', 'mostrar', 'numero', 'nro']):
+    if nro and ('factura' in kw) and _hay(kw, 'ver_factura'):
         intencion['tipo'] = 'detalle_factura_numero'
         intencion['parametros']['nro_factura'] = nro
         intencion['debug'] = f'Match: factura número {nro}'
@@ -667,7 +725,7 @@ def detectar_intencion(texto: str) -> Dict:
     # =====================================================================
     # PRIORIDAD 3: FACTURA COMPLETA DE ARTÍCULO
     # =====================================================================
-    if ('factura completa' in texto_norm) or (('ultima' in texto_norm) and ('factura' in texto_norm) and ('completa' in texto_norm or 'toda' in texto_norm)):
+    if ('factura completa' in kw) or (('ultima' in kw) and ('factura' in kw) and ('completa' in kw or 'toda' in kw)):
         intencion['tipo'] = 'factura_completa_articulo'
         intencion['debug'] = 'Match: factura completa artículo'
         return intencion
@@ -675,7 +733,7 @@ def detectar_intencion(texto: str) -> Dict:
     # =====================================================================
     # ✅ PRIORIDAD 3.5: CUANDO VINO (ARTÍCULO) - MEJORADO
     # =====================================================================
-    tiene_cuando_vino = any(x in texto_norm for x in ['cuando vino', 'cuando llego', 'cuando entro', 'ultima vez que vino', 'ultima vez que llego'])
+    tiene_cuando_vino = _hay(kw, 'cuando_vino')
 
     if tiene_cuando_vino:
         # Extraer el artículo
@@ -694,12 +752,12 @@ def detectar_intencion(texto: str) -> Dict:
     # =====================================================================
     # PRIORIDAD 4: ÚLTIMA FACTURA
     # =====================================================================
-    tiene_ultimo = any(x in texto_norm for x in ['ultima', 'ultimo', 'ultim'])
-    tiene_factura = 'factura' in texto_norm
+    tiene_ultimo = _hay(kw, 'ultimo')
+    tiene_factura = 'factura' in kw
 
     if (tiene_ultimo and tiene_factura) or (tiene_ultimo and len(texto_norm.split()) >= 2):
-        if not any(x in texto_norm for x in ['completa', 'toda', 'todas', 'entera']):
-            if not _es_comparacion(texto_norm):
+        if not _hay(kw, 'completa'):
+            if not es_comparacion:
                 intencion['tipo'] = 'ultima_factura_articulo'
                 intencion['debug'] = 'Match: última factura'
                 return intencion
@@ -707,8 +765,8 @@ def detectar_intencion(texto: str) -> Dict:
     # =====================================================================
     # PRIORIDAD 5: TODAS LAS FACTURAS DE ARTÍCULO
     # =====================================================================
-    if any(x in texto_norm for x in ['facturas', 'en que factura', 'listar facturas']):
-        if 'ultima' not in texto_norm and not _es_comparacion(texto_norm):
+    if _hay(kw, 'facturas'):
+        if 'ultima' not in kw and not es_comparacion:
             intencion['tipo'] = 'facturas_articulo'
             intencion['debug'] = 'Match: todas las facturas de artículo'
             return intencion
@@ -716,10 +774,10 @@ def detectar_intencion(texto: str) -> Dict:
     # =====================================================================
     # PRIORIDAD 6: GASTOS SECCIONES / FAMILIAS
     # =====================================================================
-    tiene_gastos = any(k in texto_norm for k in ['gastos', 'gasto', 'gastado', 'gastamos', 'importes', 'importe', 'cuanto gasto', 'cuanto fue'])
-    tiene_familia = any(k in texto_norm for k in ['familia', 'familias', 'seccion', 'secciones'])
+    tiene_gastos = _hay(kw, 'gastos')
+    tiene_familia = _hay(kw, 'familia')
 
-    if tiene_gastos and tiene_familia and not _es_comparacion(texto_norm):
+    if tiene_gastos and tiene_familia and not es_comparacion:
         intencion['tipo'] = 'gastos_secciones'
         intencion['debug'] = 'Match: gastos por familias/secciones'
         return intencion
@@ -727,7 +785,7 @@ def detectar_intencion(texto: str) -> Dict:
     # =====================================================================
     # PRIORIDAD 7: COMPARACIONES
     # =====================================================================
-    if _es_comparacion(texto_norm):
+    if es_comparacion:
         hoy = datetime.now()
 
         anios = extraer_anios(texto)
@@ -735,7 +793,7 @@ def detectar_intencion(texto: str) -> Dict:
         meses_simple = extraer_meses_para_comparacion(texto)
 
         proveedores = []
-        if 'proveedor' in texto_norm or 'proveedores' in texto_norm:
+        if _hay(kw, 'proveedor'):
             proveedores = extraer_valores_multiples(texto, 'proveedor')
 
         if not proveedores:
@@ -745,13 +803,13 @@ def detectar_intencion(texto: str) -> Dict:
             prov_limpio = _extraer_proveedor_limpio(texto)
             proveedores = [prov_limpio] if prov_limpio else []
 
-        es_familia = any(x in texto_norm for x in ['familia', 'familias', 'seccion', 'secciones'])
-        tiene_gastos_comp = any(x in texto_norm for x in ['gastos', 'gasto', 'gastado', 'importe', 'importes'])
+        es_familia = _hay(kw, 'familia')
+        tiene_gastos_comp = _hay(kw, 'gastos_comparacion')
 
         moneda = None
-        if any(m in texto_norm for m in ['dolares', 'dolar', 'usd', 'u$s']):
+        if _hay(kw, 'dolares'):
             moneda = 'U$S'
-        elif any(m in texto_norm for m in ['pesos', '$']):
+        elif _hay(kw, 'pesos'):
             moneda = '$'
 
         # MESES + 2+ AÑOS
@@ -830,9 +888,9 @@ def detectar_intencion(texto: str) -> Dict:
     # PRIORIDAD 8: COMPRAS POR MES
     # =====================================================================
     if (
-        ('compras' in texto_norm or 'compra' in texto_norm)
-        and ('por mes' in texto_norm or 'del mes' in texto_norm)
-        and any(x in texto_norm for x in ['listar', 'detalle', 'ver', 'mostrar', 'excel'])
+        _hay(kw, 'compras')
+        and _hay(kw, 'por_mes')
+        and _hay(kw, 'ver_listado')
     ):
         intencion['tipo'] = 'compras_por_mes'
         intencion['debug'] = 'Match: compras por mes'
@@ -841,11 +899,11 @@ def detectar_intencion(texto: str) -> Dict:
     # =====================================================================
     # ✅ PRIORIDAD 8.5: COMPRAS POR AÑO COMPLETO
     # =====================================================================
-    if 'compra' in texto_norm or 'compramos' in texto_norm:
-        es_comparacion_check = _es_comparacion(texto_norm)
-        tiene_proveedor_explicito = 'proveedor' in texto_norm
-        tiene_articulo_explicito = 'articulo' in texto_norm
-        tiene_familia_explicita = 'familia' in texto_norm or 'seccion' in texto_norm
+    if 'compra' in kw or 'compramos' in kw:
+        es_comparacion_check = es_comparacion
+        tiene_proveedor_explicito = 'proveedor' in kw
+        tiene_articulo_explicito = 'articulo' in kw
+        tiene_familia_explicita = 'familia' in kw or 'seccion' in kw
 
         patron_compras_anio = re.search(r'compras?\s+(?:del\s+)?(?:año\s+)?(?:en\s+)?(20\d{2})\b', texto_norm)
         patron_mostrar_compras = re.search(r'(?:mostrar?|mostrame|ver|dame|listado|todas?\s+las?)\s+(?:las?\s+)?compras?\s+(?:del?\s+)?(?:año\s+)?(?:en\s+)?(20\d{2})\b', texto_norm)
@@ -871,8 +929,8 @@ def detectar_intencion(texto: str) -> Dict:
     # =====================================================================
     # PRIORIDAD 9: DETALLE COMPRAS PROVEEDOR / ARTÍCULO + MES O AÑO
     # =====================================================================
-    if ('compra' in texto_norm or 'compras' in texto_norm or 'compre' in texto_norm):
-        if not _es_comparacion(texto_norm):
+    if ('compra' in kw or 'compras' in kw or 'compre' in kw):
+        if not es_comparacion:
             mes_key = _extraer_mes_key(texto)
             prov = _extraer_proveedor_limpio(texto)
             articulos = extraer_valores_multiples(texto, 'articulo')
@@ -928,7 +986,7 @@ def detectar_intencion(texto: str) -> Dict:
     # =====================================================================
     # PRIORIDAD 10: TOTAL COMPRAS PROVEEDOR + MONEDA + 2+ PERÍODOS
     # =====================================================================
-    if any(k in texto_norm for k in ["proveedor", "proveedores", "por proveedor"]) and any(k in texto_norm for k in ["total", "ranking", "mayor", "gasto", "gastado", "se gasto", "cuanto"]):
+    if _hay(kw, 'total_proveedor') and _hay(kw, 'total_cuanto'):
         periodos = _extraer_mes_keys_multiples(texto)
         if len(periodos) >= 2:
             intencion['tipo'] = 'total_proveedor_moneda_periodos'
@@ -939,7 +997,7 @@ def detectar_intencion(texto: str) -> Dict:
     # =====================================================================
     # PRIORIDAD 11: DETALLE GENERAL
     # =====================================================================
-    if 'detalle' in texto_norm or 'que vino' in texto_norm or 'listado' in texto_norm:
+    if _hay(kw, 'detalle'):
         intencion['tipo'] = 'detalle'
         intencion['debug'] = 'Match: detalle general'
         return intencion
@@ -947,7 +1005,7 @@ def detectar_intencion(texto: str) -> Dict:
     # =====================================================================
     # PRIORIDAD 12: COMPRAS GENERAL
     # =====================================================================
-    if 'compras' in texto_norm or 'compra' in texto_norm:
+    if _hay(kw, 'compras'):
         intencion['tipo'] = 'consulta_general'
         intencion['debug'] = 'Match: compras general'
         return intencion
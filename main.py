@@ -50,7 +50,6 @@ from sql_compras import (
     get_compras_anio,
     get_top_proveedores_por_anios,
 )
-from utils_format import formatear_dataframe
 from utils_openai import responder_con_openai
 
 from sql_facturas import (
@@ -65,7 +64,6 @@ from sql_compras import (
     get_compras_anio,
     get_top_proveedores_por_anios,  # 🔥 AGREGADO: Función para top proveedores por año
 )
-from utils_format import formatear_dataframe
 from utils_openai import responder_con_openai
 
 # =========================
@@ -169,7 +167,7 @@ def ejecutar_consulta_por_tipo(tipo: str, params: dict, pregunta_original: str):
             prov_lbl = ", ".join([p.upper() for p in proveedores_raw[:3]])
             return (
                 f"🧾 Facturas de **{prov_lbl}** ({len(df)} registros):",
-                formatear_dataframe(df),
+                df,
                 None,
             )
 
@@ -189,7 +187,7 @@ def ejecutar_consulta_por_tipo(tipo: str, params: dict, pregunta_original: str):
 
             return (
                 f"🛒 Compras de **{proveedor.upper()}** en {anio} ({len(df)} registros):",
-                formatear_dataframe(df),
+                df,
                 None,
             )
 
@@ -208,7 +206,7 @@ def ejecutar_consulta_por_tipo(tipo: str, params: dict, pregunta_original: str):
 
             return (
                 f"🛒 Compras de **{proveedor.upper()}** en {mes} {anio or ''} ({len(df)} registros):",
-                formatear_dataframe(df),
+                df,
                 None,
             )
 
@@ -239,7 +237,7 @@ def ejecutar_consulta_por_tipo(tipo: str, params: dict, pregunta_original: str):
             filtro = f" {mes_lbl} {anio_lbl}".strip()
             return (
                 f"🛒 Compras de **{prov_lbl}**{filtro} ({len(df)} registros):",
-                formatear_dataframe(df),
+                df,
                 None,
             )
 
@@ -288,7 +286,7 @@ def ejecutar_consulta_por_tipo(tipo: str, params: dict, pregunta_original: str):
             return (
                 f"📊 **Top {len(df)} Proveedores - Compras {anio}**\n\n"
                 f"💰 Total: ${total_general:,.2f}",
-                formatear_dataframe(df),
+                df,
                 None,
             )
 
@@ -313,7 +311,7 @@ def ejecutar_consulta_por_tipo(tipo: str, params: dict, pregunta_original: str):
             moneda_label = "USD" if moneda == "U$S" else "pesos"
             return (
                 f"🏭 Top {top_n} proveedores {anio} en {moneda_label}:",
-                formatear_dataframe(df),
+                df,
                 None,
             )
 
@@ -338,7 +336,7 @@ def ejecutar_consulta_por_tipo(tipo: str, params: dict, pregunta_original: str):
                     mensaje += f"📋 Encontré **{len(similares)}** factura(s) similar(es):\n"
                     return (
                         mensaje,
-                        formatear_dataframe(similares),
+                        similares,
                         None,
                     )
                 else:
@@ -362,7 +360,7 @@ def ejecutar_consulta_por_tipo(tipo: str, params: dict, pregunta_original: str):
             
             return (
                 mensaje,
-                formatear_dataframe(df),
+                df,
                 None,
             )
 
@@ -1,7 +1,7 @@
 import streamlit as st
 import pandas as pd
 import re
-from typing import Tuple, Optional
+from typing import Callable, Tuple, Optional
 import json
 
 # =========================
@@ -43,11 +43,11 @@ from sql_stock import (  # Importar funciones de stock
     get_stock_bajo,
     get_alertas_vencimiento_multiple,
 )
-from utils_format import formatear_dataframe
 from utils_openai import responder_con_openai
 
 # NUEVO: Importar el interpretador dedicado de stock
 from interpretador_stock import interpretar_pregunta_stock
+from rasgos_pregunta import extraer_rasgos
 
 ORQUESTADOR_CARGADO = True
 ORQUESTADOR_ERROR = None
@@ -228,7 +228,12 @@ def responder_pregunta_stock(pregunta: str) -> tuple:
             return f"✅ Encontré {len(df)} registro(s) relacionados con '{pregunta}'", df
 
 
-def procesar_pregunta_v2(pregunta: str):
+def procesar_pregunta_v2(pregunta: str, on_token: Optional[Callable[[str], None]] = None):
+    """
+    (mensaje, df, sugerencia). Con on_token, las respuestas de conversación /
+    conocimiento se van entregando en streaming (app_chainlit); el mensaje
+    final que se devuelve es el mismo.
+    """
     print(f"🐛 DEBUG ORQUESTADOR: Procesando pregunta: '{pregunta}'")
     _init_orquestador_state()
 
@@ -239,14 +244,14 @@ def procesar_pregunta_v2(pregunta: str):
     # =========================
     # 🆕 PRIMERO: INTENTAR CON STOCK
     # =========================
-    if any(word in pregunta.lower() for word in ["stock", "familia", "lote", "venc", "deposito", "depósito", "bajo", "crítico"]):
+    if extraer_rasgos(pregunta).menciona_stock:
         print("🔍 Detectada palabra clave de STOCK, intentando interpretador...")
         respuesta, df_extra = responder_pregunta_stock(pregunta)
         
         # Si el interpretador manejó la pregunta (no retornó None)
         if respuesta is not None:
             print(f"✅ Pregunta manejada por interpretador de STOCK")
-            return respuesta, formatear_dataframe(df_extra) if df_extra is not None else None, None
+            return respuesta, df_extra, None
         else:
             print("⚠️ Interpretador de stock retornó None, continuando con compras...")
 
@@ -303,7 +308,7 @@ def procesar_pregunta_v2(pregunta: str):
             if df is not None and not df.empty:
                 tiempo_str = ", ".join(meses) if meses else ", ".join(map(str, anios))
                 mensaje = f"📊 Comparación de compras para {', '.join(proveedores).upper()} en {tiempo_str} (agrupado por moneda)."
-                return mensaje, formatear_dataframe(df), None
+                return mensaje, df, None
             else:
                 return "⚠️ No se encontraron resultados para la comparación.", None, None
         else:
@@ -337,11 +342,15 @@ def procesar_pregunta_v2(pregunta: str):
         pass
 
     if tipo == "conversacion":
-        respuesta = responder_con_openai(pregunta, "conversacion")
+        if on_token:
+            on_token("💬 ")
+        respuesta = responder_con_openai(pregunta, "conversacion", on_token=on_token)
         return f"💬 {respuesta}", None, None
 
     if tipo == "conocimiento":
-        respuesta = responder_con_openai(pregunta, "conocimiento")
+        if on_token:
+            on_token("📚 ")
+        respuesta = responder_con_openai(pregunta, "conocimiento", on_token=on_token)
         return f"📚 {respuesta}", None, None
 
     if tipo == "no_entendido":
@@ -398,7 +407,7 @@ def _ejecutar_consulta(tipo: str, params: dict, pregunta_original: str):
             prov_lbl = ", ".join([p.upper() for p in proveedores[:3]])
             return (
                 f"📊 Comparación de compras de **{prov_lbl}** en {anios[0]}-{anios[1]} ({len(df)} registros):",
-                formatear_dataframe(df),
+                df,
                 None,
             )
 
@@ -470,7 +479,7 @@ def _ejecutar_consulta(tipo: str, params: dict, pregunta_original: str):
 
             return (
                 header,
-                formatear_dataframe(df),
+                df,
                 None,
             )
 
@@ -496,7 +505,7 @@ def _ejecutar_consulta(tipo: str, params: dict, pregunta_original: str):
 
             return (
                 f"🛒 Compras de **{proveedor.upper()}** en {anio} ({len(df)} registros):",
-                formatear_dataframe(df),
+                df,
                 None,
             )
 
@@ -522,7 +531,7 @@ def _ejecutar_consulta(tipo: str, params: dict, pregunta_original: str):
 
             return (
                 f"🛒 Compras de **{proveedor.upper()}** en {mes} {anio or ''} ({len(df)} registros):",
-                formatear_dataframe(df),
+                df,
                 None,
             )
 
@@ -561,7 +570,7 @@ def _ejecutar_consulta(tipo: str, params: dict, pregunta_original: str):
             filtro = f" {mes_lbl} {anio_lbl}".strip()
             return (
                 f"🛒 Compras de **{prov_lbl}**{filtro} ({len(df)} registros):",
-                formatear_dataframe(df),
+                df,
                 None,
             )
 
@@ -582,7 +591,7 @@ def _ejecutar_consulta(tipo: str, params: dict, pregunta_original: str):
 
             return (
                 f"🛒 Todas las compras en {anio} ({len(df)} registros):",
-                formatear_dataframe(df),
+                df,
                 None,
             )
 
@@ -617,7 +626,7 @@ def _ejecutar_consulta(tipo: str, params: dict, pregunta_original: str):
                 if similares is not None and not similares.empty:
                     mensaje = f"⚠️ No se encontró la factura **{nro_factura}** exactamente.\n\n"
                     mensaje += f"📋 Encontré **{len(similares)}** factura(s) similar(es):"
-                    return mensaje, formatear_dataframe(similares), None
+                    return mensaje, similares, None
                 else:
                     return f"❌ No se encontró la factura {nro_factura} ni facturas similares.", None, None
             
@@ -635,7 +644,7 @@ def _ejecutar_consulta(tipo: str, params: dict, pregunta_original: str):
             mensaje += f"💰 Total: {moneda} {total_monto:,.2f}\n"
             mensaje += f"📦 {total_lineas} artículo(s)\n"
             
-            return mensaje, formatear_dataframe(df), None
+            return mensaje, df, None
 
         return f"❌ Tipo de consulta '{tipo}' no implementado.", None, None
 
@@ -646,8 +655,10 @@ def _ejecutar_consulta(tipo: str, params: dict, pregunta_original: str):
         return f"❌ Error: {str(e)[:150]}", None, None
 
 
-def procesar_pregunta(pregunta: str) -> Tuple[str, Optional[pd.DataFrame]]:
-    mensaje, df, sugerencia = procesar_pregunta_v2(pregunta)
+def procesar_pregunta(
+    pregunta: str, on_token: Optional[Callable[[str], None]] = None
+) -> Tuple[str, Optional[pd.DataFrame]]:
+    mensaje, df, sugerencia = procesar_pregunta_v2(pregunta, on_token=on_token)
 
     if sugerencia:
         alternativas = sugerencia.get("alternativas", [])
@@ -659,8 +670,10 @@ def procesar_pregunta(pregunta: str) -> Tuple[str, Optional[pd.DataFrame]]:
     return mensaje, df
 
 
-def procesar_pregunta_router(pregunta: str) -> Tuple[str, Optional[pd.DataFrame]]:
-    return procesar_pregunta(pregunta)
+def procesar_pregunta_router(
+    pregunta: str, on_token: Optional[Callable[[str], None]] = None
+) -> Tuple[str, Optional[pd.DataFrame]]:
+    return procesar_pregunta(pregunta, on_token=on_token)
 
 
 if __name__ == "__main__":
@@ -12,7 +12,7 @@ import io
 from st_aggrid import AgGrid, GridOptionsBuilder, JsCode, GridUpdateMode
 
 # Importar conexión a DB
-from sql_core import ejecutar_consulta, get_db_connection
+from sql_core import ejecutar_consulta, get_db_connection, invalidar_cache_tablas, _sql_filtro_texto, _sql_score_texto
 
 # =====================================================================
 # CONFIGURACIÓN
@@ -98,6 +98,7 @@ def crear_pedido(
 
         conn.commit()
         conn.close()
+        invalidar_cache_tablas("pedidos", "pedidos_detalle", "notificaciones")
         return True, f"✅ Pedido {numero_pedido} creado correctamente", numero_pedido
 
     except Exception as e:
@@ -150,6 +151,7 @@ def marcar_notificacion_leida(notif_id: int) -> bool:
         )
         conn.commit()
         conn.close()
+        invalidar_cache_tablas("notificaciones")
         return True
     except:
         try:
@@ -212,7 +214,8 @@ def parsear_texto_pedido(texto: str) -> List[dict]:
 def sugerir_articulos_similares(texto_articulo: str, seccion: str = "") -> List[str]:
     """
     Busca artículos similares en stock.
-    - Usa ILIKE (case insensitive real)
+    - Cada palabra debe aparecer (sin importar mayúsculas/acentos)
+    - Ordena por similitud con el texto completo (pg_trgm si está disponible)
     - Incluye siempre TR como familia transversal
     """
     if not texto_articulo or len(texto_articulo.strip()) < 3:
@@ -222,17 +225,17 @@ def sugerir_articulos_similares(texto_articulo: str, seccion: str = "") -> List[
     if not palabras:
         return []
 
+    params = [texto_articulo.strip()]
     condiciones = []
-    params = []
 
     for p in palabras:
-        condiciones.append('"ARTICULO" ILIKE %s')
-        params.append(f"%{p}%")
+        condiciones.append(_sql_filtro_texto('"ARTICULO"'))
+        params.append(p)
 
     where_articulo = " AND ".join(condiciones)
 
     query = f"""
-        SELECT DISTINCT "ARTICULO"
+        SELECT "ARTICULO", MAX({_sql_score_texto('"ARTICULO"')}) AS score
         FROM stock
         WHERE {where_articulo}
     """
@@ -241,7 +244,7 @@ def sugerir_articulos_similares(texto_articulo: str, seccion: str = "") -> List[
         query += ' AND UPPER(TRIM("FAMILIA")) IN (%s, %s)'
         params.extend([seccion.upper(), 'TR'])
 
-    query += " ORDER BY 1 LIMIT 10"
+    query += ' GROUP BY "ARTICULO" ORDER BY score DESC, 1 LIMIT 10'
 
     df = ejecutar_consulta(query, tuple(params))
     if df is None or df.empty:
@@ -0,0 +1,209 @@
+# =========================
+# RASGOS_PREGUNTA.PY - EXTRACTOR ÚNICO DE RASGOS DE LA PREGUNTA
+# =========================
+"""
+Rasgos de una pregunta (años, meses, YYYY-MM, fechas, números, moneda, nro de
+factura, palabras clave) calculados UNA vez y compartidos por todos los
+intérpretes.
+
+Antes intent_detector, ia_router, ia_interpretador, ia_compras,
+ia_comparativas, ia_facturas e ia_interpretador_articulos volvían a recorrer
+la misma pregunta con sus propios _extraer_anios / _extraer_meses_* /
+_extraer_moneda / _extraer_nro_factura / _extraer_limite, y varios corren en
+la misma pregunta (router -> compras -> comparativas...).
+
+Ahora:
+    - una sola pasada de \\d+ sobre el texto arma los años, YYYY-MM, fechas y
+      números, con las dos variantes que usan los intérpretes:
+          *_libres   como re.findall(r"(2023|...|2026)") (sin \\b)
+          *_palabra  como re.findall(r"\\b(20\\d{2})\\b")   (palabra completa)
+    - meses por nombre, moneda, nro de factura y palabras clave salen del
+      mismo objeto
+    - extraer_rasgos() memoriza por texto (LRU): el segundo intérprete que
+      mira la misma pregunta no vuelve a escanear
+
+Cada intérprete sigue decidiendo orden / duplicados / límites como antes
+(ver sus _extraer_*), sólo que sobre estas tuplas. Resultados idénticos a los
+regex anteriores: ver bench/bench_rasgos_pregunta.py.
+"""
+
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Iterable, List, Optional, Tuple
+
+ANIOS_VALIDOS = frozenset({2023, 2024, 2025, 2026})
+_ANIOS_TXT = frozenset(str(a) for a in ANIOS_VALIDOS)
+_MESES_NUM = frozenset(f"{m:02d}" for m in range(1, 13))
+
+# Mismo orden que los dicts MESES de los intérpretes
+MESES_NOMBRE = (
+    "enero", "febrero", "marzo", "abril", "mayo", "junio", "julio", "agosto",
+    "septiembre", "setiembre", "octubre", "noviembre", "diciembre",
+)
+
+_MONEDAS = (
+    ("USD", ("usd", "u$s", "u$$", "dólares", "dolares", "dollar", "dólar", "dolar")),
+    ("UYU", ("pesos", "uyu", "$", "moneda nacional")),
+)
+
+PALABRAS_COMPARACION = ["comparar", "comparame", "compara", "comparacion", "comparaciones", "vs", "versus"]
+PALABRAS_STOCK = ["stock", "familia", "lote", "venc", "deposito", "depósito", "bajo", "crítico"]
+
+_RE_DIGITOS = re.compile(r"\d+")
+_RE_FACTURA = re.compile(
+    r"\b(detalle\s+)?factura(s)?\b"
+    r"|\bnro\.?\s*(comprobante|factura)\b"
+    r"|\bnro\.?\s*comprobante\b"
+    r"|\bcomprobante(s)?\b",
+    re.IGNORECASE,
+)
+_RE_NRO_FACTURA = re.compile(
+    r"\b(detalle\s+)?(factura|comprobante|nro\.?\s*comprobante|nro\.?\s*factura)\b\s*[:#-]?\s*([A-Za-z]?\d{3,})\b",
+    re.IGNORECASE,
+)
+_RE_SOLO_NRO = re.compile(r"[A-Za-z]?\d{3,}")
+
+
+@dataclass(frozen=True)
+class RasgosPregunta:
+    texto: str
+    texto_lower: str
+    anios_libres: Tuple[int, ...]       # 2023-2026 en cualquier lugar, en orden (con repetidos)
+    anios_palabra: Tuple[int, ...]      # 20xx como palabra completa, en orden
+    yyyymm_libres: Tuple[str, ...]      # (2023-2026)[-/]MM sin \b
+    yyyymm_palabra: Tuple[str, ...]     # \b20xx[-/]MM\b
+    fechas: Tuple[str, ...]             # \bYYYY-MM-DD\b
+    numeros: Tuple[int, ...]            # \b\d+\b
+    meses_nombre: Tuple[str, ...]       # nombres de mes contenidos, en orden de MESES_NOMBRE
+    moneda: Optional[str]
+    nro_factura: Optional[str]
+    menciona_factura: bool
+    menciona_comparacion: bool
+    menciona_stock: bool
+
+
+def _es_w(c: str) -> bool:
+    """Mismo criterio que \\w de re (str)."""
+    return c.isalnum() or c == "_"
+
+
+def _anios_en_corrida(s: str) -> List[int]:
+    """re.findall(r'(2023|2024|2025|2026)', s) para una corrida de dígitos."""
+    out = []
+    i, n = 0, len(s)
+    while i <= n - 4:
+        if s[i:i + 4] in _ANIOS_TXT:
+            out.append(int(s[i:i + 4]))
+            i += 4
+        else:
+            i += 1
+    return out
+
+
+def _nro_factura(texto: str) -> Optional[str]:
+    t = texto.strip()
+    m = _RE_NRO_FACTURA.search(t)
+    raw = m.group(3).strip() if m else (t if _RE_SOLO_NRO.fullmatch(t) else None)
+    if not raw:
+        return None
+    # No confundir años con números de factura
+    if raw.isdigit() and int(raw) in ANIOS_VALIDOS:
+        return None
+    return raw.upper() or None
+
+
+@lru_cache(maxsize=1024)
+def extraer_rasgos(texto: str) -> RasgosPregunta:
+    texto = str(texto or "")
+    tl = texto.lower()
+    n = len(texto)
+
+    # Corridas de dígitos: (inicio, fin, texto, borde_izq, borde_der)
+    corridas = []
+    for m in _RE_DIGITOS.finditer(texto):
+        a, b = m.span()
+        corridas.append((
+            a, b, m.group(),
+            a == 0 or not _es_w(texto[a - 1]),
+            b == n or not _es_w(texto[b]),
+        ))
+
+    anios_libres: List[int] = []
+    anios_palabra: List[int] = []
+    numeros: List[int] = []
+    yyyymm_libres: List[str] = []
+    yyyymm_palabra: List[str] = []
+    fechas: List[str] = []
+
+    usado_libre = {}        # corrida -> dígitos ya consumidos por un YYYY-MM libre
+    fin_fecha = -1
+    for i, (a, b, s, izq, der) in enumerate(corridas):
+        anios_libres.extend(_anios_en_corrida(s))
+        if izq and der:
+            numeros.append(int(s))
+            if len(s) == 4 and s.startswith("20"):
+                anios_palabra.append(int(s))
+
+        sig = corridas[i + 1] if i + 1 < len(corridas) else None
+        if sig is None or sig[0] != b + 1 or texto[b] not in "-/":
+            continue
+        sa, sb, ss, s_izq, s_der = sig
+
+        # (2023|...|2026)[-/](0[1-9]|1[0-2]) sin bordes
+        if len(s) - usado_libre.get(i, 0) >= 4 and s[-4:] in _ANIOS_TXT and ss[:2] in _MESES_NUM:
+            yyyymm_libres.append(f"{s[-4:]}-{ss[:2]}")
+            usado_libre[i + 1] = 2
+
+        # \b(20\d{2})[/-](0[1-9]|1[0-2])\b
+        if izq and len(s) == 4 and s.startswith("20") and len(ss) == 2 and s_der and ss in _MESES_NUM:
+            yyyymm_palabra.append(f"{s}-{ss}")
+
+        # \b(\d{4}-\d{2}-\d{2})\b
+        if a > fin_fecha and izq and len(s) == 4 and texto[b] == "-" and len(ss) == 2 and i + 2 < len(corridas):
+            ta, tb, ts, _, t_der = corridas[i + 2]
+            if ta == sb + 1 and texto[sb] == "-" and len(ts) == 2 and t_der:
+                fechas.append(texto[a:tb])
+                fin_fecha = tb
+
+    moneda = None
+    for cod, palabras in _MONEDAS:
+        if any(p in tl for p in palabras):
+            moneda = cod
+            break
+
+    return RasgosPregunta(
+        texto=texto,
+        texto_lower=tl,
+        anios_libres=tuple(anios_libres),
+        anios_palabra=tuple(anios_palabra),
+        yyyymm_libres=tuple(yyyymm_libres),
+        yyyymm_palabra=tuple(yyyymm_palabra),
+        fechas=tuple(fechas),
+        numeros=tuple(numeros),
+        meses_nombre=tuple(m for m in MESES_NOMBRE if m in tl),
+        moneda=moneda,
+        nro_factura=_nro_factura(texto) if texto else None,
+        menciona_factura=bool(_RE_FACTURA.search(tl)),
+        menciona_comparacion=any(p in tl for p in PALABRAS_COMPARACION),
+        menciona_stock=any(p in tl for p in PALABRAS_STOCK),
+    )
+
+
+def unicos(valores: Iterable, limite: Optional[int] = None) -> list:
+    """Sin repetidos, respetando el orden de aparición (y cortando en `limite`)."""
+    out = list(dict.fromkeys(valores))
+    return out if limite is None else out[:limite]
+
+
+def limite_de(rasgos: RasgosPregunta, predeterminado: int = 500) -> int:
+    """Primer número > 0 de la pregunta (top N, últimas N, ...)."""
+    for n in rasgos.numeros:
+        if n > 0:
+            return n
+    return predeterminado
+
+
+def rango_fechas_de(rasgos: RasgosPregunta) -> Tuple[Optional[str], Optional[str]]:
+    f = rasgos.fechas
+    return (f[0] if f else None), (f[1] if len(f) >= 2 else None)
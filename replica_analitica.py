@@ -0,0 +1,582 @@
+# =========================
+# REPLICA_ANALITICA.PY - RÉPLICA COLUMNAR (DUCKDB) DE chatbot_raw
+# =========================
+"""
+Copia local de chatbot_raw en DuckDB para las consultas analíticas pesadas
+(comparativas de varios años, variación por artículo, histórico de precios,
+dashboard). Mientras está al día esas consultas corren en el proceso: no
+pagan la latencia de red ni compiten con las escrituras en Supabase.
+
+Sincronización (hilo de fondo, uno por proceso):
+    - carga completa con iterar_consulta (por bloques) a una tabla nueva que
+      reemplaza a la anterior en una transacción
+    - cada REPLICA_POLL_SEG sólo los deltas, igual que snapshot_tablas.py:
+          SELECT * FROM chatbot_raw WHERE fc_updated_at > marca - solape
+          SELECT fc_id FROM fc_borrados WHERE tabla = 'chatbot_raw' AND ...
+    - recarga completa si hubo TRUNCATE, si cambió el esquema o cada
+      REPLICA_RECARGA_HORAS (cubre imports con triggers desactivados y la
+      purga de fc_borrados)
+
+Requiere duckdb, las columnas tipadas (monto_num, mes_key, anio, ...) y la
+migración de deltas (sql_migraciones.aplicar_replica_delta). Sin eso todo
+sigue yendo a Postgres.
+
+"Fresca" = la última sincronización terminó hace menos de
+REPLICA_MAX_ATRASO_SEG y la versión de chatbot_raw en el cache de consultas
+no cambió desde que empezó (una escritura de esta app o un import externo
+visto por fc_tabla_versiones la deja vieja hasta el próximo delta).
+
+Uso (ver sql_comparativas / sql_compras):
+    df = ejecutar_analitica(lambda f: (sql_armado_con(f), params))
+El armador recibe una FuenteAgregados: la de la réplica (chatbot_raw con
+columnas tipadas) o la de Postgres (_sql_fuente_agregados, rollup si existe).
+El SQL se escribe para Postgres: %s / %% se traducen y DuckDB se configura
+con el orden de NULL y la capitalización de nombres de Postgres.
+
+Configuración (env vars o st.secrets, ver config_runtime.get_secret):
+    REPLICA_ANALITICA       1 para activar (def. 0)
+    REPLICA_PATH            archivo DuckDB (def. <tmp>/fertichat_replica.duckdb;
+                            ":memory:" = sin persistencia entre reinicios)
+    REPLICA_POLL_SEG        cada cuánto traer deltas (def. 15)
+    REPLICA_MAX_ATRASO_SEG  atraso máximo para usarla (def. 120)
+    REPLICA_SOLAPE_SEG      solape de la marca de agua (def. 30)
+    REPLICA_RECARGA_HORAS   recarga completa periódica (def. 12)
+"""
+
+import os
+import re
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from cache_consultas import get_cache_consultas, tablas_leidas
+from config_runtime import get_secret, get_secret_num
+from sql_core import (
+    FuenteAgregados,
+    _sql_fuente_agregados,
+    columnas_tipadas_disponibles,
+    db_conexion,
+    ejecutar_consulta,
+    ejecutar_consultas,
+    iterar_consulta,
+    replica_delta_disponible,
+)
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+
+TABLA = "chatbot_raw"
+
+# information_schema.columns.data_type -> tipo DuckDB (lo demás va como texto)
+_TIPOS_DUCKDB = {
+    "text": "VARCHAR",
+    "character varying": "VARCHAR",
+    "character": "VARCHAR",
+    "smallint": "INTEGER",
+    "integer": "INTEGER",
+    "bigint": "BIGINT",
+    "real": "DOUBLE",
+    "double precision": "DOUBLE",
+    "date": "DATE",
+    "timestamp without time zone": "TIMESTAMP",
+    "timestamp with time zone": "TIMESTAMPTZ",
+    "boolean": "BOOLEAN",
+}
+
+# Mismo comportamiento que Postgres para el SQL de las consultas
+_SQL_SESION = [
+    "SET preserve_identifier_case = false",                      # alias sin comillas en minúscula
+    "SET default_null_order = 'nulls_last_on_asc_first_on_desc'",
+]
+
+# _sql_filtro_texto usa fc_norm_busqueda() si está la migración trigram
+_SQL_MACROS = """
+    CREATE OR REPLACE MACRO fc_norm_busqueda(t) AS lower(strip_accents(trim(t)));
+"""
+
+_RE_PLACEHOLDER = re.compile(r"%(%|s)")
+
+
+def _sql_duckdb(sql: str) -> str:
+    """Placeholders de psycopg2 -> DuckDB: %s -> ?, %% -> %."""
+    return _RE_PLACEHOLDER.sub(lambda m: "?" if m.group(1) == "s" else "%", sql)
+
+
+def _q(col: str) -> str:
+    return '"' + str(col).replace('"', '""') + '"'
+
+
+def fuente_replica() -> FuenteAgregados:
+    """chatbot_raw de la réplica: mismas expresiones que Postgres, sobre las columnas tipadas."""
+    return FuenteAgregados(
+        tabla=TABLA,
+        es_rollup=False,
+        proveedor='TRIM("Cliente / Proveedor")',
+        articulo='TRIM("Articulo")',
+        col_proveedor='"Cliente / Proveedor"',
+        col_articulo='"Articulo"',
+        familia='TRIM("Familia")',
+        moneda='TRIM("Moneda")',
+        mes="mes_key",
+        anio="anio",
+        es_compra='("Tipo Comprobante" = \'Compra Contado\' OR "Tipo Comprobante" LIKE \'Compra%%\')',
+        monto="monto_num",
+        monto_pesos="monto_num",
+        monto_usd="monto_num",
+        cantidad="cantidad_num",
+        lineas="1",
+        fecha='"Fecha"',
+    )
+
+
+class ReplicaAnalitica:
+    """chatbot_raw en DuckDB, al día con deltas por fc_updated_at desde un hilo de fondo."""
+
+    def __init__(
+        self,
+        path: str,
+        poll_seg: float = 15.0,
+        max_atraso_seg: float = 120.0,
+        solape_seg: float = 30.0,
+        recarga_horas: float = 12.0,
+    ):
+        self.path = path
+        self.poll_seg = float(poll_seg)
+        self.max_atraso_seg = float(max_atraso_seg)
+        self.solape_seg = float(solape_seg)
+        self.recarga_seg = float(recarga_horas) * 3600.0
+
+        self._lock = threading.RLock()
+        self._con = None
+        self._marca = None              # now() de Postgres en la última lectura
+        self._cargada_at = None         # now() de Postgres en la última carga completa
+        self._columnas: List[Tuple[str, str]] = []
+        self._ultima_sync: Optional[float] = None
+        self._foto_versiones = None
+        self._hilo: Optional[threading.Thread] = None
+        self._despertar = threading.Event()
+
+        self._stats = {
+            "cargas_completas": 0,
+            "deltas": 0,
+            "filas_delta": 0,
+            "borradas_delta": 0,
+            "consultas": 0,
+            "a_postgres": 0,
+            "errores": 0,
+        }
+
+    # -----------------------------------------------------------------
+    # DuckDB
+    # -----------------------------------------------------------------
+    def _abrir(self) -> None:
+        try:
+            con = duckdb.connect(self.path)
+        except Exception as e:
+            # Archivo tomado por otro proceso, permisos, etc.: réplica en memoria
+            print(f"⚠️ Réplica: no se pudo abrir {self.path} ({e}), uso memoria")
+            self.path = ":memory:"
+            con = duckdb.connect(":memory:")
+        for sql in _SQL_SESION:
+            con.execute(sql.replace("SET ", "SET GLOBAL ", 1))
+        con.execute(_SQL_MACROS)
+        con.execute("""
+            CREATE TABLE IF NOT EXISTS fc_replica_estado (
+                tabla      VARCHAR PRIMARY KEY,
+                marca      VARCHAR,
+                cargada_at VARCHAR,
+                columnas   VARCHAR
+            )
+        """)
+        fila = con.execute(
+            "SELECT marca, cargada_at, columnas FROM fc_replica_estado WHERE tabla = ?", [TABLA]
+        ).fetchone()
+        if fila and fila[0] is not None:
+            # Réplica persistida de una corrida anterior: seguir con deltas.
+            # Las marcas van como texto ISO (leer TIMESTAMPTZ de DuckDB pide pytz)
+            self._marca = datetime.fromisoformat(fila[0])
+            self._cargada_at = datetime.fromisoformat(fila[1]) if fila[1] else None
+            self._columnas = [tuple(c.split("\t", 1)) for c in (fila[2] or "").split("\n") if c]
+        self._con = con
+
+    def _cursor(self):
+        with self._lock:
+            cur = self._con.cursor()
+        for sql in _SQL_SESION:
+            cur.execute(sql)
+        return cur
+
+    def _guardar_estado(self, cur) -> None:
+        cur.execute(
+            "INSERT OR REPLACE INTO fc_replica_estado VALUES (?, ?, ?, ?)",
+            [
+                TABLA,
+                self._marca.isoformat() if self._marca is not None else None,
+                self._cargada_at.isoformat() if self._cargada_at is not None else None,
+                "\n".join(f"{n}\t{t}" for n, t in self._columnas),
+            ],
+        )
+
+    # -----------------------------------------------------------------
+    # Postgres
+    # -----------------------------------------------------------------
+    @staticmethod
+    def _columnas_pg() -> List[Tuple[str, str]]:
+        """[(columna, tipo DuckDB)] de chatbot_raw en Postgres."""
+        with db_conexion() as conn:
+            if conn is None:
+                raise RuntimeError("sin conexión")
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    SELECT column_name, data_type, numeric_precision, numeric_scale
+                    FROM information_schema.columns
+                    WHERE table_schema = current_schema() AND table_name = %s
+                    ORDER BY ordinal_position
+                    """,
+                    (TABLA,),
+                )
+                filas = cur.fetchall()
+            conn.rollback()
+        columnas = []
+        for nombre, tipo, precision, escala in filas:
+            if tipo == "numeric":
+                # NUMERIC sin precisión: sumas exactas como en Postgres
+                tipo_db = f"DECIMAL({min(int(precision), 38)},{int(escala or 0)})" if precision else "DECIMAL(38,6)"
+            else:
+                tipo_db = _TIPOS_DUCKDB.get(tipo, "VARCHAR")
+            columnas.append((nombre, tipo_db))
+        return columnas
+
+    @staticmethod
+    def _now_db():
+        with db_conexion() as conn:
+            if conn is None:
+                raise RuntimeError("sin conexión")
+            with conn.cursor() as cur:
+                cur.execute("SELECT now()")
+                marca = cur.fetchone()[0]
+            conn.rollback()
+        return marca
+
+    def _insertar(self, cur, tabla: str, df: pd.DataFrame) -> None:
+        """Inserta un bloque (DataFrame de psycopg2) en una tabla de la réplica."""
+        if df is None or df.empty:
+            return
+        df = df.copy()
+        for nombre, tipo in self._columnas:
+            if nombre not in df.columns:
+                df[nombre] = None
+            elif tipo.startswith("DECIMAL") and df[nombre].dtype == object:
+                # Decimal de psycopg2: DuckDB los lee como texto exacto
+                df[nombre] = df[nombre].map(lambda v: None if v is None else str(v))
+            elif tipo == "VARCHAR" and df[nombre].dtype == object:
+                df[nombre] = df[nombre].map(lambda v: v if v is None or isinstance(v, str) else str(v))
+        cols = ", ".join(_q(n) for n, _ in self._columnas)
+        cur.register("_fc_bloque", df)
+        try:
+            cur.execute(
+                f"INSERT INTO {_q(tabla)} ({cols}) SELECT "
+                + ", ".join(f"CAST({_q(n)} AS {t})" for n, t in self._columnas)
+                + " FROM _fc_bloque"
+            )
+        finally:
+            cur.unregister("_fc_bloque")
+
+    # -----------------------------------------------------------------
+    # Sincronización
+    # -----------------------------------------------------------------
+    def _cargar_completo(self) -> None:
+        t0 = time.perf_counter()
+        marca = self._now_db()
+        self._columnas = self._columnas_pg()
+        if not any(n == "fc_id" for n, _ in self._columnas):
+            raise RuntimeError("chatbot_raw sin fc_id (falta sql_migraciones.aplicar_replica_delta)")
+
+        nueva = f"{TABLA}__carga"
+        cur = self._cursor()
+        try:
+            cur.execute(f"DROP TABLE IF EXISTS {_q(nueva)}")
+            cur.execute(
+                f"CREATE TABLE {_q(nueva)} ("
+                + ", ".join(f"{_q(n)} {t}" for n, t in self._columnas)
+                + ")"
+            )
+            filas = 0
+            for bloque in iterar_consulta(f'SELECT * FROM "{TABLA}"'):
+                self._insertar(cur, nueva, bloque)
+                filas += len(bloque)
+
+            # Cambio atómico: las consultas en curso siguen viendo la tabla anterior
+            cur.execute("BEGIN TRANSACTION")
+            cur.execute(f"DROP TABLE IF EXISTS {_q(TABLA)}")
+            cur.execute(f"ALTER TABLE {_q(nueva)} RENAME TO {_q(TABLA)}")
+            self._marca = marca
+            self._cargada_at = marca
+            self._guardar_estado(cur)
+            cur.execute("COMMIT")
+        except Exception:
+            try:
+                cur.execute("ROLLBACK")
+            except Exception:
+                pass
+            raise
+        finally:
+            cur.close()
+
+        self._contar("cargas_completas")
+        print(f"🦆 Réplica {TABLA}: {filas} filas ({(time.perf_counter() - t0) * 1000:.0f} ms, {self.path})")
+
+    def _aplicar_delta(self) -> None:
+        """Trae filas cambiadas y borradas desde la marca (recarga todo si hubo TRUNCATE)."""
+        desde = self._marca - timedelta(seconds=self.solape_seg)
+        with db_conexion() as conn:
+            if conn is None:
+                raise RuntimeError("sin conexión")
+            with conn.cursor() as cur:
+                cur.execute("SELECT now()")
+                marca_nueva = cur.fetchone()[0]
+
+                cur.execute(f'SELECT * FROM "{TABLA}" WHERE fc_updated_at > %s', (desde,))
+                cols = [d[0] for d in cur.description]
+                cambiadas = pd.DataFrame(cur.fetchall(), columns=cols)
+
+                cur.execute(
+                    "SELECT DISTINCT fc_id FROM fc_borrados WHERE tabla = %s AND borrado_at > %s",
+                    (TABLA, desde),
+                )
+                borradas = [r[0] for r in cur.fetchall()]
+            conn.rollback()
+
+        # fc_id < 0 = TRUNCATE; columnas distintas = cambió el esquema
+        if any(b is not None and b < 0 for b in borradas) or [c for c, _ in self._columnas] != cols:
+            self._cargar_completo()
+            return
+
+        quitar = set(b for b in borradas if b is not None)
+        if not cambiadas.empty:
+            quitar.update(int(i) for i in cambiadas["fc_id"].tolist())
+
+        cur = self._cursor()
+        try:
+            cur.execute("BEGIN TRANSACTION")
+            if quitar:
+                cur.register("_fc_quitar", pd.DataFrame({"fc_id": sorted(quitar)}, dtype="int64"))
+                cur.execute(f"DELETE FROM {_q(TABLA)} WHERE fc_id IN (SELECT fc_id FROM _fc_quitar)")
+                cur.unregister("_fc_quitar")
+            self._insertar(cur, TABLA, cambiadas)
+            self._marca = marca_nueva
+            self._guardar_estado(cur)
+            cur.execute("COMMIT")
+        except Exception:
+            try:
+                cur.execute("ROLLBACK")
+            except Exception:
+                pass
+            raise
+        finally:
+            cur.close()
+
+        if not cambiadas.empty or borradas:
+            with self._lock:
+                self._stats["deltas"] += 1
+                self._stats["filas_delta"] += len(cambiadas)
+                self._stats["borradas_delta"] += len(borradas)
+            print(f"🔄 Réplica {TABLA}: {len(cambiadas)} filas cambiadas, {len(borradas)} borradas")
+
+    def sincronizar(self) -> bool:
+        """Una pasada: carga completa o delta. True si la réplica quedó al día."""
+        foto = get_cache_consultas().versiones([TABLA], refrescar=True)
+        try:
+            if self._con is None:
+                self._abrir()
+            vieja = (
+                self._marca is None
+                or self._cargada_at is None
+                or (datetime.now(timezone.utc) - self._cargada_at).total_seconds() >= self.recarga_seg
+            )
+            if vieja:
+                self._cargar_completo()
+            else:
+                self._aplicar_delta()
+        except Exception as e:
+            self._contar("errores")
+            print(f"⚠️ Réplica {TABLA}: sincronización falló ({e})")
+            return False
+
+        with self._lock:
+            self._ultima_sync = time.monotonic()
+            self._foto_versiones = foto
+        return True
+
+    def _bucle(self) -> None:
+        while True:
+            self.sincronizar()
+            self._despertar.wait(self.poll_seg)
+            self._despertar.clear()
+
+    def iniciar(self) -> None:
+        """Arranca el hilo de sincronización (una vez)."""
+        with self._lock:
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._bucle, name="fc-replica", daemon=True)
+                self._hilo.start()
+
+    def despertar(self) -> None:
+        """Pide un delta ya (ej. después de un import)."""
+        self._despertar.set()
+
+    # -----------------------------------------------------------------
+    # Lectura
+    # -----------------------------------------------------------------
+    def fresca(self) -> bool:
+        with self._lock:
+            if self._ultima_sync is None or self._con is None:
+                return False
+            if time.monotonic() - self._ultima_sync > self.max_atraso_seg:
+                return False
+            foto = self._foto_versiones
+        return get_cache_consultas().versiones([TABLA], refrescar=True) == foto
+
+    def consultar(self, sql: str, params: tuple = ()) -> Optional[pd.DataFrame]:
+        """Ejecuta SQL (escrito para Postgres) en la réplica. None si falla."""
+        # Mismo cache que ejecutar_consulta, con clave aparte (DuckDB da float, no Decimal)
+        cache = get_cache_consultas()
+        clave = cache.clave(sql, params) if cache.habilitado else None
+        if clave is not None:
+            clave = ("duckdb|" + clave[0], clave[1])
+            df = cache.obtener(clave)
+            if df is not None:
+                print(f"⚡ Cache SQL (réplica): {len(df)} filas")
+                return df
+            foto = cache.versiones(tablas_leidas(sql))
+
+        t0 = time.perf_counter()
+        cur = None
+        try:
+            cur = self._cursor()
+            df = cur.execute(_sql_duckdb(sql), list(params or ())).df()
+        except Exception as e:
+            self._contar("errores")
+            print(f"⚠️ Réplica: consulta falló, voy a Postgres ({e})")
+            return None
+        finally:
+            if cur is not None:
+                cur.close()
+        self._contar("consultas")
+        if clave is not None:
+            cache.guardar(clave, df, foto)
+        print(f"🦆 Réplica: {len(df)} filas en {(time.perf_counter() - t0) * 1000:.0f} ms")
+        return df
+
+    def _contar(self, clave: str) -> None:
+        with self._lock:
+            self._stats[clave] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            data = dict(self._stats)
+            data["path"] = self.path
+            data["marca"] = str(self._marca) if self._marca is not None else None
+            data["atraso_seg"] = (
+                round(time.monotonic() - self._ultima_sync, 1) if self._ultima_sync is not None else None
+            )
+        data["fresca"] = self.fresca()
+        return data
+
+
+# =====================================================================
+# RÉPLICA DEL PROCESO
+# =====================================================================
+
+_REPLICA: Optional[ReplicaAnalitica] = None
+_REPLICA_LOCK = threading.Lock()
+_REPLICA_DESCARTADA = False
+
+
+def get_replica() -> Optional[ReplicaAnalitica]:
+    """Réplica del proceso (arranca su hilo), o None si no está activada o no se puede usar."""
+    global _REPLICA, _REPLICA_DESCARTADA
+    if _REPLICA is not None or _REPLICA_DESCARTADA:
+        return _REPLICA
+    with _REPLICA_LOCK:
+        if _REPLICA is not None or _REPLICA_DESCARTADA:
+            return _REPLICA
+        flag = str(get_secret("REPLICA_ANALITICA", "0") or "0").strip().lower()
+        if flag in ("0", "false", "no", ""):
+            _REPLICA_DESCARTADA = True
+            return None
+        if duckdb is None:
+            print("ℹ️ Réplica analítica: duckdb no instalado")
+            _REPLICA_DESCARTADA = True
+            return None
+        if not (columnas_tipadas_disponibles() and replica_delta_disponible()):
+            print("ℹ️ Réplica analítica: faltan columnas tipadas o deltas de chatbot_raw (ver sql_migraciones)")
+            _REPLICA_DESCARTADA = True
+            return None
+
+        path = str(get_secret("REPLICA_PATH", "") or "") or os.path.join(
+            tempfile.gettempdir(), "fertichat_replica.duckdb"
+        )
+        _REPLICA = ReplicaAnalitica(
+            path,
+            poll_seg=get_secret_num("REPLICA_POLL_SEG", 15.0, float),
+            max_atraso_seg=get_secret_num("REPLICA_MAX_ATRASO_SEG", 120.0, float),
+            solape_seg=get_secret_num("REPLICA_SOLAPE_SEG", 30.0, float),
+            recarga_horas=get_secret_num("REPLICA_RECARGA_HORAS", 12.0, float),
+        )
+        _REPLICA.iniciar()
+    return _REPLICA
+
+
+def get_replica_stats() -> dict:
+    return {} if _REPLICA is None else _REPLICA.stats()
+
+
+# =====================================================================
+# RUTEO DE CONSULTAS ANALÍTICAS
+# =====================================================================
+
+ArmadorSQL = Callable[[FuenteAgregados], Tuple[str, tuple]]
+
+
+def ejecutar_analitica(armar: ArmadorSQL, monto_expr: Optional[str] = None) -> pd.DataFrame:
+    """
+    armar(f) -> (sql, params). Corre en la réplica si está fresca; si no (o si
+    falla) arma el SQL con _sql_fuente_agregados(monto_expr) y va a Postgres.
+    """
+    replica = get_replica()
+    if replica is not None and replica.fresca():
+        sql, params = armar(fuente_replica())
+        df = replica.consultar(sql, params)
+        if df is not None:
+            return df
+    if replica is not None:
+        replica._contar("a_postgres")
+    return ejecutar_consulta(*armar(_sql_fuente_agregados(monto_expr)))
+
+
+def ejecutar_analiticas(armadores: Dict[str, ArmadorSQL]) -> Dict[str, pd.DataFrame]:
+    """Lote de ejecutar_analitica: todo en la réplica, o a Postgres con ejecutar_consultas (paralelo)."""
+    replica = get_replica()
+    if replica is not None and replica.fresca():
+        f = fuente_replica()
+        resultados = {}
+        for nombre, armar in armadores.items():
+            df = replica.consultar(*armar(f))
+            if df is None:
+                break
+            resultados[nombre] = df
+        else:
+            return resultados
+    if replica is not None:
+        replica._contar("a_postgres")
+    f = _sql_fuente_agregados()
+    return ejecutar_consultas({nombre: armar(f) for nombre, armar in armadores.items()})
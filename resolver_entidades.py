@@ -0,0 +1,378 @@
+# =========================
+# RESOLVER_ENTIDADES.PY - ÍNDICE EN MEMORIA DE PROVEEDORES / ARTÍCULOS
+# =========================
+"""
+Resolver compartido de entidades (proveedores y artículos) para los intérpretes IA.
+
+Antes cada intérprete (ia_interpretador, ia_router, ia_compras, ia_comparativas,
+ia_stock) recorría TODO el catálogo por cada token de la pregunta, con su propio
+puntaje. Acá el catálogo se indexa UNA vez por proceso (se reconstruye cada hora):
+
+    - clave completa normalizada  -> ids        (match exacto)
+    - palabra normalizada         -> ids        (índice invertido de tokens)
+    - trigrama de la clave        -> ids        (substring / prefijo)
+    - trigrama de la palabra      -> palabras   (fuzzy, opcional)
+
+Un token se resuelve buscando la lista de trigramas más corta y verificando
+`token in clave` sólo sobre esos candidatos. Los mejores candidatos de cada
+token quedan memorizados (LRU acotado): las palabras repetidas entre preguntas
+("reactivo", "roche") no se vuelven a puntuar.
+
+El ranking es EL MISMO que tenían los _match_best de cada intérprete
+(bench/bench_resolver_entidades.py lo verifica contra copias de esas funciones):
+    modo "max" (ia_interpretador, ia_compras, ia_stock, ia_comparativas):
+        exacto (clave == token) primero, en orden de catálogo (exacto=False
+        lo saltea, como ia_comparativas); después, por entidad, el mejor
+        len(token) * 1000 - len(clave) entre sus tokens; empate -> alfabético
+    modo "suma" (ia_router):
+        suma de len(token) de cada token contenido; empate -> primer token
+        que la encontró, después orden de catálogo
+    fuzzy (sólo si se pide y el token no aparece como substring):
+        similitud de trigramas * len(token) * 1000 - 1000 - len(clave)
+
+CANDIDATOS_POR_TOKEN sólo acota lo que se memoriza por token: si con esa
+lista no alcanza para asegurar los max_items mejores (por ejemplo porque
+`excluir` descartó casi todos), ese token se vuelve a puntuar completo.
+"""
+
+import hashlib
+import heapq
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict, defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+NGRAMA = 3
+TTL_INDICES = 60 * 60
+UMBRAL_FUZZY = 0.5
+CANDIDATOS_POR_TOKEN = 200
+MEMO_TOKENS = 4096
+
+
+# =====================================================================
+# NORMALIZACIÓN (misma que usan los intérpretes)
+# =====================================================================
+def _strip_accents(s: str) -> str:
+    if not s:
+        return ""
+    return "".join(
+        c for c in unicodedata.normalize("NFD", s)
+        if unicodedata.category(c) != "Mn"
+    )
+
+
+def normalizar_clave(s: str) -> str:
+    """ "ROCHE URUGUAY S.A." -> "rocheuruguaysa" """
+    s = _strip_accents((s or "").lower().strip())
+    return re.sub(r"[^a-z0-9]+", "", s)
+
+
+def _palabras(s: str) -> List[str]:
+    raw = re.findall(r"[a-zA-ZáéíóúñÁÉÍÓÚÑ0-9]+", (s or "").lower())
+    return [k for k in (normalizar_clave(t) for t in raw) if k]
+
+
+def _ngramas(s: str) -> List[str]:
+    if len(s) < NGRAMA:
+        return [s] if s else []
+    return [s[i:i + NGRAMA] for i in range(len(s) - NGRAMA + 1)]
+
+
+# =====================================================================
+# ÍNDICE
+# =====================================================================
+class IndiceEntidades(list):
+    """
+    Catálogo indexado. Sigue siendo una lista de (original, clave) para el
+    código que la recorre; `buscar()` usa los índices.
+    """
+
+    def __init__(self, nombres: Iterable[str] = ()):
+        super().__init__((n, normalizar_clave(n)) for n in nombres if n)
+
+        self._por_clave: Dict[str, List[int]] = defaultdict(list)
+        self._por_palabra: Dict[str, set] = defaultdict(set)
+        self._por_ngrama: Dict[str, List[int]] = defaultdict(list)
+        self._ngrama_palabras: Optional[Dict[str, set]] = None
+        self._memo: "OrderedDict[Tuple[str, bool], List[Tuple[int, int]]]" = OrderedDict()
+        self._memo_lock = threading.Lock()
+
+        for i, (orig, clave) in enumerate(self):
+            if not clave:
+                continue
+            self._por_clave[clave].append(i)
+            for p in _palabras(orig):
+                self._por_palabra[p].add(i)
+            for g in set(_ngramas(clave)):
+                self._por_ngrama[g].append(i)
+
+    @classmethod
+    def desde_pares(cls, pares: Iterable[Tuple[str, str]]) -> "IndiceEntidades":
+        return cls(orig for orig, _ in pares)
+
+    # -----------------------------------------------------------------
+    # Búsqueda
+    # -----------------------------------------------------------------
+    def _candidatos_substring(self, tk: str) -> List[int]:
+        if len(tk) < NGRAMA:
+            # Más corto que un trigrama: no hay índice que sirva
+            return [i for i, (_, clave) in enumerate(self) if tk and tk in clave]
+        grams = _ngramas(tk)
+        listas = []
+        for g in grams:
+            ids = self._por_ngrama.get(g)
+            if not ids:
+                return []
+            listas.append(ids)
+        base = min(listas, key=len)
+        return [i for i in base if tk in self[i][1]]
+
+    def _puntaje(self, tk: str, i: int) -> int:
+        return len(tk) * 1000 - len(self[i][1])
+
+    def _candidatos_fuzzy(self, tk: str) -> Dict[int, int]:
+        if self._ngrama_palabras is None:
+            idx: Dict[str, set] = defaultdict(set)
+            for palabra in self._por_palabra:
+                for g in set(_ngramas(palabra)):
+                    idx[g].add(palabra)
+            self._ngrama_palabras = idx
+
+        grams_tk = set(_ngramas(tk))
+        comunes: Dict[str, int] = defaultdict(int)
+        for g in grams_tk:
+            for palabra in self._ngrama_palabras.get(g, ()):
+                comunes[palabra] += 1
+
+        out: Dict[int, int] = {}
+        for palabra, n in comunes.items():
+            union = len(grams_tk) + len(set(_ngramas(palabra))) - n
+            sim = n / union if union else 0.0
+            if sim < UMBRAL_FUZZY:
+                continue
+            for i in self._por_palabra[palabra]:
+                score = int(sim * len(tk) * 1000) - 1000 - len(self[i][1])
+                if score > out.get(i, -10**9):
+                    out[i] = score
+        return out
+
+    def _puntajes_token(self, tk: str, fuzzy: bool) -> List[Tuple[int, int]]:
+        ids = self._candidatos_substring(tk)
+        if ids:
+            return [(self._puntaje(tk, i), i) for i in ids]
+        if fuzzy:
+            return [(s, i) for i, s in self._candidatos_fuzzy(tk).items()]
+        return []
+
+    def _orden(self, x: Tuple[int, int]) -> Tuple[int, str]:
+        return (-x[0], self[x[1]][0])
+
+    def _mejores_token(self, tk: str, fuzzy: bool, completo: bool = False) -> Tuple[List[Tuple[int, int]], bool]:
+        """
+        ([(score, id)] de mejor a peor, True si la lista está completa).
+        Memoriza hasta CANDIDATOS_POR_TOKEN; completo=True devuelve todos (sin memo).
+        """
+        if completo:
+            return sorted(self._puntajes_token(tk, fuzzy), key=self._orden), True
+
+        clave_memo = (tk, fuzzy)
+        with self._memo_lock:
+            res = self._memo.get(clave_memo)
+            if res is not None:
+                self._memo.move_to_end(clave_memo)
+                return res
+
+        puntajes = self._puntajes_token(tk, fuzzy)
+        res = (heapq.nsmallest(CANDIDATOS_POR_TOKEN, puntajes, key=self._orden),
+               len(puntajes) <= CANDIDATOS_POR_TOKEN)
+
+        with self._memo_lock:
+            self._memo[clave_memo] = res
+            if len(self._memo) > MEMO_TOKENS:
+                self._memo.popitem(last=False)
+        return res
+
+    def buscar(
+        self,
+        tokens: List[str],
+        max_items: int = 1,
+        excluir: Optional[Callable[[str], bool]] = None,
+        fuzzy: bool = False,
+        exacto: bool = True,
+        modo: str = "max",
+    ) -> List[str]:
+        """
+        Mejores entidades para los tokens (ya normalizados con normalizar_clave).
+        `excluir(original) -> True` descarta candidatos; `fuzzy` tolera errores de tipeo.
+        `exacto` y `modo` ("max" / "suma") reproducen cada _match_best anterior.
+        """
+        if not tokens or not self:
+            return []
+
+        def _ok(i: int) -> bool:
+            return excluir is None or not excluir(self[i][0])
+
+        if modo == "suma":
+            return self._buscar_suma(tokens, max_items, _ok)
+
+        # 1) Exacto
+        if exacto:
+            exactos = sorted({i for tk in set(tokens) for i in self._por_clave.get(tk, ()) if _ok(i)})
+            if exactos:
+                return [self[i][0] for i in exactos[:max_items]]
+
+        # 2) Substring; 3) fuzzy sólo si el token no aparece como substring.
+        # Cada entidad queda con su mejor puntaje: alcanzan los max_items
+        # mejores (que pasen `excluir`) de cada token.
+        mejor: Dict[int, int] = {}
+        for tk in dict.fromkeys(tokens):
+            lista, completa = self._mejores_token(tk, fuzzy)
+            if not completa and sum(1 for _, i in lista if _ok(i)) < max_items:
+                lista, _ = self._mejores_token(tk, fuzzy, completo=True)
+            tomados = 0
+            for s, i in lista:
+                if not _ok(i):
+                    continue
+                if s > mejor.get(i, -10**9):
+                    mejor[i] = s
+                tomados += 1
+                if tomados >= max_items:
+                    break
+
+        ranking = sorted(((s, i) for i, s in mejor.items()), key=self._orden)
+        return [self[i][0] for _, i in ranking[:max_items]]
+
+    def _buscar_suma(self, tokens: List[str], max_items: int, ok: Callable[[int], bool]) -> List[str]:
+        """ia_router: suma len(token) por cada token contenido (tokens repetidos suman de nuevo)."""
+        scores: Dict[int, int] = {}
+        for tk in tokens:
+            if not tk:
+                continue
+            for i in self._candidatos_substring(tk):
+                if ok(i):
+                    scores[i] = scores.get(i, 0) + len(tk)
+        ranking = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
+        return [self[i][0] for i, _ in ranking[:max_items]]
+
+
+def match_tokens(
+    index,
+    tokens: List[str],
+    max_items: int = 1,
+    excluir: Optional[Callable[[str], bool]] = None,
+    fuzzy: bool = False,
+    exacto: bool = True,
+    modo: str = "max",
+) -> List[str]:
+    """Atajo para los intérpretes: acepta IndiceEntidades o lista de (original, clave)."""
+    if not index:
+        return []
+    if not isinstance(index, IndiceEntidades):
+        index = IndiceEntidades.desde_pares(index)
+    return index.buscar(tokens, max_items=max_items, excluir=excluir, fuzzy=fuzzy, exacto=exacto, modo=modo)
+
+
+# =====================================================================
+# CARGA DEL CATÁLOGO (SUPABASE) + ÍNDICES DEL PROCESO
+# =====================================================================
+def cargar_listas_entidades() -> Dict[str, List[str]]:
+    """Proveedores y artículos desde Supabase (listas únicas y ordenadas)."""
+    proveedores: List[str] = []
+    articulos: List[str] = []
+
+    try:
+        from supabase_client import supabase  # type: ignore
+        if supabase is None:
+            return {"proveedores": [], "articulos": []}
+
+        for col in ["nombre", "Nombre", "NOMBRE"]:
+            try:
+                res = supabase.table("proveedores").select(col).execute()
+                data = res.data or []
+                proveedores = [str(r.get(col)).strip() for r in data if r.get(col)]
+                if proveedores:
+                    break
+            except Exception:
+                continue
+
+        for col in ["Descripción", "Descripcion", "descripcion", "DESCRIPCION", "DESCRIPCIÓN"]:
+            try:
+                res = supabase.table("articulos").select(col).execute()
+                data = res.data or []
+                articulos = [str(r.get(col)).strip() for r in data if r.get(col)]
+                if articulos:
+                    break
+            except Exception:
+                continue
+
+    except Exception:
+        return {"proveedores": [], "articulos": []}
+
+    proveedores = sorted(list(set([p for p in proveedores if p])))
+    articulos = sorted(list(set([a for a in articulos if a])))
+    return {"proveedores": proveedores, "articulos": articulos}
+
+
+_CACHE: Dict[str, object] = {"listas": None, "indices": None, "ts": 0.0, "version": ""}
+_CACHE_LOCK = threading.Lock()
+
+
+def _version_listas(listas: Dict[str, List[str]]) -> str:
+    h = hashlib.sha1()
+    for clave in ("proveedores", "articulos"):
+        for nombre in listas.get(clave) or []:
+            h.update(nombre.encode("utf-8", "replace"))
+            h.update(b"\0")
+        h.update(b"\1")
+    return h.hexdigest()[:16]
+
+
+def _refrescar_si_vencido() -> None:
+    ahora = time.monotonic()
+    if _CACHE["indices"] is not None and (ahora - _CACHE["ts"]) < TTL_INDICES:
+        return
+    with _CACHE_LOCK:
+        if _CACHE["indices"] is not None and (time.monotonic() - _CACHE["ts"]) < TTL_INDICES:
+            return
+        t0 = time.perf_counter()
+        listas = cargar_listas_entidades()
+        indices = (
+            IndiceEntidades(listas.get("proveedores") or []),
+            IndiceEntidades(listas.get("articulos") or []),
+        )
+        # Si Supabase falló, no pisar un índice bueno con uno vacío
+        if _CACHE["indices"] is not None and not (indices[0] or indices[1]):
+            _CACHE["ts"] = time.monotonic()
+            return
+        _CACHE["listas"] = listas
+        _CACHE["indices"] = indices
+        _CACHE["version"] = _version_listas(listas)
+        _CACHE["ts"] = time.monotonic()
+        print(
+            f"📇 Índice de entidades: {len(indices[0])} proveedores, {len(indices[1])} artículos "
+            f"({(time.perf_counter() - t0) * 1000:.0f} ms)"
+        )
+
+
+def get_listas_entidades() -> Dict[str, List[str]]:
+    _refrescar_si_vencido()
+    return _CACHE["listas"] or {"proveedores": [], "articulos": []}
+
+
+def get_indices_entidades() -> Tuple[IndiceEntidades, IndiceEntidades]:
+    """(proveedores, artículos) indexados; se construyen una vez por proceso."""
+    _refrescar_si_vencido()
+    return _CACHE["indices"]
+
+
+def get_version_entidades() -> str:
+    """Huella del catálogo cargado: cambia cuando entra o sale un proveedor / artículo."""
+    _refrescar_si_vencido()
+    return _CACHE["version"] or ""
+
+
+def invalidar_indices_entidades() -> None:
+    with _CACHE_LOCK:
+        _CACHE["ts"] = 0.0
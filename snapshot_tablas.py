@@ -0,0 +1,288 @@
+# =========================
+# SNAPSHOT_TABLAS.PY - COPIA EN MEMORIA DE stock / articulos CON DELTAS
+# =========================
+"""
+Snapshot compartido (uno por proceso) de tablas que las pantallas recorren
+enteras (stock, articulos en comprobantes.py).
+
+Se carga completa UNA vez; después, como mucho cada SNAPSHOT_POLL_SEG, trae
+sólo lo que cambió desde la marca de agua:
+
+    SELECT * FROM <tabla> WHERE fc_updated_at > marca - solape   (índice)
+    SELECT fc_id FROM fc_borrados WHERE tabla = ... AND borrado_at > ...
+
+fc_id / fc_updated_at / fc_borrados los crea sql_migraciones.aplicar_snapshot_delta().
+Sin esa migración se recarga completa cada SNAPSHOT_TTL_SEG (igual que el
+st.cache_data anterior, pero compartida entre sesiones).
+
+El solape (SNAPSHOT_SOLAPE_SEG) cubre transacciones que marcaron la fila antes
+de la marca de agua pero commitearon después; releer una fila es idempotente.
+
+Lookups indexados:
+    snap = get_snapshot("stock")
+    snap.filas(DEPOSITO="Casa Central")               # DataFrame
+    snap.filas(DEPOSITO="ANDA", CODIGO="12345")
+Los índices {valor -> posiciones} se arman por columna la primera vez que se
+usan y se descartan sólo cuando el snapshot cambia.
+
+Configuración (env vars o st.secrets, ver config_runtime.get_secret):
+    SNAPSHOT_POLL_SEG   cada cuánto buscar deltas (def. 5)
+    SNAPSHOT_TTL_SEG    recarga completa sin migración (def. 120)
+    SNAPSHOT_SOLAPE_SEG solape de la marca de agua (def. 30)
+"""
+
+import threading
+import time
+from datetime import timedelta
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from config_runtime import get_secret_num
+from sql_core import db_conexion, iterar_consulta, snapshot_delta_disponible
+
+
+def _norm_valor(v) -> str:
+    if v is None:
+        return ""
+    try:
+        if pd.isna(v):
+            return ""
+    except (TypeError, ValueError):
+        pass
+    return str(v).strip()
+
+
+class SnapshotTabla:
+    """DataFrame de una tabla completa, mantenido al día con deltas por fc_updated_at."""
+
+    def __init__(
+        self,
+        tabla: str,
+        cargador_respaldo: Optional[Callable[[], pd.DataFrame]] = None,
+        poll_seg: float = 5.0,
+        ttl_seg: float = 120.0,
+        solape_seg: float = 30.0,
+    ):
+        self.tabla = tabla
+        self.cargador_respaldo = cargador_respaldo
+        self.poll_seg = float(poll_seg)
+        self.ttl_seg = float(ttl_seg)
+        self.solape_seg = float(solape_seg)
+
+        self._lock = threading.RLock()
+        self._df: Optional[pd.DataFrame] = None
+        self._marca = None              # now() de la base en la última lectura
+        self._ultimo_poll = 0.0
+        self._ultima_carga = 0.0
+        self._version = 0
+        self._indices: Dict[str, Dict[str, np.ndarray]] = {}
+
+        self._stats = {"cargas_completas": 0, "deltas": 0, "filas_delta": 0, "borradas_delta": 0}
+
+    # -----------------------------------------------------------------
+    # Carga
+    # -----------------------------------------------------------------
+    def _cargar_completo(self) -> None:
+        t0 = time.perf_counter()
+        df = None
+        marca = None
+        try:
+            if snapshot_delta_disponible():
+                marca = self._now_db()
+            partes = list(iterar_consulta(f'SELECT * FROM "{self.tabla}"'))
+            if not partes:
+                # iterar_consulta devuelve al menos el encabezado: nada = sin conexión
+                raise RuntimeError("sin conexión")
+            df = pd.concat(partes, ignore_index=True)
+        except Exception as e:
+            print(f"⚠️ Snapshot {self.tabla}: carga SQL falló ({e})")
+            df = None
+
+        if df is None and self.cargador_respaldo is not None:
+            df = self.cargador_respaldo()
+            marca = None
+
+        if df is None:
+            df = pd.DataFrame()
+
+        if marca is not None and "fc_id" in df.columns:
+            df = df.set_index("fc_id", drop=False)
+        else:
+            marca = None
+
+        self._df = df
+        self._marca = marca
+        self._ultima_carga = time.monotonic()
+        self._ultimo_poll = self._ultima_carga
+        self._version += 1
+        self._indices = {}
+        self._stats["cargas_completas"] += 1
+        print(
+            f"📦 Snapshot {self.tabla}: {len(df)} filas "
+            f"({(time.perf_counter() - t0) * 1000:.0f} ms, deltas={'sí' if marca is not None else 'no'})"
+        )
+
+    def _now_db(self):
+        with db_conexion() as conn:
+            if conn is None:
+                raise RuntimeError("sin conexión")
+            with conn.cursor() as cur:
+                cur.execute("SELECT now()")
+                marca = cur.fetchone()[0]
+            conn.rollback()
+        return marca
+
+    def _aplicar_delta(self) -> None:
+        """Trae filas cambiadas y borradas desde la marca (recarga todo si hubo TRUNCATE)."""
+        desde = self._marca - timedelta(seconds=self.solape_seg)
+        with db_conexion() as conn:
+            if conn is None:
+                raise RuntimeError("sin conexión")
+            with conn.cursor() as cur:
+                cur.execute("SELECT now()")
+                marca_nueva = cur.fetchone()[0]
+
+                cur.execute(f'SELECT * FROM "{self.tabla}" WHERE fc_updated_at > %s', (desde,))
+                cols = [d[0] for d in cur.description]
+                cambiadas = pd.DataFrame(cur.fetchall(), columns=cols)
+
+                cur.execute(
+                    "SELECT DISTINCT fc_id FROM fc_borrados WHERE tabla = %s AND borrado_at > %s",
+                    (self.tabla, desde),
+                )
+                borradas = [r[0] for r in cur.fetchall()]
+            conn.rollback()
+
+        # fc_id < 0 = TRUNCATE: no hay delta posible
+        if any(b is not None and b < 0 for b in borradas):
+            self._cargar_completo()
+            return
+
+        self._marca = marca_nueva
+        if cambiadas.empty and not borradas:
+            return
+
+        quitar = set(borradas)
+        if not cambiadas.empty:
+            cambiadas = cambiadas.set_index("fc_id", drop=False)
+            quitar.update(cambiadas.index.tolist())
+
+        df = self._df.drop(index=[i for i in quitar if i in self._df.index])
+        if not cambiadas.empty:
+            df = pd.concat([df, cambiadas[df.columns.intersection(cambiadas.columns)]]) if len(df.columns) else cambiadas
+
+        self._df = df
+        self._version += 1
+        self._indices = {}
+        self._stats["deltas"] += 1
+        self._stats["filas_delta"] += len(cambiadas)
+        self._stats["borradas_delta"] += len(borradas)
+        print(f"🔄 Snapshot {self.tabla}: {len(cambiadas)} filas cambiadas, {len(borradas)} borradas")
+
+    def refrescar(self, forzar: bool = False) -> None:
+        """Aplica deltas si pasó SNAPSHOT_POLL_SEG (o si forzar=True, ej. después de postear)."""
+        with self._lock:
+            ahora = time.monotonic()
+            if self._df is None:
+                self._cargar_completo()
+                return
+
+            if self._marca is None:
+                # Sin migración: recarga completa por TTL
+                if forzar or ahora - self._ultima_carga >= self.ttl_seg:
+                    self._cargar_completo()
+                return
+
+            if not forzar and ahora - self._ultimo_poll < self.poll_seg:
+                return
+            self._ultimo_poll = ahora
+            try:
+                self._aplicar_delta()
+            except Exception as e:
+                print(f"⚠️ Snapshot {self.tabla}: delta falló ({e}), recarga completa")
+                self._cargar_completo()
+
+    # -----------------------------------------------------------------
+    # Lectura
+    # -----------------------------------------------------------------
+    def df(self) -> pd.DataFrame:
+        """Tabla completa (copia)."""
+        self.refrescar()
+        with self._lock:
+            return self._df.reset_index(drop=True).copy()
+
+    def _indice(self, col: str) -> Dict[str, np.ndarray]:
+        idx = self._indices.get(col)
+        if idx is None:
+            claves = self._df[col].map(_norm_valor).to_numpy() if col in self._df.columns else np.array([])
+            idx = {}
+            if len(claves):
+                orden = np.argsort(claves, kind="stable")
+                valores, inicios = np.unique(claves[orden], return_index=True)
+                for v, grupo in zip(valores, np.split(orden, inicios[1:])):
+                    idx[v] = grupo
+            self._indices[col] = idx
+        return idx
+
+    def filas(self, **filtros) -> pd.DataFrame:
+        """Filas cuyo valor (sin espacios a los costados) coincide en todas las columnas dadas."""
+        self.refrescar()
+        with self._lock:
+            pos = None
+            for col, valor in filtros.items():
+                encontrados = self._indice(col).get(_norm_valor(valor))
+                if encontrados is None:
+                    return self._df.iloc[0:0].reset_index(drop=True).copy()
+                pos = encontrados if pos is None else np.intersect1d(pos, encontrados, assume_unique=True)
+            if pos is None:
+                return self._df.reset_index(drop=True).copy()
+            return self._df.iloc[np.sort(pos)].reset_index(drop=True).copy()
+
+    def valores(self, col: str) -> List[str]:
+        """Valores distintos de una columna (vía índice)."""
+        self.refrescar()
+        with self._lock:
+            return sorted(v for v in self._indice(col) if v)
+
+    def stats(self) -> dict:
+        with self._lock:
+            data = dict(self._stats)
+            data["filas"] = 0 if self._df is None else len(self._df)
+            data["deltas_habilitados"] = self._marca is not None
+            data["version"] = self._version
+        return data
+
+
+# =====================================================================
+# SNAPSHOTS DEL PROCESO
+# =====================================================================
+
+_SNAPSHOTS: Dict[str, SnapshotTabla] = {}
+_SNAPSHOTS_LOCK = threading.Lock()
+
+
+def get_snapshot(tabla: str, cargador_respaldo: Optional[Callable[[], pd.DataFrame]] = None) -> SnapshotTabla:
+    """
+    Snapshot compartido de `tabla`. `cargador_respaldo()` se usa si no hay
+    conexión directa a Postgres (ej. paginar por la API de Supabase).
+    """
+    snap = _SNAPSHOTS.get(tabla)
+    if snap is None:
+        with _SNAPSHOTS_LOCK:
+            snap = _SNAPSHOTS.get(tabla)
+            if snap is None:
+                snap = SnapshotTabla(
+                    tabla,
+                    cargador_respaldo=cargador_respaldo,
+                    poll_seg=get_secret_num("SNAPSHOT_POLL_SEG", 5.0, float),
+                    ttl_seg=get_secret_num("SNAPSHOT_TTL_SEG", 120.0, float),
+                    solape_seg=get_secret_num("SNAPSHOT_SOLAPE_SEG", 30.0, float),
+                )
+                _SNAPSHOTS[tabla] = snap
+    return snap
+
+
+def get_snapshot_stats() -> dict:
+    return {t: s.stats() for t, s in _SNAPSHOTS.items()}
@@ -0,0 +1,231 @@
+# =========================
+# SQL_ARROW.PY - RESULTADOS SQL EN COLUMNAS (PYARROW)
+# =========================
+"""
+Camino opcional para armar el DataFrame de ejecutar_consulta / iterar_consulta
+sin pasar por lista de tuplas -> pd.DataFrame (un objeto Python por celda,
+Decimal en columnas object que después hay que convertir en cada pantalla).
+
+Configuración (env vars o st.secrets, ver config_runtime.get_secret):
+    SQL_ARROW   0 / vacío  desactivado: pd.DataFrame(filas) como siempre (def.)
+                1          fetch por columnas: NUMERIC llega como float (sin
+                           Decimal) y cada bloque de filas se traspone a arrays
+                           de Arrow; las tuplas de un bloque se liberan antes
+                           de leer el siguiente
+                copy       además, los SELECT con conexión propia se leen con
+                           COPY ... TO STDOUT (CSV) y los parsea pyarrow.csv en
+                           C++, sin crear tuplas. Si alguna columna tiene un
+                           tipo no soportado (o el COPY falla) se vuelve al modo 1.
+    SQL_ARROW_BLOQUE  filas por fetchmany en el modo 1 (def. 20000)
+
+Las columnas quedan con pd.ArrowDtype (double[pyarrow], string[pyarrow],
+date32[pyarrow], ...): df.copy() y memory_usage(deep=True) no recorren celdas,
+así que el cache de consultas y las pantallas que copian el resultado no
+duplican los datos. utils_format / ui_compras / utils_graphs leen estas
+columnas con to_numpy() directo.
+
+Sin pyarrow instalado (o con SQL_ARROW=0) todo sigue por el camino de siempre.
+Benchmark: bench/bench_resultados_arrow.py
+"""
+
+import io
+from typing import List, Optional
+
+import pandas as pd
+
+from config_runtime import get_secret, get_secret_num
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:
+    pa = None
+    pa_csv = None
+
+try:
+    import psycopg2
+    import psycopg2.extensions as pg_ext
+except ImportError:
+    psycopg2 = None
+    pg_ext = None
+
+
+_MODO: Optional[str] = None
+
+
+def modo_arrow() -> str:
+    """'' (desactivado), 'columnas' o 'copy'. Se lee una vez por proceso."""
+    global _MODO
+    if _MODO is None:
+        flag = str(get_secret("SQL_ARROW", "") or "").strip().lower()
+        if pa is None or flag in ("", "0", "false", "no"):
+            _MODO = ""
+        elif flag == "copy":
+            _MODO = "copy"
+        else:
+            _MODO = "columnas"
+        if _MODO:
+            print(f"🏹 Resultados SQL en Arrow (modo {_MODO})")
+    return _MODO
+
+
+# =====================================================================
+# FETCH POR COLUMNAS (CUALQUIER CONSULTA)
+# =====================================================================
+
+# NUMERIC -> float en el cursor: evita crear un Decimal por celda
+_NUMERIC_FLOAT = (
+    pg_ext.new_type((1700,), "FC_NUMERIC_FLOAT", lambda v, cur: None if v is None else float(v))
+    if pg_ext is not None else None
+)
+
+_ERRORES_ARROW = (
+    (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError, OverflowError, TypeError, ValueError)
+    if pa is not None else ()
+)
+
+
+def preparar_cursor(cur) -> None:
+    """Registra los conversores del modo Arrow en este cursor (no toca la conexión)."""
+    if modo_arrow() and _NUMERIC_FLOAT is not None:
+        pg_ext.register_type(_NUMERIC_FLOAT, cur)
+
+
+def _arrays_bloque(filas: list, n_cols: int) -> list:
+    """Traspone un bloque de tuplas: por columna un pa.Array, o la tupla de valores si no convierte."""
+    partes = []
+    for valores in zip(*filas):
+        try:
+            arr = pa.array(valores)
+        except _ERRORES_ARROW:
+            arr = None                      # tipos mezclados: queda object
+        if arr is None or pa.types.is_nested(arr.type):
+            partes.append(valores)          # json / arrays: como el camino de tuplas
+        else:
+            partes.append(arr)
+    if len(partes) < n_cols:
+        partes.extend([()] * (n_cols - len(partes)))
+    return partes
+
+
+def _columna(partes: list):
+    """Une los bloques de una columna en un ArrowExtensionArray (o Series object)."""
+    tipos = {p.type for p in partes if isinstance(p, pa.Array) and p.type != pa.null()}
+    if len(tipos) == 1 and all(isinstance(p, pa.Array) for p in partes):
+        tipo = tipos.pop()
+        unida = pa.chunked_array(
+            [p if p.type == tipo else pa.nulls(len(p), tipo) for p in partes], type=tipo
+        )
+        return pd.arrays.ArrowExtensionArray(unida)
+    # Todo NULL o bloques con tipos distintos: como el camino de tuplas
+    valores = []
+    for p in partes:
+        valores.extend(p.to_pylist() if isinstance(p, pa.Array) else p)
+    return pd.Series(valores, dtype=object)
+
+
+def _dataframe_columnas(cols: List[str], bloques: List[list]) -> pd.DataFrame:
+    datos = {i: _columna([b[i] for b in bloques]) for i in range(len(cols))}
+    df = pd.DataFrame(datos, copy=False)
+    df.columns = cols                       # admite nombres repetidos
+    return df
+
+
+def filas_a_dataframe(filas: list, cols: List[str]) -> pd.DataFrame:
+    """Tuplas ya leídas -> DataFrame (Arrow si está activo)."""
+    if not modo_arrow() or not filas:
+        return pd.DataFrame(filas, columns=cols)
+    return _dataframe_columnas(cols, [_arrays_bloque(filas, len(cols))])
+
+
+def leer_resultado(cur, cols: List[str]) -> pd.DataFrame:
+    """
+    Lee el resultado del cursor ya ejecutado. Con Arrow activo va por bloques
+    de SQL_ARROW_BLOQUE filas: nunca están todas las tuplas en memoria juntas.
+    """
+    if not modo_arrow():
+        return pd.DataFrame(cur.fetchall(), columns=cols)
+    bloque = max(1, get_secret_num("SQL_ARROW_BLOQUE", 20000))
+    bloques = []
+    while True:
+        filas = cur.fetchmany(bloque)
+        if not filas:
+            break
+        bloques.append(_arrays_bloque(filas, len(cols)))
+    if not bloques:
+        return pd.DataFrame(columns=cols)
+    return _dataframe_columnas(cols, bloques)
+
+
+# =====================================================================
+# COPY ... TO STDOUT + pyarrow.csv (SÓLO SELECT)
+# =====================================================================
+
+# OID de Postgres -> tipo Arrow. Lo que no está acá no va por COPY.
+_TIPOS_COPY = {}
+if pa is not None:
+    _TIPOS_COPY = {
+        16: pa.bool_(),                                         # bool
+        20: pa.int64(), 21: pa.int64(), 23: pa.int64(),         # int8 / int2 / int4
+        700: pa.float64(), 701: pa.float64(), 1700: pa.float64(),  # float4 / float8 / numeric
+        25: pa.string(), 1043: pa.string(), 1042: pa.string(), 19: pa.string(),  # text / varchar / char / name
+        1082: pa.date32(),                                      # date
+        1114: pa.timestamp("us"),                               # timestamp
+    }
+
+
+def copiar_select(conn, query: str, params: tuple) -> Optional[pd.DataFrame]:
+    """
+    SELECT -> COPY (CSV) -> pyarrow.csv -> DataFrame Arrow.
+    None si no se puede (tipo no soportado, error): el llamador sigue por cursor.
+    Hace rollback si algo falla, así que sólo usar con conexión propia.
+    """
+    if pa_csv is None or pg_ext is None:
+        return None
+    try:
+        with conn.cursor() as cur:
+            sql = cur.mogrify(query, params).decode(
+                pg_ext.encodings.get(conn.encoding, "utf-8")
+            ).strip().rstrip(";")
+            # Tipos de las columnas sin traer filas
+            cur.execute(f"SELECT * FROM ({sql}) AS _fc_arrow LIMIT 0")
+            cols = [d[0] for d in cur.description]
+            oids = [d[1] for d in cur.description]
+            if any(o not in _TIPOS_COPY for o in oids):
+                return None
+
+            buf = io.BytesIO()
+            cur.copy_expert(f"COPY ({sql}) TO STDOUT WITH (FORMAT csv)", buf)
+
+        if buf.tell() == 0:
+            return pd.DataFrame(columns=cols)
+        buf.seek(0)
+        nombres = [f"c{i}" for i in range(len(cols))]     # cols puede traer repetidos
+        tabla = pa_csv.read_csv(
+            buf,
+            read_options=pa_csv.ReadOptions(column_names=nombres),
+            parse_options=pa_csv.ParseOptions(newlines_in_values=True),
+            convert_options=pa_csv.ConvertOptions(
+                column_types={n: _TIPOS_COPY[o] for n, o in zip(nombres, oids)},
+                # COPY CSV: NULL = campo vacío sin comillas, '' = ""
+                null_values=[""],
+                strings_can_be_null=True,
+                quoted_strings_can_be_null=False,
+                true_values=["t"],
+                false_values=["f"],
+            ),
+        )
+        df = pd.DataFrame(
+            {i: pd.arrays.ArrowExtensionArray(tabla.column(i)) for i in range(len(cols))},
+            copy=False,
+        )
+        df.columns = cols
+        return df
+
+    except Exception as e:
+        print(f"⚠️ COPY Arrow no disponible para esta consulta ({e}); sigo por cursor")
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+        return None
@@ -9,8 +9,16 @@ from sql_core import (
     ejecutar_consulta,
     _sql_total_num_expr,
     _sql_total_num_expr_usd,
-    _sql_total_num_expr_general
+    _sql_total_num_expr_general,
+    _sql_filtro_texto,
+    columnas_tipadas_disponibles,
+    FuenteAgregados,
 )
+from replica_analitica import ejecutar_analitica
+
+# Las comparativas de agregados arman el SQL con un _sql_*(..., f) sobre la
+# fuente f; ejecutar_analitica lo corre en la réplica DuckDB si está al día,
+# o en Postgres (ver replica_analitica.py).
 
 # =====================================================================
 # EXPRESIÓN TOTAL NUMÉRICA GENERAL (ACTUALIZADA PARA "Monto Neto")
@@ -20,6 +28,8 @@ def _sql_total_num_expr_general() -> str:
     Expresión SQL para calcular el total numérico desde "Monto Neto".
     Maneja formatos LATAM (coma como decimal), negativos en paréntesis, y limpia espacios/dólares.
     """
+    if columnas_tipadas_disponibles():
+        return "monto_num"
     return '''
         CASE 
             WHEN TRIM(REPLACE("Monto Neto", ' ', '')) LIKE '(%%)' THEN 
@@ -75,16 +85,31 @@ def comparar_compras(
 
     tiempos_sorted = sorted(list(set(tiempos)))
 
-    total_expr = _sql_total_num_expr_general()
+    df = ejecutar_analitica(
+        lambda f: _sql_comparar_compras(tiempos_sorted, usar_meses, proveedores, articulos, f),
+        monto_expr=_sql_total_num_expr_general(),
+    )
+    print(f"🐛 Resultado: {len(df) if df is not None and not df.empty else 0} filas")
+    return df
+
+
+def _sql_comparar_compras(
+    tiempos_sorted: list,
+    usar_meses: bool,
+    proveedores: Optional[List[str]],
+    articulos: Optional[List[str]],
+    f: FuenteAgregados,
+) -> tuple:
+    total_expr = f.monto
 
     # ✅ USAR FILTER en lugar de CASE WHEN para mejor performance
     cols = []
     for t in tiempos_sorted:
         if usar_meses:
-            cols.append(f"""SUM({total_expr}) FILTER (WHERE TRIM("Mes") = '{t}') AS "{t}" """)
+            cols.append(f"""SUM({total_expr}) FILTER (WHERE {f.mes} = '{t}') AS "{t}" """)
         else:
             # ✅ Año es INTEGER en la BD
-            cols.append(f"""SUM({total_expr}) FILTER (WHERE "Año" = {int(t)}) AS "{t}" """)
+            cols.append(f"""SUM({total_expr}) FILTER (WHERE {f.anio} = {int(t)}) AS "{t}" """)
 
     cols_sql = ",\n            ".join(cols)
     
@@ -93,13 +118,13 @@ def comparar_compras(
         t1, t2 = tiempos_sorted[0], tiempos_sorted[1]
         if usar_meses:
             diff_sql = f""",
-                (SUM({total_expr}) FILTER (WHERE TRIM("Mes") = '{t2}') -
-                 SUM({total_expr}) FILTER (WHERE TRIM("Mes") = '{t1}')) AS Diferencia
+                (SUM({total_expr}) FILTER (WHERE {f.mes} = '{t2}') -
+                 SUM({total_expr}) FILTER (WHERE {f.mes} = '{t1}')) AS Diferencia
             """
         else:
             diff_sql = f""",
-                (SUM({total_expr}) FILTER (WHERE "Año" = {int(t2)}) -
-                 SUM({total_expr}) FILTER (WHERE "Año" = {int(t1)})) AS Diferencia
+                (SUM({total_expr}) FILTER (WHERE {f.anio} = {int(t2)}) -
+                 SUM({total_expr}) FILTER (WHERE {f.anio} = {int(t1)})) AS Diferencia
             """
 
     # ✅ CONSTRUIR FILTROS
@@ -112,8 +137,8 @@ def comparar_compras(
             p_norm = p.strip().lower()
             if not p_norm:
                 continue
-            prov_clauses.append('LOWER(TRIM("Cliente / Proveedor")) LIKE %s')
-            params.append(f"%{p_norm}%")
+            prov_clauses.append(_sql_filtro_texto(f.col_proveedor))
+            params.append(p_norm)
         if prov_clauses:
             prov_where = "AND (" + " OR ".join(prov_clauses) + ")"
 
@@ -123,23 +148,23 @@ def comparar_compras(
         for a in articulos:
             a_norm = a.strip().lower()
             if a_norm:
-                art_clauses.append('LOWER(TRIM("Articulo")) ILIKE %s')
-                params.append(f"%{a_norm}%")
+                art_clauses.append(_sql_filtro_texto(f.col_articulo))
+                params.append(a_norm)
         if art_clauses:
             art_where = "AND (" + " OR ".join(art_clauses) + ")"
 
     # ✅ WHERE tiempo
     if usar_meses:
         meses_str = "', '".join(tiempos_sorted)
-        tiempo_where = f"TRIM(\"Mes\") IN ('{meses_str}')"
+        tiempo_where = f"{f.mes} IN ('{meses_str}')"
     else:
         anios_str = ", ".join(str(int(a)) for a in tiempos_sorted)
-        tiempo_where = f'"Año" IN ({anios_str})'
+        tiempo_where = f'{f.anio} IN ({anios_str})'
 
     # ✅ Determinar si comparar por artículos o proveedores
     modo_articulos = articulos is not None and len(articulos) > 0
     group_by_col = "Articulo" if modo_articulos else "Proveedor"
-    select_col = 'TRIM("Articulo")' if modo_articulos else 'TRIM("Cliente / Proveedor")'
+    select_col = f.articulo if modo_articulos else f.proveedor
 
     # ✅ Límite
     if modo_articulos:
@@ -153,14 +178,14 @@ def comparar_compras(
     sql = f"""
         SELECT
             {select_col} AS "{group_by_col}",
-            TRIM("Moneda") AS Moneda,
+            {f.moneda} AS Moneda,
             {cols_sql}
             {diff_sql}
-        FROM chatbot_raw
+        FROM {f.tabla}
         WHERE {tiempo_where}
           {prov_where}
           {art_where}
-        GROUP BY {select_col}, TRIM("Moneda")
+        GROUP BY {select_col}, {f.moneda}
         ORDER BY "{group_by_col}", Moneda
         LIMIT {limite}
     """
@@ -168,9 +193,7 @@ def comparar_compras(
     print(f"🐛 DEBUG comparar_compras: Ejecutando con {len(params)} params")
     print(f"🐛 DEBUG SQL (primeros 500 chars): {sql[:500]}...")
 
-    df = ejecutar_consulta(sql, tuple(params))
-    print(f"🐛 Resultado: {len(df) if df is not None and not df.empty else 0} filas")
-    return df
+    return sql, tuple(params)
 
 # =====================================================================
 # COMPARACIONES POR MESES (LEGACY)
@@ -224,33 +247,42 @@ def get_comparacion_proveedor_meses(*args, **kwargs) -> pd.DataFrame:
     label1_sql = str(label1).replace('"', "").strip()
     label2_sql = str(label2).replace('"', "").strip()
 
-    total_expr = _sql_total_num_expr_general()
+    return ejecutar_analitica(
+        lambda f: _sql_comparacion_proveedor_meses(proveedor, mes1, mes2, label1_sql, label2_sql, f),
+        monto_expr=_sql_total_num_expr_general(),
+    )
+
+
+def _sql_comparacion_proveedor_meses(
+    proveedor, mes1: str, mes2: str, label1_sql: str, label2_sql: str, f: FuenteAgregados
+) -> tuple:
+    total_expr = f.monto
 
     prov_where = ""
     prov_param = []
     if proveedor:
         if isinstance(proveedor, (list, tuple)):
             if len(proveedor) > 0:
-                prov_clauses = ['LOWER(TRIM("Cliente / Proveedor")) LIKE %s' for _ in proveedor]
+                prov_clauses = [f'LOWER({f.proveedor}) LIKE %s' for _ in proveedor]
                 prov_where = "AND (" + " OR ".join(prov_clauses) + ")"
                 prov_param = [f"%{p.strip().lower()}%" for p in proveedor if p.strip()]
         else:
             prov_norm = str(proveedor).strip().lower()
             if prov_norm:
-                prov_where = 'AND LOWER(TRIM("Cliente / Proveedor")) LIKE %s'
+                prov_where = f'AND LOWER({f.proveedor}) LIKE %s'
                 prov_param = [f"%{prov_norm}%"]
 
     sql = f"""
         SELECT
-            TRIM("Cliente / Proveedor") AS Proveedor,
-            SUM(CASE WHEN TRIM("Mes") = %s THEN {total_expr} ELSE 0 END) AS "{label1_sql}",
-            SUM(CASE WHEN TRIM("Mes") = %s THEN {total_expr} ELSE 0 END) AS "{label2_sql}",
-            SUM(CASE WHEN TRIM("Mes") = %s THEN {total_expr} ELSE 0 END) -
-            SUM(CASE WHEN TRIM("Mes") = %s THEN {total_expr} ELSE 0 END) AS Diferencia
-        FROM chatbot_raw
-        WHERE TRIM("Mes") IN (%s, %s)
+            {f.proveedor} AS Proveedor,
+            SUM(CASE WHEN {f.mes} = %s THEN {total_expr} ELSE 0 END) AS "{label1_sql}",
+            SUM(CASE WHEN {f.mes} = %s THEN {total_expr} ELSE 0 END) AS "{label2_sql}",
+            SUM(CASE WHEN {f.mes} = %s THEN {total_expr} ELSE 0 END) -
+            SUM(CASE WHEN {f.mes} = %s THEN {total_expr} ELSE 0 END) AS Diferencia
+        FROM {f.tabla}
+        WHERE {f.mes} IN (%s, %s)
           {prov_where}
-        GROUP BY TRIM("Cliente / Proveedor")
+        GROUP BY {f.proveedor}
         ORDER BY Diferencia DESC
     """
 
@@ -261,7 +293,7 @@ def get_comparacion_proveedor_meses(*args, **kwargs) -> pd.DataFrame:
         *prov_param
     )
 
-    return ejecutar_consulta(sql, params)
+    return sql, params
 
 # =====================================================================
 # COMPARACIONES POR AÑOS (LEGACY)
@@ -269,28 +301,35 @@ def get_comparacion_proveedor_meses(*args, **kwargs) -> pd.DataFrame:
 
 def get_comparacion_articulo_anios(anios: List[int], articulo_like: str) -> pd.DataFrame:
     """Compara un artículo específico entre años."""
-    total_expr = _sql_total_num_expr_general()
+    return ejecutar_analitica(
+        lambda f: _sql_comparacion_articulo_anios(anios, articulo_like, f),
+        monto_expr=_sql_total_num_expr_general(),
+    )
+
+
+def _sql_comparacion_articulo_anios(anios: List[int], articulo_like: str, f: FuenteAgregados) -> tuple:
+    total_expr = f.monto
     anios = sorted(anios)
 
     cols = []
     for y in anios:
-        cols.append(f"""SUM(CASE WHEN "Año"::int = {y} THEN {total_expr} ELSE 0 END) AS "{y}" """)
+        cols.append(f"""SUM(CASE WHEN {f.anio} = {y} THEN {total_expr} ELSE 0 END) AS "{y}" """)
 
     cols_sql = ",\n            ".join(cols)
     anios_sql = ", ".join(str(y) for y in anios)
 
     sql = f"""
         SELECT
-            TRIM("Articulo") AS Articulo,
+            {f.articulo} AS Articulo,
             {cols_sql}
-        FROM chatbot_raw
-        WHERE "Año"::int IN ({anios_sql})
-          AND LOWER(TRIM("Articulo")) LIKE %s
-        GROUP BY TRIM("Articulo")
-        ORDER BY TRIM("Articulo")
+        FROM {f.tabla}
+        WHERE {f.anio} IN ({anios_sql})
+          AND LOWER({f.articulo}) LIKE %s
+        GROUP BY {f.articulo}
+        ORDER BY {f.articulo}
         LIMIT 100
     """
-    return ejecutar_consulta(sql, (f"%{articulo_like.lower()}%",))
+    return sql, (f"%{articulo_like.lower()}%",)
 
 def get_comparacion_proveedor_anios_like(proveedor_like: str, anios: list[int]) -> pd.DataFrame:
     """
@@ -304,18 +343,30 @@ def get_comparacion_proveedor_anios_like(proveedor_like: str, anios: list[int])
         return pd.DataFrame()
 
     a1, a2 = anios[0], anios[1]
-    total_expr = _sql_total_num_expr_general()
+    df = ejecutar_analitica(
+        lambda f: _sql_comparacion_proveedor_anios_like(proveedor_like, a1, a2, f),
+        monto_expr=_sql_total_num_expr_general(),
+    )
+
+    if df is not None and not df.empty and "total_general" in df.columns:
+        df = df.drop(columns=["total_general"])
+
+    return df
+
+
+def _sql_comparacion_proveedor_anios_like(proveedor_like: str, a1: int, a2: int, f: FuenteAgregados) -> tuple:
+    total_expr = f.monto
 
     sql = f"""
         SELECT
-            TRIM("Cliente / Proveedor") AS Proveedor,
-            SUM(CASE WHEN "Año"::int = %s THEN {total_expr} ELSE 0 END) AS "{a1}",
-            SUM(CASE WHEN "Año"::int = %s THEN {total_expr} ELSE 0 END) AS "{a2}",
+            {f.proveedor} AS Proveedor,
+            SUM(CASE WHEN {f.anio} = %s THEN {total_expr} ELSE 0 END) AS "{a1}",
+            SUM(CASE WHEN {f.anio} = %s THEN {total_expr} ELSE 0 END) AS "{a2}",
             SUM({total_expr}) AS total_general
-        FROM chatbot_raw
-        WHERE LOWER(TRIM("Cliente / Proveedor")) LIKE %s
-          AND "Año"::int IN (%s, %s)
-        GROUP BY TRIM("Cliente / Proveedor")
+        FROM {f.tabla}
+        WHERE LOWER({f.proveedor}) LIKE %s
+          AND {f.anio} IN (%s, %s)
+        GROUP BY {f.proveedor}
         ORDER BY total_general DESC
         LIMIT 1
     """
@@ -328,12 +379,7 @@ def get_comparacion_proveedor_anios_like(proveedor_like: str, anios: list[int])
         a2,
     )
 
-    df = ejecutar_consulta(sql, params)
-
-    if df is not None and not df.empty and "total_general" in df.columns:
-        df = df.drop(columns=["total_general"])
-
-    return df
+    return sql, params
 
 def get_comparacion_proveedor_anios(*args, **kwargs) -> pd.DataFrame:
     """
@@ -383,24 +429,30 @@ def get_comparacion_proveedor_anios(*args, **kwargs) -> pd.DataFrame:
 
 def get_comparacion_proveedor_anios_monedas(anios: List[int], proveedores: List[str] = None) -> pd.DataFrame:
     """Compara proveedores por años con separación de monedas."""
-    total_pesos = _sql_total_num_expr()
-    total_usd = _sql_total_num_expr_usd()
+    return ejecutar_analitica(lambda f: _sql_comparacion_proveedor_anios_monedas(anios, proveedores, f))
+
+
+def _sql_comparacion_proveedor_anios_monedas(
+    anios: List[int], proveedores: Optional[List[str]], f: FuenteAgregados
+) -> tuple:
+    total_pesos = f.monto_pesos
+    total_usd = f.monto_usd
     anios = sorted(anios)
 
     prov_where = ""
     prov_params = []
     if proveedores:
-        parts = [f'LOWER(TRIM("Cliente / Proveedor")) LIKE %s' for _ in proveedores]
+        parts = [f'LOWER({f.proveedor}) LIKE %s' for _ in proveedores]
         prov_params = [f"%{p.lower()}%" for p in proveedores]
         prov_where = f"AND ({' OR '.join(parts)})"
 
     cols = []
     for y in anios:
         cols.append(
-            f"""SUM(CASE WHEN "Año"::int = {y} AND TRIM("Moneda") = '$' THEN {total_pesos} ELSE 0 END) AS "{y}_$" """
+            f"""SUM(CASE WHEN {f.anio} = {y} AND {f.moneda} = '$' THEN {total_pesos} ELSE 0 END) AS "{y}_$" """
         )
         cols.append(
-            f"""SUM(CASE WHEN "Año"::int = {y} AND TRIM("Moneda") IN ('U$S','U$$') THEN {total_usd} ELSE 0 END) AS "{y}_USD" """
+            f"""SUM(CASE WHEN {f.anio} = {y} AND {f.moneda} IN ('U$S','U$$') THEN {total_usd} ELSE 0 END) AS "{y}_USD" """
         )
 
     cols_sql = ",\n            ".join(cols)
@@ -410,37 +462,43 @@ def get_comparacion_proveedor_anios_monedas(anios: List[int], proveedores: List[
 
     sql = f"""
         SELECT
-            TRIM("Cliente / Proveedor") AS Proveedor,
+            {f.proveedor} AS Proveedor,
             {cols_sql}
-        FROM chatbot_raw
-        WHERE "Año"::int IN ({anios_sql})
+        FROM {f.tabla}
+        WHERE {f.anio} IN ({anios_sql})
           {prov_where}
-        GROUP BY TRIM("Cliente / Proveedor")
+        GROUP BY {f.proveedor}
         ORDER BY {order_sql}
         LIMIT 300
     """
-    return ejecutar_consulta(sql, tuple(prov_params) if prov_params else None)
+    return sql, tuple(prov_params) if prov_params else None
 
 def get_comparacion_familia_anios_monedas(anios: List[int], familias: List[str] = None) -> pd.DataFrame:
     """Compara familias por años con separación de monedas."""
-    total_pesos = _sql_total_num_expr()
-    total_usd = _sql_total_num_expr_usd()
+    return ejecutar_analitica(lambda f: _sql_comparacion_familia_anios_monedas(anios, familias, f))
+
+
+def _sql_comparacion_familia_anios_monedas(
+    anios: List[int], familias: Optional[List[str]], f: FuenteAgregados
+) -> tuple:
+    total_pesos = f.monto_pesos
+    total_usd = f.monto_usd
     anios = sorted(anios)
 
     fam_where = ""
     fam_params = []
     if familias:
-        parts = [f'TRIM(COALESCE("Familia", \'\')) = %s' for _ in familias]
+        parts = [f"COALESCE({f.familia}, '') = %s" for _ in familias]
         fam_params = list(familias)
         fam_where = f"AND ({' OR '.join(parts)})"
 
     cols = []
     for y in anios:
         cols.append(
-            f"""SUM(CASE WHEN "Año"::int = {y} AND TRIM("Moneda") = '$' THEN {total_pesos} ELSE 0 END) AS "{y}_$" """
+            f"""SUM(CASE WHEN {f.anio} = {y} AND {f.moneda} = '$' THEN {total_pesos} ELSE 0 END) AS "{y}_$" """
         )
         cols.append(
-            f"""SUM(CASE WHEN "Año"::int = {y} AND TRIM("Moneda") IN ('U$S','U$$') THEN {total_usd} ELSE 0 END) AS "{y}_USD" """
+            f"""SUM(CASE WHEN {f.anio} = {y} AND {f.moneda} IN ('U$S','U$$') THEN {total_usd} ELSE 0 END) AS "{y}_USD" """
         )
 
     cols_sql = ",\n            ".join(cols)
@@ -450,16 +508,16 @@ def get_comparacion_familia_anios_monedas(anios: List[int], familias: List[str]
 
     sql = f"""
         SELECT
-            TRIM(COALESCE("Familia", 'SIN FAMILIA')) AS Familia,
+            COALESCE({f.familia}, 'SIN FAMILIA') AS Familia,
             {cols_sql}
-        FROM chatbot_raw
-        WHERE "Año"::int IN ({anios_sql})
+        FROM {f.tabla}
+        WHERE {f.anio} IN ({anios_sql})
           {fam_where}
-        GROUP BY TRIM(COALESCE("Familia", 'SIN FAMILIA'))
+        GROUP BY COALESCE({f.familia}, 'SIN FAMILIA')
         ORDER BY {order_sql}
         LIMIT 300
     """
-    return ejecutar_consulta(sql, tuple(fam_params) if fam_params else None)
+    return sql, tuple(fam_params) if fam_params else None
 
 # =====================================================================
 # COMPARACIÓN MULTI PROVEEDORES - MULTI MESES
@@ -478,13 +536,22 @@ def get_comparacion_proveedores_meses_multi(
     if not meses:
         return pd.DataFrame()
 
-    total_expr = _sql_total_num_expr_general()
+    return ejecutar_analitica(
+        lambda f: _sql_comparacion_proveedores_meses_multi(proveedores, meses, articulos, f),
+        monto_expr=_sql_total_num_expr_general(),
+    )
+
+
+def _sql_comparacion_proveedores_meses_multi(
+    proveedores: List[str], meses: List[str], articulos: Optional[List[str]], f: FuenteAgregados
+) -> tuple:
+    total_expr = f.monto
 
     cols = []
     params: List = []
     for m in meses:
         cols.append(
-            f"""SUM(CASE WHEN TRIM("Mes") = %s THEN {total_expr} ELSE 0 END) AS "{m}" """
+            f"""SUM(CASE WHEN {f.mes} = %s THEN {total_expr} ELSE 0 END) AS "{m}" """
         )
         params.append(m)
 
@@ -497,7 +564,7 @@ def get_comparacion_proveedores_meses_multi(
             p_norm = p.strip().lower()
             if not p_norm:
                 continue
-            prov_clauses.append('LOWER(TRIM("Cliente / Proveedor")) LIKE %s')
+            prov_clauses.append(f'LOWER({f.proveedor}) LIKE %s')
             params.append(f"%{p_norm}%")
         if prov_clauses:
             prov_where = "AND (" + " OR ".join(prov_clauses) + ")"
@@ -505,7 +572,7 @@ def get_comparacion_proveedores_meses_multi(
     art_where = ""
     art_params = []
     if articulos:
-        art_clauses = ['LOWER(TRIM("Articulo")) LIKE %s' for _ in articulos]
+        art_clauses = [f'LOWER({f.articulo}) LIKE %s' for _ in articulos]
         art_where = " AND (" + " OR ".join(art_clauses) + ")"
         art_params = [f"%{a.strip().lower()}%" for a in articulos if a.strip()]
 
@@ -515,19 +582,19 @@ def get_comparacion_proveedores_meses_multi(
 
     sql = f"""
         SELECT
-            TRIM("Cliente / Proveedor") AS Proveedor,
-            TRIM("Moneda") AS Moneda,
+            {f.proveedor} AS Proveedor,
+            {f.moneda} AS Moneda,
             {cols_sql}
-        FROM chatbot_raw
-        WHERE TRIM("Mes") IN ({meses_placeholders})
+        FROM {f.tabla}
+        WHERE {f.mes} IN ({meses_placeholders})
           {prov_where}
           {art_where}
-        GROUP BY TRIM("Cliente / Proveedor"), TRIM("Moneda")
+        GROUP BY {f.proveedor}, {f.moneda}
         ORDER BY Proveedor, Moneda
         LIMIT 300
     """
 
-    return ejecutar_consulta(sql, tuple(params))
+    return sql, tuple(params)
 
 # =====================================================================
 # COMPARACIÓN MULTI PROVEEDORES - MULTI AÑOS
@@ -558,12 +625,21 @@ def get_comparacion_proveedores_anios_multi(
     if len(anios_ok) < 2:
         return pd.DataFrame()
 
-    total_expr = _sql_total_num_expr_general()
+    df = ejecutar_analitica(
+        lambda f: _sql_comparacion_proveedores_anios_multi(proveedores, anios_ok, f),
+        monto_expr=_sql_total_num_expr_general(),
+    )
+    print(f"🐛 DEBUG SQL_COMPARATIVAS: SQL ejecutado, resultado filas={len(df) if not df.empty else 0}")
+    return df
+
+
+def _sql_comparacion_proveedores_anios_multi(proveedores: List[str], anios_ok: List[int], f: FuenteAgregados) -> tuple:
+    total_expr = f.monto
 
     cols = []
     for y in anios_ok:
         cols.append(
-            f"""SUM(CASE WHEN "Año"::int = {y} THEN {total_expr} ELSE 0 END) AS "{y}" """
+            f"""SUM(CASE WHEN {f.anio} = {y} THEN {total_expr} ELSE 0 END) AS "{y}" """
         )
     cols_sql = ",\n            ".join(cols)
 
@@ -571,8 +647,8 @@ def get_comparacion_proveedores_anios_multi(
     if len(anios_ok) == 2:
         y1, y2 = anios_ok[0], anios_ok[1]
         diff_sql = f""",
-            (SUM(CASE WHEN "Año"::int = {y2} THEN {total_expr} ELSE 0 END) -
-             SUM(CASE WHEN "Año"::int = {y1} THEN {total_expr} ELSE 0 END)) AS Diferencia
+            (SUM(CASE WHEN {f.anio} = {y2} THEN {total_expr} ELSE 0 END) -
+             SUM(CASE WHEN {f.anio} = {y1} THEN {total_expr} ELSE 0 END)) AS Diferencia
         """
 
     anios_sql = ", ".join(str(y) for y in anios_ok)
@@ -585,30 +661,28 @@ def get_comparacion_proveedores_anios_multi(
             p_norm = p.strip().lower()
             if not p_norm:
                 continue
-            prov_clauses.append('LOWER(TRIM("Cliente / Proveedor")) LIKE %s')
+            prov_clauses.append(f'LOWER({f.proveedor}) LIKE %s')
             params.append(f"%{p_norm}%")
         if prov_clauses:
             prov_where = "AND (" + " OR ".join(prov_clauses) + ")"
 
     sql = f"""
         SELECT
-            TRIM("Cliente / Proveedor") AS Proveedor,
-            TRIM("Moneda") AS Moneda,
+            {f.proveedor} AS Proveedor,
+            {f.moneda} AS Moneda,
             {cols_sql}
             {diff_sql}
-        FROM chatbot_raw
-        WHERE "Año"::int IN ({anios_sql})
+        FROM {f.tabla}
+        WHERE {f.anio} IN ({anios_sql})
           {prov_where}
-        GROUP BY TRIM("Cliente / Proveedor"), TRIM("Moneda")
+        GROUP BY {f.proveedor}, {f.moneda}
         ORDER BY Proveedor, Moneda
         LIMIT 300
     """
 
     print(f"🐛 DEBUG SQL_COMPARATIVAS: SQL construido (primeros 200 chars): {sql[:200]}...")
     print(f"🐛 DEBUG SQL_COMPARATIVAS: Params={params}")
-    df = ejecutar_consulta(sql, tuple(params))
-    print(f"🐛 DEBUG SQL_COMPARATIVAS: SQL ejecutado, resultado filas={len(df) if not df.empty else 0}")
-    return df
+    return sql, tuple(params)
 
 # =====================================================================
 # COMPARACIÓN MULTI (AÑOS O MESES) CON MONEDAS
@@ -635,19 +709,31 @@ def get_comparacion_multi_proveedores_tiempo_monedas(
     if len(tiempos_ok) < 2:
         return pd.DataFrame()
 
-    total_expr = _sql_total_num_expr_general()
+    if not any(p.strip() for p in proveedores):
+        return pd.DataFrame()
+
+    return ejecutar_analitica(
+        lambda f: _sql_comparacion_multi_proveedores_tiempo_monedas(proveedores, tiempos_ok, usar_meses, f),
+        monto_expr=_sql_total_num_expr_general(),
+    )
+
+
+def _sql_comparacion_multi_proveedores_tiempo_monedas(
+    proveedores: List[str], tiempos_ok: list, usar_meses: bool, f: FuenteAgregados
+) -> tuple:
+    total_expr = f.monto
 
     cols = []
     params: List = []
     for t in tiempos_ok:
         if usar_meses:
             cols.append(
-                f"""SUM(CASE WHEN TRIM("Mes") = %s THEN {total_expr} ELSE 0 END) AS "{t}" """
+                f"""SUM(CASE WHEN {f.mes} = %s THEN {total_expr} ELSE 0 END) AS "{t}" """
             )
             params.append(t)
         else:
             cols.append(
-                f"""SUM(CASE WHEN "Año"::int = {int(t)} THEN {total_expr} ELSE 0 END) AS "{t}" """
+                f"""SUM(CASE WHEN {f.anio} = {int(t)} THEN {total_expr} ELSE 0 END) AS "{t}" """
             )
     cols_sql = ",\n            ".join(cols)
 
@@ -656,14 +742,14 @@ def get_comparacion_multi_proveedores_tiempo_monedas(
         t1, t2 = tiempos_ok[0], tiempos_ok[1]
         if usar_meses:
             diff_sql = f""",
-                (SUM(CASE WHEN TRIM("Mes") = %s THEN {total_expr} ELSE 0 END) -
-                 SUM(CASE WHEN TRIM("Mes") = %s THEN {total_expr} ELSE 0 END)) AS Diferencia
+                (SUM(CASE WHEN {f.mes} = %s THEN {total_expr} ELSE 0 END) -
+                 SUM(CASE WHEN {f.mes} = %s THEN {total_expr} ELSE 0 END)) AS Diferencia
             """
             params.extend([t2, t1])
         else:
             diff_sql = f""",
-                (SUM(CASE WHEN "Año"::int = {int(t2)} THEN {total_expr} ELSE 0 END) -
-                 SUM(CASE WHEN "Año"::int = {int(t1)} THEN {total_expr} ELSE 0 END)) AS Diferencia
+                (SUM(CASE WHEN {f.anio} = {int(t2)} THEN {total_expr} ELSE 0 END) -
+                 SUM(CASE WHEN {f.anio} = {int(t1)} THEN {total_expr} ELSE 0 END)) AS Diferencia
             """
 
     prov_clauses = []
@@ -671,15 +757,12 @@ def get_comparacion_multi_proveedores_tiempo_monedas(
         p_norm = p.strip().lower()
         if not p_norm:
             continue
-        prov_clauses.append('LOWER(TRIM("Cliente / Proveedor")) LIKE %s')
+        prov_clauses.append(f'LOWER({f.proveedor}) LIKE %s')
         params.append(f"%{p_norm}%")
 
-    if not prov_clauses:
-        return pd.DataFrame()
-
     prov_where = " OR ".join(prov_clauses)
 
-    tiempo_col = "Mes" if usar_meses else "Año"
+    tiempo_col = f.mes if usar_meses else f.anio
     if usar_meses:
         tiempo_placeholders = ", ".join(["%s"] * len(tiempos_ok))
         params.extend(tiempos_ok)
@@ -688,19 +771,19 @@ def get_comparacion_multi_proveedores_tiempo_monedas(
 
     sql = f"""
         SELECT
-            TRIM("Cliente / Proveedor") AS Proveedor,
-            TRIM("Moneda") AS Moneda,
+            {f.proveedor} AS Proveedor,
+            {f.moneda} AS Moneda,
             {cols_sql}
             {diff_sql}
-        FROM chatbot_raw
+        FROM {f.tabla}
         WHERE ({prov_where})
-          AND {"TRIM(\"" + tiempo_col + "\")" if usar_meses else "\"" + tiempo_col + "\"::int"} IN ({tiempo_placeholders})
-        GROUP BY TRIM("Cliente / Proveedor"), TRIM("Moneda")
+          AND {tiempo_col} IN ({tiempo_placeholders})
+        GROUP BY {f.proveedor}, {f.moneda}
         ORDER BY Proveedor, Moneda
         LIMIT 300
     """
 
-    return ejecutar_consulta(sql, tuple(params))
+    return sql, tuple(params)
 
 # =====================================================================
 # GASTOS POR FAMILIAS
@@ -708,35 +791,39 @@ def get_comparacion_multi_proveedores_tiempo_monedas(
 
 def get_gastos_todas_familias_mes(mes_key: str) -> pd.DataFrame:
     """Gastos de todas las familias en un mes."""
-    total_pesos = _sql_total_num_expr()
-    total_usd = _sql_total_num_expr_usd()
+    return ejecutar_analitica(lambda f: _sql_gastos_todas_familias_mes(mes_key, f))
+
+
+def _sql_gastos_todas_familias_mes(mes_key: str, f: FuenteAgregados) -> tuple:
     sql = f"""
         SELECT
-            TRIM(COALESCE("Familia", 'SIN FAMILIA')) AS Familia,
-            SUM(CASE WHEN TRIM("Moneda") = '$' THEN {total_pesos} ELSE 0 END) AS Total_Pesos,
-            SUM(CASE WHEN TRIM("Moneda") IN ('U$S', 'U$$') THEN {total_usd} ELSE 0 END) AS Total_USD
-        FROM chatbot_raw
-        WHERE TRIM("Mes") = %s
-        GROUP BY TRIM(COALESCE("Familia", 'SIN FAMILIA'))
+            COALESCE({f.familia}, 'SIN FAMILIA') AS Familia,
+            SUM(CASE WHEN {f.moneda} = '$' THEN {f.monto_pesos} ELSE 0 END) AS Total_Pesos,
+            SUM(CASE WHEN {f.moneda} IN ('U$S', 'U$$') THEN {f.monto_usd} ELSE 0 END) AS Total_USD
+        FROM {f.tabla}
+        WHERE {f.mes} = %s
+        GROUP BY COALESCE({f.familia}, 'SIN FAMILIA')
         ORDER BY Total_Pesos DESC, Total_USD DESC
     """
-    return ejecutar_consulta(sql, (mes_key,))
+    return sql, (mes_key,)
 
 def get_gastos_todas_familias_anio(anio: int) -> pd.DataFrame:
     """Gastos de todas las familias en un año."""
-    total_pesos = _sql_total_num_expr()
-    total_usd = _sql_total_num_expr_usd()
+    return ejecutar_analitica(lambda f: _sql_gastos_todas_familias_anio(anio, f))
+
+
+def _sql_gastos_todas_familias_anio(anio: int, f: FuenteAgregados) -> tuple:
     sql = f"""
         SELECT
-            TRIM(COALESCE("Familia", 'SIN FAMILIA')) AS Familia,
-            SUM(CASE WHEN TRIM("Moneda") = '$' THEN {total_pesos} ELSE 0 END) AS Total_Pesos,
-            SUM(CASE WHEN TRIM("Moneda") IN ('U$S', 'U$$') THEN {total_usd} ELSE 0 END) AS Total_USD
-        FROM chatbot_raw
-        WHERE "Año"::int = %s
-        GROUP BY TRIM(COALESCE("Familia", 'SIN FAMILIA'))
+            COALESCE({f.familia}, 'SIN FAMILIA') AS Familia,
+            SUM(CASE WHEN {f.moneda} = '$' THEN {f.monto_pesos} ELSE 0 END) AS Total_Pesos,
+            SUM(CASE WHEN {f.moneda} IN ('U$S', 'U$$') THEN {f.monto_usd} ELSE 0 END) AS Total_USD
+        FROM {f.tabla}
+        WHERE {f.anio} = %s
+        GROUP BY COALESCE({f.familia}, 'SIN FAMILIA')
         ORDER BY Total_Pesos DESC, Total_USD DESC
     """
-    return ejecutar_consulta(sql, (anio,))
+    return sql, (anio,)
 
 def get_gastos_secciones_detalle_completo(familias: List[str], mes_key: str) -> pd.DataFrame:
     """Detalle de gastos de familias específicas en un mes."""
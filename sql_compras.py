@@ -12,8 +12,13 @@ from sql_core import (
     _sql_total_num_expr,
     _sql_total_num_expr_usd,
     _sql_total_num_expr_general,
-    get_ultimo_mes_disponible_hasta
+    _sql_cantidad_num_expr,
+    _sql_fuente_agregados,
+    _sql_cte_factura,
+    get_ultimo_mes_disponible_hasta,
+    FuenteAgregados,
 )
+from replica_analitica import ejecutar_analitica, ejecutar_analiticas
 
 
 # =====================================================================
@@ -344,14 +349,15 @@ def get_total_compras_proveedor_anio(
 ) -> dict:
     """Resumen total de compras de un proveedor en un solo año."""
     proveedor_like = (proveedor_like or "").split("(")[0].strip().lower()
+    f = _sql_fuente_agregados(monto_expr=_sql_total_num_expr())
     sql = f"""
         SELECT
-            COUNT(*) AS registros,
-            COALESCE(SUM(CAST(NULLIF(TRIM("Monto Neto"), '') AS NUMERIC)), 0) AS total
-        FROM chatbot_raw
-        WHERE ("Tipo Comprobante" = 'Compra Contado' OR "Tipo Comprobante" LIKE 'Compra%%')
-          AND LOWER(TRIM("Cliente / Proveedor")) LIKE %s
-          AND "Año" = %s
+            COALESCE(SUM({f.lineas}), 0) AS registros,
+            COALESCE(SUM({f.monto}), 0) AS total
+        FROM {f.tabla}
+        WHERE {f.es_compra}
+          AND LOWER({f.proveedor}) LIKE %s
+          AND {f.anio} = %s
     """
     df = ejecutar_consulta(sql, (f"%{proveedor_like}%", anio))
     if df is not None and not df.empty:
@@ -395,32 +401,14 @@ def get_detalle_compras_articulo_anio(articulo_like: str, anio: int, limite: int
     """Detalle de compras de un artículo en un año."""
     if limite is None:
         limite = 500
+    monto_expr = _sql_total_num_expr_general()
+    cant_expr = _sql_cantidad_num_expr()
     sql = f"""
         SELECT
             TRIM("Articulo") AS articulo,
-            SUM(
-                CAST(
-                    REPLACE(
-                        REPLACE(
-                            REPLACE(
-                                REPLACE(TRIM("Monto Neto"), '(', ''),
-                            ')', ''),
-                        '.', ''),
-                    ',', '.')
-                AS NUMERIC)
-            ) AS total_monto,
+            SUM({monto_expr}) AS total_monto,
             COUNT(DISTINCT "Nro. Comprobante") AS facturas,
-            SUM(
-                CAST(
-                    REPLACE(
-                        REPLACE(
-                            REPLACE(
-                                REPLACE(TRIM("Cantidad"), '(', ''),
-                            ')', ''),
-                        '.', ''),
-                    ',', '.')
-                AS NUMERIC)
-            ) AS cantidad_total
+            SUM({cant_expr}) AS cantidad_total
         FROM chatbot_raw
         WHERE LOWER(TRIM("Articulo")) LIKE %s
           AND "Año" = %s
@@ -437,14 +425,15 @@ def get_detalle_compras_articulo_anio(articulo_like: str, anio: int, limite: int
 
 def get_total_compras_articulo_anio(articulo_like: str, anio: int) -> dict:
     """Total de compras de un artículo en un año."""
+    f = _sql_fuente_agregados(monto_expr=_sql_total_num_expr())
     sql = f"""
         SELECT
-            COUNT(*) AS registros,
-            COALESCE(SUM(CAST(NULLIF(TRIM("Monto Neto"), '') AS NUMERIC)), 0) AS total
-        FROM chatbot_raw
-        WHERE ("Tipo Comprobante" = 'Compra Contado' OR "Tipo Comprobante" LIKE 'Compra%%')
-          AND "Año" = %s
-          AND LOWER(TRIM("Articulo")) LIKE %s
+            COALESCE(SUM({f.lineas}), 0) AS registros,
+            COALESCE(SUM({f.monto}), 0) AS total
+        FROM {f.tabla}
+        WHERE {f.es_compra}
+          AND {f.anio} = %s
+          AND LOWER({f.articulo}) LIKE %s
     """
     df = ejecutar_consulta(sql, (anio, f"%{articulo_like.lower()}%"))
     if df is not None and not df.empty:
@@ -458,7 +447,6 @@ def get_total_compras_articulo_anio(articulo_like: str, anio: int) -> dict:
 # =====================================================================
 # GET LISTA ARTÍCULOS (para compatibilidad con ia_interpretador_articulos)
 # =====================================================================
-@st.cache_data(ttl=60 * 60)
 def get_lista_articulos() -> list[str]:
     """
     Devuelve la lista de artículos únicos de la BD.
@@ -586,80 +574,68 @@ def _factura_variantes(nro_factura: str) -> List[str]:
 
 
 def get_detalle_factura_por_numero(nro_factura: str) -> pd.DataFrame:
-    """Detalle de una factura por número."""
+    """Detalle de una factura por número (todas las variantes en una sola consulta)."""
+    variantes = _factura_variantes(nro_factura)
+    print(f"🔍 DEBUG FACTURA: Buscando '{nro_factura}' | variantes: {variantes}")
+    if not variantes:
+        print("❌ No se generaron variantes")
+        return pd.DataFrame()
+
+    cte, params = _sql_cte_factura(
+        variantes,
+        nro_factura,
+        where_extra="""
+              AND TRIM("Nro. Comprobante") <> 'A0000000'
+              AND (
+                "Tipo Comprobante" ILIKE '%%Compra%%'
+                OR "Tipo Comprobante" ILIKE '%%Factura%%'
+              )""",
+    )
     total_expr = _sql_total_num_expr_general()
     sql = f"""
+        {cte}
         SELECT
-            TRIM("Nro. Comprobante") AS nro_factura,
+            fc_nro AS nro_factura,
             TRIM("Cliente / Proveedor") AS Proveedor,
             TRIM("Articulo") AS Articulo,
             "Fecha",
             "Cantidad",
             "Moneda",
             {total_expr} AS Total
-        FROM chatbot_raw
-        WHERE TRIM("Nro. Comprobante") = %s
-          AND TRIM("Nro. Comprobante") <> 'A0000000'
-          AND (
-            "Tipo Comprobante" ILIKE '%Compra%'
-            OR "Tipo Comprobante" ILIKE '%Factura%'
-          )
+        FROM fac
         ORDER BY TRIM("Articulo")
     """
+    df = ejecutar_consulta(sql, params)
+    if df is None or df.empty:
+        print(f"❌ No encontrada con ninguna variante de {variantes}")
+        return df if df is not None else pd.DataFrame()
 
-    variantes = _factura_variantes(nro_factura)
-    
-    # DEBUG: Imprimir variantes generadas
-    print(f"🔍 DEBUG FACTURA: Buscando '{nro_factura}'")
-    print(f"🔍 Variantes generadas: {variantes}")
-    
-    if not variantes:
-        print("❌ No se generaron variantes")
-        return ejecutar_consulta(sql, ("",))
-
-    # Probar primera variante
-    print(f"🔍 Probando variante 1: '{variantes[0]}'")
-    df = ejecutar_consulta(sql, (variantes[0],))
-    if df is not None and not df.empty:
-        print(f"✅ Encontrada con '{variantes[0]}' ({len(df)} líneas)")
-        return df
-
-    # Probar variantes alternativas
-    for i, alt in enumerate(variantes[1:], 2):
-        print(f"🔍 Probando variante {i}: '{alt}'")
-        df2 = ejecutar_consulta(sql, (alt,))
-        if df2 is not None and not df2.empty:
-            print(f"✅ Encontrada con '{alt}' ({len(df2)} líneas)")
-            df2.attrs["nro_factura_fallback"] = alt
-            return df2
-
-    print(f"❌ No encontrada con ninguna variante de {variantes}")
-    return df if df is not None else pd.DataFrame()
+    encontrada = str(df["nro_factura"].iloc[0])
+    print(f"✅ Encontrada con '{encontrada}' ({len(df)} líneas)")
+    if encontrada != variantes[0]:
+        df.attrs["nro_factura_fallback"] = encontrada
+    return df
 
 
 def get_total_factura_por_numero(nro_factura: str) -> pd.DataFrame:
     """Total de una factura."""
-    total_expr = _sql_total_num_expr_general()
-    sql = f"""
-        SELECT COALESCE(SUM({total_expr}), 0) AS total_factura
-        FROM chatbot_raw
-        WHERE TRIM("Nro. Comprobante") = %s
-    """
-
     variantes = _factura_variantes(nro_factura)
     if not variantes:
-        return ejecutar_consulta(sql, ("",))
+        return pd.DataFrame({"total_factura": [0]})
 
-    df = ejecutar_consulta(sql, (variantes[0],))
+    cte, params = _sql_cte_factura(variantes, nro_factura)
+    total_expr = _sql_total_num_expr_general()
+    sql = f"""
+        {cte}
+        SELECT COALESCE(SUM({total_expr}), 0) AS total_factura, MIN(fc_nro) AS nro_factura
+        FROM fac
+    """
+    df = ejecutar_consulta(sql, params)
     if df is not None and not df.empty:
-        return df
-
-    for alt in variantes[1:]:
-        df2 = ejecutar_consulta(sql, (alt,))
-        if df2 is not None and not df2.empty:
-            df2.attrs["nro_factura_fallback"] = alt
-            return df2
-
+        encontrada = df["nro_factura"].iloc[0]
+        if encontrada and encontrada != variantes[0]:
+            df.attrs["nro_factura_fallback"] = encontrada
+        return df[["total_factura"]]
     return df if df is not None else pd.DataFrame()
 
 
@@ -817,7 +793,7 @@ def get_total_facturas_proveedor(
     query = f"""
         SELECT
             TRIM("Moneda") AS Moneda,
-            COALESCE(SUM(CAST(NULLIF(TRIM("Monto Neto"), '') AS NUMERIC)), 0) AS Total
+            COALESCE(SUM({_sql_total_num_expr()}), 0) AS Total
         FROM chatbot_raw
         WHERE {" AND ".join(where_parts)}
         GROUP BY TRIM("Moneda")
@@ -1025,20 +1001,43 @@ def get_total_compras_por_moneda_anio(anio: int) -> pd.DataFrame:
 # FUNCIONES PARA DASHBOARD (FUNCIONA COORRECTAMENTE NO TOCAR SQL)
 # =========================
 
-def get_dashboard_totales(anio: int) -> dict:
-    """Totales generales para métricas del dashboard."""
-    total_expr = _sql_total_num_expr_general()
-    sql = f"""
-        SELECT
-            COALESCE(SUM(CASE WHEN TRIM("Moneda") = '$' THEN {total_expr} ELSE 0 END), 0) AS total_pesos,
-            COALESCE(SUM(CASE WHEN TRIM("Moneda") IN ('U$S', 'U$$') THEN {total_expr} ELSE 0 END), 0) AS total_usd,
-            COUNT(DISTINCT TRIM("Cliente / Proveedor")) AS proveedores,
-            COUNT(DISTINCT TRIM("Nro. Comprobante")) AS facturas
-        FROM chatbot_raw
-        WHERE ("Tipo Comprobante" = 'Compra Contado' OR "Tipo Comprobante" LIKE 'Compra%%')
-          AND "Año" = %s
-    """
-    df = ejecutar_consulta(sql, (anio,))
+def _sql_dashboard_totales(anio: int, f: Optional[FuenteAgregados] = None) -> tuple:
+    f = f or _sql_fuente_agregados()
+    if f.es_rollup:
+        # Facturas distintas del año no se pueden sumar desde el rollup (el mismo
+        # número se repite entre proveedores/monedas): se cuentan en chatbot_raw.
+        sql = f"""
+            SELECT
+                COALESCE(SUM(CASE WHEN {f.moneda} = '$' THEN {f.monto} ELSE 0 END), 0) AS total_pesos,
+                COALESCE(SUM(CASE WHEN {f.moneda} IN ('U$S', 'U$$') THEN {f.monto} ELSE 0 END), 0) AS total_usd,
+                COUNT(DISTINCT {f.proveedor}) AS proveedores,
+                (
+                    SELECT COUNT(DISTINCT TRIM("Nro. Comprobante"))
+                    FROM chatbot_raw
+                    WHERE ("Tipo Comprobante" = 'Compra Contado' OR "Tipo Comprobante" LIKE 'Compra%%')
+                      AND anio = %s
+                ) AS facturas
+            FROM {f.tabla}
+            WHERE {f.es_compra}
+              AND {f.anio} = %s
+        """
+        params = (anio, anio)
+    else:
+        sql = f"""
+            SELECT
+                COALESCE(SUM(CASE WHEN {f.moneda} = '$' THEN {f.monto} ELSE 0 END), 0) AS total_pesos,
+                COALESCE(SUM(CASE WHEN {f.moneda} IN ('U$S', 'U$$') THEN {f.monto} ELSE 0 END), 0) AS total_usd,
+                COUNT(DISTINCT {f.proveedor}) AS proveedores,
+                COUNT(DISTINCT TRIM("Nro. Comprobante")) AS facturas
+            FROM {f.tabla}
+            WHERE {f.es_compra}
+              AND {f.anio} = %s
+        """
+        params = (anio,)
+    return sql, params
+
+
+def _dashboard_totales_desde_df(df: pd.DataFrame) -> dict:
     if df is not None and not df.empty:
         return {
             "total_pesos": float(df["total_pesos"].iloc[0] or 0),
@@ -1049,50 +1048,60 @@ def get_dashboard_totales(anio: int) -> dict:
     return {"total_pesos": 0.0, "total_usd": 0.0, "proveedores": 0, "facturas": 0}
 
 
-def get_dashboard_compras_por_mes(anio: int) -> pd.DataFrame:
-    """Datos para gráfico de barras mensual."""
-    total_expr = _sql_total_num_expr_general()
+def get_dashboard_totales(anio: int) -> dict:
+    """Totales generales para métricas del dashboard."""
+    return _dashboard_totales_desde_df(ejecutar_analitica(lambda f: _sql_dashboard_totales(anio, f)))
+
+
+def _sql_dashboard_compras_por_mes(anio: int, f: Optional[FuenteAgregados] = None) -> tuple:
+    f = f or _sql_fuente_agregados()
     sql = f"""
         SELECT
-            TRIM("Mes") AS Mes,
-            COALESCE(SUM({total_expr}), 0) AS Total
-        FROM chatbot_raw
-        WHERE ("Tipo Comprobante" = 'Compra Contado' OR "Tipo Comprobante" LIKE 'Compra%%')
-          AND "Año" = %s
-        GROUP BY TRIM("Mes")
-        ORDER BY MIN("Fecha") ASC
+            {f.mes} AS Mes,
+            COALESCE(SUM({f.monto}), 0) AS Total
+        FROM {f.tabla}
+        WHERE {f.es_compra}
+          AND {f.anio} = %s
+        GROUP BY {f.mes}
+        ORDER BY MIN({f.fecha}) ASC
     """
-    return ejecutar_consulta(sql, (anio,))
+    return sql, (anio,)
 
-def get_dashboard_top_proveedores(
-    anio: int, 
-    top_n: int = 10, 
-    moneda: str = "$",
-    meses: list = None  # ✅ NUEVO parámetro
-) -> pd.DataFrame:
-    """Top proveedores por moneda - VERSIÓN EXTENDIDA CON FECHA y filtro de meses."""
+
+def get_dashboard_compras_por_mes(anio: int) -> pd.DataFrame:
+    """Datos para gráfico de barras mensual."""
+    return ejecutar_analitica(lambda f: _sql_dashboard_compras_por_mes(anio, f))
+
+
+def _sql_dashboard_top_proveedores(
+    anio: int, top_n: int = 10, meses: list = None, f: Optional[FuenteAgregados] = None
+) -> tuple:
     total_expr = _sql_total_num_expr_general()
+    f = f or _sql_fuente_agregados()
     
     # ✅ NUEVO: Construir filtro de mes
     filtro_mes = ""
+    filtro_mes_agg = ""
     meses_params = []
     if meses and len(meses) > 0:
         meses_placeholders = ', '.join(['%s'] * len(meses))
         filtro_mes = f'AND TRIM("Mes") IN ({meses_placeholders})'
+        filtro_mes_agg = f'AND {f.mes} IN ({meses_placeholders})'
         meses_params = list(meses)
     
+    # El ranking es sólo-agregado (rollup si existe); el detalle sale de chatbot_raw.
     sql = f"""
         WITH proveedor_totales AS (
             SELECT
-                TRIM("Cliente / Proveedor") AS Proveedor,
-                SUM(CASE WHEN TRIM("Moneda") IN ('$', 'UYU', 'PESO') THEN {total_expr} ELSE 0 END) AS Total_$,
-                SUM(CASE WHEN TRIM("Moneda") IN ('U$S', 'USD', 'US$') THEN {total_expr} ELSE 0 END) AS Total_USD
-            FROM chatbot_raw
-            WHERE ("Tipo Comprobante" = 'Compra Contado' OR "Tipo Comprobante" LIKE 'Compra%%')
-              AND "Año" = %s
-              {filtro_mes}
-              AND TRIM("Cliente / Proveedor") <> ''
-            GROUP BY TRIM("Cliente / Proveedor")
+                {f.proveedor} AS Proveedor,
+                SUM(CASE WHEN {f.moneda} IN ('$', 'UYU', 'PESO') THEN {f.monto} ELSE 0 END) AS Total_$,
+                SUM(CASE WHEN {f.moneda} IN ('U$S', 'USD', 'US$') THEN {f.monto} ELSE 0 END) AS Total_USD
+            FROM {f.tabla}
+            WHERE {f.es_compra}
+              AND {f.anio} = %s
+              {filtro_mes_agg}
+              AND {f.proveedor} <> ''
+            GROUP BY {f.proveedor}
             ORDER BY Total_$ DESC, Total_USD DESC
             LIMIT %s
         )
@@ -1115,27 +1124,41 @@ def get_dashboard_top_proveedores(
     # ✅ Construir parámetros en el orden correcto
     params = [anio] + meses_params + [top_n, anio] + meses_params
     
-    return ejecutar_consulta(sql, tuple(params))
+    return sql, tuple(params)
 
 
-def get_dashboard_gastos_familia(anio: int) -> pd.DataFrame:
-    """Datos para gráfico de torta por familia."""
+def get_dashboard_top_proveedores(
+    anio: int, 
+    top_n: int = 10, 
+    moneda: str = "$",
+    meses: list = None  # ✅ NUEVO parámetro
+) -> pd.DataFrame:
+    """Top proveedores por moneda - VERSIÓN EXTENDIDA CON FECHA y filtro de meses."""
+    return ejecutar_analitica(lambda f: _sql_dashboard_top_proveedores(anio, top_n, meses, f))
+
+
+def _sql_dashboard_gastos_familia(anio: int, f: Optional[FuenteAgregados] = None) -> tuple:
     # Asumiendo que hay una columna "Familia" o similar; ajusta según tu esquema
-    total_expr = _sql_total_num_expr_general()
+    f = f or _sql_fuente_agregados()
     sql = f"""
         SELECT
-            COALESCE(TRIM("Familia"), 'Sin Clasificar') AS Familia,
-            COALESCE(SUM({total_expr}), 0) AS Total
-        FROM chatbot_raw
-        WHERE ("Tipo Comprobante" = 'Compra Contado' OR "Tipo Comprobante" LIKE 'Compra%%')
-          AND "Año" = %s
-        GROUP BY COALESCE(TRIM("Familia"), 'Sin Clasificar')
+            COALESCE({f.familia}, 'Sin Clasificar') AS Familia,
+            COALESCE(SUM({f.monto}), 0) AS Total
+        FROM {f.tabla}
+        WHERE {f.es_compra}
+          AND {f.anio} = %s
+        GROUP BY COALESCE({f.familia}, 'Sin Clasificar')
         ORDER BY Total DESC
     """
-    return ejecutar_consulta(sql, (anio,))
+    return sql, (anio,)
 
-def get_dashboard_ultimas_compras(anio: int, limite: int = 10) -> pd.DataFrame:
-    """Últimas compras recientes."""
+
+def get_dashboard_gastos_familia(anio: int) -> pd.DataFrame:
+    """Datos para gráfico de torta por familia."""
+    return ejecutar_analitica(lambda f: _sql_dashboard_gastos_familia(anio, f))
+
+
+def _sql_dashboard_ultimas_compras(anio: int, limite: int = 10) -> tuple:
     total_expr = _sql_total_num_expr_general()
     sql = f"""
         SELECT
@@ -1149,7 +1172,32 @@ def get_dashboard_ultimas_compras(anio: int, limite: int = 10) -> pd.DataFrame:
         ORDER BY "Fecha" DESC NULLS LAST
         LIMIT %s
     """
-    return ejecutar_consulta(sql, (anio, limite))
+    return sql, (anio, limite)
+
+
+def get_dashboard_ultimas_compras(anio: int, limite: int = 10) -> pd.DataFrame:
+    """Últimas compras recientes."""
+    return ejecutar_analitica(lambda _f: _sql_dashboard_ultimas_compras(anio, limite))
+
+
+def get_dashboard_datos(anio: int, top_n: int = 10, limite_ultimas: int = 10) -> dict:
+    """
+    Todo lo que necesita el dashboard en un solo lote (ver sql_core.ejecutar_consultas):
+    las consultas corren en paralelo y la página espera sólo a la más lenta.
+    Con la réplica analítica al día corren en DuckDB (replica_analitica.py).
+
+    Retorna: {"totales": dict, "compras_por_mes", "top_proveedores",
+              "gastos_familia", "ultimas_compras": DataFrame}
+    """
+    dfs = ejecutar_analiticas({
+        "totales": lambda f: _sql_dashboard_totales(anio, f),
+        "compras_por_mes": lambda f: _sql_dashboard_compras_por_mes(anio, f),
+        "top_proveedores": lambda f: _sql_dashboard_top_proveedores(anio, top_n, f=f),
+        "gastos_familia": lambda f: _sql_dashboard_gastos_familia(anio, f),
+        "ultimas_compras": lambda _f: _sql_dashboard_ultimas_compras(anio, limite_ultimas),
+    })
+    dfs["totales"] = _dashboard_totales_desde_df(dfs.get("totales"))
+    return dfs
 
 # =========================
 # WRAPPER – COMPATIBILIDAD MENÚ COMPARATIVAS
@@ -1238,20 +1286,11 @@ def get_cantidad_anual_por_articulo(anio: int, proveedor_like: str = None) -> pd
     """
     Devuelve la cantidad anual total por artículo en el año especificado, opcionalmente filtrado por proveedor.
     """
-    sql = """
+    cant_expr = _sql_cantidad_num_expr()
+    sql = f"""
     SELECT
         "Articulo",
-        SUM(
-            CAST(
-                REPLACE(
-                    REPLACE(
-                        REPLACE(
-                            REPLACE(TRIM("Cantidad"), '(', ''),
-                        ')', ''),
-                    '.', ''),
-                ',', '.')
-            AS NUMERIC)
-        ) AS cantidad_anual,
+        SUM({cant_expr}) AS cantidad_anual,
         MAX("Fecha") AS ultima_compra,
         (ARRAY_AGG("Cliente / Proveedor" ORDER BY "Fecha" DESC))[1] AS proveedor
     FROM chatbot_raw
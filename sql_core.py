@@ -4,10 +4,17 @@
 
 import os
 import re
+import time
 import pandas as pd
-from typing import Optional, List
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Optional, List, NamedTuple, Dict, Iterator
 import streamlit as st
 
+from db_pool import get_pool, get_pool_stats
+from cache_consultas import get_cache_consultas, get_cache_stats, es_escritura, tablas_escritas, tablas_leidas
+import sql_arrow
+
 try:
     import psycopg2
 except ImportError:
@@ -18,8 +25,8 @@ except ImportError:
 # CONEXIÓN DB (SUPABASE / POSTGRES)
 # =====================================================================
 
-def get_db_connection():
-    """Conexión a Postgres (Supabase) usando Secrets/Env vars."""
+def _crear_conexion_db():
+    """Abre una conexión física nueva a Postgres (Supabase) usando Secrets/Env vars."""
     if psycopg2 is None:
         print("❌ psycopg2 no instalado")
         return None
@@ -51,6 +58,21 @@ def get_db_connection():
         return None
 
 
+def get_db_connection():
+    """
+    Conexión a Postgres (Supabase) tomada del pool del proceso.
+    `conn.close()` la devuelve al pool (no cierra el socket).
+    """
+    return get_pool(_crear_conexion_db).getconn()
+
+
+@contextmanager
+def db_conexion():
+    """Checkout por sesión: `with db_conexion() as conn:` (None si no hay conexión)."""
+    with get_pool(_crear_conexion_db).connection() as conn:
+        yield conn
+
+
 # =====================================================================
 # CONSTANTES - TABLAS Y COLUMNAS
 # =====================================================================
@@ -74,6 +96,106 @@ COL_MONTO = '"Monto Neto"'
 # HELPERS SQL (POSTGRES)
 # =====================================================================
 
+# =====================================================================
+# COLUMNAS TIPADAS (monto_num, cantidad_num, fecha_date, anio, mes_key)
+# =====================================================================
+# Las crea y mantiene sql_migraciones.aplicar_columnas_tipadas().
+# Hasta que la migración esté registrada, los helpers siguen parseando TEXT.
+
+MIGRACION_COLUMNAS_TIPADAS = "chatbot_raw_columnas_tipadas_v1"
+MIGRACION_ROLLUP_MES = "chatbot_rollup_mes_v1"
+MIGRACION_BUSQUEDA_TRGM = "busqueda_trgm_v1"
+MIGRACION_VERSIONES_TABLAS = "tabla_versiones_v1"
+MIGRACION_FACTURA_NRO_NORM = "factura_nro_norm_v1"
+MIGRACION_STOCK_TIPADO = "stock_tipado_v1"
+MIGRACION_STOCK_LOTE_CLAVE = "stock_lote_clave_v1"
+MIGRACION_SNAPSHOT_DELTA = "snapshot_delta_v1"
+MIGRACION_KARDEX_INDICE = "kardex_indice_v1"
+MIGRACION_KARDEX_CHECKPOINTS = "kardex_checkpoints_v1"
+MIGRACION_REPLICA_DELTA = "replica_delta_v1"
+
+_MIGRACIONES_APLICADAS: dict = {}
+
+
+def migracion_aplicada(nombre: str) -> bool:
+    """True si la migración está registrada en fc_migraciones (se consulta una vez por proceso)."""
+    if nombre in _MIGRACIONES_APLICADAS:
+        return _MIGRACIONES_APLICADAS[nombre]
+
+    flag = str(os.getenv("SQL_MIGRACIONES", "")).strip().lower()
+    if flag in ("0", "false", "no"):
+        _MIGRACIONES_APLICADAS[nombre] = False
+        return False
+
+    conn = get_db_connection()
+    if not conn:
+        return False
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT to_regclass('fc_migraciones') IS NOT NULL")
+            aplicada = False
+            if bool(cur.fetchone()[0]):
+                cur.execute("SELECT 1 FROM fc_migraciones WHERE nombre = %s", (nombre,))
+                aplicada = cur.fetchone() is not None
+        _MIGRACIONES_APLICADAS[nombre] = aplicada
+    except Exception as e:
+        print(f"⚠️ No se pudo verificar migración {nombre}: {e}")
+        return False
+    finally:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    print(f"{'✅' if aplicada else 'ℹ️'} Migración {nombre}: {aplicada}")
+    return aplicada
+
+
+def columnas_tipadas_disponibles() -> bool:
+    """True si chatbot_raw ya tiene las columnas tipadas."""
+    return migracion_aplicada(MIGRACION_COLUMNAS_TIPADAS)
+
+
+def rollup_disponible() -> bool:
+    """True si existe el rollup mensual chatbot_rollup_mes (requiere columnas tipadas)."""
+    return columnas_tipadas_disponibles() and migracion_aplicada(MIGRACION_ROLLUP_MES)
+
+
+def busqueda_trgm_disponible() -> bool:
+    """True si existen fc_norm_busqueda() y los índices trigram de búsqueda."""
+    return migracion_aplicada(MIGRACION_BUSQUEDA_TRGM)
+
+
+def factura_nro_norm_disponible() -> bool:
+    """True si existen fc_nro_factura_norm() y su índice sobre chatbot_raw."""
+    return migracion_aplicada(MIGRACION_FACTURA_NRO_NORM)
+
+
+def stock_tipado_disponible() -> bool:
+    """True si la tabla stock tiene vencimiento_date / stock_num (ver sql_migraciones)."""
+    return migracion_aplicada(MIGRACION_STOCK_TIPADO)
+
+
+def stock_lote_clave_disponible() -> bool:
+    """True si existen el índice por clave de lote y fc_stock_cant() / fc_stock_fmt()."""
+    return migracion_aplicada(MIGRACION_STOCK_LOTE_CLAVE)
+
+
+def snapshot_delta_disponible() -> bool:
+    """True si stock/articulos tienen fc_id + fc_updated_at y existe fc_borrados."""
+    return migracion_aplicada(MIGRACION_SNAPSHOT_DELTA)
+
+
+def kardex_checkpoints_disponible() -> bool:
+    """True si existen fc_kardex_checkpoints / fc_stock_checkpoints (cierres mensuales de movimientos_stock)."""
+    return migracion_aplicada(MIGRACION_KARDEX_CHECKPOINTS)
+
+
+def replica_delta_disponible() -> bool:
+    """True si chatbot_raw tiene fc_id + fc_updated_at y registra sus borrados (réplica analítica)."""
+    return migracion_aplicada(MIGRACION_REPLICA_DELTA)
+
+
 # NOTA SOBRE FORMATOS DE DATOS:
 # - Columnas numéricas como "Monto Neto" y "Cantidad" vienen como TEXT con formato especial:
 #   - Separador de miles: punto (.) ej. "1.234.567"
@@ -82,6 +204,8 @@ COL_MONTO = '"Monto Neto"'
 #   - Espacios: pueden tener espacios iniciales/finales ej. "  123.456,78  "
 # - Las funciones _sql_total_num_expr* limpian estos formatos para convertir a NUMERIC.
 # - Usa TRIM, REPLACE y CASE para manejar casos especiales.
+# - Si la migración de columnas tipadas está aplicada, devuelven directamente
+#   monto_num / cantidad_num / mes_key (SUM y GROUP BY sin parseo por fila).
 
 def _safe_ident(col_name: str) -> str:
     clean = str(col_name).strip().strip('"')
@@ -94,6 +218,8 @@ def _sql_fecha_expr() -> str:
 
 
 def _sql_mes_col() -> str:
+    if columnas_tipadas_disponibles():
+        return "mes_key"
     return 'TRIM(COALESCE("Mes", \'\'))'
 
 
@@ -107,6 +233,8 @@ def _sql_num_from_text(text_expr: str) -> str:
 
 def _sql_total_num_expr() -> str:
     """Convierte Monto Neto a número (pesos)."""
+    if columnas_tipadas_disponibles():
+        return "monto_num"
     limpio = """
         REPLACE(
             REPLACE(
@@ -127,6 +255,8 @@ def _sql_total_num_expr() -> str:
 
 def _sql_total_num_expr_usd() -> str:
     """Convierte Monto Neto a número (USD)."""
+    if columnas_tipadas_disponibles():
+        return "monto_num"
     limpio = """
         REPLACE(
             REPLACE(
@@ -157,6 +287,8 @@ def _sql_total_num_expr_general() -> str:
     Formato de entrada: texto con puntos (miles), coma (decimal), paréntesis (negativos).
     Ej: "  124.300,00 " -> 124300.00; "(0.01)" -> -0.01
     """
+    if columnas_tipadas_disponibles():
+        return "monto_num"
     return '''
     CASE 
       WHEN LEFT(TRIM("Monto Neto"), 1) = '(' 
@@ -166,40 +298,361 @@ def _sql_total_num_expr_general() -> str:
     '''
 
 
+def _sql_cantidad_num_expr() -> str:
+    """
+    Convierte Cantidad a número (paréntesis/puntos/comas).
+    "(3)" -> -3, igual que fc_num_latam / cantidad_num: las sumas de cantidad
+    no pueden cambiar de signo según esté aplicada o no la migración.
+    """
+    if columnas_tipadas_disponibles():
+        return "cantidad_num"
+    return """
+        CAST(
+            REPLACE(
+                REPLACE(
+                    REPLACE(
+                        REPLACE(TRIM("Cantidad"), '(', '-'),
+                    ')', ''),
+                '.', ''),
+            ',', '.')
+        AS NUMERIC)
+    """
+
+
+# =====================================================================
+# BÚSQUEDA POR TEXTO (TRIGRAM)
+# =====================================================================
+# Pasar la columna SIN TRIM/LOWER (ej. '"Articulo"') para que la expresión
+# coincida con el índice fc_norm_busqueda("Articulo"). El parámetro va tal
+# cual lo escribió el usuario (sin % alrededor): se normaliza en SQL.
+
+def _sql_norm_busqueda(expr: str) -> str:
+    """Texto normalizado para comparar (minúsculas, sin acentos, sin espacios extremos)."""
+    if busqueda_trgm_disponible():
+        return f"fc_norm_busqueda({expr})"
+    return f"LOWER(TRIM({expr}))"
+
+
+def _sql_filtro_texto(col: str) -> str:
+    """Condición 'contiene' con un placeholder %s (usa el índice GIN trigram)."""
+    return f"{_sql_norm_busqueda(col)} LIKE '%%' || {_sql_norm_busqueda('%s')} || '%%'"
+
+
+def _sql_score_texto(col: str) -> str:
+    """Puntaje de similitud (mayor = mejor) con un placeholder %s."""
+    if busqueda_trgm_disponible():
+        return f"similarity({_sql_norm_busqueda(col)}, {_sql_norm_busqueda('%s')})"
+    return f"CASE WHEN {_sql_norm_busqueda(col)} LIKE {_sql_norm_busqueda('%s')} || '%%' THEN 1 ELSE 0 END"
+
+
+# =====================================================================
+# BÚSQUEDA DE FACTURA POR NÚMERO (UNA SOLA CONSULTA)
+# =====================================================================
+
+def _nro_factura_norm(nro: str) -> str:
+    """Igual que fc_nro_factura_norm(): sólo dígitos, sin ceros a la izquierda ("A00060907" -> "60907")."""
+    return re.sub(r"[^0-9]", "", str(nro or "")).lstrip("0")
+
+
+def _sql_cte_factura(variantes: List[str], nro_factura: str, where_extra: str = "") -> tuple:
+    """
+    CTE `fac` con las líneas de chatbot_raw de la factura buscada, en UNA consulta:
+    todas las variantes van juntas y gana la de menor posición en `variantes`
+    (las que sólo coinciden por número normalizado van al final).
+
+    Con la migración factura_nro_norm el filtro es fc_nro_factura_norm(...) = %s
+    (índice); sin ella, TRIM("Nro. Comprobante") = ANY(%s).
+
+    Retorna (sql_cte, params): anteponer sql_cte y seguir con SELECT ... FROM fac.
+    """
+    norm = _nro_factura_norm(nro_factura)
+    if norm and factura_nro_norm_disponible():
+        match, param_match = 'fc_nro_factura_norm("Nro. Comprobante") = %s', norm
+    else:
+        match, param_match = 'TRIM("Nro. Comprobante") = ANY(%s::text[])', list(variantes)
+
+    sql = f"""
+        WITH fac_cand AS (
+            SELECT
+                *,
+                TRIM("Nro. Comprobante") AS fc_nro,
+                COALESCE(array_position(%s::text[], TRIM("Nro. Comprobante")), 2147483647) AS fc_prio
+            FROM chatbot_raw
+            WHERE {match}
+              {where_extra}
+        ),
+        fac AS (
+            SELECT * FROM fac_cand
+            WHERE fc_nro = (SELECT fc_nro FROM fac_cand ORDER BY fc_prio, fc_nro LIMIT 1)
+        )
+    """
+    return sql, (list(variantes), param_match)
+
+
+# =====================================================================
+# KARDEX (movimientos_stock)
+# =====================================================================
+
+# Depósito de un movimiento: el propio o, en transferencias, origen (salida) / destino (entrada)
+SQL_DEPOSITO_MOVIMIENTO = (
+    "COALESCE(deposito_id, CASE WHEN qty_base < 0 THEN deposito_origen_id ELSE deposito_destino_id END)"
+)
+
+
+def _sql_kardex_ctes(fuente: str) -> str:
+    """
+    CTEs que calculan, por artículo, el estado del kardex (costo promedio móvil)
+    después de los movimientos de `fuente`. Misma cuenta que
+    ficha_stock._kardex_arrays, pero en la base:
+
+    - sólo importa el tramo desde el último saldo <= 0 (ahí costo y valor vuelven a 0);
+    - dentro del tramo una salida no cambia el costo, sólo achica el valor en
+      saldo / saldo_previo; cada entrada vale qty * precio * exp(L_fin - L_k)
+      con L = suma de log(saldo / saldo_previo) de las salidas. exp() se acota
+      en -600: Postgres da error de underflow en float8.
+
+    `fuente` es un SELECT con (articulo_id, orden, fecha_hora, id, qty, precio);
+    orden = 0 para un saldo inicial (qty = saldo, precio = costo promedio) y 1
+    para movimientos. Termina en `kestado(articulo_id, saldo_qty, saldo_valor,
+    movimientos)`; movimientos cuenta sólo orden = 1.
+
+    Uso: "WITH " + _sql_kardex_ctes(fuente) + " SELECT ... FROM kestado".
+    """
+    return f"""
+        kx AS (
+            {fuente}
+        ),
+        km AS (
+            SELECT
+                articulo_id, orden, qty, precio, rn, saldo,
+                LAG(saldo, 1, 0::float8) OVER (PARTITION BY articulo_id ORDER BY rn) AS saldo_prev
+            FROM (
+                SELECT kx.*, ROW_NUMBER() OVER w AS rn, SUM(qty) OVER w AS saldo
+                FROM kx
+                WINDOW w AS (PARTITION BY articulo_id ORDER BY orden, fecha_hora, id)
+            ) s
+        ),
+        kc AS (
+            SELECT
+                articulo_id,
+                COALESCE(MAX(rn) FILTER (WHERE saldo <= 0), 0) AS rn_corte,
+                (ARRAY_AGG(saldo ORDER BY rn DESC))[1] AS saldo_qty,
+                COUNT(*) FILTER (WHERE orden = 1) AS movimientos
+            FROM km
+            GROUP BY articulo_id
+        ),
+        kt AS (
+            SELECT
+                km.articulo_id, km.rn, km.qty, km.precio,
+                SUM(CASE WHEN km.qty < 0 THEN LN(km.saldo / km.saldo_prev) ELSE 0 END)
+                    OVER (PARTITION BY km.articulo_id ORDER BY km.rn) AS l
+            FROM km
+            JOIN kc ON kc.articulo_id = km.articulo_id
+            WHERE km.rn > kc.rn_corte
+        ),
+        kv AS (
+            SELECT
+                articulo_id,
+                SUM(CASE WHEN qty > 0 THEN qty * precio * EXP(GREATEST(l_fin - l, -600)) ELSE 0 END) AS saldo_valor
+            FROM (
+                SELECT
+                    kt.*,
+                    LAST_VALUE(l) OVER (
+                        PARTITION BY articulo_id ORDER BY rn
+                        ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING
+                    ) AS l_fin
+                FROM kt
+            ) z
+            GROUP BY articulo_id
+        ),
+        kestado AS (
+            SELECT
+                kc.articulo_id,
+                kc.saldo_qty,
+                CASE WHEN kc.saldo_qty > 0 THEN COALESCE(kv.saldo_valor, 0) ELSE 0 END AS saldo_valor,
+                kc.movimientos
+            FROM kc
+            LEFT JOIN kv ON kv.articulo_id = kc.articulo_id
+        )
+    """
+
+
+# =====================================================================
+# PLANIFICADOR: ROLLUP MENSUAL vs LÍNEAS CRUDAS
+# =====================================================================
+
+class FuenteAgregados(NamedTuple):
+    """
+    Tabla y expresiones para armar un agregado de compras.
+    Las medidas (monto*, cantidad, lineas) son sumables: usar SUM({...}).
+    col_proveedor / col_articulo son las columnas para _sql_filtro_texto.
+    """
+    tabla: str
+    es_rollup: bool
+    proveedor: str
+    articulo: str
+    col_proveedor: str
+    col_articulo: str
+    familia: str
+    moneda: str
+    mes: str
+    anio: str
+    es_compra: str
+    monto: str
+    monto_pesos: str
+    monto_usd: str
+    cantidad: str
+    lineas: str
+    fecha: str
+
+
+def _sql_fuente_agregados(monto_expr: Optional[str] = None) -> FuenteAgregados:
+    """
+    Elige la fuente para consultas sólo-agregado (SUM/COUNT por mes, proveedor,
+    artículo, familia o moneda): chatbot_rollup_mes si está disponible, si no
+    chatbot_raw. Las vistas de detalle (líneas de factura) no pasan por acá.
+
+    `monto_expr` reemplaza la expresión de monto sólo para chatbot_raw.
+    """
+    if rollup_disponible():
+        return FuenteAgregados(
+            tabla="chatbot_rollup_mes",
+            es_rollup=True,
+            proveedor="proveedor",
+            articulo="articulo",
+            col_proveedor="proveedor",
+            col_articulo="articulo",
+            familia="familia",
+            moneda="moneda",
+            mes="mes_key",
+            anio="anio",
+            es_compra="es_compra",
+            monto="monto_sum",
+            monto_pesos="monto_sum",
+            monto_usd="monto_sum",
+            cantidad="cantidad_sum",
+            lineas="lineas",
+            fecha="fecha_min",
+        )
+
+    return FuenteAgregados(
+        tabla="chatbot_raw",
+        es_rollup=False,
+        proveedor='TRIM("Cliente / Proveedor")',
+        articulo='TRIM("Articulo")',
+        col_proveedor='"Cliente / Proveedor"',
+        col_articulo='"Articulo"',
+        familia='TRIM("Familia")',
+        moneda='TRIM("Moneda")',
+        mes='TRIM("Mes")',
+        anio='"Año"::int',
+        es_compra='("Tipo Comprobante" = \'Compra Contado\' OR "Tipo Comprobante" LIKE \'Compra%%\')',
+        monto=monto_expr or _sql_total_num_expr_general(),
+        monto_pesos=_sql_total_num_expr(),
+        monto_usd=_sql_total_num_expr_usd(),
+        cantidad=_sql_cantidad_num_expr(),
+        lineas="1",
+        fecha='"Fecha"',
+    )
+
+
 # =====================================================================
 # EJECUTOR SQL
 # =====================================================================
 
-def ejecutar_consulta(query: str, params: tuple = None) -> pd.DataFrame:
+def _leer_versiones_tablas() -> Optional[dict]:
+    """{tabla: version} desde fc_tabla_versiones (None si la migración no está)."""
+    if not migracion_aplicada(MIGRACION_VERSIONES_TABLAS):
+        return None
+    conn = get_db_connection()
+    if not conn:
+        return None
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT tabla, version FROM fc_tabla_versiones")
+            return {str(t).lower(): int(v) for t, v in cur.fetchall()}
+    finally:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+def invalidar_cache_tablas(*tablas: str) -> None:
+    """
+    Avisar al cache de consultas que se escribió en estas tablas.
+    Llamar después del commit en escrituras que no pasan por ejecutar_consulta
+    (cursores propios, API de Supabase).
+    """
+    get_cache_consultas().invalidar(*tablas)
+
+
+get_cache_consultas().set_lector_versiones(_leer_versiones_tablas)
+
+
+def ejecutar_consulta(
+    query: str,
+    params: tuple = None,
+    usar_cache: bool = True,
+    conn=None,
+) -> pd.DataFrame:
     """
     Ejecuta una consulta SQL y retorna los resultados en un DataFrame.
+    Los SELECT se cachean (ver cache_consultas.py); las escrituras invalidan
+    las tablas que tocan. usar_cache=False fuerza ir a la base.
+    Con `conn` usa esa conexión (no la devuelve al pool).
     """
-    conn = None
+    if params is None:
+        params = ()
+
+    cache = get_cache_consultas()
+    escritura = es_escritura(query)
+    clave = None
+    if usar_cache and not escritura and cache.habilitado:
+        clave = cache.clave(query, params)
+        df = cache.obtener(clave) if clave is not None else None
+        if df is not None:
+            print(f"⚡ Cache SQL: {len(df)} filas (sin ir a la base)")
+            return df
+        foto = cache.versiones(tablas_leidas(query)) if clave is not None else None
+
+    conn_propia = conn is None
     try:
-        conn = get_db_connection()
+        if conn_propia:
+            conn = get_db_connection()
         if not conn:
             print("❌ No se pudo establecer conexión con la base de datos.")
             return pd.DataFrame()
 
-        if params is None:
-            params = ()
-
         print("\n🛠 SQL ejecutado:")
         print(query)
         print("🛠 Parámetros usados:")
         print(params)
 
-        with conn.cursor() as cur:
-            cur.execute(query, params)
-            if cur.description is None:
-                conn.commit()
-                print("✅ Consulta sin retorno ejecutada.")
-                return pd.DataFrame()
+        df = None
+        if conn_propia and not escritura and sql_arrow.modo_arrow() == "copy":
+            df = sql_arrow.copiar_select(conn, query, params)
 
-            cols = [d[0] for d in cur.description]
-            rows = cur.fetchall()
+        if df is None:
+            with conn.cursor() as cur:
+                sql_arrow.preparar_cursor(cur)
+                cur.execute(query, params)
+                if cur.description is None:
+                    conn.commit()
+                    if escritura:
+                        cache.invalidar(*tablas_escritas(query))
+                    print("✅ Consulta sin retorno ejecutada.")
+                    return pd.DataFrame()
 
-        df = pd.DataFrame(rows, columns=cols)
+                cols = [d[0] for d in cur.description]
+                # Tuplas -> DataFrame, o por columnas a Arrow (SQL_ARROW, ver sql_arrow.py)
+                df = sql_arrow.leer_resultado(cur, cols)
+
+        if escritura:
+            cache.invalidar(*tablas_escritas(query))
+
+        if clave is not None:
+            cache.guardar(clave, df, foto)
 
         if df.empty:
             print("⚠️ Consulta ejecutada, pero no devolvió resultados.")
@@ -213,16 +666,148 @@ def ejecutar_consulta(query: str, params: tuple = None) -> pd.DataFrame:
         print(f"SQL fallido:\n{query}")
         print(f"Parámetros:\n{params}")
         print(f"Traceback completo:\n{traceback.format_exc()}")
+        if conn and not conn_propia:
+            # Conexión compartida: dejarla usable para la próxima consulta
+            try:
+                conn.rollback()
+            except Exception:
+                pass
         return pd.DataFrame()
     
     finally:
-        if conn:
+        if conn and conn_propia:
             try:
                 conn.close()
             except:
                 pass
 
 
+def ejecutar_consultas(
+    consultas: Dict[str, object],
+    paralelo: bool = True,
+    max_hilos: int = 8,
+    usar_cache: bool = True,
+) -> Dict[str, pd.DataFrame]:
+    """
+    Ejecuta varias consultas con nombre y devuelve {nombre: DataFrame}.
+
+    consultas: {"nombre": "SELECT ..."} o {"nombre": ("SELECT ... %s", params)}
+
+    paralelo=True  → cada consulta en un hilo con su propia conexión del pool:
+                     la página tarda lo que la consulta más lenta, no la suma.
+    paralelo=False → todas en serie sobre UNA conexión (un solo checkout).
+
+    Cada consulta pasa por ejecutar_consulta (cache, logs, manejo de errores):
+    si una falla, su DataFrame viene vacío y el resto sigue.
+    """
+    lote = []
+    for nombre, q in consultas.items():
+        if isinstance(q, (tuple, list)):
+            sql, params = q[0], (q[1] if len(q) > 1 else ())
+        else:
+            sql, params = q, ()
+        lote.append((nombre, sql, params))
+
+    if not lote:
+        return {}
+
+    t0 = time.perf_counter()
+    resultados: Dict[str, pd.DataFrame] = {}
+
+    if paralelo and len(lote) > 1:
+        hilos = max(1, min(len(lote), max_hilos, get_pool(_crear_conexion_db).max_size))
+        with ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="fc-sql") as ex:
+            futuros = {
+                nombre: ex.submit(ejecutar_consulta, sql, params, usar_cache)
+                for nombre, sql, params in lote
+            }
+            for nombre, fut in futuros.items():
+                try:
+                    resultados[nombre] = fut.result()
+                except Exception as e:
+                    print(f"❌ Lote SQL: '{nombre}' falló: {e}")
+                    resultados[nombre] = pd.DataFrame()
+        modo = f"paralelo x{hilos}"
+    else:
+        with db_conexion() as conn:
+            for nombre, sql, params in lote:
+                if conn is None:
+                    resultados[nombre] = pd.DataFrame()
+                    continue
+                resultados[nombre] = ejecutar_consulta(sql, params, usar_cache, conn=conn)
+        modo = "serie, 1 conexión"
+
+    print(f"⏱ Lote SQL: {len(lote)} consultas ({modo}) en {(time.perf_counter() - t0) * 1000:.0f} ms")
+    return resultados
+
+
+def iterar_consulta(
+    query: str,
+    params: tuple = None,
+    chunk_filas: int = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Ejecuta un SELECT con cursor de servidor (named cursor) y va devolviendo
+    DataFrames de hasta `chunk_filas` filas. Nunca tiene el resultado completo
+    en memoria: para exports grandes (ver utils_format.df_to_csv_bytes / df_to_excel).
+
+        for chunk in iterar_consulta(sql, params):
+            ...
+
+    No pasa por el cache de consultas. La conexión queda tomada hasta que se
+    termina (o se cierra) el generador. Tamaño por defecto: SQL_CHUNK_FILAS (20000).
+    """
+    if params is None:
+        params = ()
+    if chunk_filas is None:
+        try:
+            chunk_filas = int(os.getenv("SQL_CHUNK_FILAS", "") or 20000)
+        except ValueError:
+            chunk_filas = 20000
+    chunk_filas = max(1, int(chunk_filas))
+
+    if es_escritura(query):
+        raise ValueError("iterar_consulta sólo acepta consultas de lectura")
+
+    t0 = time.perf_counter()
+    total = 0
+    with db_conexion() as conn:
+        if conn is None:
+            print("❌ No se pudo establecer conexión con la base de datos.")
+            return
+
+        print("\n🛠 SQL ejecutado (stream):")
+        print(query)
+        print("🛠 Parámetros usados:")
+        print(params)
+
+        try:
+            # Named cursor = cursor del lado del servidor (DECLARE ... CURSOR)
+            with conn.cursor(name=f"fc_stream_{os.getpid()}_{id(conn)}") as cur:
+                cur.itersize = chunk_filas
+                sql_arrow.preparar_cursor(cur)
+                cur.execute(query, params)
+                cols = None
+                while True:
+                    rows = cur.fetchmany(chunk_filas)
+                    if cols is None:
+                        cols = [d[0] for d in cur.description] if cur.description else []
+                    if not rows:
+                        break
+                    total += len(rows)
+                    yield sql_arrow.filas_a_dataframe(rows, cols)
+                if total == 0:
+                    # Sin filas: igual devolver las columnas (encabezado del export)
+                    yield pd.DataFrame(columns=cols or [])
+        finally:
+            # Sólo lectura: cerrar la transacción que abrió el cursor
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            print(f"✅ Stream SQL: {total} filas en {(time.perf_counter() - t0) * 1000:.0f} ms")
+
+
 # =====================================================================
 # LISTAS / LOOKUPS
 # =====================================================================
@@ -374,16 +959,16 @@ def buscar_stock_por_lote(
         params = []
 
         if articulo:
-            sql += ' AND LOWER(TRIM("Articulo")) LIKE LOWER(%s)'
-            params.append(f"%{articulo}%")
+            sql += " AND " + _sql_filtro_texto('"Articulo"')
+            params.append(articulo)
 
         if lote and lote.strip():
-            sql += ' AND LOWER(TRIM("Lote")) LIKE LOWER(%s)'
-            params.append(f"%{lote.strip()}%")
+            sql += " AND " + _sql_filtro_texto('"Lote"')
+            params.append(lote.strip())
 
         if familia:
-            sql += ' AND LOWER(TRIM("Familia")) LIKE LOWER(%s)'
-            params.append(f"%{familia}%")
+            sql += " AND " + _sql_filtro_texto('"Familia"')
+            params.append(familia)
 
         if deposito:
             sql += ' AND LOWER(TRIM("Deposito")) LIKE LOWER(%s)'
@@ -391,14 +976,14 @@ def buscar_stock_por_lote(
 
         if texto_busqueda and texto_busqueda.strip():
             txt = texto_busqueda.strip()
-            sql += """
+            sql += f"""
                 AND (
-                    LOWER("Articulo") LIKE LOWER(%s) OR
-                    LOWER("Lote") LIKE LOWER(%s) OR
-                    LOWER("Familia") LIKE LOWER(%s)
+                    {_sql_filtro_texto('"Articulo"')} OR
+                    {_sql_filtro_texto('"Lote"')} OR
+                    {_sql_filtro_texto('"Familia"')}
                 )
             """
-            params.extend([f"%{txt}%", f"%{txt}%", f"%{txt}%"])
+            params.extend([txt, txt, txt])
 
         sql += ' ORDER BY "Vencimiento" ASC LIMIT 500'
 
@@ -466,12 +1051,12 @@ def get_facturas_articulo(articulo: str, anios: Optional[List[int]] = None) -> p
     Obtiene todas las facturas de un artículo específico, opcionalmente filtrado por años.
     """
     try:
-        sql = """
+        sql = f"""
             SELECT *
             FROM chatbot_raw
-            WHERE LOWER(TRIM("Articulo")) LIKE LOWER(%s)
+            WHERE {_sql_filtro_texto('"Articulo"')}
         """
-        params = [f"%{articulo}%"]
+        params = [articulo]
 
         if anios:
             placeholders = ', '.join(['%s'] * len(anios))
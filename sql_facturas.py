@@ -11,6 +11,8 @@ from typing import List, Optional, Any
 from sql_core import (
     ejecutar_consulta,
     _sql_total_num_expr_general,
+    columnas_tipadas_disponibles,
+    _sql_cte_factura,
 )
 
 
@@ -72,6 +74,8 @@ def _sql_monto_neto_num_expr() -> str:
     Normaliza "Monto Neto" a NUMERIC, manejando paréntesis como negativos, puntos y comas.
     Maneja formatos: 1.234,56 (Europeo: . mil, , decimal) o 1,234.56 (Americano: , mil, . decimal).
     """
+    if columnas_tipadas_disponibles():
+        return "monto_num"
     return """
         (
           CASE
@@ -104,67 +108,46 @@ def get_detalle_factura_por_numero(nro_factura: str) -> pd.DataFrame:
     Devuelve el detalle de una factura (todas las líneas) dado un número,
     probando variantes del número (A + 8 dígitos, etc.).
     
-    ESTRATEGIA:
-    1. Primero busca coincidencia EXACTA (más rápido)
-    2. Si falla, busca con ILIKE (más flexible, encuentra "A 60907", " 60907", etc.)
+    ESTRATEGIA (cada fase es UNA consulta con todas las variantes):
+    1. Coincidencia EXACTA / número normalizado (índice fc_nro_factura_norm)
+    2. Si falla, ILIKE (más flexible, encuentra "A 60907", " 60907", etc.)
+    3. Último recurso: ILIKE sin filtrar Tipo Comprobante
     """
     total_expr = _sql_total_num_expr_general()
-    
-    # SQL con coincidencia EXACTA (primera prueba)
-    sql_exacta = f"""
-        SELECT
-            TRIM("Nro. Comprobante") AS nro_factura,
-            TRIM("Cliente / Proveedor") AS Proveedor,
-            TRIM("Articulo") AS Articulo,
-            "Fecha",
-            "Cantidad",
-            "Moneda",
-            {total_expr} AS Total
-        FROM chatbot_raw
-        WHERE TRIM("Nro. Comprobante") = %s
-          AND TRIM("Nro. Comprobante") <> 'A0000000'
+    filtro_tipo = """
           AND (
-            "Tipo Comprobante" ILIKE '%Compra%'
-            OR "Tipo Comprobante" ILIKE '%Factura%'
-          )
-        ORDER BY TRIM("Articulo")
-    """
-    
-    # SQL con ILIKE (búsqueda flexible - fallback)
-    sql_ilike = f"""
-        SELECT
-            TRIM("Nro. Comprobante") AS nro_factura,
-            TRIM("Cliente / Proveedor") AS Proveedor,
-            TRIM("Articulo") AS Articulo,
-            "Fecha",
-            "Cantidad",
-            "Moneda",
-            {total_expr} AS Total
-        FROM chatbot_raw
-        WHERE "Nro. Comprobante" ILIKE %s
-          AND TRIM("Nro. Comprobante") <> 'A0000000'
-          AND (
-            "Tipo Comprobante" ILIKE '%Compra%'
-            OR "Tipo Comprobante" ILIKE '%Factura%'
-          )
-        ORDER BY TRIM("Articulo")
-    """
+            "Tipo Comprobante" ILIKE '%%Compra%%'
+            OR "Tipo Comprobante" ILIKE '%%Factura%%'
+          )"""
 
-    # SQL final sin filtro de tipo (último recurso)
-    sql_ilike_sin_tipo = f"""
-        SELECT
-            TRIM("Nro. Comprobante") AS nro_factura,
+    def _select_cols(col_nro: str) -> str:
+        return f"""
+            {col_nro} AS nro_factura,
             TRIM("Cliente / Proveedor") AS Proveedor,
             TRIM("Articulo") AS Articulo,
             "Fecha",
             "Cantidad",
             "Moneda",
-            {total_expr} AS Total
-        FROM chatbot_raw
-        WHERE "Nro. Comprobante" ILIKE %s
-          AND TRIM("Nro. Comprobante") <> 'A0000000'
-        ORDER BY TRIM("Articulo")
-    """
+            {total_expr} AS Total"""
+
+    def _sql_ilike(con_tipo: bool) -> str:
+        # Todos los patrones juntos; gana el de menor posición y, dentro de él, un solo comprobante
+        return f"""
+            WITH cand AS (
+                SELECT
+                    {_select_cols('TRIM("Nro. Comprobante")')},
+                    (SELECT MIN(p.i) FROM unnest(%s::text[]) WITH ORDINALITY AS p(patron, i)
+                      WHERE "Nro. Comprobante" ILIKE p.patron) AS prio
+                FROM chatbot_raw
+                WHERE "Nro. Comprobante" ILIKE ANY(%s::text[])
+                  AND TRIM("Nro. Comprobante") <> 'A0000000'
+                  {filtro_tipo if con_tipo else ""}
+            )
+            SELECT nro_factura, Proveedor, Articulo, "Fecha", "Cantidad", "Moneda", Total
+            FROM cand
+            WHERE nro_factura = (SELECT nro_factura FROM cand ORDER BY prio, nro_factura LIMIT 1)
+            ORDER BY Articulo
+        """
 
     variantes = _factura_variantes(nro_factura)
     
@@ -177,46 +160,50 @@ def get_detalle_factura_por_numero(nro_factura: str) -> pd.DataFrame:
         return pd.DataFrame()
 
     # ===================================================
-    # FASE 1: BÚSQUEDA EXACTA
+    # FASE 1: BÚSQUEDA EXACTA (todas las variantes, una consulta)
     # ===================================================
-    for i, variante in enumerate(variantes, 1):
-        print(f"🔍 [EXACTA] Probando variante {i}: '{variante}'")
-        df = ejecutar_consulta(sql_exacta, (variante,))
-        if df is not None and not df.empty:
-            print(f"✅ [EXACTA] Encontrada con '{variante}' ({len(df)} líneas)")
-            return df
+    cte, params = _sql_cte_factura(
+        variantes,
+        nro_factura,
+        where_extra="""AND TRIM("Nro. Comprobante") <> 'A0000000'""" + filtro_tipo,
+    )
+    df = ejecutar_consulta(
+        f"""
+        {cte}
+        SELECT {_select_cols("fc_nro")}
+        FROM fac
+        ORDER BY TRIM("Articulo")
+        """,
+        params,
+    )
+    if df is not None and not df.empty:
+        encontrada = str(df["nro_factura"].iloc[0])
+        print(f"✅ [EXACTA] Encontrada con '{encontrada}' ({len(df)} líneas)")
+        if encontrada != variantes[0]:
+            df.attrs["nro_factura_fallback"] = encontrada
+        return df
 
     # ===================================================
-    # FASE 2: BÚSQUEDA FLEXIBLE CON ILIKE
+    # FASE 2: BÚSQUEDA FLEXIBLE CON ILIKE (variantes + sólo dígitos)
     # ===================================================
     print(f"⚠️ No encontrada con búsqueda exacta. Probando con ILIKE...")
-    
-    for i, variante in enumerate(variantes, 1):
-        patron = f"%{variante}%"
-        print(f"🔍 [ILIKE] Probando variante {i}: '{patron}'")
-        df = ejecutar_consulta(sql_ilike, (patron,))
-        if df is not None and not df.empty:
-            print(f"✅ [ILIKE] Encontrada con '{patron}' ({len(df)} líneas)")
-            df.attrs["nro_factura_fallback"] = variante
-            return df
 
-    # ===================================================
-    # FASE 3: BÚSQUEDA ULTRA-FLEXIBLE (SOLO DÍGITOS)
-    # ===================================================
     # Extraer solo dígitos del input
     solo_digitos = ''.join(c for c in nro_factura if c.isdigit())
-    if solo_digitos and len(solo_digitos) >= 4:
-        patron_digitos = f"%{solo_digitos}%"
-        print(f"🔍 [ULTRA-FLEX] Probando solo dígitos: '{patron_digitos}'")
-        df = ejecutar_consulta(sql_ilike, (patron_digitos,))
-        if df is not None and not df.empty:
-            print(f"✅ [ULTRA-FLEX] Encontrada con '{patron_digitos}' ({len(df)} líneas)")
-            df.attrs["nro_factura_fallback"] = solo_digitos
-            return df
+    patrones = [f"%{v}%" for v in variantes]
+    if solo_digitos and len(solo_digitos) >= 4 and f"%{solo_digitos}%" not in patrones:
+        patrones.append(f"%{solo_digitos}%")
 
+    print(f"🔍 [ILIKE] Probando patrones: {patrones}")
+    df = ejecutar_consulta(_sql_ilike(True), (patrones, patrones))
+    if df is not None and not df.empty:
+        encontrada = str(df["nro_factura"].iloc[0])
+        print(f"✅ [ILIKE] Encontrada '{encontrada}' ({len(df)} líneas)")
+        df.attrs["nro_factura_fallback"] = encontrada
+        return df
 
     # ===================================================
-    # FASE 4: ÚLTIMO FALLBACK (SIN FILTRO DE TIPO COMPROBANTE)
+    # FASE 3: ÚLTIMO FALLBACK (SIN FILTRO DE TIPO COMPROBANTE)
     # ===================================================
     print(f"⚠️ No encontrada con filtros de tipo. Probando ILIKE sin filtrar Tipo Comprobante...")
 
@@ -226,13 +213,13 @@ def get_detalle_factura_por_numero(nro_factura: str) -> pd.DataFrame:
     # Variante principal (la que vino en el input/primer variante)
     patrones_finales.append(f"%{variantes[0]}%")
 
-    for patron in patrones_finales:
-        print(f"🔍 [SIN-TIPO] Probando: '{patron}'")
-        df = ejecutar_consulta(sql_ilike_sin_tipo, (patron,))
-        if df is not None and not df.empty:
-            print(f"✅ [SIN-TIPO] Encontrada con '{patron}' ({len(df)} líneas)")
-            df.attrs["nro_factura_fallback"] = patron.strip("%")
-            return df
+    print(f"🔍 [SIN-TIPO] Probando: {patrones_finales}")
+    df = ejecutar_consulta(_sql_ilike(False), (patrones_finales, patrones_finales))
+    if df is not None and not df.empty:
+        encontrada = str(df["nro_factura"].iloc[0])
+        print(f"✅ [SIN-TIPO] Encontrada '{encontrada}' ({len(df)} líneas)")
+        df.attrs["nro_factura_fallback"] = encontrada
+        return df
     print(f"❌ No encontrada con ninguna estrategia")
     return pd.DataFrame()
 
@@ -241,33 +228,31 @@ def get_total_factura_por_numero(nro_factura: str) -> dict:
     """
     Devuelve total, cantidad de líneas y moneda de una factura.
     """
+    variantes = _factura_variantes(nro_factura)
+    if not variantes:
+        return {"total": 0, "lineas": 0, "moneda": ""}
+
+    cte, params = _sql_cte_factura(
+        variantes,
+        nro_factura,
+        where_extra="""
+          AND (
+            "Tipo Comprobante" = 'Compra Contado'
+            OR "Tipo Comprobante" ILIKE 'Compra%%'
+            OR "Tipo Comprobante" ILIKE 'Factura%%'
+          )""",
+    )
     total_expr = _sql_total_num_expr_general()
     sql = f"""
+        {cte}
         SELECT 
             COALESCE(SUM({total_expr}), 0) AS total_factura,
             COUNT(*) AS lineas,
             TRIM("Moneda") AS Moneda
-        FROM chatbot_raw
-        WHERE TRIM("Nro. Comprobante") = %s
-          AND (
-            "Tipo Comprobante" = 'Compra Contado'
-            OR "Tipo Comprobante" ILIKE 'Compra%%'
-            OR "Tipo Comprobante" ILIKE 'Factura%%'
-          )
+        FROM fac
         GROUP BY TRIM("Moneda")
     """
-
-    variantes = _factura_variantes(nro_factura)
-    if not variantes:
-        return {"total": 0, "lineas": 0, "moneda": ""}
-
-    df = ejecutar_consulta(sql, (variantes[0],))
-    if df is None or df.empty:
-        for alt in variantes[1:]:
-            df2 = ejecutar_consulta(sql, (alt,))
-            if df2 is not None and not df2.empty:
-                df = df2
-                break
+    df = ejecutar_consulta(sql, params)
 
     if df is not None and not df.empty:
         return {
@@ -757,68 +742,19 @@ def buscar_facturas_similares(patron: str, limite: int = 10) -> pd.DataFrame:
 # =====================================================================
 
 def get_total_facturas_por_moneda_todos_anios():
-    sql = """
+    monto_expr = _sql_total_num_expr_general()
+    sql = f"""
         SELECT
             "Año" AS anio,
             SUM(
                 CASE
-                    WHEN TRIM("Moneda") IN ('$', 'UYU', 'PESOS') THEN
-                        CASE
-                            WHEN LEFT(TRIM("Monto Neto"), 1) = '(' THEN
-                                -CAST(
-                                    REPLACE(
-                                        REPLACE(
-                                            REPLACE(
-                                                SUBSTRING(TRIM("Monto Neto"), 2, LENGTH(TRIM("Monto Neto")) - 2),
-                                                ' ', ''
-                                            ),
-                                            '.', ''
-                                        ),
-                                        ',', '.'
-                                    ) AS numeric
-                                )
-                            ELSE
-                                CAST(
-                                    REPLACE(
-                                        REPLACE(
-                                            REPLACE(TRIM("Monto Neto"), ' ', ''),
-                                            '.', ''
-                                        ),
-                                        ',', '.'
-                                    ) AS numeric
-                                )
-                        END
+                    WHEN TRIM("Moneda") IN ('$', 'UYU', 'PESOS') THEN {monto_expr}
                     ELSE 0
                 END
             ) AS total_pesos,
             SUM(
                 CASE
-                    WHEN TRIM("Moneda") IN ('USD', 'US$', 'U$S', 'U$$') THEN
-                        CASE
-                            WHEN LEFT(TRIM("Monto Neto"), 1) = '(' THEN
-                                -CAST(
-                                    REPLACE(
-                                        REPLACE(
-                                            REPLACE(
-                                                SUBSTRING(TRIM("Monto Neto"), 2, LENGTH(TRIM("Monto Neto")) - 2),
-                                                ' ', ''
-                                            ),
-                                            '.', ''
-                                        ),
-                                        ',', '.'
-                                    ) AS numeric
-                                )
-                            ELSE
-                                CAST(
-                                    REPLACE(
-                                        REPLACE(
-                                            REPLACE(TRIM("Monto Neto"), ' ', ''),
-                                            '.', ''
-                                        ),
-                                        ',', '.'
-                                    ) AS numeric
-                                )
-                        END
+                    WHEN TRIM("Moneda") IN ('USD', 'US$', 'U$S', 'U$$') THEN {monto_expr}
                     ELSE 0
                 END
             ) AS total_usd,
@@ -837,35 +773,12 @@ def get_total_facturas_por_moneda_todos_anios():
 
 def get_total_facturas_por_moneda_generico():
     print("🔥 get_total_facturas_por_moneda_generico EJECUTADA")
-    sql = """
+    monto_expr = _sql_total_num_expr_general()
+    sql = f"""
     SELECT
         TRIM("Moneda") AS moneda,
         COUNT(*) AS registros,
-        SUM(
-            CASE
-                WHEN TRIM("Monto Neto") LIKE '(%'
-                THEN
-                    -1 * CAST(
-                        REPLACE(
-                            REPLACE(
-                                REPLACE(
-                                    REPLACE(TRIM("Monto Neto"), '(', ''),
-                                ')', ''),
-                            '.', ''),
-                        ',', '.'
-                        ) AS numeric
-                    )
-                ELSE
-                    CAST(
-                        REPLACE(
-                            REPLACE(
-                                REPLACE(TRIM("Monto Neto"), '.', ''),
-                            ',', '.'),
-                        ' ', ''
-                        ) AS numeric
-                    )
-            END
-        ) AS total
+        SUM({monto_expr}) AS total
     FROM chatbot_raw
     WHERE TRIM("Moneda") IS NOT NULL
       AND TRIM("Moneda") <> ''
@@ -0,0 +1,1093 @@
+# =========================
+# SQL_MIGRACIONES.PY - MIGRACIONES DE ESQUEMA (SUPABASE / POSTGRES)
+# =========================
+"""
+Migraciones idempotentes sobre las tablas del chatbot.
+
+Ejecutar una vez (o después de cada import masivo si se desactivaron triggers):
+
+    python sql_migraciones.py
+
+Columnas tipadas en chatbot_raw
+-------------------------------
+"Monto Neto", "Cantidad", "Fecha", "Año" y "Mes" vienen como TEXT con formato
+LATAM. Esta migración agrega columnas "sombra" ya convertidas:
+
+    monto_num     NUMERIC   ← "Monto Neto"  ("1.234,56", "(12,5)", "U$S 10")
+    cantidad_num  NUMERIC   ← "Cantidad"
+    fecha_date    DATE      ← "Fecha"       (YYYY-MM-DD o DD/MM/YYYY)
+    anio          INT       ← "Año"         (o año de fecha_date)
+    mes_key       CHAR(7)   ← "Mes"         (YYYY-MM, o mes de fecha_date)
+
+Un trigger BEFORE INSERT/UPDATE las mantiene al día y `refrescar_columnas_tipadas()`
+las recalcula para filas existentes. Al terminar se registra la migración en
+`fc_migraciones`; sql_core.columnas_tipadas_disponibles() usa ese registro para
+decidir si los _sql_total_num_expr* devuelven la columna o la expresión de texto.
+
+Rollup mensual (requiere columnas tipadas)
+------------------------------------------
+chatbot_rollup_mes: SUM/MIN/MAX de monto, SUM de cantidad, líneas y rango de
+fechas por mes_key × proveedor × artículo × familia × moneda × es_compra.
+Las facturas distintas no son sumables entre meses ni proveedores (el mismo
+número se repite): el conteo del dashboard sigue leyendo chatbot_raw.
+
+Triggers AFTER ... FOR EACH STATEMENT sobre chatbot_raw recalculan sólo los
+meses tocados por cada INSERT/UPDATE/DELETE (un import = un refresh por mes).
+Para cargas masivas fila a fila conviene desactivar los triggers
+(ALTER TABLE chatbot_raw DISABLE TRIGGER USER) y llamar a refrescar_rollup(meses).
+sql_core._sql_fuente_agregados() decide si un agregado lee el rollup o chatbot_raw.
+
+Búsqueda por texto (pg_trgm)
+----------------------------
+fc_norm_busqueda(txt) = LOWER(unaccent(TRIM(txt))), IMMUTABLE para poder indexarla.
+Índices GIN gin_trgm_ops sobre esa expresión en artículo, proveedor, lote y familia
+(chatbot_raw, stock, stock_raw si existe). Con esto `LIKE '%x%'` y similarity()
+usan índice; ver sql_core._sql_filtro_texto / _sql_score_texto.
+
+Versiones de tablas (cache de consultas)
+----------------------------------------
+fc_tabla_versiones(tabla, version) sube en cada INSERT/UPDATE/DELETE/TRUNCATE
+(trigger FOR EACH STATEMENT) sobre las tablas de TABLAS_VERSIONADAS. El cache
+de ejecutar_consulta (cache_consultas.py) la lee para invalidar resultados
+también ante imports externos u otras instancias de la app.
+
+Número de factura normalizado
+-----------------------------
+fc_nro_factura_norm(txt) = sólo dígitos sin ceros a la izquierda
+("A00060907", "60907", "A 0060907" -> "60907"), IMMUTABLE e indexada en
+chatbot_raw. sql_core._sql_cte_factura busca todas las variantes de un número
+con una sola consulta sobre ese índice.
+
+Columnas tipadas en stock
+-------------------------
+"VENCIMIENTO" y "STOCK" también son TEXT. Igual que en chatbot_raw, se agregan
+columnas sombra mantenidas por un trigger BEFORE INSERT/UPDATE:
+
+    vencimiento_date  DATE     ← "VENCIMIENTO" (YYYY-MM-DD, DD/MM/YYYY, DD-MM-YYYY)
+    stock_num         NUMERIC  ← "STOCK"
+
+con índices en ambas. Los días para vencer se calculan al consultar
+(vencimiento_date - CURRENT_DATE). sql_stock._stock_base_subquery() las usa
+cuando sql_core.stock_tipado_disponible().
+
+Clave de lote en stock (bajas / movimientos)
+--------------------------------------------
+Índice compuesto sobre exactamente las expresiones con las que bajastock
+identifica un lote: TRIM(CODIGO), TRIM(ARTICULO), TRIM(DEPOSITO),
+COALESCE(TRIM(LOTE), ''), COALESCE(TRIM(VENCIMIENTO), ''). Los dos primeros
+campos también sirven para los totales por artículo.
+fc_stock_cant(txt) / fc_stock_fmt(num) replican bajastock._to_float / _fmt_num
+para que la baja sea un solo UPDATE ... RETURNING.
+
+Snapshot incremental (stock / articulos)
+----------------------------------------
+Cada tabla de TABLAS_SNAPSHOT recibe fc_id (identity, único) y fc_updated_at
+(índice), marcado con clock_timestamp() por un trigger BEFORE INSERT/UPDATE.
+Los DELETE dejan el fc_id en fc_borrados; un TRUNCATE deja fc_id = -1 (recargar
+todo). snapshot_tablas.py trae sólo las filas tocadas desde la última lectura.
+fc_borrados se puede purgar periódicamente (DELETE ... WHERE borrado_at < now() - '1 day').
+
+Kardex (movimientos_stock)
+--------------------------
+Índice (articulo_id, fecha_hora, id): el orden del kardex. Lo usan el saldo
+inicial calculado en SQL y la paginación por cursor de ficha_stock.
+
+Checkpoints mensuales de stock (requiere movimientos_stock)
+-----------------------------------------------------------
+Cierre al inicio de cada mes (`corte`), con el estado de todo lo anterior:
+
+    fc_kardex_checkpoints  articulo_id × corte: saldo_qty, saldo_valor
+                           (costo promedio móvil), movimientos acumulados
+    fc_stock_checkpoints   articulo_id × depósito × lote × corte: saldo_qty
+                           (sólo saldos distintos de 0)
+
+fc_checkpoints_mes() arma el primer corte que falte (en bloque para todos los
+artículos, partiendo del corte anterior) y lo devuelve; NULL si no falta
+ninguno hasta el mes actual. El job de fondo la llama hasta que devuelve NULL,
+un mes por transacción: `python sql_migraciones.py checkpoints`, o en Supabase
+con pg_cron y el procedimiento fc_checkpoints_construir() (COMMIT por mes):
+
+    SELECT cron.schedule('fc_checkpoints', '15 3 * * *', 'CALL fc_checkpoints_construir()');
+
+Un movimiento con fecha anterior a un corte ya armado (carga retroactiva,
+edición, borrado) borra por trigger los cortes posteriores de ese artículo;
+el próximo job los rehace. Cada mes toma la tabla en modo SHARE: espera a las
+escrituras en curso y las frena sólo mientras arma ese mes, así ningún
+movimiento queda fuera de un corte sin que su trigger lo borre. Como entre
+un mes y otro pueden entrar escrituras, cada mes vuelve a buscar el primer
+corte que falta. ficha_stock y sql_stock.get_stock_a_fecha parten del último
+corte <= fecha y sólo suman los movimientos posteriores.
+
+Réplica analítica (chatbot_raw)
+-------------------------------
+Las tablas de TABLAS_REPLICA reciben el mismo fc_id / fc_updated_at y los
+mismos triggers de borrado que el snapshot incremental. replica_analitica.py
+copia chatbot_raw a DuckDB y después trae sólo los deltas; las comparativas y
+el dashboard la consultan mientras está al día.
+"""
+
+from sql_core import (
+    get_db_connection,
+    MIGRACION_COLUMNAS_TIPADAS,
+    MIGRACION_ROLLUP_MES,
+    MIGRACION_BUSQUEDA_TRGM,
+    MIGRACION_VERSIONES_TABLAS,
+    MIGRACION_FACTURA_NRO_NORM,
+    MIGRACION_STOCK_TIPADO,
+    MIGRACION_STOCK_LOTE_CLAVE,
+    MIGRACION_SNAPSHOT_DELTA,
+    MIGRACION_KARDEX_INDICE,
+    MIGRACION_KARDEX_CHECKPOINTS,
+    MIGRACION_REPLICA_DELTA,
+    SQL_DEPOSITO_MOVIMIENTO,
+    _sql_kardex_ctes,
+)
+
+
+# =====================================================================
+# DDL
+# =====================================================================
+
+SQL_TABLA_MIGRACIONES = """
+    CREATE TABLE IF NOT EXISTS fc_migraciones (
+        nombre TEXT PRIMARY KEY,
+        aplicada_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+    );
+"""
+
+SQL_FUNCIONES_PARSEO = r"""
+    CREATE OR REPLACE FUNCTION fc_num_latam(txt TEXT) RETURNS NUMERIC
+    LANGUAGE plpgsql IMMUTABLE AS $fn$
+    DECLARE
+        s TEXT := REPLACE(TRIM(COALESCE(txt, '')), ' ', '');
+        neg BOOLEAN := FALSE;
+    BEGIN
+        s := REPLACE(REPLACE(REPLACE(s, 'U$S', ''), 'U$$', ''), '$', '');
+        IF LEFT(s, 1) = '(' THEN
+            neg := TRUE;
+            s := REPLACE(REPLACE(s, '(', ''), ')', '');
+        END IF;
+        IF LEFT(s, 1) = '-' THEN
+            neg := NOT neg;
+            s := SUBSTRING(s FROM 2);
+        END IF;
+        -- Igual que el parseo TEXT de sql_core (_sql_total_num_expr): el punto
+        -- es siempre separador de miles ("12.50" -> 1250) y la coma el decimal.
+        s := REPLACE(REPLACE(s, '.', ''), ',', '.');
+        IF s !~ '^[0-9]+(\.[0-9]+)?$' THEN
+            RETURN NULL;
+        END IF;
+        RETURN CASE WHEN neg THEN -s::NUMERIC ELSE s::NUMERIC END;
+    END
+    $fn$;
+
+    CREATE OR REPLACE FUNCTION fc_fecha_date(txt TEXT) RETURNS DATE
+    LANGUAGE plpgsql IMMUTABLE AS $fn$
+    DECLARE
+        s TEXT := TRIM(COALESCE(txt, ''));
+    BEGIN
+        IF s ~ '^[0-9]{4}-[0-9]{2}-[0-9]{2}' THEN
+            RETURN TO_DATE(LEFT(s, 10), 'YYYY-MM-DD');
+        ELSIF s ~ '^[0-9]{1,2}/[0-9]{1,2}/[0-9]{4}' THEN
+            RETURN TO_DATE(SUBSTRING(s FROM '^[0-9]{1,2}/[0-9]{1,2}/[0-9]{4}'), 'DD/MM/YYYY');
+        END IF;
+        RETURN NULL;
+    EXCEPTION WHEN OTHERS THEN
+        RETURN NULL;
+    END
+    $fn$;
+"""
+
+SQL_COLUMNAS_TIPADAS = """
+    ALTER TABLE chatbot_raw ADD COLUMN IF NOT EXISTS monto_num NUMERIC;
+    ALTER TABLE chatbot_raw ADD COLUMN IF NOT EXISTS cantidad_num NUMERIC;
+    ALTER TABLE chatbot_raw ADD COLUMN IF NOT EXISTS fecha_date DATE;
+    ALTER TABLE chatbot_raw ADD COLUMN IF NOT EXISTS anio INT;
+    ALTER TABLE chatbot_raw ADD COLUMN IF NOT EXISTS mes_key CHAR(7);
+"""
+
+SQL_TRIGGER_TIPADAS = """
+    CREATE OR REPLACE FUNCTION fc_chatbot_raw_tipados() RETURNS TRIGGER
+    LANGUAGE plpgsql AS $fn$
+    BEGIN
+        NEW.monto_num := fc_num_latam(NEW."Monto Neto"::TEXT);
+        NEW.cantidad_num := fc_num_latam(NEW."Cantidad"::TEXT);
+        NEW.fecha_date := fc_fecha_date(NEW."Fecha"::TEXT);
+        NEW.anio := CASE
+            WHEN TRIM(NEW."Año"::TEXT) ~ '^[0-9]{4}$' THEN TRIM(NEW."Año"::TEXT)::INT
+            ELSE EXTRACT(YEAR FROM NEW.fecha_date)::INT
+        END;
+        NEW.mes_key := CASE
+            WHEN TRIM(NEW."Mes"::TEXT) ~ '^[0-9]{4}-[0-9]{2}' THEN LEFT(TRIM(NEW."Mes"::TEXT), 7)
+            ELSE TO_CHAR(NEW.fecha_date, 'YYYY-MM')
+        END;
+        RETURN NEW;
+    END
+    $fn$;
+
+    DROP TRIGGER IF EXISTS trg_chatbot_raw_tipados ON chatbot_raw;
+    CREATE TRIGGER trg_chatbot_raw_tipados
+        BEFORE INSERT OR UPDATE OF "Monto Neto", "Cantidad", "Fecha", "Año", "Mes"
+        ON chatbot_raw
+        FOR EACH ROW EXECUTE FUNCTION fc_chatbot_raw_tipados();
+"""
+
+SQL_REFRESCAR_TIPADAS = """
+    UPDATE chatbot_raw
+    SET monto_num = fc_num_latam("Monto Neto"::TEXT),
+        cantidad_num = fc_num_latam("Cantidad"::TEXT),
+        fecha_date = fc_fecha_date("Fecha"::TEXT),
+        anio = CASE
+            WHEN TRIM("Año"::TEXT) ~ '^[0-9]{4}$' THEN TRIM("Año"::TEXT)::INT
+            ELSE EXTRACT(YEAR FROM fc_fecha_date("Fecha"::TEXT))::INT
+        END,
+        mes_key = CASE
+            WHEN TRIM("Mes"::TEXT) ~ '^[0-9]{4}-[0-9]{2}' THEN LEFT(TRIM("Mes"::TEXT), 7)
+            ELSE TO_CHAR(fc_fecha_date("Fecha"::TEXT), 'YYYY-MM')
+        END
+"""
+
+SQL_INDICES_TIPADAS = """
+    CREATE INDEX IF NOT EXISTS idx_chatbot_raw_anio ON chatbot_raw (anio);
+    CREATE INDEX IF NOT EXISTS idx_chatbot_raw_mes_key ON chatbot_raw (mes_key);
+    CREATE INDEX IF NOT EXISTS idx_chatbot_raw_fecha_date ON chatbot_raw (fecha_date);
+"""
+
+
+SQL_ROLLUP_TABLAS = """
+    CREATE TABLE IF NOT EXISTS chatbot_rollup_mes (
+        mes_key CHAR(7) NOT NULL,
+        anio INT,
+        proveedor TEXT,
+        articulo TEXT,
+        familia TEXT,
+        moneda TEXT,
+        es_compra BOOLEAN NOT NULL,
+        monto_sum NUMERIC NOT NULL DEFAULT 0,
+        monto_min NUMERIC,
+        monto_max NUMERIC,
+        cantidad_sum NUMERIC NOT NULL DEFAULT 0,
+        lineas INT NOT NULL DEFAULT 0,
+        fecha_min DATE,
+        fecha_max DATE
+    );
+    CREATE INDEX IF NOT EXISTS idx_rollup_mes_mes_key ON chatbot_rollup_mes (mes_key);
+    CREATE INDEX IF NOT EXISTS idx_rollup_mes_anio ON chatbot_rollup_mes (anio, mes_key);
+    CREATE INDEX IF NOT EXISTS idx_rollup_mes_proveedor ON chatbot_rollup_mes (proveedor, anio);
+
+    DROP TABLE IF EXISTS chatbot_rollup_proveedor_mes;
+"""
+
+SQL_ROLLUP_FUNCIONES = """
+    CREATE OR REPLACE FUNCTION fc_rollup_refrescar_meses(meses TEXT[]) RETURNS VOID
+    LANGUAGE plpgsql AS $fn$
+    DECLARE
+        m TEXT;
+    BEGIN
+        -- Un refresco por mes a la vez: dos sentencias concurrentes sobre el
+        -- mismo mes esperan acá (hasta el commit de la otra) en vez de
+        -- intercalar DELETE/INSERT y dejar filas duplicadas o faltantes.
+        -- Orden fijo para no trabarse entre sí.
+        FOR m IN SELECT DISTINCT x FROM unnest(meses) x ORDER BY 1 LOOP
+            PERFORM pg_advisory_xact_lock(hashtext('fc_rollup_mes:' || m));
+        END LOOP;
+
+        DELETE FROM chatbot_rollup_mes WHERE mes_key = ANY(meses);
+
+        INSERT INTO chatbot_rollup_mes (
+            mes_key, anio, proveedor, articulo, familia, moneda, es_compra,
+            monto_sum, monto_min, monto_max, cantidad_sum, lineas, fecha_min, fecha_max
+        )
+        SELECT
+            COALESCE(mes_key, ''),
+            anio,
+            TRIM("Cliente / Proveedor"),
+            TRIM("Articulo"),
+            TRIM("Familia"),
+            TRIM("Moneda"),
+            COALESCE("Tipo Comprobante" = 'Compra Contado' OR "Tipo Comprobante" LIKE 'Compra%', FALSE),
+            COALESCE(SUM(monto_num), 0),
+            MIN(monto_num),
+            MAX(monto_num),
+            COALESCE(SUM(cantidad_num), 0),
+            COUNT(*),
+            MIN(fecha_date),
+            MAX(fecha_date)
+        FROM chatbot_raw
+        WHERE COALESCE(mes_key, '') = ANY(meses)
+        GROUP BY 1, 2, 3, 4, 5, 6, 7;
+    END
+    $fn$;
+
+    CREATE OR REPLACE FUNCTION fc_rollup_trigger() RETURNS TRIGGER
+    LANGUAGE plpgsql AS $fn$
+    DECLARE
+        meses TEXT[];
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            SELECT ARRAY_AGG(DISTINCT COALESCE(mes_key, '')) INTO meses FROM nuevas;
+        ELSIF TG_OP = 'DELETE' THEN
+            SELECT ARRAY_AGG(DISTINCT COALESCE(mes_key, '')) INTO meses FROM viejas;
+        ELSE
+            SELECT ARRAY_AGG(DISTINCT m) INTO meses FROM (
+                SELECT COALESCE(mes_key, '') AS m FROM nuevas
+                UNION
+                SELECT COALESCE(mes_key, '') FROM viejas
+            ) t;
+        END IF;
+        IF meses IS NOT NULL THEN
+            PERFORM fc_rollup_refrescar_meses(meses);
+        END IF;
+        RETURN NULL;
+    END
+    $fn$;
+
+    DROP TRIGGER IF EXISTS trg_chatbot_rollup_ins ON chatbot_raw;
+    DROP TRIGGER IF EXISTS trg_chatbot_rollup_upd ON chatbot_raw;
+    DROP TRIGGER IF EXISTS trg_chatbot_rollup_del ON chatbot_raw;
+    CREATE TRIGGER trg_chatbot_rollup_ins AFTER INSERT ON chatbot_raw
+        REFERENCING NEW TABLE AS nuevas
+        FOR EACH STATEMENT EXECUTE FUNCTION fc_rollup_trigger();
+    CREATE TRIGGER trg_chatbot_rollup_upd AFTER UPDATE ON chatbot_raw
+        REFERENCING OLD TABLE AS viejas NEW TABLE AS nuevas
+        FOR EACH STATEMENT EXECUTE FUNCTION fc_rollup_trigger();
+    CREATE TRIGGER trg_chatbot_rollup_del AFTER DELETE ON chatbot_raw
+        REFERENCING OLD TABLE AS viejas
+        FOR EACH STATEMENT EXECUTE FUNCTION fc_rollup_trigger();
+"""
+
+SQL_ROLLUP_REFRESCAR_TODO = """
+    SELECT fc_rollup_refrescar_meses(
+        ARRAY(SELECT DISTINCT COALESCE(mes_key, '') FROM chatbot_raw)
+    );
+"""
+
+
+SQL_BUSQUEDA_EXTENSIONES = """
+    CREATE EXTENSION IF NOT EXISTS pg_trgm;
+    CREATE EXTENSION IF NOT EXISTS unaccent;
+
+    CREATE OR REPLACE FUNCTION fc_norm_busqueda(txt TEXT) RETURNS TEXT
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $fn$
+        SELECT LOWER(public.unaccent('public.unaccent'::regdictionary, TRIM(COALESCE(txt, ''))))
+    $fn$;
+"""
+
+# (tabla, columna) indexadas con trigramas sobre fc_norm_busqueda(columna)
+INDICES_BUSQUEDA = [
+    ("chatbot_raw", "Articulo"),
+    ("chatbot_raw", "Cliente / Proveedor"),
+    ("chatbot_raw", "Familia"),
+    ("stock", "ARTICULO"),
+    ("stock", "LOTE"),
+    ("stock", "FAMILIA"),
+    ("stock_raw", "Articulo"),
+    ("stock_raw", "Lote"),
+    ("stock_raw", "Familia"),
+]
+
+
+SQL_VERSIONES_TABLAS = """
+    CREATE TABLE IF NOT EXISTS fc_tabla_versiones (
+        tabla       TEXT PRIMARY KEY,
+        version     BIGINT NOT NULL DEFAULT 0,
+        actualizado TIMESTAMPTZ NOT NULL DEFAULT now()
+    );
+
+    CREATE OR REPLACE FUNCTION fc_tabla_version_subir() RETURNS trigger
+    LANGUAGE plpgsql AS $fn$
+    BEGIN
+        INSERT INTO fc_tabla_versiones (tabla, version, actualizado)
+        VALUES (TG_TABLE_NAME, 1, now())
+        ON CONFLICT (tabla) DO UPDATE
+            SET version = fc_tabla_versiones.version + 1,
+                actualizado = now();
+        RETURN NULL;
+    END
+    $fn$;
+"""
+
+# Tablas cuyas escrituras invalidan el cache de consultas
+TABLAS_VERSIONADAS = [
+    "chatbot_raw",
+    # Las llena el trigger de chatbot_raw (fc_rollup_refrescar_meses): suben
+    # de versión en la misma transacción que la carga de compras.
+    "chatbot_rollup_mes",
+    "stock",
+    "stock_raw",
+    "comprobantes_stock",
+    "comprobantes_stock_items",
+    "historial_bajas",
+    "historial_movimientos",
+    "pedidos",
+    "pedidos_detalle",
+    "articulos",
+    "proveedores",
+    "depositos",
+    "familias",
+]
+
+
+SQL_FACTURA_NRO_NORM = r"""
+    CREATE OR REPLACE FUNCTION fc_nro_factura_norm(txt TEXT) RETURNS TEXT
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $fn$
+        SELECT NULLIF(LTRIM(REGEXP_REPLACE(COALESCE(txt, ''), '[^0-9]', '', 'g'), '0'), '')
+    $fn$;
+
+    CREATE INDEX IF NOT EXISTS idx_chatbot_raw_nro_norm
+        ON chatbot_raw (fc_nro_factura_norm("Nro. Comprobante"));
+"""
+
+
+# Mismas reglas que sql_stock._sql_date_expr_stock / _sql_num_expr_stock
+SQL_STOCK_TIPADO = r"""
+    CREATE OR REPLACE FUNCTION fc_stock_vencimiento(txt TEXT) RETURNS DATE
+    LANGUAGE plpgsql IMMUTABLE AS $fn$
+    DECLARE
+        s TEXT := TRIM(COALESCE(txt, ''));
+    BEGIN
+        IF s ~ '^\d{4}-\d{2}-\d{2}' THEN
+            RETURN s::DATE;
+        ELSIF s ~ '^\d{1,2}/\d{1,2}/\d{4}$' THEN
+            RETURN TO_DATE(s, 'DD/MM/YYYY');
+        ELSIF s ~ '^\d{1,2}-\d{1,2}-\d{4}$' THEN
+            RETURN TO_DATE(s, 'DD-MM-YYYY');
+        END IF;
+        RETURN NULL;
+    EXCEPTION WHEN OTHERS THEN
+        RETURN NULL;
+    END
+    $fn$;
+
+    CREATE OR REPLACE FUNCTION fc_stock_num(txt TEXT) RETURNS NUMERIC
+    LANGUAGE plpgsql IMMUTABLE AS $fn$
+    BEGIN
+        RETURN NULLIF(
+            REGEXP_REPLACE(REPLACE(REPLACE(TRIM(COALESCE(txt, '')), ' ', ''), ',', '.'), '[^0-9\.]', '', 'g'),
+            ''
+        )::NUMERIC;
+    EXCEPTION WHEN OTHERS THEN
+        RETURN NULL;
+    END
+    $fn$;
+
+    ALTER TABLE stock ADD COLUMN IF NOT EXISTS vencimiento_date DATE;
+    ALTER TABLE stock ADD COLUMN IF NOT EXISTS stock_num NUMERIC;
+
+    CREATE OR REPLACE FUNCTION fc_stock_tipados() RETURNS TRIGGER
+    LANGUAGE plpgsql AS $fn$
+    BEGIN
+        NEW.vencimiento_date := fc_stock_vencimiento(NEW."VENCIMIENTO"::TEXT);
+        NEW.stock_num := fc_stock_num(NEW."STOCK"::TEXT);
+        RETURN NEW;
+    END
+    $fn$;
+
+    DROP TRIGGER IF EXISTS trg_stock_tipados ON stock;
+    CREATE TRIGGER trg_stock_tipados
+        BEFORE INSERT OR UPDATE OF "VENCIMIENTO", "STOCK"
+        ON stock
+        FOR EACH ROW EXECUTE FUNCTION fc_stock_tipados();
+"""
+
+SQL_REFRESCAR_STOCK_TIPADO = """
+    UPDATE stock
+    SET vencimiento_date = fc_stock_vencimiento("VENCIMIENTO"::TEXT),
+        stock_num = fc_stock_num("STOCK"::TEXT)
+"""
+
+SQL_INDICES_STOCK_TIPADO = """
+    CREATE INDEX IF NOT EXISTS idx_stock_vencimiento_date ON stock (vencimiento_date);
+    CREATE INDEX IF NOT EXISTS idx_stock_stock_num ON stock (stock_num);
+"""
+
+SQL_STOCK_LOTE_CLAVE = r"""
+    CREATE OR REPLACE FUNCTION fc_stock_cant(txt TEXT) RETURNS NUMERIC
+    LANGUAGE plpgsql IMMUTABLE AS $fn$
+    DECLARE
+        s TEXT := REGEXP_REPLACE(COALESCE(txt, ''), '[^0-9,.\-]', '', 'g');
+    BEGIN
+        IF s = '' THEN
+            RETURN 0;
+        END IF;
+        IF POSITION(',' IN s) > 0 AND POSITION('.' IN s) > 0 THEN
+            s := REPLACE(s, ',', '');
+        ELSE
+            s := REPLACE(s, ',', '.');
+        END IF;
+        RETURN s::NUMERIC;
+    EXCEPTION WHEN OTHERS THEN
+        RETURN 0;
+    END
+    $fn$;
+
+    CREATE OR REPLACE FUNCTION fc_stock_fmt(n NUMERIC) RETURNS TEXT
+    LANGUAGE sql IMMUTABLE AS $fn$
+        SELECT CASE
+            WHEN n IS NULL THEN '0'
+            WHEN ABS(n - ROUND(n)) < 0.000000001 THEN ROUND(n)::BIGINT::TEXT
+            ELSE REGEXP_REPLACE(ROUND(n, 2)::TEXT, '\.?0+$', '')
+        END
+    $fn$;
+
+    CREATE INDEX IF NOT EXISTS idx_stock_lote_clave ON stock (
+        TRIM("CODIGO"),
+        TRIM("ARTICULO"),
+        TRIM("DEPOSITO"),
+        COALESCE(TRIM("LOTE"), ''),
+        COALESCE(TRIM("VENCIMIENTO"), '')
+    );
+"""
+
+
+SQL_SNAPSHOT_DELTA = """
+    CREATE TABLE IF NOT EXISTS fc_borrados (
+        tabla      TEXT NOT NULL,
+        fc_id      BIGINT NOT NULL,
+        borrado_at TIMESTAMPTZ NOT NULL DEFAULT clock_timestamp()
+    );
+    CREATE INDEX IF NOT EXISTS idx_fc_borrados_tabla_at ON fc_borrados (tabla, borrado_at);
+
+    CREATE OR REPLACE FUNCTION fc_marcar_actualizado() RETURNS trigger
+    LANGUAGE plpgsql AS $fn$
+    BEGIN
+        NEW.fc_updated_at := clock_timestamp();
+        RETURN NEW;
+    END
+    $fn$;
+
+    CREATE OR REPLACE FUNCTION fc_registrar_borrado() RETURNS trigger
+    LANGUAGE plpgsql AS $fn$
+    BEGIN
+        IF TG_OP = 'TRUNCATE' THEN
+            INSERT INTO fc_borrados (tabla, fc_id) VALUES (TG_TABLE_NAME, -1);
+        ELSE
+            INSERT INTO fc_borrados (tabla, fc_id) VALUES (TG_TABLE_NAME, OLD.fc_id);
+        END IF;
+        RETURN NULL;
+    END
+    $fn$;
+"""
+
+# Tablas que snapshot_tablas.py mantiene en memoria con deltas
+TABLAS_SNAPSHOT = [
+    "stock",
+    "articulos",
+]
+
+# Tablas que replica_analitica.py copia a DuckDB con deltas
+TABLAS_REPLICA = [
+    "chatbot_raw",
+]
+
+
+SQL_KARDEX_INDICE = """
+    CREATE INDEX IF NOT EXISTS idx_movimientos_stock_kardex
+        ON movimientos_stock (articulo_id, fecha_hora, id);
+"""
+
+
+SQL_CHECKPOINTS_TABLAS = """
+    -- Mismos tipos que movimientos_stock (articulo_id / deposito_id pueden ser int, uuid o text)
+    CREATE TABLE IF NOT EXISTS fc_kardex_checkpoints AS
+        SELECT
+            articulo_id,
+            NULL::timestamptz AS corte,
+            0::float8 AS saldo_qty,
+            0::float8 AS saldo_valor,
+            0::bigint AS movimientos
+        FROM movimientos_stock
+        WITH NO DATA;
+    ALTER TABLE fc_kardex_checkpoints ALTER COLUMN corte SET NOT NULL;
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_fc_kardex_checkpoints ON fc_kardex_checkpoints (articulo_id, corte);
+    CREATE INDEX IF NOT EXISTS idx_fc_kardex_checkpoints_corte ON fc_kardex_checkpoints (corte);
+
+    CREATE TABLE IF NOT EXISTS fc_stock_checkpoints AS
+        SELECT
+            articulo_id,
+            deposito_id,
+            ''::text AS lote,
+            NULL::timestamptz AS corte,
+            0::float8 AS saldo_qty
+        FROM movimientos_stock
+        WITH NO DATA;
+    ALTER TABLE fc_stock_checkpoints ALTER COLUMN corte SET NOT NULL;
+    CREATE INDEX IF NOT EXISTS idx_fc_stock_checkpoints ON fc_stock_checkpoints (articulo_id, corte);
+    CREATE INDEX IF NOT EXISTS idx_fc_stock_checkpoints_corte ON fc_stock_checkpoints (corte);
+
+    CREATE INDEX IF NOT EXISTS idx_movimientos_stock_fecha ON movimientos_stock (fecha_hora);
+"""
+
+# Artículos a cerrar en v_corte: los que tenían corte el mes anterior o se
+# movieron en el mes, menos los que ya tienen v_corte (siguen válidos).
+_SQL_CHECKPOINTS_MES = """
+    prev AS (
+        SELECT articulo_id, saldo_qty, saldo_valor, movimientos
+        FROM fc_kardex_checkpoints
+        WHERE corte = v_corte - INTERVAL '1 month'
+    ),
+    movs AS (
+        SELECT
+            articulo_id,
+            fecha_hora,
+            id,
+            {deposito} AS deposito_id,
+            COALESCE(TRIM(lote), '') AS lote,
+            COALESCE(qty_base::float8, 0) AS qty,
+            COALESCE(precio_unit_aplicado::float8, 0) AS precio
+        FROM movimientos_stock
+        WHERE fecha_hora >= v_corte - INTERVAL '1 month'
+          AND fecha_hora < v_corte
+    ),
+    arts AS (
+        SELECT articulo_id FROM prev
+        UNION
+        SELECT articulo_id FROM movs
+        EXCEPT
+        SELECT articulo_id FROM fc_kardex_checkpoints WHERE corte = v_corte
+    )
+""".format(deposito=SQL_DEPOSITO_MOVIMIENTO)
+
+SQL_CHECKPOINTS_FUNCIONES = """
+    -- Un mes por llamada (y por transacción del llamador): el lock SHARE sobre
+    -- movimientos_stock dura sólo lo que tarda ese mes
+    CREATE OR REPLACE FUNCTION fc_checkpoints_mes(
+        p_hasta TIMESTAMPTZ DEFAULT date_trunc('month', now())
+    ) RETURNS TIMESTAMPTZ
+    LANGUAGE plpgsql AS $fn$
+    DECLARE
+        v_corte TIMESTAMPTZ;
+    BEGIN
+        -- Un solo job a la vez
+        PERFORM pg_advisory_xact_lock(hashtext('fc_checkpoints_construir'));
+        -- Choca con INSERT/UPDATE/DELETE: un movimiento sin confirmar no lo ve
+        -- este job ni su trigger ve los cortes sin confirmar del job
+        LOCK TABLE movimientos_stock IN SHARE MODE;
+
+        -- Primer corte que le falta a algún artículo (se recalcula cada mes:
+        -- una escritura entre dos meses puede haber borrado cortes anteriores)
+        SELECT MIN(COALESCE(
+                   (SELECT MAX(k.corte) FROM fc_kardex_checkpoints k WHERE k.articulo_id = a.articulo_id),
+                   date_trunc('month', a.primera)
+               ) + INTERVAL '1 month')
+          INTO v_corte
+          FROM (
+              SELECT articulo_id, MIN(fecha_hora) AS primera
+              FROM movimientos_stock
+              WHERE fecha_hora IS NOT NULL
+              GROUP BY articulo_id
+          ) a;
+
+        IF v_corte IS NULL OR v_corte > p_hasta THEN
+            RETURN NULL;
+        END IF;
+
+        INSERT INTO fc_stock_checkpoints (articulo_id, deposito_id, lote, corte, saldo_qty)
+        WITH {mes}
+        SELECT t.articulo_id, t.deposito_id, t.lote, v_corte, SUM(t.qty)
+        FROM (
+            SELECT articulo_id, deposito_id, lote, saldo_qty AS qty
+            FROM fc_stock_checkpoints
+            WHERE corte = v_corte - INTERVAL '1 month'
+            UNION ALL
+            SELECT articulo_id, deposito_id, lote, qty FROM movs
+        ) t
+        WHERE t.articulo_id IN (SELECT articulo_id FROM arts)
+        GROUP BY t.articulo_id, t.deposito_id, t.lote
+        HAVING SUM(t.qty) <> 0;
+
+        INSERT INTO fc_kardex_checkpoints (articulo_id, corte, saldo_qty, saldo_valor, movimientos)
+        WITH {mes},
+        {kardex}
+        SELECT e.articulo_id, v_corte, e.saldo_qty, e.saldo_valor, COALESCE(p.movimientos, 0) + e.movimientos
+        FROM kestado e
+        LEFT JOIN prev p ON p.articulo_id = e.articulo_id;
+
+        RETURN v_corte;
+    END
+    $fn$;
+
+    -- Para pg_cron: CALL fc_checkpoints_construir() confirma mes a mes
+    DROP ROUTINE IF EXISTS fc_checkpoints_construir(TIMESTAMPTZ);
+    CREATE OR REPLACE PROCEDURE fc_checkpoints_construir(
+        p_hasta TIMESTAMPTZ DEFAULT date_trunc('month', now())
+    )
+    LANGUAGE plpgsql AS $fn$
+    BEGIN
+        WHILE fc_checkpoints_mes(p_hasta) IS NOT NULL LOOP
+            COMMIT;
+        END LOOP;
+    END
+    $fn$;
+
+    -- Movimientos con fecha anterior a cortes ya armados: esos cortes dejan de valer
+    CREATE OR REPLACE FUNCTION fc_checkpoints_invalidar() RETURNS TRIGGER
+    LANGUAGE plpgsql AS $fn$
+    BEGIN
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            DELETE FROM fc_kardex_checkpoints k
+            USING (SELECT articulo_id, MIN(fecha_hora) AS desde FROM nuevas GROUP BY articulo_id) n
+            WHERE k.articulo_id = n.articulo_id AND k.corte > n.desde;
+            DELETE FROM fc_stock_checkpoints s
+            USING (SELECT articulo_id, MIN(fecha_hora) AS desde FROM nuevas GROUP BY articulo_id) n
+            WHERE s.articulo_id = n.articulo_id AND s.corte > n.desde;
+        END IF;
+        IF TG_OP IN ('DELETE', 'UPDATE') THEN
+            DELETE FROM fc_kardex_checkpoints k
+            USING (SELECT articulo_id, MIN(fecha_hora) AS desde FROM viejas GROUP BY articulo_id) v
+            WHERE k.articulo_id = v.articulo_id AND k.corte > v.desde;
+            DELETE FROM fc_stock_checkpoints s
+            USING (SELECT articulo_id, MIN(fecha_hora) AS desde FROM viejas GROUP BY articulo_id) v
+            WHERE s.articulo_id = v.articulo_id AND s.corte > v.desde;
+        END IF;
+        RETURN NULL;
+    END
+    $fn$;
+
+    DROP TRIGGER IF EXISTS trg_fc_checkpoints_ins ON movimientos_stock;
+    DROP TRIGGER IF EXISTS trg_fc_checkpoints_upd ON movimientos_stock;
+    DROP TRIGGER IF EXISTS trg_fc_checkpoints_del ON movimientos_stock;
+    CREATE TRIGGER trg_fc_checkpoints_ins AFTER INSERT ON movimientos_stock
+        REFERENCING NEW TABLE AS nuevas
+        FOR EACH STATEMENT EXECUTE FUNCTION fc_checkpoints_invalidar();
+    CREATE TRIGGER trg_fc_checkpoints_upd AFTER UPDATE ON movimientos_stock
+        REFERENCING OLD TABLE AS viejas NEW TABLE AS nuevas
+        FOR EACH STATEMENT EXECUTE FUNCTION fc_checkpoints_invalidar();
+    CREATE TRIGGER trg_fc_checkpoints_del AFTER DELETE ON movimientos_stock
+        REFERENCING OLD TABLE AS viejas
+        FOR EACH STATEMENT EXECUTE FUNCTION fc_checkpoints_invalidar();
+""".format(
+    mes=_SQL_CHECKPOINTS_MES,
+    kardex=_sql_kardex_ctes("""
+        SELECT
+            p.articulo_id, 0 AS orden, NULL::timestamptz AS fecha_hora, NULL AS id,
+            p.saldo_qty AS qty,
+            CASE WHEN p.saldo_qty > 0 THEN p.saldo_valor / p.saldo_qty ELSE 0 END AS precio
+        FROM prev p
+        JOIN arts a ON a.articulo_id = p.articulo_id
+        UNION ALL
+        SELECT m.articulo_id, 1, m.fecha_hora, m.id, m.qty, m.precio
+        FROM movs m
+        JOIN arts a ON a.articulo_id = m.articulo_id
+    """),
+)
+
+
+# =====================================================================
+# EJECUCIÓN
+# =====================================================================
+
+def _ejecutar_ddl(*bloques) -> bool:
+    """Ejecuta bloques SQL en una transacción. Cada bloque es un str o (sql, params)."""
+    conn = get_db_connection()
+    if not conn:
+        print("❌ Migración: sin conexión a la base de datos.")
+        return False
+    try:
+        with conn.cursor() as cur:
+            for bloque in bloques:
+                sql, params = bloque if isinstance(bloque, tuple) else (bloque, None)
+                cur.execute(sql, params)
+        conn.commit()
+        return True
+    except Exception as e:
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+        print(f"❌ Error aplicando migración: {e}")
+        return False
+    finally:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+def _registrar_migracion(nombre: str) -> bool:
+    return _ejecutar_ddl(
+        SQL_TABLA_MIGRACIONES,
+        ("INSERT INTO fc_migraciones (nombre) VALUES (%s) ON CONFLICT (nombre) DO NOTHING", (nombre,)),
+    )
+
+
+def refrescar_columnas_tipadas(where: str = "") -> bool:
+    """
+    Recalcula las columnas tipadas de chatbot_raw.
+    `where` permite acotar (ej. 'WHERE monto_num IS NULL' después de un import con triggers desactivados).
+    """
+    return _ejecutar_ddl(f"{SQL_REFRESCAR_TIPADAS} {where}")
+
+
+def aplicar_columnas_tipadas() -> bool:
+    """Crea funciones, columnas, trigger e índices; rellena filas existentes y registra la migración."""
+    print("🛠 Migración: columnas tipadas en chatbot_raw...")
+    ok = (
+        _ejecutar_ddl(SQL_FUNCIONES_PARSEO, SQL_COLUMNAS_TIPADAS, SQL_TRIGGER_TIPADAS)
+        and refrescar_columnas_tipadas()
+        and _ejecutar_ddl(SQL_INDICES_TIPADAS)
+        and _registrar_migracion(MIGRACION_COLUMNAS_TIPADAS)
+    )
+    print("✅ Columnas tipadas listas." if ok else "❌ La migración de columnas tipadas no se completó.")
+    return ok
+
+
+def refrescar_rollup(meses: list = None) -> bool:
+    """
+    Recalcula el rollup para los meses indicados ("YYYY-MM"), o completo si meses es None.
+    Usar después de cargas con triggers desactivados.
+    """
+    if meses:
+        return _ejecutar_ddl(("SELECT fc_rollup_refrescar_meses(%s::TEXT[])", (list(meses),)))
+    return _ejecutar_ddl(SQL_ROLLUP_REFRESCAR_TODO)
+
+
+def aplicar_rollup_mes() -> bool:
+    """Crea las tablas de rollup, funciones y triggers; las llena y registra la migración."""
+    print("🛠 Migración: rollup mensual de chatbot_raw...")
+    ok = (
+        aplicar_columnas_tipadas()
+        and _ejecutar_ddl(SQL_ROLLUP_TABLAS, SQL_ROLLUP_FUNCIONES)
+        and refrescar_rollup()
+        and _registrar_migracion(MIGRACION_ROLLUP_MES)
+    )
+    print("✅ Rollup mensual listo." if ok else "❌ La migración del rollup no se completó.")
+    return ok
+
+
+def _tabla_existe(tabla: str) -> bool:
+    conn = get_db_connection()
+    if not conn:
+        return False
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT to_regclass(%s) IS NOT NULL", (tabla,))
+            return bool(cur.fetchone()[0])
+    except Exception:
+        return False
+    finally:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+def aplicar_busqueda_trgm() -> bool:
+    """Crea pg_trgm/unaccent, fc_norm_busqueda() y los índices GIN de búsqueda."""
+    print("🛠 Migración: índices trigram de búsqueda...")
+    if not _ejecutar_ddl(SQL_BUSQUEDA_EXTENSIONES):
+        return False
+
+    indices = []
+    for tabla, col in INDICES_BUSQUEDA:
+        if not _tabla_existe(tabla):
+            print(f"ℹ️ Tabla {tabla} no existe, se omite índice sobre \"{col}\"")
+            continue
+        nombre = "idx_trgm_" + "_".join(
+            "".join(ch if ch.isalnum() else "_" for ch in parte.lower()).strip("_")
+            for parte in (tabla, col)
+        )
+        indices.append(
+            f'CREATE INDEX IF NOT EXISTS {nombre} ON {tabla} '
+            f'USING gin (fc_norm_busqueda("{col}") gin_trgm_ops)'
+        )
+
+    ok = _ejecutar_ddl(*indices) and _registrar_migracion(MIGRACION_BUSQUEDA_TRGM)
+    print("✅ Búsqueda trigram lista." if ok else "❌ La migración de búsqueda no se completó.")
+    return ok
+
+
+def aplicar_versiones_tablas() -> bool:
+    """Crea fc_tabla_versiones y los triggers que la mantienen."""
+    print("🛠 Migración: versiones de tablas para el cache de consultas...")
+    bloques = [SQL_VERSIONES_TABLAS]
+    for tabla in TABLAS_VERSIONADAS:
+        if not _tabla_existe(tabla):
+            print(f"ℹ️ Tabla {tabla} no existe, se omite trigger de versión")
+            continue
+        bloques.append(f"""
+            DROP TRIGGER IF EXISTS trg_fc_version ON {tabla};
+            CREATE TRIGGER trg_fc_version
+                AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {tabla}
+                FOR EACH STATEMENT EXECUTE FUNCTION fc_tabla_version_subir();
+        """)
+
+    ok = _ejecutar_ddl(*bloques) and _registrar_migracion(MIGRACION_VERSIONES_TABLAS)
+    print("✅ Versiones de tablas listas." if ok else "❌ La migración de versiones no se completó.")
+    return ok
+
+
+def aplicar_factura_nro_norm() -> bool:
+    """Crea fc_nro_factura_norm() y su índice en chatbot_raw."""
+    print("🛠 Migración: índice de número de factura normalizado...")
+    ok = _ejecutar_ddl(SQL_FACTURA_NRO_NORM) and _registrar_migracion(MIGRACION_FACTURA_NRO_NORM)
+    print("✅ Índice de facturas listo." if ok else "❌ La migración de número de factura no se completó.")
+    return ok
+
+
+def refrescar_stock_tipado(where: str = "") -> bool:
+    """Recalcula vencimiento_date / stock_num (ej. después de un import con triggers desactivados)."""
+    return _ejecutar_ddl(f"{SQL_REFRESCAR_STOCK_TIPADO} {where}")
+
+
+def aplicar_stock_tipado() -> bool:
+    """Crea funciones, columnas, trigger e índices tipados en stock y registra la migración."""
+    print("🛠 Migración: columnas tipadas en stock...")
+    ok = (
+        _ejecutar_ddl(SQL_STOCK_TIPADO)
+        and refrescar_stock_tipado()
+        and _ejecutar_ddl(SQL_INDICES_STOCK_TIPADO)
+        and _registrar_migracion(MIGRACION_STOCK_TIPADO)
+    )
+    print("✅ Stock tipado listo." if ok else "❌ La migración de stock tipado no se completó.")
+    return ok
+
+
+def aplicar_stock_lote_clave() -> bool:
+    """Crea el índice por clave de lote en stock y las funciones de cantidad."""
+    print("🛠 Migración: clave de lote en stock...")
+    ok = _ejecutar_ddl(SQL_STOCK_LOTE_CLAVE) and _registrar_migracion(MIGRACION_STOCK_LOTE_CLAVE)
+    print("✅ Clave de lote lista." if ok else "❌ La migración de clave de lote no se completó.")
+    return ok
+
+
+def aplicar_snapshot_delta() -> bool:
+    """Agrega fc_id / fc_updated_at y los triggers de borrado a las tablas del snapshot."""
+    print("🛠 Migración: snapshot incremental de stock / articulos...")
+    bloques = [SQL_SNAPSHOT_DELTA]
+    for tabla in TABLAS_SNAPSHOT:
+        if not _tabla_existe(tabla):
+            print(f"ℹ️ Tabla {tabla} no existe, se omite snapshot incremental")
+            continue
+        bloques.append(_sql_delta_tabla(tabla))
+
+    ok = _ejecutar_ddl(*bloques) and _registrar_migracion(MIGRACION_SNAPSHOT_DELTA)
+    print("✅ Snapshot incremental listo." if ok else "❌ La migración de snapshot no se completó.")
+    return ok
+
+
+def _sql_delta_tabla(tabla: str) -> str:
+    """fc_id, fc_updated_at y triggers de actualización / borrado para una tabla."""
+    return f"""
+            ALTER TABLE {tabla}
+                ADD COLUMN IF NOT EXISTS fc_id BIGINT GENERATED BY DEFAULT AS IDENTITY,
+                ADD COLUMN IF NOT EXISTS fc_updated_at TIMESTAMPTZ NOT NULL DEFAULT clock_timestamp();
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_{tabla}_fc_id ON {tabla} (fc_id);
+            CREATE INDEX IF NOT EXISTS idx_{tabla}_fc_updated_at ON {tabla} (fc_updated_at);
+
+            DROP TRIGGER IF EXISTS trg_fc_actualizado ON {tabla};
+            CREATE TRIGGER trg_fc_actualizado
+                BEFORE INSERT OR UPDATE ON {tabla}
+                FOR EACH ROW EXECUTE FUNCTION fc_marcar_actualizado();
+
+            DROP TRIGGER IF EXISTS trg_fc_borrado ON {tabla};
+            CREATE TRIGGER trg_fc_borrado
+                AFTER DELETE ON {tabla}
+                FOR EACH ROW EXECUTE FUNCTION fc_registrar_borrado();
+
+            DROP TRIGGER IF EXISTS trg_fc_truncado ON {tabla};
+            CREATE TRIGGER trg_fc_truncado
+                AFTER TRUNCATE ON {tabla}
+                FOR EACH STATEMENT EXECUTE FUNCTION fc_registrar_borrado();
+        """
+
+
+def aplicar_replica_delta() -> bool:
+    """fc_id / fc_updated_at y triggers de borrado en chatbot_raw (réplica analítica)."""
+    print("🛠 Migración: deltas de chatbot_raw para la réplica analítica...")
+    bloques = [SQL_SNAPSHOT_DELTA]
+    for tabla in TABLAS_REPLICA:
+        if not _tabla_existe(tabla):
+            print(f"ℹ️ Tabla {tabla} no existe, se omite réplica")
+            continue
+        bloques.append(_sql_delta_tabla(tabla))
+
+    ok = _ejecutar_ddl(*bloques) and _registrar_migracion(MIGRACION_REPLICA_DELTA)
+    print("✅ Deltas de réplica listos." if ok else "❌ La migración de réplica no se completó.")
+    return ok
+
+
+def aplicar_kardex_indice() -> bool:
+    """Crea el índice del kardex sobre movimientos_stock."""
+    print("🛠 Migración: índice de kardex...")
+    if not _tabla_existe("movimientos_stock"):
+        print("ℹ️ Tabla movimientos_stock no existe, se omite índice de kardex")
+        return True
+    ok = _ejecutar_ddl(SQL_KARDEX_INDICE) and _registrar_migracion(MIGRACION_KARDEX_INDICE)
+    print("✅ Índice de kardex listo." if ok else "❌ La migración del índice de kardex no se completó.")
+    return ok
+
+
+def refrescar_checkpoints_stock() -> bool:
+    """
+    Arma los cortes mensuales que falten (job de fondo; ver docstring del módulo).
+    Un mes por transacción: las escrituras en movimientos_stock sólo esperan al mes en curso.
+    """
+    conn = get_db_connection()
+    if not conn:
+        print("❌ Checkpoints: sin conexión a la base de datos.")
+        return False
+    meses = 0
+    try:
+        with conn.cursor() as cur:
+            while True:
+                cur.execute("SELECT fc_checkpoints_mes()")
+                corte = cur.fetchone()[0]
+                conn.commit()
+                if corte is None:
+                    break
+                meses += 1
+        print(f"✅ Checkpoints: {meses} meses armados.")
+        return True
+    except Exception as e:
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+        print(f"❌ Error armando checkpoints ({meses} meses armados): {e}")
+        return False
+    finally:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+def aplicar_kardex_checkpoints() -> bool:
+    """Crea las tablas de checkpoints, la función que las arma y los triggers de invalidación."""
+    print("🛠 Migración: checkpoints mensuales de movimientos_stock...")
+    if not _tabla_existe("movimientos_stock"):
+        print("ℹ️ Tabla movimientos_stock no existe, se omiten checkpoints")
+        return True
+    ok = (
+        _ejecutar_ddl(SQL_CHECKPOINTS_TABLAS, SQL_CHECKPOINTS_FUNCIONES)
+        and refrescar_checkpoints_stock()
+        and _registrar_migracion(MIGRACION_KARDEX_CHECKPOINTS)
+    )
+    print("✅ Checkpoints de stock listos." if ok else "❌ La migración de checkpoints no se completó.")
+    return ok
+
+
+def aplicar_todas() -> bool:
+    # El rollup aplica antes las columnas tipadas de las que depende.
+    return (
+        aplicar_rollup_mes()
+        and aplicar_busqueda_trgm()
+        and aplicar_versiones_tablas()
+        and aplicar_factura_nro_norm()
+        and aplicar_stock_tipado()
+        and aplicar_stock_lote_clave()
+        and aplicar_snapshot_delta()
+        and aplicar_kardex_indice()
+        and aplicar_kardex_checkpoints()
+        and aplicar_replica_delta()
+    )
+
+
+if __name__ == "__main__":
+    import sys
+
+    if sys.argv[1:] == ["checkpoints"]:
+        refrescar_checkpoints_stock()
+    else:
+        aplicar_todas()
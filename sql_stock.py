@@ -1,7 +1,14 @@
 import os
 import pandas as pd
 import streamlit as st
-from sql_core import ejecutar_consulta, _safe_ident
+from datetime import datetime
+from sql_core import (
+    ejecutar_consulta,
+    _safe_ident,
+    stock_tipado_disponible,
+    kardex_checkpoints_disponible,
+    SQL_DEPOSITO_MOVIMIENTO,
+)
 
 
 # =====================================================================
@@ -102,9 +109,30 @@ def _sql_num_expr_stock(col_expr: str) -> str:
       ''
     )::numeric
     """
+
+
 def _stock_base_subquery() -> tuple:
-    """Subquery hardcoded para evitar problemas de detección de columnas."""
-    
+    """
+    Subquery hardcoded para evitar problemas de detección de columnas.
+    Con la migración stock_tipado usa vencimiento_date / stock_num (indexadas)
+    en vez de parsear "VENCIMIENTO" y "STOCK" en cada consulta.
+    """
+    if stock_tipado_disponible():
+        sub = """
+        SELECT
+            TRIM(COALESCE("CODIGO"::text,'')) AS "CODIGO",
+            TRIM(COALESCE("ARTICULO"::text,'')) AS "ARTICULO",
+            TRIM(COALESCE("FAMILIA"::text,'')) AS "FAMILIA",
+            TRIM(COALESCE("DEPOSITO"::text,'')) AS "DEPOSITO",
+            TRIM(COALESCE("LOTE"::text,'')) AS "LOTE",
+            vencimiento_date AS "VENCIMIENTO",
+            stock_num AS "STOCK",
+            (vencimiento_date - CURRENT_DATE) AS "Dias_Para_Vencer"
+        FROM "public"."stock" s
+        WHERE UPPER(TRIM(COALESCE(s."ARTICULO", ''))) <> 'SIN ARTICULO'
+        """
+        return sub, "public", "stock"
+
     sub = """
         SELECT
             TRIM(COALESCE("CODIGO"::text,'')) AS "CODIGO",
@@ -487,6 +515,78 @@ def get_stock_por_deposito() -> pd.DataFrame:
         return pd.DataFrame()
 
 
+# =====================================================================
+# STOCK A UNA FECHA (movimientos_stock + checkpoints mensuales)
+# =====================================================================
+
+def get_stock_a_fecha(fecha, articulo_id=None) -> pd.DataFrame:
+    """
+    Stock por artículo × depósito × lote al final de `fecha` (date o datetime),
+    sumando movimientos_stock. Con checkpoints (sql_migraciones.aplicar_kardex_checkpoints)
+    parte del último corte mensual <= fecha de cada artículo y sólo suma lo posterior.
+    """
+    try:
+        if isinstance(fecha, datetime):
+            hasta = fecha
+        else:
+            hasta = datetime.combine(fecha, datetime.max.time())
+        params = {"hasta": hasta, "articulo_id": articulo_id}
+        filtro_art = "AND articulo_id = %(articulo_id)s" if articulo_id is not None else ""
+        filtro_art_m = "AND m.articulo_id = %(articulo_id)s" if articulo_id is not None else ""
+
+        if kardex_checkpoints_disponible():
+            sql = f"""
+                WITH cp AS (
+                    SELECT articulo_id, MAX(corte) AS corte
+                    FROM fc_kardex_checkpoints
+                    WHERE corte <= %(hasta)s
+                      {filtro_art}
+                    GROUP BY articulo_id
+                ),
+                base AS (
+                    SELECT s.articulo_id, s.deposito_id, s.lote, s.saldo_qty AS qty
+                    FROM fc_stock_checkpoints s
+                    JOIN cp ON cp.articulo_id = s.articulo_id AND cp.corte = s.corte
+                    UNION ALL
+                    SELECT
+                        m.articulo_id,
+                        {SQL_DEPOSITO_MOVIMIENTO},
+                        COALESCE(TRIM(m.lote), ''),
+                        COALESCE(m.qty_base::float8, 0)
+                    FROM movimientos_stock m
+                    LEFT JOIN cp ON cp.articulo_id = m.articulo_id
+                    WHERE m.fecha_hora <= %(hasta)s
+                      AND (cp.corte IS NULL OR m.fecha_hora >= cp.corte)
+                      {filtro_art_m}
+                )
+                SELECT articulo_id, deposito_id, lote, SUM(qty) AS stock
+                FROM base
+                GROUP BY articulo_id, deposito_id, lote
+                HAVING SUM(qty) <> 0
+                ORDER BY articulo_id, deposito_id, lote
+            """
+        else:
+            sql = f"""
+                SELECT
+                    articulo_id,
+                    {SQL_DEPOSITO_MOVIMIENTO} AS deposito_id,
+                    COALESCE(TRIM(lote), '') AS lote,
+                    SUM(COALESCE(qty_base::float8, 0)) AS stock
+                FROM movimientos_stock
+                WHERE fecha_hora <= %(hasta)s
+                  {filtro_art}
+                GROUP BY 1, 2, 3
+                HAVING SUM(COALESCE(qty_base::float8, 0)) <> 0
+                ORDER BY 1, 2, 3
+            """
+        # movimientos_stock no está versionada para el cache de consultas
+        df = ejecutar_consulta(sql, params, usar_cache=False)
+        return df if df is not None else pd.DataFrame()
+    except Exception as e:
+        print(f"Error en get_stock_a_fecha: {e}")
+        return pd.DataFrame()
+
+
 # =====================================================================
 # ALERTAS Y VENCIMIENTOS - CORREGIDO PARA CAST DE TEXT A DATE/NUMERIC
 # =====================================================================
@@ -498,12 +598,10 @@ def get_lotes_por_vencer(dias: int = 90) -> pd.DataFrame:
             SELECT
                 "CODIGO","ARTICULO","FAMILIA","DEPOSITO","LOTE","VENCIMIENTO","Dias_Para_Vencer","STOCK"
             FROM ({base}) s
-            WHERE "VENCIMIENTO" IS NOT NULL
-              AND "VENCIMIENTO" >= CURRENT_DATE
-              AND "Dias_Para_Vencer" <= %s
-              AND "Dias_Para_Vencer" >= 0
+            WHERE "VENCIMIENTO" >= CURRENT_DATE
+              AND "VENCIMIENTO" <= CURRENT_DATE + %s
               AND COALESCE("STOCK", 0) > 0
-            ORDER BY "Dias_Para_Vencer" ASC
+            ORDER BY "VENCIMIENTO" ASC
         """
         df = ejecutar_consulta(sql, (int(dias),))
         return df if df is not None else pd.DataFrame()
@@ -2,7 +2,7 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 from datetime import datetime
-from sql_core import ejecutar_consulta  # Asegúrate de que esta función exista y funcione con PostgreSQL
+from sql_core import ejecutar_consulta, _sql_cantidad_num_expr  # Asegúrate de que esta función exista y funcione con PostgreSQL
 
 # ============ CSS =============
 CSS_SUGERENCIAS_PEDIDOS = """
@@ -80,23 +80,14 @@ def get_datos_sugerencias(anio: int, proveedor_like: str = None) -> pd.DataFrame
     Obtiene datos de sugerencias: Articulo, stock_actual (max de stock > 0 de todas las filas del artículo), proveedor, ultima_compra, cantidad_anual.
     Respeta todas las reglas: limpieza de números, filtros obligatorios, agrupaciones.
     """
-    base_sql = """
+    cant_expr = _sql_cantidad_num_expr()
+    base_sql = f"""
     WITH aggregated AS (
         SELECT
             TRIM("Articulo") AS "Articulo",
             (ARRAY_AGG(TRIM("Cliente / Proveedor") ORDER BY "Fecha" DESC))[1] AS proveedor,
             MAX(TRIM("Fecha")) AS ultima_compra,
-            SUM(
-                CAST(
-                    REPLACE(
-                        REPLACE(
-                            REPLACE(
-                                REPLACE(TRIM("Cantidad"), '(', ''),
-                            ')', ''),
-                        '.', ''),
-                    ',', '.')
-                AS NUMERIC)
-            ) AS cantidad_anual
+            SUM({cant_expr}) AS cantidad_anual
         FROM chatbot_raw
         WHERE "Año" = %s
           AND TRIM("Articulo") IS NOT NULL
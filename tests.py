@@ -94,5 +94,139 @@ def run_tests():
         print("⚠️  Algunos tests fallaron. Revisá el orden en intent_detector.py")
 
 
+# =====================================================================
+# KARDEX: VECTORIZADO VS LOOP ORIGINAL (PROPIEDAD)
+# =====================================================================
+
+def _kardex_referencia(qtys, precios):
+    """Loop fila por fila original de ficha_stock (promedio móvil)."""
+    saldo_qty = 0.0
+    saldo_valor = 0.0
+    costo_prom = 0.0
+    filas = []
+    for qty, precio_in in zip(qtys, precios):
+        costo_previo = costo_prom
+        if qty > 0:
+            v = qty * precio_in
+            saldo_qty += qty
+            saldo_valor += v
+        elif qty < 0:
+            q_out = abs(qty)
+            v = -1 * q_out * costo_previo
+            saldo_qty -= q_out
+            saldo_valor += v
+        else:
+            v = 0.0
+
+        if saldo_qty > 0:
+            costo_prom = saldo_valor / saldo_qty
+        else:
+            costo_prom = 0.0
+            saldo_valor = 0.0
+
+        filas.append((costo_previo if qty < 0 else 0.0, v, saldo_qty, saldo_valor, costo_prom))
+    return filas
+
+
+def run_tests_kardex(casos: int = 500, semilla: int = 2024):
+    """Kardex aleatorios (saldos que cruzan cero, salidas sin stock, precios 0)."""
+    import random
+
+    try:
+        import pandas as pd
+        from ficha_stock import _calcular_kardex_promedio_movil
+    except ImportError as e:
+        print(f"⏭️  Kardex: omitido ({e})")
+        return
+
+    columnas = ["costo_unit_aplicado", "valor_mov", "saldo_qty", "saldo_valor", "costo_promedio"]
+    rng = random.Random(semilla)
+    passed = 0
+    failed = 0
+
+    for caso in range(casos):
+        n = rng.randint(1, 150)
+        qtys = [float(rng.choice([rng.randint(1, 500), -rng.randint(1, 500), 0])) for _ in range(n)]
+        precios = [rng.choice([0.0, round(rng.uniform(0, 2000), 2)]) for _ in range(n)]
+
+        esperado = _kardex_referencia(qtys, precios)
+        df = _calcular_kardex_promedio_movil(pd.DataFrame({"qty_base": qtys, "precio_unit_aplicado": precios}))
+
+        error = None
+        for j, col in enumerate(columnas):
+            for i, fila in enumerate(esperado):
+                a, b = fila[j], float(df[col].iloc[i])
+                if abs(a - b) > 1e-6 + 1e-7 * abs(a):
+                    error = f"{col}[{i}]: esperado {a}, obtenido {b}"
+                    break
+            if error:
+                break
+
+        if error:
+            print(f"❌ FAIL kardex caso {caso}: {error}")
+            failed += 1
+        else:
+            passed += 1
+
+    print(f"📊 KARDEX: {passed} passed, {failed} failed")
+
+
+def run_tests_snapshot():
+    """Snapshot sin conexión: tiene que usar cargador_respaldo, no quedar vacío."""
+    try:
+        import pandas as pd
+        import snapshot_tablas
+    except ImportError as e:
+        print(f"⏭️  Snapshot: omitido ({e})")
+        return
+
+    respaldo = pd.DataFrame({"articulo": ["A", "B"], "stock": ["1", "2"]})
+    vacio = pd.DataFrame({"articulo": pd.Series(dtype=object), "stock": pd.Series(dtype=object)})
+
+    def _sin_conexion(*args, **kwargs):
+        return iter(())
+
+    def _falla(*args, **kwargs):
+        raise RuntimeError("timeout")
+
+    def _tabla_vacia(*args, **kwargs):
+        return iter([vacio])
+
+    # (nombre, iterar_consulta simulado, filas esperadas, ¿usa respaldo?)
+    casos = [
+        ("sin conexión", _sin_conexion, 2, True),
+        ("error SQL", _falla, 2, True),
+        ("tabla vacía", _tabla_vacia, 0, False),
+    ]
+
+    originales = (snapshot_tablas.iterar_consulta, snapshot_tablas.snapshot_delta_disponible)
+    passed = 0
+    failed = 0
+    try:
+        snapshot_tablas.snapshot_delta_disponible = lambda: False
+        for nombre, iterar, filas, usa_respaldo in casos:
+            llamadas = []
+
+            def _respaldo():
+                llamadas.append(1)
+                return respaldo.copy()
+
+            snapshot_tablas.iterar_consulta = iterar
+            snap = snapshot_tablas.SnapshotTabla("stock", cargador_respaldo=_respaldo)
+            df = snap.df()
+
+            if len(df) == filas and bool(llamadas) == usa_respaldo:
+                passed += 1
+            else:
+                print(f"❌ FAIL snapshot {nombre}: {len(df)} filas, respaldo={'sí' if llamadas else 'no'}")
+                failed += 1
+    finally:
+        snapshot_tablas.iterar_consulta, snapshot_tablas.snapshot_delta_disponible = originales
+
+    print(f"📊 SNAPSHOT: {passed} passed, {failed} failed")
+
+
 if __name__ == "__main__":
     run_tests()
+    run_tests_kardex()
+    run_tests_snapshot()
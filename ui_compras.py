@@ -11,6 +11,7 @@ import sql_compras as sqlq_compras
 import sql_comparativas as sqlq_comparativas
 import sql_facturas as sqlq_facturas
 from sql_core import get_unique_proveedores, get_unique_articulos, ejecutar_consulta
+from utils_format import df_to_csv_bytes, df_to_excel, formatear_dataframe, _serie_to_datetime
 
 try:
     from debug_panel import DebugPanel
@@ -329,15 +330,19 @@ def calcular_totales_por_moneda(df: pd.DataFrame) -> dict:
     try:
         df_calc = df.copy()
 
-        df_calc[col_total] = (
-            df_calc[col_total]
-            .astype(str)
-            .str.replace(".", "", regex=False)
-            .str.replace(",", ".", regex=False)
-            .str.replace("$", "", regex=False)
-            .str.strip()
-        )
-        df_calc[col_total] = pd.to_numeric(df_calc[col_total], errors="coerce").fillna(0)
+        if _es_serie_numerica(df_calc[col_total]):
+            # Resultado sin formatear (lo normal): sumar directo
+            df_calc[col_total] = _serie_a_float(df_calc[col_total])
+        else:
+            df_calc[col_total] = (
+                df_calc[col_total]
+                .astype(str)
+                .str.replace(".", "", regex=False)
+                .str.replace(",", ".", regex=False)
+                .str.replace("$", "", regex=False)
+                .str.strip()
+            )
+            df_calc[col_total] = pd.to_numeric(df_calc[col_total], errors="coerce").fillna(0)
 
         mon = df_calc[col_moneda].astype(str)
 
@@ -432,8 +437,6 @@ def calcular_totales_por_moneda_comparativas(df: pd.DataFrame) -> dict:
 # DASHBOARD VENDIBLE (UI) - NUEVO
 # (NO TOCA SQL / NO ROMPE LO EXISTENTE)
 # =========================
-import io
-
 
 def _find_col(df: pd.DataFrame, candidates_lower: list) -> Optional[str]:
     for c in df.columns:
@@ -474,6 +477,21 @@ def _safe_to_float(v) -> float:
         return 0.0
 
 
+def _es_serie_numerica(serie: pd.Series) -> bool:
+    """Columna numérica (incluye los Decimal que devuelve psycopg2 en columnas object)."""
+    if pd.api.types.is_numeric_dtype(serie):
+        return True
+    return pd.api.types.infer_dtype(serie, skipna=True) in ("decimal", "integer", "floating", "mixed-integer-float")
+
+
+def _serie_a_float(serie: pd.Series) -> pd.Series:
+    """Importes -> float: numéricos directo (vectorizado), texto con _safe_to_float."""
+    if _es_serie_numerica(serie):
+        # Una sola conversión: numpy, Decimal (object) o double[pyarrow]
+        return pd.Series(serie.to_numpy(dtype="float64", na_value=0.0), index=serie.index, name=serie.name)
+    return serie.apply(_safe_to_float)
+
+
 def _fmt_compact_money(v: float, moneda: str) -> str:
     try:
         v = float(v or 0.0)
@@ -515,17 +533,14 @@ def _df_export_clean(df: pd.DataFrame) -> pd.DataFrame:
 
 def _df_to_csv_bytes(df: pd.DataFrame) -> bytes:
     try:
-        return df.to_csv(index=False).encode("utf-8")
+        return df_to_csv_bytes(df)
     except Exception:
         return b""
 
 
 def _df_to_excel_bytes(df: pd.DataFrame) -> bytes:
     try:
-        buff = io.BytesIO()
-        with pd.ExcelWriter(buff, engine="openpyxl") as writer:
-            df.to_excel(writer, index=False, sheet_name="datos")
-        return buff.getvalue()
+        return df_to_excel(df, sheet_name="datos")
     except Exception:
         return b""
 
@@ -865,13 +880,13 @@ def render_dashboard_compras_vendible(df: pd.DataFrame, titulo: str = "Resultado
         df_view["__moneda_view__"] = "OTRA"
 
     if col_fecha:
-        df_view["__fecha_view__"] = pd.to_datetime(df_view[col_fecha], errors="coerce")
+        df_view["__fecha_view__"] = _serie_to_datetime(df_view[col_fecha])
     else:
         df_view["__fecha_view__"] = pd.NaT
 
     # FIX: Calcular __total_num__ correctamente para comparaciones
     if col_total:
-        df_view["__total_num__"] = df_view[col_total].apply(_safe_to_float)
+        df_view["__total_num__"] = _serie_a_float(df_view[col_total])
     else:
         numeric_cols = [c for c in df_view.columns if c != col_proveedor and pd.api.types.is_numeric_dtype(df_view[c])]
         if numeric_cols:
@@ -998,7 +1013,7 @@ def render_dashboard_compras_vendible(df: pd.DataFrame, titulo: str = "Resultado
             
             # CARD 3: ACTIVIDAD EN EL TIEMPO
             if col_fecha and not df_f.empty:
-                df_f['fecha_dt'] = pd.to_datetime(df_f[col_fecha], errors='coerce')
+                df_f['fecha_dt'] = _serie_to_datetime(df_f[col_fecha])
                 df_f['fecha_str'] = df_f['fecha_dt'].dt.strftime('%d/%m')
                 gasto_diario = df_f.groupby('fecha_str')['__total_num__'].sum()
                 if col_nro:
@@ -1148,7 +1163,8 @@ def render_dashboard_compras_vendible(df: pd.DataFrame, titulo: str = "Resultado
             if col_articulo and col_articulo in df_page.columns:
                 df_page[col_articulo] = df_page[col_articulo].apply(lambda x: _shorten_text(x, 60))
 
-            st.dataframe(df_page, use_container_width=True, height=460)
+            # Formato LATAM sólo para las filas visibles: df_f sigue numérico
+            st.dataframe(formatear_dataframe(df_page), use_container_width=True, height=460)
 
             # Drill-down por factura
             if col_nro and col_nro in df_f.columns:
@@ -1198,7 +1214,7 @@ def render_dashboard_compras_vendible(df: pd.DataFrame, titulo: str = "Resultado
                     if col_articulo and col_articulo in df_fac_disp.columns:
                         df_fac_disp[col_articulo] = df_fac_disp[col_articulo].apply(lambda x: _shorten_text(x, 70))
 
-                    st.dataframe(df_fac_disp, use_container_width=True, height=320)
+                    st.dataframe(formatear_dataframe(df_fac_disp), use_container_width=True, height=320)
 
 
 # =========================
@@ -2493,7 +2509,7 @@ def Compras_IA(modo="compras"):
                                     )
 
                             st.markdown("---")
-                            st.dataframe(df, use_container_width=True, height=400)
+                            st.dataframe(formatear_dataframe(df), use_container_width=True, height=400)
                             st.caption(f"Dashboard vendible falló: {e}")
 
             # =========================
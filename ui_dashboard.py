@@ -21,6 +21,7 @@ from sql_compras import (
     get_dashboard_top_proveedores,
     get_dashboard_gastos_familia,
     get_dashboard_ultimas_compras,
+    get_dashboard_datos,
 )
 from sql_stock import get_alertas_combinadas  # ✅ CHANGED: Use combined alerts function
 
@@ -41,11 +42,19 @@ def mostrar_dashboard():
 
     st.markdown("---")
 
+    # Todas las consultas del dashboard en un solo lote (en paralelo);
+    # si el lote falla, cada sección consulta por su cuenta.
+    try:
+        datos = get_dashboard_datos(anio)
+    except Exception as e:
+        print(f"⚠️ Dashboard: lote SQL falló, se consulta por sección: {e}")
+        datos = {}
+
     # =====================
     # MÉTRICAS PRINCIPALES
     # =====================
     try:
-        totales = get_dashboard_totales(anio)
+        totales = datos.get("totales") or get_dashboard_totales(anio)
 
         col1, col2, col3, col4 = st.columns(4)
 
@@ -76,7 +85,7 @@ def mostrar_dashboard():
     with col_izq:
         st.subheader("📈 Compras por Mes")
         try:
-            df_meses = get_dashboard_compras_por_mes(anio)
+            df_meses = datos["compras_por_mes"] if "compras_por_mes" in datos else get_dashboard_compras_por_mes(anio)
             if df_meses is not None and not df_meses.empty:
                 fig_meses = px.bar(
                     df_meses,
@@ -110,7 +119,7 @@ def mostrar_dashboard():
             tabs = st.tabs(["$ Pesos", "U$S USD"])
 
             with tabs[0]:
-                df_provs = get_dashboard_top_proveedores(anio, 10, moneda="$")
+                df_provs = datos["top_proveedores"] if "top_proveedores" in datos else get_dashboard_top_proveedores(anio, 10, moneda="$")
                 if df_provs is not None and not df_provs.empty:
                     fig_provs = px.bar(
                         df_provs,
@@ -132,7 +141,8 @@ def mostrar_dashboard():
                     st.info("No hay datos en $ para este año")
 
             with tabs[1]:
-                df_provs_usd = get_dashboard_top_proveedores(anio, 10, moneda="U$S")
+                # Misma consulta que la pestaña $ (el parámetro moneda no filtra en SQL)
+                df_provs_usd = datos["top_proveedores"] if "top_proveedores" in datos else get_dashboard_top_proveedores(anio, 10, moneda="U$S")
                 if df_provs_usd is not None and not df_provs_usd.empty:
                     fig_provs_usd = px.bar(
                         df_provs_usd,
@@ -163,7 +173,7 @@ def mostrar_dashboard():
     with col_izq2:
         st.subheader("🥧 Gastos por Familia")
         try:
-            df_familias = get_dashboard_gastos_familia(anio)
+            df_familias = datos["gastos_familia"] if "gastos_familia" in datos else get_dashboard_gastos_familia(anio)
             if df_familias is not None and not df_familias.empty:
                 fig_torta = px.pie(
                     df_familias,
@@ -286,7 +296,7 @@ def mostrar_dashboard():
         # Últimos artículos comprados
         try:
             st.markdown("**🛒 Últimos artículos comprados:**")
-            df_ultimas = get_dashboard_ultimas_compras(anio, 10)
+            df_ultimas = datos["ultimas_compras"] if "ultimas_compras" in datos else get_dashboard_ultimas_compras(anio, 10)
             if df_ultimas is not None and not df_ultimas.empty:
                 # ✅ FIX: Normalizar nombres de columnas a minúsculas
                 df_ultimas_display = df_ultimas.copy()
@@ -359,7 +369,6 @@ def _safe_float(x) -> float:
         return 0.0
 
 
-@st.cache_data(ttl=300)
 def _get_totales_anio(anio: int) -> dict:
     total_expr = _sql_total_num_expr_general()
 
@@ -399,7 +408,6 @@ def _get_totales_anio(anio: int) -> dict:
     }
 
 
-@st.cache_data(ttl=300)
 def _get_totales_mes(mes_key: str) -> dict:
     total_expr = _sql_total_num_expr_general()
 
@@ -424,7 +432,6 @@ def _get_totales_mes(mes_key: str) -> dict:
     }
 
 
-@st.cache_data(ttl=300)
 def _get_top_proveedores_anio(anio: int, top_n: int = 20) -> pd.DataFrame:
     total_expr = _sql_total_num_expr_general()
 
@@ -1022,7 +1022,7 @@ def _stock_to_float(x) -> float:
         return 0.0
 
 
-# Removido @st.cache_data para debug
+# Cache: ejecutar_consulta (se invalida con movimientos de stock)
 def _get_stock_cantidad_1(top_n: int = 200) -> pd.DataFrame:
     # Cambiar a stock bajo (<=10) en lugar de exactamente =1
     df = get_stock_bajo(10)
@@ -1035,7 +1035,7 @@ def _get_stock_cantidad_1(top_n: int = 200) -> pd.DataFrame:
     return dfx.head(int(top_n))
 
 
-# Removido @st.cache_data para debug
+# Cache: ejecutar_consulta (se invalida con movimientos de stock)
 def _get_lotes_proximos_a_vencer(dias: int = 365) -> pd.DataFrame:  # ✅ CAMBIADO A 365 DÍAS
     df = get_lotes_por_vencer(dias)
     # DEBUG removido
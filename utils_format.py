@@ -2,8 +2,9 @@
 # UTILS_FORMAT.PY - FORMATEO DE DATOS
 # =========================
 
+import numpy as np
 import pandas as pd
-from typing import Optional
+from typing import Iterator, Optional
 import io
 import re
 
@@ -60,6 +61,117 @@ def _fmt_num_latam(valor, decimales: int = 2) -> str:
     return f"{prefijo}{latam}".strip()
 
 
+# ---------------------------------------------------------------------
+# Por columna: la misma limpieza que _fmt_num_latam / _latam_to_float con
+# .str (nativo sobre el dtype "str" de Arrow) y una sola conversión a float.
+# Lo que después de limpiar no queda "[-]dígitos[.dígitos]" (ej. "nan",
+# "1e5", texto suelto) y lo que no es texto ni número se resuelve con la
+# función por celda, así el resultado es idéntico.
+# Paridad y tiempos: python -m bench.bench_formato_latam
+# ---------------------------------------------------------------------
+
+_RE_NUM_PLANO = r"-?[0-9]+(?:\.[0-9]+)?"
+
+
+def _limpiar_serie_latam(txt: pd.Series, quitar_usd: bool) -> pd.Series:
+    s = txt.str.replace("U$S", "", regex=False)
+    if quitar_usd:
+        s = s.str.replace("USD", "", regex=False)
+    s = (
+        s.str.replace("$", "", regex=False)
+        .str.replace("(", "-", regex=False)
+        .str.replace(")", "", regex=False)
+        .str.replace(" ", "", regex=False)
+    )
+    # Coma decimal si no hay punto después de la última coma
+    coma_decimal = s.str.contains(r",[^.]*$", regex=True)
+    return (
+        s.str.replace(".", "", regex=False)
+        .str.replace(",", ".", regex=False)
+        .where(coma_decimal, s.str.replace(",", "", regex=False))
+    )
+
+
+def _parsear_serie_latam(serie: pd.Series, quitar_usd: bool):
+    """
+    (nums, ok, textos): float de cada fila (NaN donde no se pudo en bloque),
+    máscara de filas resueltas y, para las filas de texto, (posiciones, textos
+    como dtype "str").
+    """
+    n = len(serie)
+    if pd.api.types.is_numeric_dtype(serie.dtype):
+        nums = serie.astype("float64").to_numpy(dtype="float64", na_value=np.nan)
+        return nums, ~np.isnan(nums), (np.empty(0, dtype=np.intp), None)
+
+    nums = np.full(n, np.nan)
+    ok = np.zeros(n, dtype=bool)
+    if isinstance(serie.dtype, pd.StringDtype):
+        es_txt = serie.notna().to_numpy(dtype=bool)
+    else:
+        es_txt = serie.map(lambda v: isinstance(v, str)).to_numpy(dtype=bool)
+
+    pos_txt = np.flatnonzero(es_txt)
+    txt = None
+    if len(pos_txt):
+        txt = serie.iloc[pos_txt].astype("str")
+        limpio = _limpiar_serie_latam(txt, quitar_usd)
+        plano = limpio.str.fullmatch(_RE_NUM_PLANO).to_numpy(dtype=bool)
+        nums[pos_txt[plano]] = limpio[plano].astype("float64").to_numpy()
+        ok[pos_txt[plano]] = True
+
+    # Decimal / int / float sueltos en columnas object (psycopg2 sin Arrow)
+    pos_otros = np.flatnonzero(~es_txt)
+    if len(pos_otros):
+        otros = pd.to_numeric(serie.iloc[pos_otros], errors="coerce").astype("float64").to_numpy()
+        bien = ~np.isnan(otros)
+        nums[pos_otros[bien]] = otros[bien]
+        ok[pos_otros[bien]] = True
+
+    return nums, ok, (pos_txt, txt)
+
+
+def _serie_latam_to_float(serie: pd.Series) -> pd.Series:
+    """_latam_to_float sobre una columna entera."""
+    nums, ok, _ = _parsear_serie_latam(serie, quitar_usd=True)
+    resto = np.flatnonzero(~ok)
+    if len(resto):
+        nums[resto] = [_latam_to_float(v) for v in serie.iloc[resto]]
+    return pd.Series(nums, index=serie.index, name=serie.name)
+
+
+def _fmt_serie_latam(serie: pd.Series, decimales: int = 2) -> pd.Series:
+    """_fmt_num_latam sobre una columna entera (1.568.687,40)."""
+    nums, ok, (pos_txt, txt) = _parsear_serie_latam(serie, quitar_usd=False)
+    out = np.full(len(serie), "", dtype=object)
+
+    pos_ok = np.flatnonzero(ok)
+    if len(pos_ok):
+        patron = f"{{:,.{decimales}f}}"
+        base = pd.Series([patron.format(x) for x in nums[pos_ok].tolist()], dtype="str")
+        latam = (
+            base.str.replace(",", "X", regex=False)
+            .str.replace(".", ",", regex=False)
+            .str.replace("X", ".", regex=False)
+        )
+        if txt is not None:
+            prefijo = np.where(
+                txt.str.contains("U$S", regex=False).to_numpy(dtype=bool),
+                "U$S ",
+                np.where(txt.str.contains("$", regex=False).to_numpy(dtype=bool), "$ ", ""),
+            )
+            pref = np.full(len(serie), "", dtype=object)
+            pref[pos_txt] = prefijo
+            latam = pd.Series(pref[pos_ok], dtype="str") + latam
+        if len(pos_ok) == len(serie):
+            return pd.Series(latam.array, index=serie.index, name=serie.name)
+        out[pos_ok] = latam.to_numpy(dtype=object)
+
+    resto = np.flatnonzero(~ok)
+    if len(resto):
+        out[resto] = [_fmt_num_latam(v, decimales) for v in serie.iloc[resto]]
+    return pd.Series(out.tolist(), index=serie.index, name=serie.name)
+
+
 def _es_col_importe_latam(nombre_col: str) -> bool:
     """Detecta si una columna es un importe"""
     n = normalizar_texto(nombre_col or "")
@@ -85,21 +197,104 @@ def formatear_dataframe(df: pd.DataFrame) -> pd.DataFrame:
     d = df.copy()
     for c in d.columns:
         if _es_col_importe_latam(c):
-            d[c] = d[c].apply(_fmt_num_latam)
+            d[c] = _fmt_serie_latam(d[c])
         elif "variacion" in normalizar_texto(c) or "%" in c:
             d[c] = d[c].apply(lambda x: (f"{float(x):.2f}%" if pd.notna(x) else ""))
     return d
 
 
 # =====================================================================
-# HELPER PARA EXPORTAR A EXCEL
+# EXPORTAR A EXCEL / CSV (INCREMENTAL)
 # =====================================================================
+# `origen` puede ser:
+#   - un DataFrame
+#   - un iterable de DataFrames (ej. sql_core.iterar_consulta(sql, params))
+#   - un DataFrame truncado con attrs["sql_origen"] = (sql, params): se
+#     vuelve a leer completo desde la base, por chunks
+# Se escribe chunk por chunk: un export de varios años no arma el resultado
+# entero en memoria.
+
+def iterar_chunks(origen) -> Iterator[pd.DataFrame]:
+    if origen is None:
+        return
+    if isinstance(origen, pd.DataFrame):
+        sql_origen = origen.attrs.get("sql_origen")
+        if sql_origen and origen.attrs.get("truncado"):
+            from sql_core import iterar_consulta
+            yield from iterar_consulta(*sql_origen)
+        else:
+            yield origen
+        return
+    for chunk in origen:
+        if chunk is not None:
+            yield chunk
 
-def df_to_excel(df: pd.DataFrame) -> bytes:
-    """Convierte un DataFrame a bytes de Excel (.xlsx)"""
+
+def _celda_excel(v):
+    if v is None:
+        return None
+    try:
+        if pd.isna(v):
+            return None
+    except (TypeError, ValueError):
+        pass
+    if isinstance(v, pd.Timestamp):
+        v = v.to_pydatetime()
+    if getattr(v, "tzinfo", None) is not None:
+        v = v.replace(tzinfo=None)
+    return v
+
+
+def exportar_csv(origen, destino) -> int:
+    """Escribe CSV (UTF-8) en `destino` (ruta o archivo binario). Retorna filas escritas."""
+    propio = isinstance(destino, str)
+    f = open(destino, "wb") if propio else destino
+    filas = 0
+    try:
+        primero = True
+        for chunk in iterar_chunks(origen):
+            f.write(chunk.to_csv(index=False, header=primero).encode("utf-8"))
+            primero = False
+            filas += len(chunk)
+    finally:
+        if propio:
+            f.close()
+    return filas
+
+
+def exportar_excel(origen, destino, sheet_name: str = "Datos") -> int:
+    """
+    Escribe .xlsx en `destino` (ruta o archivo binario) con openpyxl en modo
+    write_only (fila a fila). Retorna filas escritas.
+    """
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=sheet_name)
+    filas = 0
+    encabezado = False
+    for chunk in iterar_chunks(origen):
+        if not encabezado:
+            ws.append([str(c) for c in chunk.columns])
+            encabezado = True
+        for row in chunk.itertuples(index=False, name=None):
+            ws.append([_celda_excel(v) for v in row])
+        filas += len(chunk)
+    wb.save(destino)
+    return filas
+
+
+def df_to_csv_bytes(origen) -> bytes:
+    """CSV (UTF-8) en bytes, escrito por chunks."""
     output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Datos')
+    exportar_csv(origen, output)
+    return output.getvalue()
+
+
+def df_to_excel(origen, sheet_name: str = "Datos") -> bytes:
+    """Convierte un DataFrame (o chunks, ver iterar_chunks) a bytes de Excel (.xlsx)"""
+    output = io.BytesIO()
+    exportar_excel(origen, output, sheet_name=sheet_name)
     output.seek(0)
     return output.getvalue()
 
@@ -169,6 +364,23 @@ def _latam_to_float(valor) -> float:
         return 0.0
 
 
+def _serie_to_datetime(serie: pd.Series, dayfirst: bool = False) -> pd.Series:
+    """
+    pd.to_datetime(serie, errors="coerce") que no pasa por objetos Python
+    cuando la columna ya es fecha de Arrow (resultados con SQL_ARROW, ver
+    sql_arrow.py): date32 / timestamp se castean en pyarrow.
+    """
+    dtype = serie.dtype
+    if isinstance(dtype, pd.ArrowDtype):
+        import pyarrow as pa
+
+        tipo = dtype.pyarrow_dtype
+        if pa.types.is_date(tipo) or (pa.types.is_timestamp(tipo) and tipo.tz is None):
+            ts = serie.array.__arrow_array__().cast(pa.timestamp("us"))
+            return pd.Series(ts.to_numpy(), index=serie.index, name=serie.name)
+    return pd.to_datetime(serie, errors="coerce", dayfirst=dayfirst)
+
+
 def _safe_float(x) -> float:
     try:
         if x is None:
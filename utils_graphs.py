@@ -9,7 +9,7 @@ import plotly.graph_objects as go
 from typing import Optional
 
 from intent_detector import normalizar_texto
-from utils_format import _fmt_num_latam, _latam_to_float, _fmt_money_latam, _pick_col
+from utils_format import _fmt_num_latam, _serie_latam_to_float, _serie_to_datetime, _fmt_money_latam, _pick_col
 
 def _df_get_numeric(df: pd.DataFrame, col: str) -> pd.Series:
     if col is None or df is None or df.empty or col not in df.columns:
@@ -19,7 +19,7 @@ def _df_get_numeric(df: pd.DataFrame, col: str) -> pd.Series:
     if pd.api.types.is_numeric_dtype(ser):
         return pd.to_numeric(ser, errors="coerce").fillna(0.0)
     # si es string (por formatear_dataframe), parsear LATAM
-    return ser.apply(_latam_to_float).fillna(0.0)
+    return _serie_latam_to_float(ser).fillna(0.0)
 
 
 def _df_get_datetime(df: pd.DataFrame, col: str) -> Optional[pd.Series]:
@@ -27,7 +27,7 @@ def _df_get_datetime(df: pd.DataFrame, col: str) -> Optional[pd.Series]:
         return None
     try:
         # dayfirst=True por DD/MM/YYYY que aparece a veces
-        return pd.to_datetime(df[col], errors="coerce", dayfirst=True)
+        return _serie_to_datetime(df[col], dayfirst=True)
     except Exception:
         return None
 
@@ -222,7 +222,7 @@ def _render_graficos_compras(df: pd.DataFrame, key_base: str = "detalle_df"):
     # Fecha a datetime si existe
     if col_fecha is not None:
         try:
-            dfg[col_fecha] = pd.to_datetime(dfg[col_fecha], errors="coerce", dayfirst=True)
+            dfg[col_fecha] = _serie_to_datetime(dfg[col_fecha], dayfirst=True)
         except Exception:
             pass
 
@@ -11,17 +11,57 @@ import pandas as pd
 
 from openai import OpenAI
 from config import OPENAI_MODEL
-from config_runtime import get_secret
+from config_runtime import get_secret, get_secret_num
 
 OPENAI_API_KEY = get_secret("OPENAI_API_KEY")
 
 
 from ia_interpretador import normalizar_texto
-from sql_core import ejecutar_consulta
+from sql_core import iterar_consulta
+from cache_llm import completar_cacheado
 
 # Cliente OpenAI
 client = OpenAI(api_key=OPENAI_API_KEY)
 
+
+def _chat(system_prompt: str, usuario: str, validar=None, timeout=None, on_token=None, **opciones) -> str:
+    """
+    chat.completions (system + user) con cache de respuestas (ver cache_llm).
+    Devuelve el texto de la respuesta; sólo se cachea si validar(texto) da True.
+    Con on_token la respuesta llega en streaming: on_token(fragmento) por cada
+    delta (o una sola vez con el texto entero si salió del cache).
+    """
+    llamado = []
+
+    def llamar() -> str:
+        llamado.append(True)
+        extra = {"timeout": timeout} if timeout is not None else {}
+        mensajes = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": usuario}
+        ]
+        if on_token is None:
+            response = client.chat.completions.create(
+                model=OPENAI_MODEL, messages=mensajes, **opciones, **extra
+            )
+            return response.choices[0].message.content.strip()
+
+        partes = []
+        stream = client.chat.completions.create(
+            model=OPENAI_MODEL, messages=mensajes, stream=True, **opciones, **extra
+        )
+        for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                partes.append(delta)
+                on_token(delta)
+        return "".join(partes).strip()
+
+    texto = completar_cacheado(llamar, OPENAI_MODEL, system_prompt, usuario, validar=validar, **opciones)
+    if on_token is not None and not llamado:
+        on_token(texto)
+    return texto
+
 # =====================================================================
 # OPENAI - RESPUESTAS CONVERSACIONALES
 # =====================================================================
@@ -93,8 +133,8 @@ def es_pregunta_conocimiento(texto: str) -> bool:
 
     return False
 
-def responder_con_openai(pregunta: str, tipo: str) -> str:
-    """Responde con OpenAI (conversación o conocimiento)"""
+def responder_con_openai(pregunta: str, tipo: str, on_token=None) -> str:
+    """Responde con OpenAI (conversación o conocimiento). Con on_token, en streaming (ver _chat)."""
     if tipo == "conversacion":
         system_msg = """Eres un asistente amigable de un sistema de análisis de compras de laboratorio.
 Responde de forma natural, cálida y breve a saludos y conversación casual.
@@ -112,16 +152,7 @@ Responde en español de forma concisa pero completa."""
         if not OPENAI_API_KEY:
             return "⚠️ La API de OpenAI no está configurada. Configurá OPENAI_API_KEY en las variables de entorno."
         
-        response = client.chat.completions.create(
-            model=OPENAI_MODEL,
-            messages=[
-                {"role": "system", "content": system_msg},
-                {"role": "user", "content": pregunta}
-            ],
-            temperature=0.5,
-            max_tokens=max_tok
-        )
-        return response.choices[0].message.content.strip()
+        return _chat(system_msg, pregunta, on_token=on_token, temperature=0.5, max_tokens=max_tok)
     except Exception as e:
         print(f"❌ Error OpenAI: {e}")
         return f"⚠️ Error al conectar con OpenAI: {str(e)[:100]}"
@@ -148,20 +179,18 @@ Usa frases como:
 """
 
     try:
-        response = client.chat.completions.create(
-            model=OPENAI_MODEL,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": pregunta}
-            ],
-            temperature=0.3,
-            max_tokens=300
-        )
-        return response.choices[0].message.content.strip()
+        return _chat(system_prompt, pregunta, temperature=0.3, max_tokens=300)
     except Exception:
         return "No pude ayudarte a reformular la pregunta."
 
 
+def _parsear_sugerencia(content: str):
+    """JSON de la sugerencia, sin los ``` que a veces agrega el modelo."""
+    content = re.sub(r'```json\s*', '', content)
+    content = re.sub(r'```\s*', '', content)
+    return json.loads(content.strip())
+
+
 def obtener_sugerencia_ejecutable(pregunta: str) -> dict:
     """
     ✅ VERSIÓN MEJORADA: Interpreta TODAS las variaciones de lenguaje natural
@@ -248,24 +277,14 @@ RESPONDE SOLO JSON (sin ```json):
 
     try:
         print(f"🤖 Llamando a IA con: {pregunta}")
-        response = client.chat.completions.create(
-            model=OPENAI_MODEL,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": pregunta}
-            ],
-            temperature=0.1,
-            max_tokens=250,
-            timeout=15
+        content = _chat(
+            system_prompt, pregunta,
+            validar=lambda c: isinstance(_parsear_sugerencia(c), dict),
+            timeout=15, temperature=0.1, max_tokens=250
         )
-        content = response.choices[0].message.content.strip()
         print(f"🤖 IA respondió: {content}")
 
-        content = re.sub(r'```json\s*', '', content)
-        content = re.sub(r'```\s*', '', content)
-        content = content.strip()
-
-        resultado = json.loads(content)
+        resultado = _parsear_sugerencia(content)
         print(f"🤖 JSON parseado: {resultado}")
         return resultado
 
@@ -329,6 +348,44 @@ def _sql_es_seguro(sql: str) -> bool:
 
     return True
 
+
+def _sql_de_respuesta(obj: Optional[dict]) -> str:
+    """SQL del JSON de OpenAI, sin LIMIT final."""
+    if not obj:
+        return ""
+    sql = str(obj.get("sql", "")).strip()
+    # ✅ Remover LIMIT si OpenAI lo agregó
+    return re.sub(r'\s+LIMIT\s+\d+\s*$', '', sql, flags=re.IGNORECASE)
+
+
+def _leer_acotado(sql: str, max_filas: int) -> pd.DataFrame:
+    """
+    Lee un SELECT por chunks (cursor de servidor) y se queda con las primeras
+    max_filas. Si hay más, el DataFrame sale con attrs truncado/sql_origen y los
+    exports (utils_format.df_to_excel / df_to_csv_bytes) releen todo por chunks.
+    """
+    partes = []
+    filas = 0
+    truncado = False
+    gen = iterar_consulta(sql)
+    try:
+        for chunk in gen:
+            if filas + len(chunk) > max_filas:
+                partes.append(chunk.iloc[: max_filas - filas])
+                truncado = True
+                break
+            partes.append(chunk)
+            filas += len(chunk)
+    finally:
+        gen.close()
+
+    df = pd.concat(partes, ignore_index=True) if partes else pd.DataFrame()
+    if truncado:
+        print(f"⚠️ Fallback SQL: resultado truncado a {max_filas} filas en memoria")
+        df.attrs["truncado"] = True
+        df.attrs["sql_origen"] = (sql, ())
+    return df
+
 def fallback_openai_sql(pregunta: str, motivo: str) -> Tuple[Optional[str], Optional[pd.DataFrame], Optional[str]]:
     """
     ✅ FALLBACK MEJORADO: Genera SQL SIN LIMIT para traer datos completos
@@ -372,33 +429,26 @@ Responde SOLO con JSON:
 """
 
     try:
-        response = client.chat.completions.create(
-            model=OPENAI_MODEL,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"Motivo: {motivo}\n\nPregunta: {pregunta}"}
-            ],
-            temperature=0.1,
-            max_tokens=800
+        # Sólo se cachea una respuesta con SQL seguro; igual se revalida abajo
+        content = _chat(
+            system_prompt, f"Motivo: {motivo}\n\nPregunta: {pregunta}",
+            validar=lambda c: _sql_es_seguro(_sql_de_respuesta(_extraer_json_de_texto(c))),
+            temperature=0.1, max_tokens=800
         )
-
-        content = response.choices[0].message.content.strip()
         obj = _extraer_json_de_texto(content)
 
         if not obj:
             return None, None, None
 
-        sql = str(obj.get("sql", "")).strip()
+        sql = _sql_de_respuesta(obj)
         titulo = str(obj.get("titulo", "Resultado")).strip()
         respuesta = str(obj.get("respuesta", "")).strip()
 
-        # ✅ Remover LIMIT si OpenAI lo agregó
-        sql = re.sub(r'\s+LIMIT\s+\d+\s*$', '', sql, flags=re.IGNORECASE)
-
         if not _sql_es_seguro(sql):
             return None, None, None
 
-        df = ejecutar_consulta(sql)
+        # Sin LIMIT puede traer todo chatbot_raw: se lee por chunks con tope en memoria
+        df = _leer_acotado(sql, get_secret_num("FALLBACK_SQL_MAX_FILAS", 200000))
         return titulo, df, respuesta
 
     except Exception as e: